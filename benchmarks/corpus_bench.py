@@ -0,0 +1,251 @@
+"""合成したリポジトリ一覧で `list` / `fix` / `search` の主要処理を計測し、結果を JSON ファイルに書き出す。
+
+リポジトリ数ごと (既定は 1k / 10k / 100k) に一時ディレクトリへユーザーを作り、次を計測する。
+`gh` は起動せず、GraphQL 応答と同じ形の JSON をあらかじめ生成してプロセス内で返す。
+
+- `get_all_repos`: 応答 JSON の解析・検証 (管理用フィールドは保存時に重ねる)
+- `save_snapshot`: スナップショットの保存 (回ごとに 1% のレコードを変える)
+- `merge_into_repos`: 最新リポジトリ一覧へのマージ
+- `fix_storage`: 保存済みスナップショット構成の点検
+- `search:<種別>`: `CommandSearch.search_repos` の各検索種別
+
+    python benchmarks/corpus_bench.py [--sizes 1000,10000,100000] [--repeat 3]
+        [--output bench.json] [--compare baseline.json] [--threshold 1.25]
+
+`src/` を `PYTHONPATH` に加えて実行する。`HOME` を一時ディレクトリに差し替えるため、
+実際の設定・保存データには触れない。`--compare` を指定すると、別ブランチで書き出した結果と
+中央値を比べ、`--threshold` 倍を超えて遅くなった項目があれば終了コード 1 で終了する。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+SEARCH_KINDS = ["public", "private", "internal", "both", "latest10", "latest", "oldest"]
+VISIBILITIES = ["PUBLIC", "PRIVATE", "INTERNAL"]
+PAGE_SIZE = 100  # GraphQL `first` の上限値 (`RepoFetcher.DEFAULT_PAGE_SIZE`)
+CHANGE_RATIO = 100  # 回ごとに内容を変えるレコードの割合 (1/N)
+
+
+def make_node(owner: str, index: int, revision: int) -> dict[str, Any]:
+    """`gh api graphql` が返すリポジトリ 1 件と同じ形の値を返す。"""
+    changed = revision > 0 and index % CHANGE_RATIO == revision % CHANGE_RATIO
+    return {
+        "name": f"repo{index:06d}",
+        "visibility": VISIBILITIES[index % len(VISIBILITIES)],
+        "url": f"https://github.com/{owner}/repo{index:06d}",
+        "owner": {"id": "U_bench", "login": owner},
+        "nameWithOwner": f"{owner}/repo{index:06d}",
+        "description": f"synthetic repository {index}",
+        "createdAt": f"{2010 + index % 15}-{1 + index % 12:02d}-{1 + index % 28:02d}T00:00:00Z",
+        "updatedAt": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T00:00:00Z",
+        "pushedAt": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T12:00:00Z",
+        "diskUsage": index * 10 + (revision if changed else 0),
+        "hasProjectsEnabled": index % 2 == 0,
+        "homepageUrl": "",
+        "parent": None,
+        "pullRequests": {"totalCount": index % 7},
+    }
+
+
+def make_pages(owner: str, size: int, revision: int) -> list[str]:
+    """`size` 件を `PAGE_SIZE` 件ずつに分けた GraphQL 応答 JSON を返す。"""
+    pages: list[str] = []
+    for start in range(0, size, PAGE_SIZE):
+        end = min(start + PAGE_SIZE, size)
+        connection = {
+            "nodes": [make_node(owner, index, revision) for index in range(start, end)],
+            "pageInfo": {"hasNextPage": end < size, "endCursor": str(end)},
+        }
+        pages.append(json.dumps({"data": {"repositoryOwner": {"repositories": connection}}}))
+    return pages
+
+
+def make_runner(pages: list[str]) -> Callable[[list[str]], str]:
+    """`gh` の代わりに、`after` カーソルに応じた生成済みのページを返す関数を返す。"""
+
+    def run(command_args: list[str]) -> str:
+        after = 0
+        for value in command_args:
+            if value.startswith("after="):
+                after = int(value[len("after=") :])
+        return pages[after // PAGE_SIZE]
+
+    return run
+
+
+def measure(run: Callable[[], object], repeat: int) -> list[float]:
+    """`run` を `repeat` 回実行し、各回の所要時間 (ミリ秒) を返す。"""
+    elapsed: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        elapsed.append((time.perf_counter() - started) * 1000)
+    return elapsed
+
+
+def summarize(size: int, case: str, elapsed: list[float]) -> dict[str, Any]:
+    """1 項目の計測結果を返す。"""
+    return {
+        "size": size,
+        "case": case,
+        "runs_ms": [round(value, 2) for value in elapsed],
+        "min_ms": round(min(elapsed), 2),
+        "median_ms": round(statistics.median(elapsed), 2),
+    }
+
+
+def bench_size(size: int, repeat: int) -> Iterator[dict[str, Any]]:
+    """`size` 件のユーザーを作って各処理を計測し、項目ごとの結果を返す。"""
+    from ghrepo.appconfigx import AppConfigx
+    from ghrepo.command_list import CommandList
+    from ghrepo.command_search import CommandSearch, SearchOptions
+    from ghrepo.command_setup import CommandSetup
+    from ghrepo.ghrepo import Ghrepo
+    from ghrepo.repo_fetcher import RepoFetcher
+
+    owner = f"bench{size}"
+    appstore = Ghrepo.init_appstore(owner)
+    CommandSetup(appstore).run(AppConfigx.key, AppConfigx.default_json_fields)
+    appstore.load_file_all()
+    command = CommandList(appstore, AppConfigx.default_json_fields, owner)
+    args = argparse.Namespace(user=owner, json=None, limit=None)
+
+    revisions = [make_pages(owner, size, revision) for revision in range(repeat + 1)]
+    fetched: list[Mapping[str, Any]] = []
+
+    def fetch() -> None:
+        fetcher = RepoFetcher(runner=make_runner(revisions[len(fetched)]))
+        fetched.append(command.get_all_repos(args, appstore, len(fetched) + 1, fetcher))
+
+    yield summarize(size, "get_all_repos", measure(fetch, repeat + 1))
+
+    saved: list[int] = []
+
+    def save() -> None:
+        with command.reserve_snapshot_id() as snapshot_id:
+            timestamp = f"2025-01-{1 + len(saved):02d}T00:00:00+00:00"
+            command.save_snapshot(snapshot_id, timestamp, fetched[len(saved)])
+        saved.append(snapshot_id)
+
+    yield summarize(size, "save_snapshot", measure(save, repeat))
+
+    merged: list[int] = []
+
+    def merge() -> None:
+        merged.append(command._merge_into_repos(fetched[(len(merged) + 1) % len(fetched)]))
+
+    yield summarize(size, "merge_into_repos", measure(merge, repeat))
+    yield summarize(
+        size, "fix_storage", measure(lambda: command.fix_storage(max_workers=4), repeat)
+    )
+
+    search = CommandSearch(appstore, owner)
+    for kind in SEARCH_KINDS:
+        options = SearchOptions(kind)
+        yield summarize(
+            size, f"search:{kind}", measure(lambda: search.search_repos(options), repeat)
+        )
+
+
+def get_git_revision() -> str | None:
+    """計測したソースの git リビジョンを返す。git が使えなければ `None` を返す。"""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def compare(
+    results: list[dict[str, Any]], baseline_path: Path, threshold: float
+) -> list[dict[str, Any]]:
+    """基準の結果と中央値を比べ、`threshold` 倍を超えて遅くなった項目を返す。"""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    baseline_medians = {
+        (item["size"], item["case"]): item["median_ms"] for item in baseline["results"]
+    }
+    regressions: list[dict[str, Any]] = []
+    for item in results:
+        base_ms = baseline_medians.get((item["size"], item["case"]))
+        if base_ms is None or base_ms <= 0:
+            continue
+        ratio = item["median_ms"] / base_ms
+        if ratio > threshold:
+            regressions.append(
+                {
+                    "size": item["size"],
+                    "case": item["case"],
+                    "baseline_ms": base_ms,
+                    "median_ms": item["median_ms"],
+                    "ratio": round(ratio, 2),
+                }
+            )
+    return regressions
+
+
+def main() -> None:
+    """計測を実行して結果を書き出す。"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", default="1000,10000,100000", help="comma-separated repository counts"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per case")
+    parser.add_argument("--output", default="bench.json", help="result JSON file")
+    parser.add_argument("--compare", help="baseline result JSON file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="allowed median slowdown ratio against --compare",
+    )
+    args = parser.parse_args()
+    sizes = [int(value) for value in args.sizes.split(",") if value.strip()]
+
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="ghrepo-bench-") as home_dir:
+        os.environ["HOME"] = home_dir
+        os.environ["USERPROFILE"] = home_dir
+        os.environ["GHREPO_SERVER"] = "off"
+        for size in sizes:
+            for item in bench_size(size, args.repeat):
+                print(
+                    f"{item['size']:>7} {item['case']:<18} {item['median_ms']:>10.2f} ms",
+                    file=sys.stderr,
+                )
+                results.append(item)
+
+    report: dict[str, Any] = {
+        "revision": get_git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.compare:
+        report["regressions"] = compare(results, Path(args.compare), args.threshold)
+    Path(args.output).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+    if report.get("regressions"):
+        print(json.dumps(report["regressions"], indent=2), file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""`ghrepo search public` のコールドスタート時間を計測し、予算を超えたら失敗する。
+
+サブコマンドのハンドラ本体は差し替えて呼ばないため、計測対象は「インタープリタ起動から
+ハンドラ呼び出しまで」(import と引数解析) になる。`python -c pass` との差分の中央値を
+予算と比べ、あわせて `-X importtime` の出力から起動時に読み込んではいけない重いモジュールが
+含まれていないかを確認する。
+
+    python benchmarks/startup_budget.py [--runs 7] [--budget-ms 120]
+
+`src/` を `PYTHONPATH` に加えて実行する。結果は JSON で標準出力し、予算超過または
+禁止モジュールの読み込みがあれば終了コード 1 で終了する。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# ハンドラを差し替えてから main() を実行し、呼び出し直前までの起動コストだけを測る
+STARTUP_CODE = (
+    "import sys\n"
+    "from ghrepo.ghrepo import Ghrepo, main\n"
+    "Ghrepo.search_repos = classmethod(lambda cls, args: None)\n"
+    "sys.argv = ['ghrepo', 'search', 'public']\n"
+    "main()\n"
+)
+
+# `search` のハンドラ呼び出しまでに読み込まれてはならないモジュール
+FORBIDDEN_MODULES = [
+    "yaml",
+    "csv",
+    "concurrent.futures",
+    "http.client",
+    "http.server",
+    "yklibpy.db.appstore",
+    "yklibpy.command.command_gh_user",
+    "ghrepo.command_list",
+    "ghrepo.command_search",
+    "ghrepo.command_setup",
+    "ghrepo.gh_user_cache",
+    "ghrepo.history_index",
+    "ghrepo.output_writer",
+    "ghrepo.query",
+    "ghrepo.repo_fetcher",
+    "ghrepo.search_index",
+    "ghrepo.server",
+    "ghrepo.snapshot_codec",
+    "ghrepo.snapshot_store",
+    "ghrepo.storage_scan",
+]
+
+
+def get_env() -> dict[str, str]:
+    """`src/` を `PYTHONPATH` に加え、常駐プロセスへの問い合わせを無効にした環境変数を返す。"""
+    env = dict(os.environ)
+    src_dir = str(Path(__file__).resolve().parent.parent / "src")
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (src_dir, env.get("PYTHONPATH", "")) if path
+    )
+    env["GHREPO_SERVER"] = "off"
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def measure(code: str, runs: int, env: dict[str, str]) -> list[float]:
+    """`python -c code` を `runs` 回実行し、各回の所要時間 (ミリ秒) を返す。"""
+    elapsed: list[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+        elapsed.append((time.perf_counter() - started) * 1000)
+    return elapsed
+
+
+def collect_imported_modules(env: dict[str, str]) -> tuple[list[str], int]:
+    """`-X importtime` で読み込まれたモジュール名と、トップレベル import の累計時間 (マイクロ秒) を返す。"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: list[str] = []
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append(name.strip())
+        if not name[1:].startswith(" "):  # 字下げの無い行がトップレベルの import
+            total_us += int(cumulative_us)
+    return modules, total_us
+
+
+def main() -> None:
+    """計測を実行して結果を出力する。"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="number of runs")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=120.0,
+        help="allowed median overhead over `python -c pass` in milliseconds",
+    )
+    args = parser.parse_args()
+
+    env = get_env()
+    baseline = statistics.median(measure("pass", args.runs, env))
+    startup = statistics.median(measure(STARTUP_CODE, args.runs, env))
+    modules, import_us = collect_imported_modules(env)
+    forbidden = [name for name in FORBIDDEN_MODULES if name in modules]
+    overhead = startup - baseline
+
+    result = {
+        "command": "ghrepo search public",
+        "runs": args.runs,
+        "baseline_ms": round(baseline, 1),
+        "startup_ms": round(startup, 1),
+        "overhead_ms": round(overhead, 1),
+        "budget_ms": args.budget_ms,
+        "import_ms": round(import_us / 1000, 1),
+        "modules": len(modules),
+        "forbidden_modules": forbidden,
+        "ok": overhead <= args.budget_ms and not forbidden,
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if not result["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
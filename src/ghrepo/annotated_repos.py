@@ -0,0 +1,31 @@
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+type RepoItem = dict[str, Any]
+
+
+class AnnotatedRepos(Mapping[str, RepoItem]):
+    """取得したリポジトリ名 -> レコードの対応と、全レコードに共通の管理用フィールドを分けて持つ。
+
+    管理用フィールド (`CommandList.get_annotations`) は 1 つの辞書を共有し、各レコードへは書き込まない。
+    `repos[name]` や `items()` は呼ぶたびにレコードへ管理用フィールドを重ねた新しい辞書を返すため、
+    スナップショットや出力へ書き出す時にだけ 1 件ずつ組み立てられる。レコードに同じキーがあれば
+    (前回スナップショットから引き継いだレコードの `snapshot-id` 等) 管理用フィールドの値を使う。
+    """
+
+    def __init__(self, records: dict[str, RepoItem], annotations: dict[str, Any]) -> None:
+        """取得したレコードと管理用フィールドを保持する。どちらも変更しない。"""
+        self.records: dict[str, RepoItem] = records
+        self.annotations: dict[str, Any] = annotations
+
+    def __getitem__(self, name: str) -> RepoItem:
+        return {**self.records[name], **self.annotations}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
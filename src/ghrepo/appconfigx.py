@@ -9,11 +9,22 @@ class AppConfigx(AppConfig):
     BASE_NAME_SNAPSHOTS: ClassVar[str] = "snapshots"  # スナップショット作成記録ファイルのベース名
     SNAPSHOT_TOP_DIR_NAME: ClassVar[str] = "snapshots"  # スナップショットトップディレクトリ名
     BASE_NAME_REPOS: ClassVar[str] = "repos"
+    OBJECTS_DIR_NAME: ClassVar[str] = "objects"  # 重複排除形式のレコード保存ディレクトリ名
+    BASE_NAME_WATERMARKS: ClassVar[str] = "watermarks"  # 差分取得用の最高水位ファイルのベース名
+    ARCHIVE_DIR_NAME: ClassVar[str] = "archive"  # prune で外したスナップショットのアーカイブ置き場
+
+    # `AppConfig.FILE_TYPE_YAML` などと同じく大文字で表す
+    FILE_TYPE_JSONL: ClassVar[str] = "JSONL"  # スナップショット用 JSON Lines
+    FILE_TYPE_MSGPACK: ClassVar[str] = "MSGPACK"  # スナップショット用 MessagePack
+    FILE_TYPE_PARQUET: ClassVar[str] = "PARQUET"  # スナップショット用 Parquet (列指向)
 
     file_type_dict: ClassVar[dict[str, str]] = {
         AppConfig.FILE_TYPE_YAML: ".yaml",
         AppConfig.FILE_TYPE_JSON: ".json",
         AppConfig.FILE_TYPE_TOML: ".toml",
+        FILE_TYPE_JSONL: ".jsonl",
+        FILE_TYPE_MSGPACK: ".msgpack",
+        FILE_TYPE_PARQUET: ".parquet",
     }
 
     file_assoc: ClassVar[dict[str, dict[str, dict[str, Any]]]] = {
@@ -75,3 +86,50 @@ class AppConfigx(AppConfig):
         "homepageUrl",
     ]
     key: ClassVar[str] = "JSON_FIELDS"
+
+    SNAPSHOT_STORAGE_KEY: ClassVar[str] = "SNAPSHOT_STORAGE"  # スナップショット保存形式の設定キー
+    SNAPSHOT_STORAGE_PLAIN: ClassVar[str] = "plain"  # 全レコードを snapshot.yaml へ書き出す
+    SNAPSHOT_STORAGE_DEDUP: ClassVar[str] = "dedup"  # レコードを内容ハッシュで 1 度だけ保存する
+    default_snapshot_storage: ClassVar[str] = SNAPSHOT_STORAGE_PLAIN
+
+    SNAPSHOT_FORMAT_KEY: ClassVar[str] = "SNAPSHOT_FORMAT"  # スナップショットのファイル種別の設定キー
+    default_snapshot_format: ClassVar[str] = AppConfig.FILE_TYPE_YAML
+    snapshot_formats: ClassVar[list[str]] = [
+        AppConfig.FILE_TYPE_YAML,
+        FILE_TYPE_JSONL,
+        FILE_TYPE_MSGPACK,
+        FILE_TYPE_PARQUET,
+    ]
+
+    REPOS_STORE_KEY: ClassVar[str] = "REPOS_STORE"  # 最新リポジトリ一覧の保存先の設定キー
+    REPOS_STORE_YAML: ClassVar[str] = "yaml"  # repos.yaml に全件を書き出す
+    REPOS_STORE_SQLITE: ClassVar[str] = "sqlite"  # repos.sqlite3 にレコード単位で保存する
+    default_repos_store: ClassVar[str] = REPOS_STORE_YAML
+    repos_stores: ClassVar[list[str]] = [REPOS_STORE_YAML, REPOS_STORE_SQLITE]
+
+    RETENTION_KEEP_LAST_KEY: ClassVar[str] = "RETENTION_KEEP_LAST"  # prune で残す最新の件数
+    RETENTION_KEEP_DAILY_KEY: ClassVar[str] = "RETENTION_KEEP_DAILY"  # 1 日 1 件を残す日数
+    RETENTION_KEEP_WEEKLY_KEY: ClassVar[str] = "RETENTION_KEEP_WEEKLY"  # 1 週 1 件を残す週数 (-1 で無期限)
+    default_retention_keep_last: ClassVar[int] = 10
+    default_retention_keep_daily: ClassVar[int] = 30
+    default_retention_keep_weekly: ClassVar[int] = -1
+
+    OUTPUT_FORMAT_JSON: ClassVar[str] = "json"  # 字下げ付き JSON (`list` の既定)
+    OUTPUT_FORMAT_COMPACT: ClassVar[str] = "compact"  # 字下げ・空白なしの JSON
+    OUTPUT_FORMAT_JSONL: ClassVar[str] = "jsonl"  # 1 行 1 レコードの JSON Lines
+    OUTPUT_FORMAT_CSV: ClassVar[str] = "csv"
+    OUTPUT_FORMAT_TSV: ClassVar[str] = "tsv"
+    output_formats: ClassVar[list[str]] = [  # `list` / `search` の `--format`
+        OUTPUT_FORMAT_JSON,
+        OUTPUT_FORMAT_COMPACT,
+        OUTPUT_FORMAT_JSONL,
+        OUTPUT_FORMAT_CSV,
+        OUTPUT_FORMAT_TSV,
+    ]
+
+    search_sort_fields: ClassVar[list[str]] = [  # `search latest/oldest` の並べ替えキー
+        "createdAt",
+        "updatedAt",
+        "pushedAt",
+        "diskUsage",
+    ]
@@ -0,0 +1,46 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+
+def fsync_path(path: Path) -> None:
+    """ファイルまたはディレクトリの内容をディスクへ書き出す。ディレクトリを fsync できない環境では何もしない。"""
+    is_dir = path.is_dir()
+    try:
+        fd = os.open(path, os.O_RDONLY | (getattr(os, "O_DIRECTORY", 0) if is_dir else 0))
+    except OSError:
+        if is_dir:  # Windows はディレクトリを開けない
+            return
+        raise
+    try:
+        os.fsync(fd)
+    except OSError:
+        if not is_dir:  # ディレクトリの fsync に対応しないファイルシステムがある
+            raise
+    finally:
+        os.close(fd)
+
+
+def replace_atomically(path: Path, dump: Callable[[Path], object]) -> None:
+    """`dump` で同じディレクトリの一時ファイルへ書き、fsync してから `path` へ置き換える。
+
+    `dump` の戻り値は使わない (`Path.write_text` などをそのまま渡せる)。
+
+    読み手は置き換え前か後の完全な内容だけを見る。置き換え後に親ディレクトリも fsync し、
+    電源断でも置き換えが失われないようにする。途中で失敗した場合は一時ファイルを消す。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        dump(temp_path)
+        fsync_path(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    fsync_path(path.parent)
+
+
+def write_text_atomically(path: Path, text: str) -> None:
+    """文字列を `replace_atomically` で書き出す。"""
+    replace_atomically(path, lambda temp_path: temp_path.write_text(text, encoding="utf-8"))
@@ -3,6 +3,9 @@ from collections.abc import Callable
 
 from yklibpy.cli import Cli
 
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.daemon_client import DaemonClient
+
 type CommandHandler = Callable[[argparse.Namespace], None]
 
 
@@ -24,6 +27,11 @@ class Clix:
         )
         p_setup.set_defaults(func=command_dict["setup"])
         p_setup.add_argument("--user", help="GitHub user name")
+        p_setup.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
 
         # サブコマンド "list"
         p_list: argparse.ArgumentParser = subparsers.add_parser(
@@ -34,16 +42,53 @@ class Clix:
         p_list.add_argument(
             "-f", "--force", action="store_true", help="force download"
         )
+        p_list.add_argument(
+            "-i",
+            "--incremental",
+            action="store_true",
+            help="fetch only repositories changed since the previous snapshot",
+        )
         p_list.add_argument("-v", "--verbose", action="store_true", help="verbose")
         p_list.add_argument("--user", help="GitHub user name")
+        p_list.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
+        p_list.add_argument(
+            "--users", help="comma separated GitHub users/orgs to fetch concurrently"
+        )
+        p_list.add_argument(
+            "--users-file", help="file listing GitHub users/orgs, one per line"
+        )
+        p_list.add_argument(
+            "--jobs",
+            type=int,
+            default=4,
+            help="max number of owners fetched concurrently (with --users)",
+        )
+        p_list.add_argument(
+            "--no-daemon",
+            action="store_true",
+            help="do not query a running `ghrepo serve` process",
+        )
         p_list.add_argument("--limit", type=int, help="limit the number of repos")
         p_list.add_argument("--json", type=str, help="json output")
         p_list.add_argument(
             "--output",
             type=str,
-            default="repos.json",
-            help="output file name",
+            help="output file name ('-' for stdout, default: repos.json)",
+        )
+        p_list.add_argument(
+            "--format",
+            choices=AppConfigx.output_formats,
+            help="output format (default: json)",
+        )
+        p_list.add_argument(
+            "--fields", help="comma separated fields to output, e.g. name,url"
         )
+        self.add_timing_arguments(p_list)
+        self.add_metrics_arguments(p_list)
 
         # サブコマンド "fix"
         p_fix: argparse.ArgumentParser = subparsers.add_parser(
@@ -51,7 +96,110 @@ class Clix:
         )
         p_fix.set_defaults(func=command_dict["fix"])
         p_fix.add_argument("--user", help="GitHub user name")
+        p_fix.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
+        p_fix.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="report what would be fixed without changing anything",
+        )
+        p_fix.add_argument(
+            "--validate",
+            action="store_true",
+            help="check that every snapshot can be read (exit 1 if not)",
+        )
+        p_fix.add_argument(
+            "--jobs",
+            type=int,
+            default=4,
+            help="max number of workers for scanning and --validate",
+        )
         p_fix.add_argument("--verbose", action="store_true", help="verbose")
+        self.add_timing_arguments(p_fix)
+        self.add_metrics_arguments(p_fix)
+
+        # サブコマンド "convert"
+        p_convert: argparse.ArgumentParser = subparsers.add_parser(
+            "convert", help="convert stored snapshots to another file format"
+        )
+        p_convert.set_defaults(func=command_dict["convert"])
+        p_convert.add_argument(
+            "--format",
+            required=True,
+            type=str.upper,
+            choices=AppConfigx.snapshot_formats,
+            help="snapshot file format",
+        )
+        p_convert.add_argument("--user", help="GitHub user name")
+        p_convert.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
+        p_convert.add_argument("--verbose", action="store_true", help="verbose")
+
+        # サブコマンド "prune"
+        p_prune: argparse.ArgumentParser = subparsers.add_parser(
+            "prune",
+            help="archive snapshots outside the retention policy and compact objects",
+        )
+        p_prune.set_defaults(func=command_dict["prune"])
+        p_prune.add_argument(
+            "--keep-last",
+            type=int,
+            help=f"keep the newest N snapshots (default: {AppConfigx.RETENTION_KEEP_LAST_KEY})",
+        )
+        p_prune.add_argument(
+            "--keep-daily",
+            type=int,
+            help=f"keep one snapshot per day for N days (default: {AppConfigx.RETENTION_KEEP_DAILY_KEY})",
+        )
+        p_prune.add_argument(
+            "--keep-weekly",
+            type=int,
+            help=(
+                "keep one snapshot per week for N weeks, -1 for forever "
+                f"(default: {AppConfigx.RETENTION_KEEP_WEEKLY_KEY})"
+            ),
+        )
+        p_prune.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="report what would be archived without changing anything",
+        )
+        p_prune.add_argument("--user", help="GitHub user name")
+        p_prune.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
+        p_prune.add_argument("--verbose", action="store_true", help="verbose")
+
+        # サブコマンド "diff"
+        p_diff: argparse.ArgumentParser = subparsers.add_parser(
+            "diff", help="show changes between two snapshots as JSON Lines"
+        )
+        p_diff.set_defaults(func=command_dict["diff"])
+        p_diff.add_argument(
+            "--from",
+            dest="from_id",
+            type=int,
+            help="old snapshot id (default: the one before --to)",
+        )
+        p_diff.add_argument(
+            "--to", dest="to_id", type=int, help="new snapshot id (default: latest)"
+        )
+        p_diff.add_argument("--output", type=str, help="output file name (default: stdout)")
+        p_diff.add_argument("--user", help="GitHub user name")
+        p_diff.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
+        p_diff.add_argument("--verbose", action="store_true", help="verbose")
 
         # サブコマンド "search"
         p_search: argparse.ArgumentParser = subparsers.add_parser(
@@ -60,17 +208,136 @@ class Clix:
         p_search.set_defaults(func=command_dict["search"])
         p_search.add_argument(
             "search_name",
-            choices=["public", "private", "both", "internal", "latest10"],
+            choices=[
+                "public",
+                "private",
+                "both",
+                "internal",
+                "latest10",
+                "latest",
+                "oldest",
+            ],
             help="search kind",
         )
+        p_search.add_argument(
+            "-n",
+            "--count",
+            type=int,
+            default=10,
+            help="number of repositories returned by latest/oldest",
+        )
+        p_search.add_argument(
+            "--sort-by",
+            choices=AppConfigx.search_sort_fields,
+            default="createdAt",
+            help="field ordering latest/oldest",
+        )
         p_search.add_argument("--name", help="substring pattern for repository name")
+        p_search.add_argument(
+            "--where",
+            metavar="EXPR",
+            help="filter expression, e.g. \"diskUsage>1e5 and (parent!=null or name~'^tool-')\"",
+        )
+        p_search.add_argument(
+            "--sort",
+            metavar="FIELDS",
+            help="comma separated fields to sort by; prefix a field with '-' for descending",
+        )
+        p_search.add_argument(
+            "--limit", type=int, help="max number of repositories returned"
+        )
+        p_search_when = p_search.add_mutually_exclusive_group()
+        p_search_when.add_argument(
+            "--at",
+            metavar="ID_OR_TIME",
+            help="search the snapshot with this id, or the last one taken at or before this time",
+        )
+        p_search_when.add_argument(
+            "--between",
+            nargs=2,
+            metavar=("FROM", "TO"),
+            help="repositories that had the visibility in any snapshot between FROM and TO "
+            "(snapshot ids or times)",
+        )
         p_search.add_argument("--user", help="GitHub user name")
+        p_search.add_argument(
+            "--refresh-user",
+            action="store_true",
+            help="resolve the GitHub user with `gh` again instead of the cache",
+        )
         p_search.add_argument("--verbose", action="store_true", help="verbose")
         p_search.add_argument(
             "--all",
             action="store_true",
             help="include all repository fields in JSON output",
         )
+        p_search.add_argument(
+            "--format",
+            choices=AppConfigx.output_formats,
+            help="write results record by record in this format",
+        )
+        p_search.add_argument(
+            "--fields", help="comma separated fields to output, e.g. name,url"
+        )
+        p_search.add_argument(
+            "--output", type=str, help="output file name (default: stdout)"
+        )
+        p_search.add_argument(
+            "--no-daemon",
+            action="store_true",
+            help="do not query a running `ghrepo serve` process",
+        )
+        self.add_timing_arguments(p_search)
+
+        # サブコマンド "serve"
+        p_serve: argparse.ArgumentParser = subparsers.add_parser(
+            "serve", help="serve search/list queries from a warm in-memory cache"
+        )
+        p_serve.set_defaults(func=command_dict["serve"])
+        p_serve.add_argument(
+            "--socket",
+            help="Unix domain socket to listen on (default: per-user socket under $XDG_RUNTIME_DIR)",
+        )
+        p_serve.add_argument(
+            "--host",
+            default=DaemonClient.DEFAULT_HOST,
+            help="address to listen on with --port",
+        )
+        p_serve.add_argument(
+            "--port",
+            type=int,
+            help="listen on TCP instead of the socket (no authentication; "
+            "clients use it only with GHREPO_SERVER=host:port)",
+        )
+        p_serve.add_argument("--verbose", action="store_true", help="verbose")
+
+    @staticmethod
+    def add_timing_arguments(parser: argparse.ArgumentParser) -> None:
+        """`--timings` / `--profile` / `--trace-memory` を追加する。"""
+        parser.add_argument(
+            "--timings",
+            nargs="?",
+            const="-",
+            metavar="FILE",
+            help="write per-phase timings as JSON to FILE (default: stderr)",
+        )
+        parser.add_argument(
+            "--profile", metavar="FILE", help="write cProfile stats (pstats format) to FILE"
+        )
+        parser.add_argument(
+            "--trace-memory",
+            action="store_true",
+            help="trace allocations with tracemalloc and add them to the timings",
+        )
+
+    @staticmethod
+    def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+        """`--metrics-textfile` を追加する。"""
+        parser.add_argument(
+            "--metrics-textfile",
+            metavar="FILE",
+            help="write Prometheus metrics of all users to FILE (node_exporter textfile collector)",
+        )
 
     def get_subparsers(
         self, name: str
@@ -1,8 +1,11 @@
 import argparse
-import json
+import time
+from collections.abc import Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, ClassVar, cast
 
 import yaml
 from yklibpy.command import Command
@@ -11,14 +14,42 @@ from yklibpy.config.appconfig import AppConfig
 from yklibpy.db.appstore import AppStore
 from yklibpy.db.storex import Storex
 
+from ghrepo.annotated_repos import AnnotatedRepos
 from ghrepo.appconfigx import AppConfigx
+from ghrepo.atomic_file import replace_atomically
+from ghrepo.file_lock import FileLock
+from ghrepo.metrics import RunMetrics
+from ghrepo.phase_timer import PhaseTimer
+from ghrepo.repo_fetcher import RepoFetcher
+from ghrepo.repos_store import ReposStore, SqliteReposStore, YamlReposStore
+from ghrepo.retention import RetentionPolicy
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_diff import ChangeRecord, SnapshotDiff
+from ghrepo.snapshot_journal import SnapshotJournal
+from ghrepo.snapshot_registry import SnapshotRegistry
+from ghrepo.snapshot_store import SnapshotStore
+from ghrepo.storage_scan import StorageScan, validate_snapshot
 
 type RepoItem = dict[str, Any]
 type RepoAssoc = dict[str, RepoItem]
 
 
 class CommandList(Command):
-    """リポジトリ一覧の取得、保存、補正を担当するコマンド群。"""
+    """リポジトリ一覧の取得、保存、補正を担当するコマンド群。
+
+    書き込み (スナップショットIDの割り当て、`save_snapshot`、`fix_storage`、`convert_snapshots`) は
+    ユーザー単位のロック (`<ユーザーディレクトリ>/.lock`) を取って行う。読み手はロックを取らない。
+    """
+
+    LOCK_FILE_NAME: ClassVar[str] = ".lock"  # ユーザー単位の書き込みロック
+    INCREMENTAL_FIELDS: ClassVar[list[str]] = ["updatedAt", "pushedAt"]  # 差分取得で水位に使う
+    INCREMENTAL_LIGHT_FIELDS: ClassVar[list[str]] = [
+        "name",
+        "nameWithOwner",
+        "visibility",
+        "updatedAt",
+        "pushedAt",
+    ]  # 差分判定用の軽量一覧で要求するフィールド
 
     def __init__(self, appstore: AppStore, json_fields: list[str], user: str | None) -> None:
         """保存先と取得対象ユーザーに関する実行文脈を保持する。"""
@@ -34,6 +65,16 @@ class CommandList(Command):
             return cast(Storex, path_assoc)
         return cast(Storex, path_assoc[self.appstore.user])
 
+    def _get_config_value(self, key: str) -> Any:
+        """設定ファイルの `key` の値を返す。
+
+        新しい設定項目を持たない (以前の `setup` で作った) 設定ファイルでは `None` を返す。
+        """
+        try:
+            return self.appstore.get_from_config("config", key)
+        except KeyError:
+            return None
+
     def _set_db_value(self, base_name: str, data: dict[Any, Any]) -> None:
         """`AppStore` 内のキャッシュ済み DB 値を更新する。"""
         if self.appstore.user is None:
@@ -48,9 +89,26 @@ class CommandList(Command):
         """スナップショット作成記録ファイル (`snapshots.yaml`) に対応する `Storex` を返す。"""
         return self._get_store(AppConfigx.BASE_NAME_SNAPSHOTS)
 
-    def get_repos_store(self) -> Storex:
-        """`repos.yaml` に対応する `Storex` を返す。"""
-        return self._get_store(AppConfigx.BASE_NAME_REPOS)
+    def get_repos_store(self) -> ReposStore:
+        """設定ファイルの `REPOS_STORE` に応じた最新リポジトリ一覧の保存先を返す。
+
+        未設定なら `repos.yaml` を使う。`sqlite` 指定で `repos.sqlite3` がまだ無い場合は、
+        既存の `repos.yaml` の内容を取り込んでから返す。
+
+        Raises:
+            ValueError: `REPOS_STORE` が未知の値の場合。
+        """
+        yaml_store = YamlReposStore(self._get_store(AppConfigx.BASE_NAME_REPOS))
+        kind = self._get_config_value(AppConfigx.REPOS_STORE_KEY)
+        if not isinstance(kind, str) or kind in ("", AppConfigx.REPOS_STORE_YAML):
+            return yaml_store
+        if kind != AppConfigx.REPOS_STORE_SQLITE:
+            raise ValueError(f"unsupported repos store: {kind}")
+
+        sqlite_store = SqliteReposStore(self.get_user_dir() / SqliteReposStore.FILE_NAME)
+        if not sqlite_store.exists() and yaml_store.exists():
+            sqlite_store.merge(yaml_store.load_all())
+        return sqlite_store
 
     def get_snapshots_path(self) -> Path:
         """スナップショット作成記録ファイル (`snapshots.yaml`) の実ファイルパスを返す。"""
@@ -64,6 +122,76 @@ class CommandList(Command):
         """スナップショットトップディレクトリ (`snapshots/`) のパスを返す。"""
         return self.get_user_dir() / AppConfigx.SNAPSHOT_TOP_DIR_NAME
 
+    def get_snapshot_store(self) -> SnapshotStore:
+        """対象ユーザーのスナップショットを読み書きする `SnapshotStore` を返す。"""
+        return SnapshotStore(self.get_user_dir())
+
+    def get_snapshot_registry(self) -> SnapshotRegistry:
+        """対象ユーザーのスナップショット台帳 (`registry.json`) を返す。"""
+        return SnapshotRegistry(self.get_user_dir())
+
+    def get_run_metrics(self) -> RunMetrics:
+        """直近の取得・補正の結果 (`metrics.json`) を返す。"""
+        return RunMetrics(self.get_user_dir())
+
+    def record_fetch_metrics(
+        self,
+        duration: float,
+        success: bool,
+        repos: int | None = None,
+        changed_records: int | None = None,
+    ) -> None:
+        """取得 (`list`) の所要時間・成否と、成功時は件数とマージで変わったレコード数を記録する。"""
+        values: dict[str, Any] = {"duration_seconds": round(duration, 3), "success": success}
+        if success:
+            values.update(
+                repos=repos,
+                changed_records=changed_records,
+                success_timestamp=round(time.time(), 3),
+            )
+        with self.lock_user_dir():
+            self.get_run_metrics().record("fetch", values)
+
+    def record_fix_metrics(self, result: dict[str, Any]) -> None:
+        """`fix_storage` の結果から補正件数を記録する。
+
+        補正件数は、削除した空ディレクトリと検索用インデックス、更新した `snapshots.yaml` と台帳、
+        作り直したインデックス、後始末したスナップショット、消した予約の合計とする。
+        読み込めないスナップショット数は `validate` 指定時だけ、その時刻 (`validate_timestamp`) とともに
+        記録する。`validate` なしの `fix` は前回の値と時刻を残すため、値がいつのものか区別できる。
+        """
+        repairs = (
+            result["removed_empty_directories"]
+            + result["removed_search_indexes"]
+            + int(result["snapshots_updated"])
+            + int(result["registry_updated"])
+            + int(result["search_index_rebuilt"])
+            + int(result["recovered_snapshot_id"] is not None)
+            + len(result["released_snapshot_ids"])
+        )
+        values: dict[str, Any] = {"repairs": repairs}
+        if "invalid_snapshots" in result:
+            values.update(
+                invalid_snapshots=len(result["invalid_snapshots"]),
+                validate_timestamp=round(time.time(), 3),
+            )
+        with self.lock_user_dir():
+            self.get_run_metrics().record("fix", values)
+
+    def get_snapshot_storage(self) -> str:
+        """設定ファイルの `SNAPSHOT_STORAGE` を返す。未設定 (キーが無い場合を含む) なら `plain` を返す。"""
+        storage = self._get_config_value(AppConfigx.SNAPSHOT_STORAGE_KEY)
+        if not isinstance(storage, str) or storage == "":
+            return AppConfigx.default_snapshot_storage
+        return storage
+
+    def get_snapshot_format(self) -> str:
+        """設定ファイルの `SNAPSHOT_FORMAT` を大文字にそろえて返す。未設定 (キーが無い場合を含む) なら `YAML` を返す。"""
+        file_type = self._get_config_value(AppConfigx.SNAPSHOT_FORMAT_KEY)
+        if not isinstance(file_type, str) or file_type == "":
+            return AppConfigx.default_snapshot_format
+        return file_type.upper()
+
     @staticmethod
     def _coerce_snapshots_assoc(snapshots_assoc: dict[Any, Any]) -> dict[int, str]:
         """スナップショット作成記録ファイルの辞書キーと値を保存用の型へそろえる。"""
@@ -87,192 +215,533 @@ class CommandList(Command):
         return self._coerce_snapshots_assoc(loaded_value)
 
     def load_latest_assoc(self) -> RepoAssoc:
-        """`repos.yaml` を読み込み、辞書として返す。"""
-        loaded_value = self.get_repos_store().load()
-        if not isinstance(loaded_value, dict):
-            return {}
-        return cast(RepoAssoc, loaded_value)
+        """最新リポジトリ一覧を読み込み、辞書として返す。"""
+        return self.get_repos_store().load_all()
+
+    def iter_latest_items(self) -> Iterator[tuple[str, RepoItem]]:
+        """最新リポジトリ一覧を `(リポジトリ名, レコード)` で順に返す。`sqlite` 保存先では 1 件ずつ読む。"""
+        return self.get_repos_store().iter_items()
+
+    def load_latest_repo(self, name: str) -> RepoItem | None:
+        """最新リポジトリ一覧から 1 件を返す。`sqlite` 保存先では全件を読み込まない。"""
+        return self.get_repos_store().get(name)
 
     def _output_snapshots_assoc(self, snapshots_assoc: dict[int, str]) -> None:
-        """スナップショット作成記録ファイルを永続化し、`AppStore` 内の値も同期する。"""
-        self.appstore.output_db(
-            AppConfigx.BASE_NAME_SNAPSHOTS, cast(dict[str, Any], snapshots_assoc)
+        """スナップショット作成記録ファイルを一時ファイル経由で永続化し、`AppStore` 内の値も同期する。"""
+        replace_atomically(
+            self.get_snapshots_path(),
+            lambda temp_path: temp_path.write_text(
+                yaml.safe_dump(snapshots_assoc, allow_unicode=True), encoding="utf-8"
+            ),
         )
         self._set_db_value(AppConfigx.BASE_NAME_SNAPSHOTS, snapshots_assoc)
 
     def get_next_snapshot_count(self) -> int:
-        """既存スナップショットIDの最大値を参照して次回スナップショットIDを返す。"""
+        """台帳の最新スナップショットIDと予約済みIDの最大値を参照して次回スナップショットIDを返す。
+
+        台帳 (`registry.json`) が無い場合だけ、`snapshots.yaml` とスナップショットトップディレクトリを参照する。
+        ID を確保するには `reserve_snapshot_id` を使う。
+        """
+        reserved_ids = self.get_snapshot_store().collect_reserved_ids()
+        registry = self.get_snapshot_registry()
+        if registry.exists():
+            return max([registry.get_latest_id() or 0, *reserved_ids]) + 1
+
         snapshots_assoc = self._load_snapshots_assoc()
-        snapshot_ids = self._collect_snapshot_ids(self.get_snapshots_dir())
+        snapshot_ids = self.get_snapshot_store().collect_all_snapshot_ids()
         max_record_snapshot_id = max(snapshots_assoc.keys(), default=0)
-        max_snapshot_id = max(snapshot_ids, default=0)
+        max_snapshot_id = max(snapshot_ids + reserved_ids, default=0)
         return max(max_record_snapshot_id, max_snapshot_id) + 1
 
-    def get_command_for_repository(self, args: argparse.Namespace) -> str:
-        """CLI 引数と設定値から `gh repo list` コマンド文字列を組み立てる。"""
-        target_user = self.config_user
+    def ensure_snapshot_registry(self) -> bool:
+        """台帳が無ければ既存のスナップショットから作り、作ったかを返す。
+
+        台帳導入前のユーザーディレクトリ向け。呼び出し側はユーザー単位のロックを保持していること。
+        """
+        registry = self.get_snapshot_registry()
+        if registry.exists():
+            return False
+        snapshot_store = self.get_snapshot_store()
+        registry.rebuild(
+            snapshot_store,
+            [
+                snapshot_id
+                for snapshot_id in snapshot_store.collect_all_snapshot_ids()
+                if snapshot_store.exists(snapshot_id)
+            ],
+        )
+        return True
+
+    def lock_user_dir(self) -> FileLock:
+        """ユーザー単位の書き込みロックを返す。`with` で取得・解放する。"""
+        return FileLock(self.get_user_dir() / self.LOCK_FILE_NAME)
+
+    @contextmanager
+    def reserve_snapshot_id(self) -> Iterator[int]:
+        """次回スナップショットIDを予約し、`with` を抜けるまで他のプロセスに割り当てさせない。
+
+        ID の割り当てだけをロック下で行い、GitHub からの取得中はロックを保持しない。そのため
+        同じユーザーの取得が重なっても別々の ID を使い、互いのファイルを上書きしない。
+        """
+        snapshot_store = self.get_snapshot_store()
+        with self.lock_user_dir():
+            self.recover_pending_snapshot()
+            self.ensure_snapshot_registry()
+            snapshot_id = self.get_next_snapshot_count()
+            reservation = snapshot_store.reserve(snapshot_id)
+        try:
+            yield snapshot_id
+        finally:
+            snapshot_store.release_reservation(snapshot_id, reservation)
+
+    def get_target_user(self, args: argparse.Namespace) -> str:
+        """CLI 引数と設定値から取得対象の GitHub ユーザー (組織) 名を返す。"""
         if args.user is not None and args.user != "":
-            target_user = args.user
+            return cast(str, args.user)
+        return self.config_user
 
-        limit_value = 400 if args.limit is None else args.limit
-        options = [f"--limit {limit_value}"]
+    def get_json_fields(self, args: argparse.Namespace) -> list[str]:
+        """CLI 引数と設定値から取得フィールド名の一覧を組み立てる。
 
+        `--json` 未指定時は設定値を使う。`visibility` は必ず含め、重複は順序を保って除去する。
+        """
         if args.json is None:
             json_fields = list(self.json_fields)
         else:
-            # `gh` CLI の `--json` はカンマ区切りのフィールド列を想定する。
+            # `--json` はカンマ区切りのフィールド列を想定する。
             # ユーザ指定が `visibility` を含まない場合でも、必ず `visibility` を追加する。
             json_fields = [field.strip() for field in args.json.split(",") if field.strip()]
 
         # `visibility` の強制追加（重複は順序維持で除去）
         if "visibility" not in json_fields:
             json_fields.append("visibility")
+        # 管理用フィールドは GitHub 側に存在しないため要求しない
+        managed_fields = set(AppConfigx.default_json_fields_in_db) - set(
+            AppConfigx.default_json_fields
+        )
         seen_fields: set[str] = set()
         normalized_fields: list[str] = []
         for field in json_fields:
-            if field in seen_fields:
+            if field in seen_fields or field in managed_fields:
                 continue
             seen_fields.add(field)
             normalized_fields.append(field)
-
-        json_value = ",".join(normalized_fields)
-        options.append(f"--json {json_value}")
-
-        command_parts = ["gh repo list"]
-        if target_user != "":
-            command_parts.append(target_user)
-        command_parts.append(" ".join(options))
-
-        return " ".join(command_parts)
+        return normalized_fields
 
     @staticmethod
     def array_to_dict(array: list[RepoItem], key: str) -> RepoAssoc:
         """リポジトリ配列を指定キー基準の連想配列へ変換する。"""
         return {cast(str, item[key]): item for item in array}
 
+    def iter_repo_pages(
+        self,
+        args: argparse.Namespace,
+        fetcher: RepoFetcher | None = None,
+    ) -> Iterator[list[RepoItem]]:
+        """GitHub からリポジトリ一覧をページ単位で取得し、到着順に返す。
+
+        `--limit` 未指定時は件数を制限せず、全ページをたどる。
+        """
+        page_fetcher = fetcher if fetcher is not None else RepoFetcher()
+        return page_fetcher.iter_pages(
+            self.get_target_user(args), self.get_json_fields(args), args.limit
+        )
+
+    @staticmethod
+    def get_annotations(snapshot_id: int) -> dict[str, Any]:
+        """取得したリポジトリへ付与する管理用フィールドを返す。値は不変なので全レコードで共有する。"""
+        return {
+            "snapshot-id": snapshot_id,
+            "valid": True,
+            "field_1": "",
+            "field_2": "",
+            "field_3": "",
+        }
+
     def get_all_repos(
-        self, args: argparse.Namespace, appstore: AppStore, snapshot_id: int
-    ) -> RepoAssoc:
-        """GitHub CLI で取得した一覧に管理用フィールドを付与して返す。
+        self,
+        args: argparse.Namespace,
+        appstore: AppStore,
+        snapshot_id: int,
+        fetcher: RepoFetcher | None = None,
+    ) -> AnnotatedRepos:
+        """GitHub から取得した一覧を、管理用フィールドと組にして返す。
 
         Args:
             args: `list` サブコマンドの引数。
             appstore: 設定・DB ファイルアクセスオブジェクト。
             snapshot_id: 今回付与するスナップショットID。
+            fetcher: ページ取得に使う `RepoFetcher`。省略時は `gh` を起動する。
 
         Returns:
-            リポジトリ名をキーとする取得結果。
+            リポジトリ名をキーとする取得結果。管理用フィールドは書き出す時にレコードへ重ねる。
+
+        Raises:
+            ValueError: 取得結果の形式、`name` / `visibility` が不正な場合。不正なレコードは
+                全ページを取得してからまとめて報告する。
         """
         assert appstore is self.appstore
-        command_line = self.get_command_for_repository(args)
-        json_str = self.run_command_simple(command_line)
-        try:
-            json_array = json.loads(json_str)
-        except json.JSONDecodeError as exc:
-            raise ValueError("gh repo list returned invalid JSON output") from exc
-
-        if not isinstance(json_array, list):
-            raise ValueError("gh repo list must return a JSON array")
-        if any(
-            not isinstance(item, dict) or "name" not in item or "visibility" not in item
-            for item in json_array
-        ):
-            raise ValueError(
-                "gh repo list output must include repository names and visibility"
+        assoc: RepoAssoc = {}
+        for page in self.iter_repo_pages(args, fetcher):
+            with PhaseTimer.phase("collect") as phase:
+                assoc.update(self.array_to_dict(page, "name"))
+                phase.add(records=len(page))
+
+        return AnnotatedRepos(assoc, self.get_annotations(snapshot_id))
+
+    def get_watermarks_path(self) -> Path:
+        """オーナー別の更新日時の最高水位 (`watermarks.yaml`) のパスを返す。"""
+        return self.get_user_dir() / f"{AppConfigx.BASE_NAME_WATERMARKS}.yaml"
+
+    def _load_watermarks(self) -> dict[str, dict[str, Any]]:
+        """`watermarks.yaml` を読み込む。存在しない、または形式が不正なら空辞書を返す。"""
+        watermarks_path = self.get_watermarks_path()
+        if not watermarks_path.exists():
+            return {}
+        with watermarks_path.open(encoding="utf-8") as watermarks_file:
+            loaded_value = yaml.safe_load(watermarks_file)
+        if not isinstance(loaded_value, dict):
+            return {}
+        return {
+            str(key): value for key, value in loaded_value.items() if isinstance(value, dict)
+        }
+
+    def load_watermark(self, owner: str) -> tuple[str, int] | None:
+        """オーナーの最高水位 (更新日時) と、それを記録したスナップショットIDを返す。"""
+        entry = self._load_watermarks().get(owner)
+        if entry is None:
+            return None
+        watermark = entry.get("updatedAt")
+        snapshot_id = entry.get("snapshot-id")
+        if not isinstance(watermark, str) or not isinstance(snapshot_id, int):
+            return None
+        return watermark, snapshot_id
+
+    def save_watermark(self, owner: str, watermark: str, snapshot_id: int) -> None:
+        """オーナーの最高水位を `watermarks.yaml` へ記録する。"""
+        with self.lock_user_dir():
+            watermarks = self._load_watermarks()
+            watermarks[owner] = {"updatedAt": watermark, "snapshot-id": snapshot_id}
+            replace_atomically(
+                self.get_watermarks_path(),
+                lambda temp_path: temp_path.write_text(
+                    yaml.safe_dump(watermarks, allow_unicode=True, sort_keys=True),
+                    encoding="utf-8",
+                ),
             )
 
-        allowed_visibility = {"public", "internal", "private"}
-        for item in json_array:
-            visibility_value = item["visibility"]
-            if not isinstance(visibility_value, str):
-                raise ValueError(
-                    "gh repo list output has invalid visibility value: "
-                    f"{visibility_value!r}"
+    @staticmethod
+    def _get_item_watermark(item: RepoItem) -> str:
+        """`updatedAt` と `pushedAt` の新しい方を返す。ISO 8601 (UTC) 文字列は辞書順で比較できる。"""
+        return max(
+            (value for key in ("updatedAt", "pushedAt") if isinstance(value := item.get(key), str)),
+            default="",
+        )
+
+    def load_snapshot_assoc(self, snapshot_id: int) -> RepoAssoc:
+        """保存済みスナップショットを形式によらず読み込んで返す。存在しなければ空辞書を返す。"""
+        try:
+            return self.get_snapshot_store().read(snapshot_id)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get_incremental_repos(
+        self,
+        args: argparse.Namespace,
+        appstore: AppStore,
+        snapshot_id: int,
+        fetcher: RepoFetcher | None = None,
+    ) -> tuple[AnnotatedRepos, str]:
+        """前回スナップショットとの差分だけを GitHub から取得し、新しい一覧を組み立てる。
+
+        軽量フィールドだけの全件一覧で現存リポジトリと更新日時を確認し、最高水位以降のもの、
+        前回に無い名前 (新規・改名) のものだけを全フィールドで取り直す。前回にあり今回の一覧に
+        無い名前は削除 (または改名前) として落とす。水位や前回スナップショットが無い場合は全件取得する。
+        一覧が欠けると削除と区別できないため、`args.limit` は使わない。
+
+        Returns:
+            リポジトリ名をキーとする取得結果と、次回に使う最高水位。前回から引き継いだレコードの
+            `snapshot-id` 等は、書き出す時に今回の管理用フィールドで上書きされる。
+        """
+        assert appstore is self.appstore
+        page_fetcher = fetcher if fetcher is not None else RepoFetcher()
+        owner = self.get_target_user(args)
+        fields = self.get_json_fields(args)
+        fields += [field for field in self.INCREMENTAL_FIELDS if field not in fields]
+
+        annotations = self.get_annotations(snapshot_id)
+        stored = self.load_watermark(owner)
+        previous_assoc = self.load_snapshot_assoc(stored[1]) if stored is not None else {}
+        if stored is None or not previous_assoc:
+            assoc: RepoAssoc = {}
+            for page in page_fetcher.iter_pages(owner, fields):
+                assoc.update(self.array_to_dict(page, "name"))
+            watermark = max(map(self._get_item_watermark, assoc.values()), default="")
+            return AnnotatedRepos(assoc, annotations), watermark
+
+        previous_watermark = stored[0]
+        listing: RepoAssoc = {}
+        for page in page_fetcher.iter_pages(owner, self.INCREMENTAL_LIGHT_FIELDS):
+            listing.update(self.array_to_dict(page, "name"))
+
+        changed_names = [
+            cast(str, item["nameWithOwner"])
+            for name, item in listing.items()
+            if name not in previous_assoc
+            # 水位と同じ秒に、前回の一覧より後で更新されたものも取り直す
+            or self._get_item_watermark(item) >= previous_watermark
+            or previous_assoc[name].get("visibility") != item["visibility"]
+        ]
+        assoc = {
+            name: previous_assoc[name] for name in listing if name in previous_assoc
+        }
+        for page in page_fetcher.iter_repositories_by_name(changed_names, fields):
+            assoc.update(self.array_to_dict(page, "name"))
+
+        removed_count = sum(1 for name in previous_assoc if name not in listing)
+        Loggerx.debug(
+            f"incremental: listed={len(listing)} refetched={len(changed_names)} "
+            f"removed={removed_count}",
+            __name__,
+        )
+        watermark = max(
+            [previous_watermark, *map(self._get_item_watermark, listing.values())]
+        )
+        return AnnotatedRepos(assoc, annotations), watermark
+
+    def convert_snapshots(self, file_type: str) -> dict[str, Any]:
+        """保存済みスナップショットをすべて指定のファイル種別へ書き換える。
+
+        保存形式 (`plain` / `dedup`) は各スナップショットの現状を維持する。
+
+        Returns:
+            変換したスナップショットIDの一覧と、変換先のファイル種別を含む結果辞書。
+
+        Raises:
+            ValueError: `file_type` が未知の値の場合。
+        """
+        snapshot_store = self.get_snapshot_store()
+        registry = self.get_snapshot_registry()
+        converted: list[int] = []
+        with self.lock_user_dir():
+            for snapshot_id in self._collect_snapshot_ids(self.get_snapshots_dir()):
+                if not snapshot_store.exists(snapshot_id):
+                    continue
+                storage = (
+                    AppConfigx.SNAPSHOT_STORAGE_DEDUP
+                    if snapshot_store.read_manifest(snapshot_id) is not None
+                    else AppConfigx.SNAPSHOT_STORAGE_PLAIN
                 )
-            normalized = visibility_value.lower()
-            if normalized not in allowed_visibility:
-                raise ValueError(
-                    "gh repo list output has invalid visibility value: "
-                    f"{visibility_value!r}"
+                assoc = snapshot_store.read(snapshot_id)
+                snapshot_store.write(snapshot_id, assoc, storage, file_type)
+                SearchIndex.build(
+                    assoc, snapshot_id, snapshot_store.get_fingerprint(snapshot_id)
+                ).save(SearchIndex.get_index_path(snapshot_store, snapshot_id))
+                registry.record(
+                    snapshot_id, SnapshotRegistry.describe(snapshot_store, snapshot_id, len(assoc))
                 )
-            # `gh` は PUBLIC 等の大文字で返すことがある。保存は public/internal/private に統一する。
-            item["visibility"] = normalized
+                converted.append(snapshot_id)
+
+        return {"converted": converted, "format": file_type}
+
+    def get_retention_policy(
+        self,
+        keep_last: int | None = None,
+        keep_daily: int | None = None,
+        keep_weekly: int | None = None,
+    ) -> RetentionPolicy:
+        """引数、設定ファイルの `RETENTION_*`、既定値の順で保持ポリシーを組み立てる。
+
+        キーの無い設定ファイル (この設定項目が入る前の `setup` で作ったもの) では既定値を使う。
 
-        assoc = self.array_to_dict(json_array, "name")
-        for name, item in list(assoc.items()):
-            item["snapshot-id"] = snapshot_id
-            item["valid"] = True
-            item["field_1"] = ""
-            item["field_2"] = ""
-            item["field_3"] = ""
-            assoc[name] = item
+        Raises:
+            ValueError: 値が整数でない、または範囲外の場合。
+        """
+
+        def get_value(override: int | None, key: str) -> Any:
+            return override if override is not None else self._get_config_value(key)
+
+        return RetentionPolicy.from_values(
+            get_value(keep_last, AppConfigx.RETENTION_KEEP_LAST_KEY),
+            get_value(keep_daily, AppConfigx.RETENTION_KEEP_DAILY_KEY),
+            get_value(keep_weekly, AppConfigx.RETENTION_KEEP_WEEKLY_KEY),
+            defaults=(
+                AppConfigx.default_retention_keep_last,
+                AppConfigx.default_retention_keep_daily,
+                AppConfigx.default_retention_keep_weekly,
+            ),
+        )
 
-        return assoc
+    def prune_snapshots(
+        self, policy: RetentionPolicy, dry_run: bool = False
+    ) -> dict[str, Any]:
+        """保持ポリシーに該当しないスナップショットをアーカイブへ移し、不要になったオブジェクトを消す。
 
-    def _merge_into_repos(self, new_assoc: RepoAssoc) -> None:
-        """`repos.yaml` に新スナップショットの内容をマージ更新する。
+        アーカイブしたスナップショットも `search --at` / `--between` と `diff` から読める。
+        `snapshots.yaml` の記録は残す。ユーザー単位のロック下で行う。
 
-        同一リポジトリIDのレコードが存在し内容に差異があれば新しいレコードで上書きする。
-        差異がなければ更新しない。
+        Returns:
+            残した ID、アーカイブした ID、作成したアーカイブ名、消したオブジェクト数を含む結果辞書。
+            `dry_run` では実行した場合の値を返す (オブジェクト数はアーカイブ前の状態で数える)。
         """
-        repos_store = self.get_repos_store()
-        loaded = repos_store.load()
-        repos_assoc: RepoAssoc = cast(RepoAssoc, loaded) if isinstance(loaded, dict) else {}
+        with nullcontext() if dry_run else self.lock_user_dir():
+            if not dry_run:
+                # オブジェクトの参照元は台帳から決めるため、先に台帳を最新にする
+                self.recover_pending_snapshot()
+                self.ensure_snapshot_registry()
+            snapshot_store = self.get_snapshot_store()
+            snapshot_ids = [
+                snapshot_id
+                for snapshot_id in snapshot_store.collect_published_ids()
+                if snapshot_store.exists(snapshot_id)
+            ]
+            timestamps: dict[int, datetime] = {}
+            for snapshot_id, value in self._load_snapshots_assoc().items():
+                parsed = SearchIndex.parse_timestamp(value)
+                if parsed is not None:
+                    timestamps[snapshot_id] = parsed.astimezone()
+            kept, archived = policy.select(snapshot_ids, timestamps)
+
+            pack_name: str | None = None
+            if archived and not dry_run:
+                pack_name = snapshot_store.archive_snapshots(archived)
+                Loggerx.info(f"archived {len(archived)} snapshots into {pack_name}", __name__)
+            removed_objects = snapshot_store.remove_unreferenced_objects(dry_run)
+
+        return {
+            "dry_run": dry_run,
+            "kept": kept,
+            "archived": archived,
+            "pack": pack_name,
+            "removed_objects": removed_objects,
+        }
+
+    def iter_snapshot_changes(
+        self, old_id: int | None = None, new_id: int | None = None
+    ) -> Iterator[ChangeRecord]:
+        """2 つのスナップショット間の変更レコードを返す。
 
-        for repo_id, item in new_assoc.items():
-            if repo_id not in repos_assoc or repos_assoc[repo_id] != item:
-                repos_assoc[repo_id] = item
+        `new_id` を省略すると最新、`old_id` を省略すると `new_id` の 1 つ前のスナップショットを使う。
+        アーカイブ済みのスナップショットも対象にする。
+
+        Raises:
+            FileNotFoundError: 比較対象のスナップショットが存在しない場合。
+        """
+        snapshot_ids = self.get_snapshot_store().collect_all_snapshot_ids()
+        if new_id is None:
+            new_id = snapshot_ids[-1] if snapshot_ids else None
+        if old_id is None and new_id is not None:
+            older_ids = [snapshot_id for snapshot_id in snapshot_ids if snapshot_id < new_id]
+            old_id = older_ids[-1] if older_ids else None
+        if old_id is None or new_id is None:
+            raise FileNotFoundError(f"比較するスナップショットが 2 つ以上存在しません: {self.get_snapshots_dir()}")
+        return SnapshotDiff(self.get_snapshot_store()).iter_changes(old_id, new_id)
+
+    def _merge_into_repos(self, new_assoc: Mapping[str, RepoItem]) -> int:
+        """最新リポジトリ一覧に新スナップショットの内容をマージ更新する。
+
+        同一リポジトリのレコードが存在し、`snapshot-id` 以外の内容に差異があれば新しいレコードで上書きする。
+        差異が 1 件も無ければ保存先へ書き込まない。
 
-        repos_store.output(repos_assoc)
-        self._set_db_value(AppConfigx.BASE_NAME_REPOS, repos_assoc)
+        Returns:
+            追加・更新したレコード数。
+        """
+        with PhaseTimer.phase("repos_merge") as phase:
+            changed_count = self.get_repos_store().merge(new_assoc)
+            phase.add(records=changed_count)
+        Loggerx.debug(f"repos merged: {changed_count} changed", __name__)
+        return changed_count
 
     def save_snapshot(
-        self, snapshot_id: int, timestamp: str, assoc: RepoAssoc
-    ) -> None:
+        self, snapshot_id: int, timestamp: str, assoc: Mapping[str, RepoItem]
+    ) -> int:
         """取得結果をスナップショットとして保存し、`snapshots.yaml` と `repos.yaml` も更新する。
 
         更新順序:
-        1. `snapshots/<snapshot-id>/snapshot.yaml` を出力する。
-        2. `snapshots.yaml` に `<snapshot-id>: <timestamp>` を反映する。
-        3. `repos.yaml` をマージ更新する。
+        1. ジャーナル (`journal.json`) に書き込み中のスナップショットIDと作成日時を記録する。
+        2. `snapshots/.staging/<snapshot-id>/` に設定された形式でスナップショットと検索用インデックスを出力する。
+        3. ディレクトリごと `snapshots/<snapshot-id>/` へ rename して公開する (ここでコミットが確定する)。
+        4. 台帳 (`registry.json`) と `snapshots.yaml` に記録し、`repos.yaml` をマージ更新する。
+        5. ジャーナルを消す。
+
+        途中で止まった場合は、次回の `recover_pending_snapshot` が 3 の前なら破棄、後なら 4 からやり直す。
+        全体をユーザー単位のロック下で行う。`snapshot_id` は `reserve_snapshot_id` で予約したものを渡す。
+        `assoc` が `AnnotatedRepos` なら、管理用フィールドは各出力が 1 件ずつ読む時に重ねる。
+
+        Returns:
+            最新リポジトリ一覧で追加・更新したレコード数。
         """
-        # 1. snapshots/<snapshot-id>/snapshot.yaml を出力する
-        snapshot_dir = self.get_snapshots_dir() / str(snapshot_id)
-        snapshot_path = snapshot_dir / "snapshot.yaml"
-        snapshot_dir.mkdir(parents=True, exist_ok=True)
-        with snapshot_path.open("w", encoding="utf-8") as snapshot_file:
-            yaml.safe_dump(assoc, snapshot_file, allow_unicode=True, sort_keys=True)
-
-        # 2. snapshots.yaml を更新する
-        snapshots_assoc = self._load_snapshots_assoc()
-        snapshots_assoc[snapshot_id] = timestamp
-        self._output_snapshots_assoc(dict(sorted(snapshots_assoc.items())))
+        with self.lock_user_dir():
+            self.recover_pending_snapshot()
+            journal = SnapshotJournal(self.get_user_dir())
+            journal.begin(snapshot_id, timestamp)
+
+            snapshot_store = self.get_snapshot_store()
+            staging_store = snapshot_store.get_staging_store()
+            snapshot_store.discard_staged(snapshot_id)
+            with PhaseTimer.phase("snapshot_write") as phase:
+                staging_store.write(
+                    snapshot_id, assoc, self.get_snapshot_storage(), self.get_snapshot_format()
+                )
+                fingerprint = staging_store.get_fingerprint(snapshot_id)
+                phase.add(
+                    records=len(assoc),
+                    bytes_written=fingerprint["size"] if fingerprint is not None else 0,
+                )
+            with PhaseTimer.phase("search_index"):
+                SearchIndex.build(assoc, snapshot_id, fingerprint).save(
+                    SearchIndex.get_index_path(staging_store, snapshot_id)
+                )
+            with PhaseTimer.phase("publish"):
+                snapshot_store.publish(snapshot_id)
 
-        # 3. repos.yaml をマージ更新する
-        self._merge_into_repos(assoc)
+            changed_count = self._record_snapshot(snapshot_id, timestamp, assoc)
+            journal.clear()
+        return changed_count
 
-    @staticmethod
-    def _remove_empty_directories(root_dir: str | Path) -> int:
-        """指定ディレクトリ配下の空ディレクトリを末端から削除する。"""
-        root_path = Path(root_dir)
-        if not root_path.exists():
-            return 0
-
-        removed_count = 0
-        directory_paths = sorted(
-            (path for path in root_path.rglob("*") if path.is_dir()),
-            key=lambda path: len(path.parts),
-            reverse=True,
-        )
-        for directory_path in directory_paths:
-            try:
-                if not any(directory_path.iterdir()):
-                    directory_path.rmdir()
-                    removed_count += 1
-            except OSError:
-                continue
+    def _record_snapshot(
+        self, snapshot_id: int, timestamp: str, assoc: Mapping[str, RepoItem]
+    ) -> int:
+        """公開済みのスナップショットを台帳、`snapshots.yaml`、最新リポジトリ一覧へ反映する。何度実行しても同じ結果になる。
+
+        Returns:
+            最新リポジトリ一覧で追加・更新したレコード数。
+        """
+        with PhaseTimer.phase("snapshots_record"):
+            self.get_snapshot_registry().record(
+                snapshot_id,
+                SnapshotRegistry.describe(self.get_snapshot_store(), snapshot_id, len(assoc)),
+            )
+            snapshots_assoc = self._load_snapshots_assoc()
+            snapshots_assoc[snapshot_id] = timestamp
+            self._output_snapshots_assoc(dict(sorted(snapshots_assoc.items())))
+        return self._merge_into_repos(assoc)
+
+    def recover_pending_snapshot(self) -> int | None:
+        """前回の `save_snapshot` が途中で止まっていれば後始末し、対象のスナップショットIDを返す。
+
+        ジャーナルだけを見るため、止まっていなければディレクトリを走査しない。公開済みなら
+        `snapshots.yaml` と最新リポジトリ一覧への反映をやり直し、公開前なら書きかけのディレクトリを消す。
+        ジャーナルは書き込みロック下でしか存在しないため、呼び出し側はユーザー単位のロックを保持していること。
 
-        return removed_count
+        Returns:
+            後始末したスナップショットID。ジャーナルが無ければ `None`。
+        """
+        journal = SnapshotJournal(self.get_user_dir())
+        pending = journal.read()
+        if pending is None:
+            return None
+
+        snapshot_id, timestamp = pending
+        snapshot_store = self.get_snapshot_store()
+        if snapshot_store.exists(snapshot_id):
+            self._record_snapshot(snapshot_id, timestamp, snapshot_store.read(snapshot_id))
+            Loggerx.info(f"snapshot {snapshot_id}: recovered interrupted commit", __name__)
+        else:
+            snapshot_store.discard_staged(snapshot_id)
+            Loggerx.info(f"snapshot {snapshot_id}: discarded unfinished write", __name__)
+        journal.clear()
+        return snapshot_id
 
     @staticmethod
     def _collect_snapshot_ids(snapshots_dir: str | Path) -> list[int]:
@@ -280,23 +749,7 @@ class CommandList(Command):
 
         数値に解釈できないディレクトリ名は対象に含めない。
         """
-        snapshot_top_path = Path(snapshots_dir)
-        if not snapshot_top_path.exists() or not snapshot_top_path.is_dir():
-            return []
-
-        ids: list[int] = []
-        for child_path in snapshot_top_path.iterdir():
-            if not child_path.is_dir():
-                continue
-            try:
-                snapshot_id = int(child_path.name)
-            except ValueError:
-                continue
-            if snapshot_id > 0:
-                ids.append(snapshot_id)
-
-        ids.sort()
-        return ids
+        return SnapshotStore.collect_snapshot_ids(snapshots_dir)
 
     @staticmethod
     def _normalize_snapshots_assoc(
@@ -357,44 +810,153 @@ class CommandList(Command):
         sorted_result = dict(sorted(trimmed.items()))
         return sorted_result, changed
 
-    def fix_storage(self, verbose: bool = False) -> dict[str, Any]:
+    def fix_storage(
+        self,
+        verbose: bool = False,
+        dry_run: bool = False,
+        validate: bool = False,
+        max_workers: int = 1,
+    ) -> dict[str, Any]:
         """保存済みスナップショット構成を点検し、必要な補正結果を返す。
 
+        ユーザー単位のロック下で、最初に書き込み途中で止まったスナップショットを後始末し
+        (`recover_pending_snapshot`)、異常終了したプロセスが残したスナップショットIDの予約を消す。
+        ユーザーディレクトリは `StorageScan` で 1 回だけ走査し、本体の無いスナップショットに残った
+        検索用インデックスと空ディレクトリを削除する。最新スナップショットのインデックスが古ければ作り直し、
+        台帳 (`registry.json`) を走査結果とアーカイブに合わせて作り直す。
+
+        Args:
+            verbose: 警告をログへ出力するか。
+            dry_run: 何も変更せず、補正する内容だけを返す。ロックも取らない。
+            validate: 全スナップショットを読み込めるか、台帳のハッシュと一致するかを確かめる
+                (`max_workers` が 2 以上ならプロセスプール)。
+            max_workers: 走査と検証の並列数。
+
         Returns:
-            削除件数、最大スナップショットID、`snapshots.yaml` 更新有無、警告一覧を含む結果辞書。
+            削除件数、最大スナップショットID、`snapshots.yaml` と台帳の更新有無、インデックス再作成有無、
+            後始末したスナップショットID、消した予約の一覧、警告一覧を含む結果辞書。
+            `dry_run` では実行した場合の値を返す。`validate` では読み込めないスナップショットも含む。
         """
-        warnings: list[str] = []
         user_dir = self.get_user_dir()
-        snapshots_dir = self.get_snapshots_dir()
-
-        removed_empty_directories = self._remove_empty_directories(user_dir)
-        snapshot_ids = self._collect_snapshot_ids(snapshots_dir)
-        if not snapshots_dir.exists():
-            warnings.append("スナップショットトップディレクトリが存在しません")
+        snapshot_store = self.get_snapshot_store()
+        warnings: list[str] = []
+        with nullcontext() if dry_run else self.lock_user_dir():
+            if dry_run:
+                pending = SnapshotJournal(user_dir).read(clear_invalid=False)
+                recovered_snapshot_id = pending[0] if pending is not None else None
+            else:
+                recovered_snapshot_id = self.recover_pending_snapshot()
+            released_snapshot_ids = snapshot_store.remove_stale_reservations(dry_run)
+
+            with PhaseTimer.phase("scan") as phase:
+                storage_scan = StorageScan.scan(user_dir, max_workers)
+                phase.add(records=len(storage_scan.snapshot_files))
+            with PhaseTimer.phase("cleanup"):
+                if dry_run:
+                    removed_search_indexes = len(storage_scan.orphan_indexes)
+                    removed_empty_directories = len(storage_scan.empty_dirs)
+                else:
+                    removed_search_indexes = storage_scan.remove_orphan_indexes()
+                    removed_empty_directories = storage_scan.remove_empty_dirs()
+            snapshot_ids = storage_scan.get_live_snapshot_ids()
+
+            search_index_rebuilt = False
+            if snapshot_ids:
+                latest_id = max(snapshot_ids)
+                if SearchIndex.load(snapshot_store, latest_id) is None:
+                    try:
+                        if not dry_run:
+                            SearchIndex.rebuild(snapshot_store, latest_id)
+                        search_index_rebuilt = True
+                    except (FileNotFoundError, ValueError) as exc:
+                        warnings.append(f"検索用インデックスを作成できません: {exc}")
+            if not storage_scan.snapshots_dir.exists():
+                warnings.append("スナップショットトップディレクトリが存在しません")
+
+            snapshots_assoc = self._load_snapshots_assoc()
+            fallback_timestamp = ""
+            if snapshots_assoc:
+                fallback_timestamp = snapshots_assoc[max(snapshots_assoc)]
+            if fallback_timestamp == "":
+                fallback_timestamp = datetime.now().astimezone().isoformat(timespec="seconds")
+
+            normalized_assoc, snapshots_updated = self._normalize_snapshots_assoc(
+                snapshots_assoc, snapshot_ids, fallback_timestamp
+            )
+            snapshots_path = self.get_snapshots_path()
+            snapshots_exists_before = snapshots_path.exists()
+            if (snapshots_updated or not snapshots_exists_before) and not dry_run:
+                self._output_snapshots_assoc(normalized_assoc)
+
+            registry = self.get_snapshot_registry()
+            body_snapshot_ids = [
+                snapshot_id for snapshot_id in snapshot_ids if storage_scan.has_body(snapshot_id)
+            ]
+            with PhaseTimer.phase("registry"):
+                registry_updated = registry.rebuild(
+                    snapshot_store,
+                    sorted(
+                        set(body_snapshot_ids) | set(snapshot_store.archive.collect_snapshot_ids())
+                    ),
+                    dry_run,
+                )
 
-        snapshots_assoc = self._load_snapshots_assoc()
-        fallback_timestamp = ""
-        if snapshots_assoc:
-            fallback_timestamp = snapshots_assoc[max(snapshots_assoc)]
-        if fallback_timestamp == "":
-            fallback_timestamp = datetime.now().astimezone().isoformat(timespec="seconds")
-
-        normalized_assoc, snapshots_updated = self._normalize_snapshots_assoc(
-            snapshots_assoc, snapshot_ids, fallback_timestamp
-        )
-        snapshots_path = self.get_snapshots_path()
-        snapshots_exists_before = snapshots_path.exists()
-        if snapshots_updated or not snapshots_exists_before:
-            self._output_snapshots_assoc(normalized_assoc)
+            invalid_snapshots: dict[int, str] = {}
+            if validate:
+                with PhaseTimer.phase("validate_snapshots") as phase:
+                    invalid_snapshots = self._validate_snapshots(
+                        body_snapshot_ids,
+                        [
+                            cast(str | None, (registry.get_entry(snapshot_id) or {}).get("hash"))
+                            for snapshot_id in body_snapshot_ids
+                        ],
+                        max_workers,
+                    )
+                    phase.add(records=len(body_snapshot_ids))
+                for snapshot_id, reason in invalid_snapshots.items():
+                    warnings.append(f"スナップショット {snapshot_id} を読み込めません: {reason}")
 
         result: dict[str, Any] = {
+            "dry_run": dry_run,
             "removed_empty_directories": removed_empty_directories,
+            "removed_search_indexes": removed_search_indexes,
             "max_snapshot_id": max(snapshot_ids, default=None),
             "snapshots_updated": snapshots_updated or not snapshots_exists_before,
+            "registry_updated": registry_updated,
+            "search_index_rebuilt": search_index_rebuilt,
+            "recovered_snapshot_id": recovered_snapshot_id,
+            "released_snapshot_ids": released_snapshot_ids,
             "warnings": warnings,
         }
+        if validate:
+            result["invalid_snapshots"] = invalid_snapshots
         if verbose and warnings:
             for warning in warnings:
                 Loggerx.warning(warning, __name__)
 
         return result
+
+    def _validate_snapshots(
+        self, snapshot_ids: list[int], expected_hashes: list[str | None], max_workers: int
+    ) -> dict[int, str]:
+        """スナップショットを読み込めるか確かめ、読めないものの ID と理由を返す。
+
+        `expected_hashes` (台帳のハッシュ) が与えられたスナップショットは、本体の内容が一致するかも確かめる。
+        `max_workers` が 2 以上ならプロセスプールで並行して読み込む (パースは CPU 律速のため)。
+        """
+        user_dir = str(self.get_user_dir())
+        user_dirs = [user_dir] * len(snapshot_ids)
+        if max_workers > 1 and len(snapshot_ids) > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                reasons = list(
+                    executor.map(
+                        validate_snapshot, user_dirs, snapshot_ids, expected_hashes, chunksize=4
+                    )
+                )
+        else:
+            reasons = list(map(validate_snapshot, user_dirs, snapshot_ids, expected_hashes))
+        return {
+            snapshot_id: reason
+            for snapshot_id, reason in zip(snapshot_ids, reasons)
+            if reason is not None
+        }
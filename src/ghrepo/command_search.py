@@ -2,27 +2,121 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, cast
 
-import yaml
 from yklibpy.command import Command
 from yklibpy.config.appconfig import AppConfig
 from yklibpy.db.appstore import AppStore
 from yklibpy.db.storex import Storex
 
 from ghrepo.appconfigx import AppConfigx
+from ghrepo.history_index import HistoryIndex, Interval
+from ghrepo.phase_timer import PhaseTimer
+from ghrepo.query import Query, SortKey
+from ghrepo.repo_table import RepoTable
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_registry import SnapshotRegistry
+from ghrepo.snapshot_store import SnapshotStore
 
 type RepoItem = dict[str, Any]
 type RepoAssoc = dict[str, RepoItem]
 
-SEARCH_KINDS = {"public", "private", "both", "internal", "latest10"}
+SEARCH_KINDS = {"public", "private", "both", "internal", "latest10", "latest", "oldest"}
+ORDER_KINDS = {"latest": True, "oldest": False}  # 並べ替え検索の種別と降順かどうか
+VISIBILITY_KINDS = {"public", "private", "both", "internal"}  # 期間検索で使える検索種別
+
+
+class SearchOptions:
+    """`search` の検索条件。`CommandSearch.search_names` / `search_repos` に渡す。
+
+    `sort` 省略時は `latest` / `oldest` なら `sort_by`、`latest10` なら `createdAt` の降順、
+    それ以外は名前順に並べる。`limit` 省略時は `latest` / `oldest` なら `count`、`latest10` なら 10 件、
+    それ以外は制限しない。
+    """
+
+    def __init__(
+        self,
+        search_name: str,
+        *,
+        name_pattern: str | None = None,
+        user: str | None = None,
+        count: int = 10,
+        sort_by: str = "createdAt",
+        at: str | None = None,
+        where: str | None = None,
+        sort: str | None = None,
+        limit: int | None = None,
+    ) -> None:
+        """検索条件を保持する。
+
+        Raises:
+            ValueError: `search_name` が `SEARCH_KINDS` に含まれない場合。
+        """
+        if search_name not in SEARCH_KINDS:
+            raise ValueError(f"unsupported search_name: {search_name}")
+        self.search_name: str = search_name
+        self.name_pattern: str | None = name_pattern
+        self.user: str | None = user
+        self.count: int = count
+        self.sort_by: str = sort_by
+        self.at: str | None = at
+        self.where: str | None = where
+        self.sort: str | None = sort
+        self.limit: int | None = limit
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "SearchOptions":
+        """`ghrepo search` の問い合わせ内容 (`/search` の JSON) から検索条件を作る。"""
+        return cls(
+            str(payload["search_name"]),
+            name_pattern=cast(str | None, payload.get("name")),
+            user=cast(str | None, payload.get("user")),
+            count=int(payload.get("count", 10)),
+            sort_by=str(payload.get("sort_by", "createdAt")),
+            at=cast(str | None, payload.get("at")),
+            where=cast(str | None, payload.get("where")),
+            sort=cast(str | None, payload.get("sort")),
+            limit=cast(int | None, payload.get("limit")),
+        )
+
+    def get_sort_keys(self) -> list[SortKey]:
+        """並べ替えのキーを返す。
+
+        Raises:
+            ValueError: `sort` の指定が不正な場合。
+        """
+        if self.sort:
+            return Query.parse_sort(self.sort)
+        if self.search_name in ORDER_KINDS:
+            return [(self.sort_by, ORDER_KINDS[self.search_name])]
+        if self.search_name == "latest10":
+            return [("createdAt", True)]
+        return []
+
+    def get_limit(self) -> int | None:
+        """件数の上限を返す。制限しない場合は `None` を返す。"""
+        if self.limit is not None:
+            return self.limit
+        if self.search_name in ORDER_KINDS:
+            return self.count
+        return 10 if self.search_name == "latest10" else None
 
 
 class CommandSearch(Command):
     """保存済みスナップショットを検索するコマンド。"""
 
-    def __init__(self, appstore: AppStore, user: str | None) -> None:
+    def __init__(self, appstore: AppStore, user: str | None, cache: bool = False) -> None:
+        """検索対象の `AppStore` を保持する。
+
+        `cache` を有効にすると、読み込んだインデックスとスナップショットをメモリに保持し、
+        元ファイルのフィンガープリントが変わるまで再利用する (常駐プロセス向け)。
+        スナップショットはメモリの少ない `RepoTable` で保持する。
+        """
         self.appstore: AppStore = appstore
         self.user: str | None = user
         self.config_user: str = cast(str, self.appstore.get_from_config("config", "USER"))
+        self.cache: bool = cache
+        self._cache_key: tuple[int, object] | None = None
+        self._cached_index: SearchIndex | None = None
+        self._cached_assoc: RepoTable | None = None
 
     def _get_store(self, base_name: str) -> Storex:
         """ユーザー別設定を考慮して対象 `Storex` を返す。"""
@@ -46,133 +140,242 @@ class CommandSearch(Command):
     @staticmethod
     def _collect_snapshot_ids(snapshots_dir: str | Path) -> list[int]:
         """スナップショットトップディレクトリ配下の数値ディレクトリ名を昇順で収集する。"""
-        snapshot_top_path = Path(snapshots_dir)
-        if not snapshot_top_path.exists() or not snapshot_top_path.is_dir():
-            return []
+        return SnapshotStore.collect_snapshot_ids(snapshots_dir)
 
-        ids: list[int] = []
-        for child_path in snapshot_top_path.iterdir():
-            if not child_path.is_dir():
-                continue
-            try:
-                snapshot_id = int(child_path.name)
-            except ValueError:
-                continue
-            if snapshot_id > 0:
-                ids.append(snapshot_id)
+    def get_snapshot_store(self) -> SnapshotStore:
+        """対象ユーザーのスナップショットを読み書きする `SnapshotStore` を返す。"""
+        return SnapshotStore(self.get_user_dir())
 
-        ids.sort()
-        return ids
+    def _get_latest_snapshot_id(self) -> int:
+        """最新スナップショットIDを返す。
 
-    def _load_latest_snapshot_assoc(self) -> RepoAssoc:
-        """最新リポジトリ一覧スナップショットファイルを読み込んで返す。"""
+        台帳 (`registry.json`) の値を使い、ディレクトリを走査しない。台帳が無い場合だけ
+        スナップショットトップディレクトリを走査する。
+
+        Raises:
+            FileNotFoundError: スナップショットが 1 件も無い場合。
+        """
         snapshots_dir = self.get_snapshots_dir()
-        snapshot_ids = self._collect_snapshot_ids(snapshots_dir)
+        registry = SnapshotRegistry(self.get_user_dir())
+        if registry.exists():
+            latest_id = registry.get_latest_id()
+            snapshot_ids = [] if latest_id is None else [latest_id]
+        else:
+            snapshot_ids = self._collect_snapshot_ids(snapshots_dir)
         if not snapshot_ids:
             raise FileNotFoundError(f"スナップショットトップディレクトリ配下にスナップショットが存在しません: {snapshots_dir}")
+        return max(snapshot_ids)
 
-        latest_id = max(snapshot_ids)
-        snapshot_path = snapshots_dir / str(latest_id) / "snapshot.yaml"
-        if not snapshot_path.exists():
-            raise FileNotFoundError(f"リポジトリ一覧スナップショットファイルが存在しません: {snapshot_path}")
-
-        with snapshot_path.open(encoding="utf-8") as snapshot_file:
-            loaded_value = yaml.safe_load(snapshot_file)
+    def _load_snapshot_timestamps(self) -> dict[int, datetime]:
+        """`snapshots.yaml` からスナップショットIDと作成日時の対応を ID 昇順で返す。"""
+        loaded_value = self._get_store(AppConfigx.BASE_NAME_SNAPSHOTS).load()
         if not isinstance(loaded_value, dict):
-            raise ValueError(f"リポジトリ一覧スナップショットファイルの形式が不正です: {snapshot_path}")
-
-        assoc: RepoAssoc = {}
+            return {}
+        timestamps: dict[int, datetime] = {}
         for key, value in loaded_value.items():
-            if not isinstance(key, str) or not isinstance(value, dict):
+            try:
+                snapshot_id = int(key)
+            except (TypeError, ValueError):
                 continue
-            assoc[key] = cast(RepoItem, value)
-        return assoc
+            parsed = SearchIndex.parse_timestamp(str(value))
+            if parsed is not None:
+                timestamps[snapshot_id] = parsed.astimezone()
+        return dict(sorted(timestamps.items()))
 
-    @staticmethod
-    def _filter_by_visibility(assoc: RepoAssoc, visibility: str) -> list[RepoItem]:
-        """`visibility` が一致するレコードを返す。"""
-        if visibility == "both":
-            normalized_visibility = ["public", "private"]
-        else:
-            normalized_visibility = [visibility.lower()]
+    def resolve_snapshot_id(self, value: str, earliest: bool = False) -> int:
+        """スナップショットID、または日時を対象のスナップショットIDへ解決する。
+
+        日時の場合は `snapshots.yaml` でその日時以前に作成された最後のスナップショットを選ぶ。
+        タイムゾーンの無い日時はローカル時刻とみなす。`earliest` を指定すると、該当が無いときに
+        最初のスナップショットを返す (期間の開始側)。
 
-        return [
-            item
-            for item in assoc.values()
-            if isinstance(item.get("visibility"), str)
-            and cast(str, item["visibility"]).lower() in normalized_visibility
+        Raises:
+            FileNotFoundError: 該当するスナップショットが存在しない場合。
+            ValueError: `value` が ID にも日時にも解釈できない場合。
+        """
+        snapshot_store = self.get_snapshot_store()
+        if value.strip().isdigit():
+            snapshot_id = int(value)
+            if not snapshot_store.exists(snapshot_id):
+                raise FileNotFoundError(f"スナップショットが存在しません: {snapshot_id}")
+            return snapshot_id
+
+        parsed = SearchIndex.parse_timestamp(value.strip())
+        if parsed is None:
+            raise ValueError(f"snapshot id or timestamp expected: {value}")
+        at = parsed.astimezone()
+        timestamps = self._load_snapshot_timestamps()
+        candidates = [
+            snapshot_id for snapshot_id in timestamps if snapshot_store.exists(snapshot_id)
         ]
+        before = [snapshot_id for snapshot_id in candidates if timestamps[snapshot_id] <= at]
+        if before:
+            return before[-1]
+        if earliest and candidates:
+            return candidates[0]
+        raise FileNotFoundError(f"{value} 以前のスナップショットが存在しません")
+
+    def _get_target_snapshot_id(self, at: str | None) -> int:
+        """`at` 指定時はその時点の、省略時は最新のスナップショットIDを返す。"""
+        if at is None or at == "":
+            return self._get_latest_snapshot_id()
+        return self.resolve_snapshot_id(at)
+
+    def _load_latest_snapshot_assoc(self) -> RepoAssoc:
+        """最新リポジトリ一覧スナップショットを保存形式によらず読み込んで返す。"""
+        return self.get_snapshot_store().read(self._get_latest_snapshot_id())
+
+    def _get_index(self, snapshot_id: int) -> SearchIndex:
+        """検索用インデックスを返す。キャッシュ有効時は元データが変わるまで同じものを返す。"""
+        snapshot_store = self.get_snapshot_store()
+        with PhaseTimer.phase("index_load"):
+            if not self.cache:
+                return SearchIndex.load_or_rebuild(snapshot_store, snapshot_id)
+
+            cache_key = (snapshot_id, snapshot_store.get_fingerprint(snapshot_id))
+            if self._cache_key != cache_key or self._cached_index is None:
+                self._cached_index = SearchIndex.load_or_rebuild(snapshot_store, snapshot_id)
+                self._cached_assoc = None
+                self._cache_key = cache_key
+            return self._cached_index
+
+    def _read_records(self, snapshot_id: int, names: list[str]) -> list[RepoItem]:
+        """指定名のレコードを `names` の順に返す。キャッシュ有効時は全件を 1 度だけ読み込んで保持する。"""
+        snapshot_store = self.get_snapshot_store()
+        with PhaseTimer.phase("records_read") as phase:
+            if not self.cache:
+                records = list(snapshot_store.read_subset(snapshot_id, names).values())
+            else:
+                if self._cached_assoc is None:
+                    self._cached_assoc = snapshot_store.read_table(snapshot_id)
+                assoc = self._cached_assoc
+                records = [assoc[name] for name in names if name in assoc]
+            phase.add(records=len(records))
+        return records
 
     @staticmethod
     def _parse_created_at(value: object) -> datetime | None:
         """`createdAt` 値を `datetime` に変換する。"""
-        if not isinstance(value, str) or value == "":
-            return None
-        try:
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        except ValueError:
-            return None
-
-    def _take_latest_n_by_created_at(self, assoc: RepoAssoc, n: int) -> list[RepoItem]:
-        """`createdAt` 降順で上位 `n` 件を返す。"""
-        items = list(assoc.values())
-        sorted_items = sorted(
-            items,
-            key=lambda item: (
-                self._parse_created_at(item.get("createdAt")) is None,
-                -(cast(datetime, self._parse_created_at(item.get("createdAt"))).timestamp())
-                if self._parse_created_at(item.get("createdAt")) is not None
-                else 0.0,
-                str(item.get("name", "")),
-            ),
-        )
-        return sorted_items[:n]
+        return SearchIndex.parse_timestamp(value)
 
     @staticmethod
-    def _filter_by_name_substring(repos: list[RepoItem], pattern: str | None) -> list[RepoItem]:
-        """`name` の部分文字列一致で絞り込む。"""
-        if pattern is None or pattern == "":
-            return repos
-        return [
-            item
-            for item in repos
-            if isinstance(item.get("name"), str) and pattern in cast(str, item["name"])
-        ]
+    def _select_candidates(index: SearchIndex, options: SearchOptions) -> list[int]:
+        """並べ替えと件数制限の前の候補となる位置番号を名前順に求める。`latest10` では名前とユーザーの条件を無視する。"""
+        positions = list(range(len(index.names)))
+        if options.search_name == "latest10":
+            return positions
+        if options.search_name not in ORDER_KINDS:
+            visibilities = (
+                ["public", "private"] if options.search_name == "both" else [options.search_name]
+            )
+            positions = index.select_visibility(visibilities)
+        if options.name_pattern:
+            positions = index.filter_name_substring(positions, options.name_pattern)
+        if options.user:
+            positions = index.filter_owner(positions, options.user)
+        return positions
 
-    @staticmethod
-    def _owner_matches(item: RepoItem, github_user: str) -> bool:
-        """`owner` 等から GitHub ユーザー名が一致するか判定する。"""
-        gu = github_user.lower().strip()
-        owner = item.get("owner")
-        if isinstance(owner, str) and owner.lower() == gu:
-            return True
-        if isinstance(owner, dict):
-            login = owner.get("login")
-            if isinstance(login, str) and login.lower() == gu:
-                return True
-        nwo = item.get("nameWithOwner")
-        if isinstance(nwo, str) and "/" in nwo:
-            prefix = nwo.split("/", 1)[0]
-            if prefix.lower() == gu:
-                return True
-        return False
-
-    def search_repos(
+    def _search(
+        self, options: SearchOptions, with_records: bool
+    ) -> tuple[list[str], list[RepoItem]]:
+        """検索種別の候補を `where` の式で絞り込み、並べて先頭 `limit` 件を返す。
+
+        式は 1 度だけ述語関数に変換し、候補ごとに 1 回だけ評価する。名前・可視性・並べ替え用フィールドの
+        項はインデックスの行で先に評価し、残りの項や並べ替えにレコード本体が必要な場合だけ、
+        絞り込んだ候補のレコードを読む。式が無く並べ替え用フィールド 1 つで並べる場合は、
+        全候補を並べずにインデックスから先頭だけを選ぶ (`SearchIndex.take_top`)。
+
+        Returns:
+            一致したリポジトリ名と、`with_records` 指定時はそのレコード (未指定時は空リスト)。
+
+        Raises:
+            ValueError: 式または並べ替えの指定が不正な場合。
+        """
+        query = Query.parse(options.where) if options.where else None
+        sort_keys = options.get_sort_keys()
+        limit = options.get_limit()
+        snapshot_id = self._get_target_snapshot_id(options.at)
+        index = self._get_index(snapshot_id)
+
+        row_fields = SearchIndex.get_row_fields()
+        index_predicate, rest_predicate = (
+            query.split(row_fields) if query is not None else (None, None)
+        )
+        with PhaseTimer.phase("select") as phase:
+            positions = self._select_candidates(index, options)
+            if (
+                query is None
+                and limit is not None
+                and len(sort_keys) == 1
+                and sort_keys[0][0] in SearchIndex.SORT_FIELDS
+            ):
+                field, descending = sort_keys[0]
+                positions = index.take_top(field, limit, descending, positions)
+                sort_keys = []
+            if index_predicate is None and not sort_keys:
+                names = index.get_names(positions)
+            else:
+                rows = index.get_rows(positions)
+                if index_predicate is not None:
+                    rows = [row for row in rows if index_predicate(row)]
+                if rest_predicate is None and all(
+                    field in row_fields for field, _descending in sort_keys
+                ):
+                    rows = Query.sort_items(rows, sort_keys)
+                    sort_keys = []
+                names = [cast(str, row["name"]) for row in rows]
+            phase.add(records=len(names))
+
+        if rest_predicate is None and not sort_keys:
+            # 並びが確定していれば、先頭 `limit` 件のレコードだけを読む
+            names = names[:limit]
+            return names, self._read_records(snapshot_id, names) if with_records else []
+
+        records = self._read_records(snapshot_id, names)
+        if rest_predicate is not None:
+            records = [record for record in records if rest_predicate(record)]
+        records = Query.sort_items(records, sort_keys)[:limit]
+        return [cast(str, record["name"]) for record in records], records if with_records else []
+
+    def search_names(self, options: SearchOptions) -> list[str]:
+        """検索条件に一致するリポジトリ名を返す。
+
+        インデックスで決まらない条件 (`where` の一部や並べ替え) が無ければスナップショット本体は読まない。
+        インデックスが無い、または元データと一致しない場合は作り直してから使う。
+        """
+        return self._search(options, False)[0]
+
+    def search_repos(self, options: SearchOptions) -> list[RepoItem]:
+        """検索条件に一致するリポジトリのレコードを返す。
+
+        対象の決定は `search_names` と同じくインデックスで行い、一致したレコードだけを読み出す。
+        """
+        return self._search(options, True)[1]
+
+    def search_between(
         self,
         search_name: str,
+        start: str,
+        end: str,
         name_pattern: str | None = None,
         user: str | None = None,
-    ) -> list[RepoItem]:
-        """検索種別と `--name` / `--user` 条件でスナップショットを絞り込む。"""
-        if search_name not in SEARCH_KINDS:
-            raise ValueError(f"unsupported search_name: {search_name}")
+    ) -> dict[str, list[Interval]]:
+        """`start` から `end` までのいずれかのスナップショットで検索種別の可視性だったリポジトリを返す。
+
+        全スナップショットから作る区間索引 (`HistoryIndex`) だけで判定し、スナップショットは読み直さない。
+        結果はリポジトリ名ごとの、期間に重なる `[開始ID, 終了ID, 可視性]` の一覧。
 
-        assoc = self._load_latest_snapshot_assoc()
-        if search_name == "latest10":
-            return self._take_latest_n_by_created_at(assoc, 10)
+        Raises:
+            ValueError: 検索種別が可視性による種別でない、または期間の指定が不正な場合。
+            FileNotFoundError: 該当するスナップショットが存在しない場合。
+        """
+        if search_name not in VISIBILITY_KINDS:
+            raise ValueError(f"unsupported search_name for a range query: {search_name}")
 
-        candidates = self._filter_by_visibility(assoc, search_name)
-        candidates = self._filter_by_name_substring(candidates, name_pattern)
-        if user is not None and user != "":
-            candidates = [item for item in candidates if self._owner_matches(item, user)]
-        return candidates
+        start_id = self.resolve_snapshot_id(start, earliest=True)
+        end_id = self.resolve_snapshot_id(end)
+        if start_id > end_id:
+            raise ValueError(f"range start is after its end: {start} > {end}")
+        visibilities = ["public", "private"] if search_name == "both" else [search_name]
+        history = HistoryIndex.update(self.get_snapshot_store())
+        return history.select(visibilities, start_id, end_id, name_pattern, user)
@@ -1,6 +1,4 @@
 from yklibpy.command.command import Command
-from yklibpy.command.command_gh_user import CommandGhUser
-from yklibpy.common.util import Util
 from yklibpy.db.appstore import AppStore
 
 from ghrepo.appconfigx import AppConfigx
@@ -16,13 +14,18 @@ class CommandSetup(Command):
     def run(self, key: str, default_json_fields: list[str]) -> None:
         """設定値と空の DB を出力して初回利用状態を整える。
 
-        GitHub ユーザーが取得できない場合は既定値へフォールバックする。
+        `USER` には `AppStore` 準備時に解決済みのユーザー名を書き込むため、ここでは `gh` を起動しない。
         """
-        user: str | None = CommandGhUser().run()
-        if Util.is_empty(user):
-            user = CommandGhUser.DEFAULT_VALUE_USER
-
-        data = {key: default_json_fields, "USER": self.appstore.user}
+        data = {
+            key: default_json_fields,
+            "USER": self.appstore.user,
+            AppConfigx.SNAPSHOT_STORAGE_KEY: AppConfigx.default_snapshot_storage,
+            AppConfigx.SNAPSHOT_FORMAT_KEY: AppConfigx.default_snapshot_format,
+            AppConfigx.REPOS_STORE_KEY: AppConfigx.default_repos_store,
+            AppConfigx.RETENTION_KEEP_LAST_KEY: AppConfigx.default_retention_keep_last,
+            AppConfigx.RETENTION_KEEP_DAILY_KEY: AppConfigx.default_retention_keep_daily,
+            AppConfigx.RETENTION_KEEP_WEEKLY_KEY: AppConfigx.default_retention_keep_weekly,
+        }
         self.appstore.output_config("config", data)
         self.appstore.output_db(AppConfigx.BASE_NAME_REPOS, {})
         self.appstore.output_db(AppConfigx.BASE_NAME_SNAPSHOTS, {})
@@ -0,0 +1,176 @@
+import json
+import os
+import socket
+import stat
+from pathlib import Path
+from typing import Any, ClassVar
+
+type DaemonAddress = Path | tuple[str, int]
+
+
+class DaemonClient:
+    """`ghrepo serve` で起動した常駐プロセスへ問い合わせる軽量クライアント。
+
+    CLI の起動時間を増やさないよう、`http.client` ではなくソケットで HTTP/1.0 の要求を直接送る。
+
+    既定の接続先は OS ユーザーごとの Unix ドメインソケット (`get_default_socket_path`) で、
+    自分が所有し、他のユーザーが書き換えられないディレクトリにあるものにだけ接続する。
+    TCP は認証が無いため、環境変数 `GHREPO_SERVER` に `host:port` を指定したときだけ使う
+    (Unix ドメインソケットの無い環境では、指定しなければ問い合わせない)。`unix:PATH` で
+    ソケットの場所を、`off` で問い合わせの無効化を指定できる。
+
+    常駐プロセスが起動していない場合や、`ghrepo serve` 以外が応答した・応答が壊れている場合は
+    `request` が `None` を返し、呼び出し側は同じ処理をプロセス内で実行する。
+    """
+
+    SERVER_ENV: ClassVar[str] = "GHREPO_SERVER"
+    DEFAULT_HOST: ClassVar[str] = "127.0.0.1"
+    DEFAULT_PORT: ClassVar[int] = 8765
+    SOCKET_FILE_NAME: ClassVar[str] = "serve.sock"
+    SERVER_SOFTWARE: ClassVar[str] = "ghrepo-serve/1"  # 応答の `Server` ヘッダー (他のサービスと見分ける)
+    CONNECT_TIMEOUT: ClassVar[float] = 0.3  # 常駐プロセス不在の判定を待つ秒数
+    READ_TIMEOUT: ClassVar[float] = 60.0
+
+    SEARCH_PATH: ClassVar[str] = "/search"
+    LIST_PATH: ClassVar[str] = "/list"
+    HEALTH_PATH: ClassVar[str] = "/health"
+    METRICS_PATH: ClassVar[str] = "/metrics"  # Prometheus のテキスト形式で応答する (GET のみ)
+
+    # 常駐プロセス側の例外をクライアント側で同じ型として送出し直す
+    ERROR_TYPES: ClassVar[dict[str, type[Exception]]] = {
+        "FileNotFoundError": FileNotFoundError,
+        "ValueError": ValueError,
+    }
+
+    def __init__(self, address: DaemonAddress) -> None:
+        """接続先 (Unix ドメインソケットのパス、または `(host, port)`) を保持する。"""
+        self.address: DaemonAddress = address
+
+    @classmethod
+    def get_default_socket_path(cls) -> Path | None:
+        """既定のソケットパスを返す。Unix ドメインソケットが使えない環境では `None` を返す。
+
+        `$XDG_RUNTIME_DIR/ghrepo/serve.sock`、未設定なら `$XDG_CACHE_HOME/ghrepo/serve.sock`
+        (`~/.cache` 既定) を使う。
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            return None
+        base_dir = (
+            os.environ.get("XDG_RUNTIME_DIR")
+            or os.environ.get("XDG_CACHE_HOME")
+            or str(Path.home() / ".cache")
+        )
+        return Path(base_dir) / "ghrepo" / cls.SOCKET_FILE_NAME
+
+    @classmethod
+    def from_env(cls) -> "DaemonClient | None":
+        """環境変数 `GHREPO_SERVER` から接続先を決める。問い合わせない場合は `None` を返す。"""
+        value = os.environ.get(cls.SERVER_ENV, "").strip()
+        if value.lower() == "off":
+            return None
+        if value == "":
+            socket_path = cls.get_default_socket_path()
+            return None if socket_path is None else cls(socket_path)
+        if value.startswith("unix:"):
+            return cls(Path(value[len("unix:") :])) if hasattr(socket, "AF_UNIX") else None
+        host, _, port = value.rpartition(":")
+        return cls((host or cls.DEFAULT_HOST, int(port)))
+
+    @staticmethod
+    def is_private_socket(socket_path: Path) -> bool:
+        """自分が所有するソケットで、親ディレクトリも自分が所有し他のユーザーが書き込めないか判定する。"""
+        try:
+            socket_stat = socket_path.lstat()
+            dir_stat = socket_path.parent.stat()
+        except OSError:
+            return False
+        uid = os.getuid()
+        return (
+            stat.S_ISSOCK(socket_stat.st_mode)
+            and socket_stat.st_uid == uid
+            and dir_stat.st_uid == uid
+            and dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH) == 0
+        )
+
+    def _connect(self) -> socket.socket | None:
+        """接続先へ接続する。接続できない、または他のユーザーのソケットなら `None` を返す。"""
+        if isinstance(self.address, tuple):
+            try:
+                return socket.create_connection(self.address, timeout=self.CONNECT_TIMEOUT)
+            except OSError:
+                return None
+        if not self.is_private_socket(self.address):
+            return None
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.CONNECT_TIMEOUT)
+        try:
+            connection.connect(str(self.address))
+        except OSError:
+            connection.close()
+            return None
+        return connection
+
+    @classmethod
+    def parse_response(cls, response: bytes) -> tuple[int, dict[str, Any]] | None:
+        """HTTP 応答をステータスと JSON 本文に分ける。`ghrepo serve` の応答でなければ `None` を返す。"""
+        head, separator, body = response.partition(b"\r\n\r\n")
+        if not separator:
+            return None
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            return None
+        headers = {
+            name.strip().lower(): value.strip()
+            for name, _, value in (line.partition(":") for line in header_lines)
+        }
+        if headers.get("server", "").split()[:1] != [cls.SERVER_SOFTWARE]:
+            return None
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        return int(parts[1]), data
+
+    def request(self, path: str, payload: dict[str, Any]) -> Any:
+        """常駐プロセスへ JSON を POST し、応答の `result` を返す。
+
+        接続できない場合、通信が途中で切れた場合、`ghrepo serve` 以外の応答の場合は `None` を返す。
+
+        Raises:
+            FileNotFoundError: 常駐プロセス側で対象ファイルが見つからなかった場合。
+            ValueError: 常駐プロセス側で引数や保存内容が不正と判定された場合。
+            RuntimeError: それ以外のエラー応答の場合。
+        """
+        connection = self._connect()
+        if connection is None:
+            return None
+
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        header = (
+            f"POST {path} HTTP/1.0\r\n"
+            "Host: localhost\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode("ascii")
+        chunks: list[bytes] = []
+        try:
+            with connection:
+                connection.settimeout(self.READ_TIMEOUT)
+                connection.sendall(header + body)
+                # HTTP/1.0 のため、応答の終わりは接続の切断で判定する
+                while chunk := connection.recv(65536):
+                    chunks.append(chunk)
+        except OSError:
+            return None
+
+        parsed = self.parse_response(b"".join(chunks))
+        if parsed is None:
+            return None
+        status, data = parsed
+        if status != 200:
+            error_type = self.ERROR_TYPES.get(str(data.get("type")), RuntimeError)
+            raise error_type(str(data.get("error")))
+        return data.get("result")
@@ -0,0 +1,96 @@
+import os
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import ClassVar
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+
+class FileLock:
+    """ファイルに対する排他的なアドバイザリロック。
+
+    POSIX では `flock`、Windows では `msvcrt.locking` を使う。ロックはファイル記述子に結び付くため、
+    プロセスが異常終了しても OS が解放する。同じプロセス内でも別インスタンス同士は排他になるので、
+    入れ子にして取得しないこと。
+    """
+
+    WINDOWS_RETRY_INTERVAL: ClassVar[float] = 0.1  # msvcrt.locking の再試行間隔 (秒)
+
+    def __init__(self, path: Path) -> None:
+        """ロックファイルのパスを保持する。ファイルは取得時に作成する。"""
+        self.path: Path = path
+        self._fd: int | None = None
+
+    @property
+    def locked(self) -> bool:
+        """このインスタンスがロックを保持しているか。"""
+        return self._fd is not None
+
+    @staticmethod
+    def _lock_fd(fd: int, blocking: bool) -> bool:
+        """記述子をロックする。`blocking=False` で他が保持していれば `False` を返す。"""
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            return True
+
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+            time.sleep(FileLock.WINDOWS_RETRY_INTERVAL)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """ロックを取得する。`blocking=False` で他が保持していれば待たずに `False` を返す。
+
+        Raises:
+            RuntimeError: このインスタンスが既にロックを保持している場合。
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"ロックを二重に取得しようとしました: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not self._lock_fd(fd, blocking):
+                os.close(fd)
+                return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        """ロックを解放する。保持していなければ何もしない。"""
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from yklibpy.common.loggerx import Loggerx
+
+
+class GhUserCache:
+    """`gh` で解決した GitHub ユーザー名をファイルにキャッシュする。
+
+    `gh` の認証設定ファイル (`hosts.yml`) の更新時刻・サイズと、環境変数 `GH_TOKEN` /
+    `GITHUB_TOKEN` のハッシュをキーにし、キーが一致して TTL 内であれば `gh` を起動しない。
+    ログインし直した場合やトークンを差し替えた場合はキーが変わるため、自動的に解決し直す。
+    """
+
+    CACHE_FILE_NAME: ClassVar[str] = "gh_user.json"
+    TTL_ENV: ClassVar[str] = "GHREPO_USER_CACHE_TTL"  # TTL (秒) を上書きする環境変数名
+    DEFAULT_TTL: ClassVar[int] = 24 * 60 * 60
+    TOKEN_ENVS: ClassVar[list[str]] = ["GH_TOKEN", "GITHUB_TOKEN"]
+
+    def __init__(self, cache_path: Path | None = None, ttl: int | None = None) -> None:
+        """キャッシュファイルのパスと TTL を保持する。省略時は既定値を使う。"""
+        self.cache_path: Path = (
+            cache_path if cache_path is not None else self.get_default_cache_path()
+        )
+        self.ttl: int = ttl if ttl is not None else self.get_default_ttl()
+
+    @classmethod
+    def get_default_cache_path(cls) -> Path:
+        """既定のキャッシュファイルパス (`$XDG_CACHE_HOME/ghrepo/gh_user.json`) を返す。"""
+        cache_home = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+        return Path(cache_home) / "ghrepo" / cls.CACHE_FILE_NAME
+
+    @classmethod
+    def get_default_ttl(cls) -> int:
+        """環境変数 `GHREPO_USER_CACHE_TTL` の値、未指定または不正なら既定の TTL を返す。"""
+        try:
+            return int(os.environ.get(cls.TTL_ENV, cls.DEFAULT_TTL))
+        except ValueError:
+            return cls.DEFAULT_TTL
+
+    @staticmethod
+    def get_gh_config_dir() -> Path:
+        """`gh` の設定ディレクトリを `gh` 本体と同じ優先順位で返す。"""
+        for env_name, sub_dir in (("GH_CONFIG_DIR", ""), ("XDG_CONFIG_HOME", "gh")):
+            value = os.environ.get(env_name)
+            if value:
+                return Path(value) / sub_dir
+        if sys.platform == "win32" and os.environ.get("AppData"):
+            return Path(os.environ["AppData"]) / "GitHub CLI"
+        return Path.home() / ".config" / "gh"
+
+    @classmethod
+    def get_auth_key(cls) -> dict[str, Any]:
+        """認証状態を表すキー (`hosts.yml` の更新時刻・サイズとトークンのハッシュ) を返す。"""
+        hosts_path = cls.get_gh_config_dir() / "hosts.yml"
+        try:
+            stat_result = hosts_path.stat()
+            hosts: list[int] | None = [stat_result.st_mtime_ns, stat_result.st_size]
+        except OSError:
+            hosts = None
+        # トークン自体は保存しない
+        token = "\0".join(os.environ.get(name, "") for name in cls.TOKEN_ENVS)
+        return {
+            "hosts": hosts,
+            "token": hashlib.sha256(token.encode("utf-8")).hexdigest()[:16],
+        }
+
+    def load(self, auth_key: dict[str, Any]) -> str | None:
+        """キーが一致し TTL 内の空でないキャッシュ値を返す。無ければ `None` を返す。"""
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if (
+            not isinstance(data, dict)
+            or data.get("key") != auth_key
+            or not isinstance(data.get("user"), str)
+            or data["user"] == ""
+            or time.time() - float(data.get("resolved_at", 0)) > self.ttl
+        ):
+            return None
+        return cast(str, data["user"])
+
+    def save(self, auth_key: dict[str, Any], user: str) -> None:
+        """解決結果を一時ファイル経由で保存する。保存できなくても処理は続ける。"""
+        data = {"key": auth_key, "user": user, "resolved_at": time.time()}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_name(
+                f"{self.cache_path.name}.{os.getpid()}.tmp"
+            )
+            temp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(temp_path, self.cache_path)
+        except OSError as exc:
+            Loggerx.debug(f"gh user cache not saved: {exc}", __name__)
+
+    def get_user(self, refresh: bool = False) -> str | None:
+        """GitHub ユーザー名を返す。キャッシュが使えない、または `refresh` 指定時のみ `gh` を起動する。
+
+        `gh` で解決できなかった場合 (空文字・`None`) はキャッシュせず、次回も `gh` で解決し直す。
+        """
+        auth_key = self.get_auth_key()
+        if not refresh:
+            cached = self.load(auth_key)
+            if cached is not None:
+                return cached
+
+        # キャッシュが使えるときは yklibpy のコマンド層を読み込まない
+        from yklibpy.command.command_gh_user import CommandGhUser
+
+        user: str | None = CommandGhUser().run()
+        # 一時的な失敗を TTL の間使い続けないよう、解決できたときだけ保存する
+        if user:
+            self.save(auth_key, user)
+        return user
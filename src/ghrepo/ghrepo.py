@@ -1,24 +1,35 @@
-"""コマンドライン実行ユーティリティ"""
+"""コマンドライン実行ユーティリティ
+
+起動時間を抑えるため、サブコマンド固有の処理とその依存 (yaml、yklibpy の DB/コマンド層、
+スナップショット関連モジュール) は各サブコマンドのメソッド内で import する。
+"""
 
 import argparse
+import copy
 import json
 import logging
-from collections.abc import Callable
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING, Any, ClassVar, TextIO, cast
 
-from yklibpy.command.command_gh_user import CommandGhUser
 from yklibpy.common.loggerx import Loggerx
 from yklibpy.common.util import Util
-from yklibpy.db.appstore import AppStore
-from yklibpy.db.storex import Storex
 
 from ghrepo.appconfigx import AppConfigx
 from ghrepo.clix import Clix
-from ghrepo.command_list import CommandList
-from ghrepo.command_search import CommandSearch
-from ghrepo.command_setup import CommandSetup
+from ghrepo.daemon_client import DaemonClient
+from ghrepo.phase_timer import PhaseTimer
+
+if TYPE_CHECKING:
+    from yklibpy.db.appstore import AppStore
+
+    from ghrepo.annotated_repos import AnnotatedRepos
+    from ghrepo.command_list import CommandList, RepoItem
 
 type CommandHandler = Callable[[argparse.Namespace], None]
 
@@ -26,34 +37,65 @@ type CommandHandler = Callable[[argparse.Namespace], None]
 class Ghrepo:
     """`ghrepo` の主要 CLI 処理を束ねる統括クラス。"""
 
+    LIST_OUTPUT_DEFAULT: ClassVar[str] = "repos.json"  # `list --output` 省略時の出力先
+    # `--users` / `--users-file` と同時に指定できない `list` の引数 (属性名 -> オプション名)
+    OWNERS_CONFLICTING_ARGS: ClassVar[dict[str, str]] = {
+        "user": "--user",
+        "output": "--output",
+        "format": "--format",
+        "fields": "--fields",
+    }
+
     @classmethod
-    def init_appstore(cls, normalized_user: str | None) -> AppStore:
+    def init_appstore(
+        cls, normalized_user: str | None, refresh_user: bool = False
+    ) -> AppStore:
         """対象ユーザーに対応する `AppStore` を準備して返す。
 
         Args:
             normalized_user: 正規化済み GitHub ユーザー名。`None` の場合は実行環境から補完する。
+            refresh_user: 補完時にキャッシュを使わず `gh` で解決し直すか。
 
         Returns:
             設定ファイルと DB ファイルの準備が済んだ `AppStore`。
+
+        `AppConfigx.file_assoc` は `AppStore` ごとに複製して渡す (読み込んだ値を書き込むため)。
+        `Storex` のクラス変数も設定するため、複数ユーザー分を並行に呼ばないこと。
         """
+        from yklibpy.db.appstore import AppStore
+        from yklibpy.db.storex import Storex
+
         Storex.set_file_type_dict(AppConfigx.file_type_dict)
 
         if normalized_user is None:
-            user: str | None = CommandGhUser().run()
-            if Util.is_empty(user):
-                user = CommandGhUser.DEFAULT_VALUE_USER
-                Loggerx.debug(f"user={user}", __name__)
-
-            normalized_user = Util.normalize_string(user)
+            normalized_user = cls.resolve_default_user(refresh_user)
 
-        appstore = AppStore("ghrepo", AppConfigx.file_assoc, normalized_user)
+        appstore = AppStore("ghrepo", copy.deepcopy(AppConfigx.file_assoc), normalized_user)
         appstore.prepare_config_file_and_db_file()
         return appstore
 
+    @staticmethod
+    def resolve_default_user(refresh_user: bool = False) -> str:
+        """`--user` 省略時の保存先ユーザー名を、実行環境の GitHub ユーザー名から正規化して返す。
+
+        `gh` で解決できない場合は `CommandGhUser.DEFAULT_VALUE_USER` を使う。
+        """
+        from ghrepo.gh_user_cache import GhUserCache
+
+        user: str | None = GhUserCache().get_user(refresh_user)
+        if Util.is_empty(user):
+            from yklibpy.command.command_gh_user import CommandGhUser
+
+            user = CommandGhUser.DEFAULT_VALUE_USER
+            Loggerx.debug(f"user={user}", __name__)
+        return cast(str, Util.normalize_string(user))
+
     @classmethod
     def setup(cls, args: argparse.Namespace) -> None:
         """設定ファイルと保存先 DB の初期化を実行する。"""
-        appstore = cls.init_appstore(args.user)
+        from ghrepo.command_setup import CommandSetup
+
+        appstore = cls.init_appstore(args.user, args.refresh_user)
         command = CommandSetup(appstore)
         command.run(AppConfigx.key, AppConfigx.default_json_fields)
 
@@ -66,72 +108,443 @@ class Ghrepo:
     def _debug_if_verbose(cls, verbose: bool, data: object) -> None:
         """`verbose` が有効なときだけ整形済み JSON をデバッグ出力する。"""
         if verbose:
-            Loggerx.debug(json.dumps(data, ensure_ascii=False, indent=2), __name__)
+            # `AnnotatedRepos` 等の読み取り専用の対応は辞書に戻して出力する
+            Loggerx.debug(
+                json.dumps(data, ensure_ascii=False, indent=2, default=dict), __name__
+            )
+
+    @classmethod
+    def _request_daemon(
+        cls, args: argparse.Namespace, path: str, payload: dict[str, Any]
+    ) -> Any:
+        """`ghrepo serve` の常駐プロセスへ問い合わせる。`--no-daemon` / `--refresh-user` 指定時や常駐プロセス不在時は `None` を返す。
+
+        保存先ユーザー名は常駐プロセス側の `gh` ではなくこのプロセスで解決し、`store_user` として送る。
+        """
+        if getattr(args, "no_daemon", False) or getattr(args, "refresh_user", False):
+            return None
+        client = DaemonClient.from_env()
+        if client is None:
+            return None
+        store_user = Util.normalize_string(args.user)
+        if store_user is None:
+            store_user = cls.resolve_default_user()
+        with PhaseTimer.phase("daemon"):
+            return client.request(path, {**payload, "store_user": store_user})
+
+    @staticmethod
+    @contextmanager
+    def _open_output(output: str | None) -> Iterator[TextIO]:
+        """出力ファイルを開く。`None` または `-` なら標準出力を返し、閉じない。"""
+        if output is None or output == "-":
+            try:
+                yield sys.stdout
+                sys.stdout.flush()
+            except BrokenPipeError:
+                # 下流 (`head` 等) が先に閉じた場合は残りを捨てて終了する
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        with Path(output).open("w", encoding="utf-8") as output_file:
+            yield output_file
+
+    @classmethod
+    def _write_records(
+        cls,
+        args: argparse.Namespace,
+        items: Iterable[tuple[str, RepoItem]],
+        keyed: bool,
+        default_format: str = AppConfigx.OUTPUT_FORMAT_JSON,
+    ) -> None:
+        """`--format` / `--fields` に従い、レコードを 1 件ずつ `--output` へ書き出す。"""
+        from ghrepo.output_writer import get_record_writer
+
+        fields = (
+            [field.strip() for field in args.fields.split(",") if field.strip()]
+            if args.fields
+            else None
+        )
+        output_format = args.format or default_format
+        with PhaseTimer.phase("output") as phase, cls._open_output(args.output) as output_file:
+            writer = get_record_writer(output_format, output_file, fields, keyed)
+            for name, item in items:
+                writer.write(name, item)
+                phase.add(records=1)
+            writer.close()
+            if output_file is sys.stdout and output_format in (
+                AppConfigx.OUTPUT_FORMAT_JSON,
+                AppConfigx.OUTPUT_FORMAT_COMPACT,
+            ):
+                output_file.write("\n")
+            elif output_file is not sys.stdout:
+                phase.add(bytes_written=output_file.tell())
+
+    @classmethod
+    def _fetch_and_save_snapshot(
+        cls, args: argparse.Namespace, command: CommandList, appstore: AppStore
+    ) -> AnnotatedRepos:
+        """GitHub から一覧を取得し、新しいスナップショットとして保存した結果を返す。
+
+        `--incremental` 指定時は前回スナップショットからの差分だけを取得し、保存後に最高水位を更新する。
+        スナップショットIDは取得前に予約するため、同じユーザーの取得が重なっても ID は衝突しない。
+        所要時間と件数 (失敗時は成否だけ) を `metrics.json` に記録する。
+        """
+        started = time.perf_counter()
+        try:
+            with command.reserve_snapshot_id() as snapshot_id:
+                timestamp = datetime.now().astimezone().isoformat(timespec="seconds")
+                if not args.incremental:
+                    new_assoc = command.get_all_repos(args, appstore, snapshot_id)
+                    changed_count = command.save_snapshot(snapshot_id, timestamp, new_assoc)
+                else:
+                    new_assoc, watermark = command.get_incremental_repos(
+                        args, appstore, snapshot_id
+                    )
+                    changed_count = command.save_snapshot(snapshot_id, timestamp, new_assoc)
+                    command.save_watermark(
+                        command.get_target_user(args), watermark, snapshot_id
+                    )
+        except Exception:
+            command.record_fetch_metrics(time.perf_counter() - started, False)
+            raise
+        command.record_fetch_metrics(
+            time.perf_counter() - started, True, len(new_assoc), changed_count
+        )
+        return new_assoc
 
     @classmethod
     def list_repos(cls, args: argparse.Namespace) -> None:
-        """GitHub リポジトリ一覧を取得し、最新 DB とスナップショットを更新する。"""
+        """GitHub リポジトリ一覧を取得し、最新 DB とスナップショットを更新する。
+
+        `--users` / `--users-file` が指定された場合は複数オーナーを並行取得する。
+        """
         cls._set_log_level_by_verbose(args.verbose)
+        if args.incremental and args.limit is not None:
+            # 上限より後のリポジトリが削除扱いになるため
+            raise ValueError("--limit cannot be combined with --incremental")
+
+        owners = cls._collect_owners(args)
+        if owners:
+            conflicting = [
+                option
+                for name, option in cls.OWNERS_CONFLICTING_ARGS.items()
+                if getattr(args, name, None) is not None
+            ]
+            if conflicting:
+                raise ValueError(
+                    f"{' / '.join(conflicting)} cannot be combined with --users / --users-file"
+                )
+            cls._list_repos_for_owners(args, owners)
+            return
+        if args.output is None:
+            args.output = cls.LIST_OUTPUT_DEFAULT
+
+        if not (args.force or args.incremental):
+            daemon_assoc = cls._request_daemon(
+                args, DaemonClient.LIST_PATH, {"user": args.user}
+            )
+            if daemon_assoc is not None:
+                cls._debug_if_verbose(args.verbose, daemon_assoc)
+                cls._write_records(args, daemon_assoc.items(), keyed=True)
+                return
+
+        from ghrepo.command_list import CommandList
 
         normalized_user = Util.normalize_string(args.user)
-        appstore = cls.init_appstore(normalized_user)
+        appstore = cls.init_appstore(normalized_user, args.refresh_user)
         appstore.load_file_all()
         json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
         command = CommandList(appstore, json_fields, args.user)
-        should_fetch = args.force or not command.get_snapshots_path().exists()
+        should_fetch = (
+            args.force or args.incremental or not command.get_snapshots_path().exists()
+        )
 
         if should_fetch:
-            snapshot_id = command.get_next_snapshot_count()
-            new_assoc = command.get_all_repos(args, appstore, snapshot_id)
-            timestamp = datetime.now().astimezone().isoformat(timespec="seconds")
-            command.save_snapshot(snapshot_id, timestamp, new_assoc)
+            new_assoc = cls._fetch_and_save_snapshot(args, command, appstore)
 
             cls._debug_if_verbose(args.verbose, new_assoc)
-            Path(args.output).write_text(
-                json.dumps(new_assoc, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            cls._write_records(args, new_assoc.items(), keyed=True)
             return
 
         repos_file_path = command.get_repos_store().get_path()
         if not repos_file_path.exists():
             raise FileNotFoundError(f"リポジトリ一覧ファイルが存在しません: {repos_file_path}")
 
-        latest_assoc = command.load_latest_assoc()
-        cls._debug_if_verbose(args.verbose, latest_assoc)
-        Path(args.output).write_text(
-            json.dumps(latest_assoc, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        if args.verbose:
+            latest_assoc = command.load_latest_assoc()
+            cls._debug_if_verbose(args.verbose, latest_assoc)
+            cls._write_records(args, latest_assoc.items(), keyed=True)
+            return
+        cls._write_records(args, command.iter_latest_items(), keyed=True)
+
+    @staticmethod
+    def _collect_owners(args: argparse.Namespace) -> list[str]:
+        """`--users` と `--users-file` から対象オーナー名を重複なく順序どおりに集める。
+
+        `--users-file` は 1 行 1 オーナーとし、空行と `#` 以降は無視する。
+        """
+        owners: list[str] = []
+        users_value = getattr(args, "users", None)
+        if users_value:
+            owners += [owner.strip() for owner in users_value.split(",")]
+        users_file = getattr(args, "users_file", None)
+        if users_file:
+            for line in Path(users_file).read_text(encoding="utf-8").splitlines():
+                owners.append(line.split("#", 1)[0].strip())
+
+        return list(dict.fromkeys(owner for owner in owners if owner != ""))
+
+    @classmethod
+    def _prepare_owner(cls, owner: str) -> tuple[CommandList, AppStore]:
+        """1 オーナー分の `AppStore` を準備し、`CommandList` と組で返す。"""
+        from ghrepo.command_list import CommandList
+
+        appstore = cls.init_appstore(Util.normalize_string(owner))
+        appstore.load_file_all()
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        return CommandList(appstore, json_fields, owner), appstore
+
+    @staticmethod
+    def _fail_report(report: dict[str, Any], exc: Exception) -> None:
+        """結果レポートを失敗にし、理由を記録して警告を出す。"""
+        report["status"] = "error"
+        report["error"] = f"{type(exc).__name__}: {exc}"
+        Loggerx.warning(f"{report['user']}: {report['error']}", __name__)
+
+    @classmethod
+    def _list_one_owner(
+        cls,
+        args: argparse.Namespace,
+        owner: str,
+        prepared: tuple[CommandList, AppStore],
+    ) -> dict[str, Any]:
+        """準備済みの 1 オーナー分のスナップショットを取得・保存し、結果レポートを返す。例外は送出しない。"""
+        started = time.perf_counter()
+        report: dict[str, Any] = {"user": owner, "status": "ok"}
+        try:
+            owner_args = argparse.Namespace(**vars(args))
+            owner_args.user = owner
+            command, appstore = prepared
+            if (
+                args.force
+                or args.incremental
+                or not command.get_snapshots_path().exists()
+            ):
+                new_assoc = cls._fetch_and_save_snapshot(owner_args, command, appstore)
+                report["repos"] = len(new_assoc)
+            else:
+                report["status"] = "skipped"
+        except Exception as exc:  # 1 オーナーの失敗でバッチ全体を止めない
+            cls._fail_report(report, exc)
+        report["elapsed"] = round(time.perf_counter() - started, 3)
+        return report
+
+    @classmethod
+    def _list_repos_for_owners(cls, args: argparse.Namespace, owners: list[str]) -> None:
+        """複数オーナーのスナップショットを上限付きスレッドプールで並行取得する。
+
+        `init_appstore` はクラス変数を書き換えるため、各オーナーの `AppStore` はスレッドを
+        分ける前に直列で準備する。各オーナーの結果 (所要時間、件数、失敗理由) を JSON で
+        標準出力し、1 件でも失敗があれば全オーナーの処理後に終了コード 1 で終了する。
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        prepared: dict[str, tuple[CommandList, AppStore]] = {}
+        failed: dict[str, dict[str, Any]] = {}
+        for owner in owners:
+            started = time.perf_counter()
+            try:
+                prepared[owner] = cls._prepare_owner(owner)
+            except Exception as exc:  # 1 オーナーの失敗でバッチ全体を止めない
+                report: dict[str, Any] = {"user": owner}
+                cls._fail_report(report, exc)
+                report["elapsed"] = round(time.perf_counter() - started, 3)
+                failed[owner] = report
+
+        max_workers = max(1, min(args.jobs, len(prepared) or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            done = dict(
+                zip(
+                    prepared,
+                    executor.map(
+                        lambda owner: cls._list_one_owner(args, owner, prepared[owner]),
+                        prepared,
+                    ),
+                )
+            )
+        reports = [done[owner] if owner in done else failed[owner] for owner in owners]
+
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        if any(report["status"] == "error" for report in reports):
+            raise SystemExit(1)
 
     @classmethod
     def fix_repos(cls, args: argparse.Namespace) -> None:
-        """空ディレクトリ削除とスナップショット作成記録ファイルの整合性補正を実行する。`repos.yaml` は変更しない。"""
+        """空ディレクトリ削除とスナップショット作成記録ファイルの整合性補正を実行する。`repos.yaml` は変更しない。
+
+        `--dry-run` / `--validate` 指定時は結果を JSON で標準出力し、読み込めないスナップショットがあれば
+        終了コード 1 で終了する。`--dry-run` 以外では補正件数を `metrics.json` に記録する。
+        """
+        from ghrepo.command_list import CommandList
+
         cls._set_log_level_by_verbose(args.verbose)
 
         normalized_user = Util.normalize_string(args.user)
-        appstore = cls.init_appstore(normalized_user)
+        appstore = cls.init_appstore(normalized_user, args.refresh_user)
         appstore.load_file_all()
         json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
         command = CommandList(appstore, json_fields, args.user)
-        result = command.fix_storage(args.verbose)
+        result = command.fix_storage(
+            args.verbose, args.dry_run, args.validate, max(1, args.jobs)
+        )
+        if not args.dry_run:
+            command.record_fix_metrics(result)
         cls._debug_if_verbose(args.verbose, result)
+        if args.dry_run or args.validate:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        if result.get("invalid_snapshots"):
+            raise SystemExit(1)
 
     @classmethod
-    def search_repos(cls, args: argparse.Namespace) -> None:
-        """保存済みスナップショットから条件一致するリポジトリを検索する。"""
+    def convert_repos(cls, args: argparse.Namespace) -> None:
+        """保存済みスナップショットを指定ファイル種別へ変換する。新規保存の種別は設定の `SNAPSHOT_FORMAT` に従う。"""
+        from ghrepo.command_list import CommandList
+
+        cls._set_log_level_by_verbose(args.verbose)
+
+        normalized_user = Util.normalize_string(args.user)
+        appstore = cls.init_appstore(normalized_user, args.refresh_user)
+        appstore.load_file_all()
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        command = CommandList(appstore, json_fields, args.user)
+        result = command.convert_snapshots(args.format)
+        if command.get_snapshot_format() != args.format:
+            Loggerx.info(
+                f"新規スナップショットは {command.get_snapshot_format()} で保存されます。"
+                f"設定ファイルの {AppConfigx.SNAPSHOT_FORMAT_KEY} を {args.format} に変更してください",
+                __name__,
+            )
+        cls._debug_if_verbose(args.verbose, result)
+
+    @classmethod
+    def prune_repos(cls, args: argparse.Namespace) -> None:
+        """保持ポリシーに該当しないスナップショットをアーカイブへ移し、結果を JSON で標準出力する。"""
+        from ghrepo.command_list import CommandList
+
+        cls._set_log_level_by_verbose(args.verbose)
+
+        normalized_user = Util.normalize_string(args.user)
+        appstore = cls.init_appstore(normalized_user, args.refresh_user)
+        appstore.load_file_all()
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        command = CommandList(appstore, json_fields, args.user)
+        policy = command.get_retention_policy(
+            args.keep_last, args.keep_daily, args.keep_weekly
+        )
+        result = command.prune_snapshots(policy, args.dry_run)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    @classmethod
+    def diff_repos(cls, args: argparse.Namespace) -> None:
+        """2 つのスナップショット間の変更を JSON Lines で出力する。`--output` 省略時は標準出力へ書く。"""
+        from ghrepo.command_list import CommandList
+
         cls._set_log_level_by_verbose(args.verbose)
 
         normalized_user = Util.normalize_string(args.user)
-        appstore = cls.init_appstore(normalized_user)
+        appstore = cls.init_appstore(normalized_user, args.refresh_user)
         appstore.load_file_all()
-        command = CommandSearch(appstore, args.user)
-        _result = command.search_repos(args.search_name, args.name, args.user)
-        if args.all:
-            print(json.dumps(_result, ensure_ascii=False))
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        command = CommandList(appstore, json_fields, args.user)
+        changes = command.iter_snapshot_changes(args.from_id, args.to_id)
+
+        with cls._open_output(args.output) as output_file:
+            for change in changes:
+                output_file.write(json.dumps(change, ensure_ascii=False))
+                output_file.write("\n")
+
+    @classmethod
+    def search_repos(cls, args: argparse.Namespace) -> None:
+        """保存済みスナップショットから条件一致するリポジトリを検索する。
+
+        `--at` 指定時はその時点のスナップショットを、`--between` 指定時は期間中のいずれかの
+        スナップショットで条件に一致したリポジトリを対象にする (`--all` 指定時は名前ごとの可視性の区間を出力する)。
+        `ghrepo serve` が起動していればそちらへ問い合わせ、いなければプロセス内で検索する。
+        """
+        cls._set_log_level_by_verbose(args.verbose)
+        if args.between and (args.where or args.sort or args.limit is not None):
+            raise ValueError("--where / --sort / --limit cannot be combined with --between")
+        # `--fields` に名前以外があれば、`--all` が無くてもレコード本体を取り出す
+        with_records = args.all or bool(
+            args.fields and {field.strip() for field in args.fields.split(",")} - {"name", ""}
+        )
+
+        payload = {
+            "user": args.user,
+            "search_name": args.search_name,
+            "name": args.name,
+            "count": args.count,
+            "sort_by": args.sort_by,
+            "all": with_records,
+            "at": args.at,
+            "between": args.between,
+            "where": args.where,
+            "sort": args.sort,
+            "limit": args.limit,
+        }
+        _result = cls._request_daemon(args, DaemonClient.SEARCH_PATH, payload)
+        if _result is None:
+            from ghrepo.command_search import CommandSearch, SearchOptions
+
+            normalized_user = Util.normalize_string(args.user)
+            appstore = cls.init_appstore(normalized_user, args.refresh_user)
+            appstore.load_file_all()
+            command = CommandSearch(appstore, args.user)
+            if args.between:
+                intervals = command.search_between(
+                    args.search_name, args.between[0], args.between[1], args.name, args.user
+                )
+                _result = intervals if with_records else list(intervals)
+            elif with_records:
+                _result = command.search_repos(SearchOptions.from_payload(payload))
+            else:
+                _result = command.search_names(SearchOptions.from_payload(payload))
+        if args.format is None and args.fields is None and args.output is None:
+            print(json.dumps(_result, ensure_ascii=not args.all))
+            return
+
+        if isinstance(_result, dict):  # `--between` のレコードは名前ごとの区間
+            items = [
+                (name, {"name": name, "intervals": intervals})
+                for name, intervals in _result.items()
+            ]
+        elif with_records:
+            items = [(str(item.get("name")), item) for item in _result]
         else:
-            _names = [item["name"] for item in _result]
-            print(json.dumps(_names, ensure_ascii=True))
+            items = [(name, {"name": name}) for name in _result]
+        cls._write_records(args, items, False, AppConfigx.OUTPUT_FORMAT_COMPACT)
+
+    @classmethod
+    def write_metrics_textfile(cls, args: argparse.Namespace) -> None:
+        """全ユーザーのメトリクスを `--metrics-textfile` のファイルへ書き出す (textfile collector 向け)。"""
+        from ghrepo.command_list import CommandList
+        from ghrepo.metrics import MetricsExporter
+
+        appstore = cls.init_appstore(Util.normalize_string(args.user))
+        appstore.load_file_all()
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        command = CommandList(appstore, json_fields, args.user)
+        MetricsExporter(
+            command.get_user_dir().parent, command.get_snapshots_path().name
+        ).write_textfile(Path(args.metrics_textfile))
+
+    @classmethod
+    def serve(cls, args: argparse.Namespace) -> None:
+        """`search` / `list` に応答する常駐プロセスを起動する。"""
+        from ghrepo.server import GhrepoServer
+
+        cls._set_log_level_by_verbose(args.verbose)
+        socket_path = Path(args.socket) if args.socket is not None else None
+        GhrepoServer(cls.init_appstore, args.host, args.port, socket_path).serve_forever()
 
 
 def main() -> None:
@@ -140,18 +553,42 @@ def main() -> None:
         "setup": Ghrepo.setup,
         "list": Ghrepo.list_repos,
         "fix": Ghrepo.fix_repos,
+        "convert": Ghrepo.convert_repos,
+        "prune": Ghrepo.prune_repos,
+        "diff": Ghrepo.diff_repos,
         "search": Ghrepo.search_repos,
+        "serve": Ghrepo.serve,
     }
     clix = Clix("GitHub Repository list", command_dict)
 
     args = clix.parse_args()
-    cast(CommandHandler, args.func)(args)
+    handler = cast(CommandHandler, args.func)
+    timings = getattr(args, "timings", None)
+    profile = getattr(args, "profile", None)
+    trace_memory = getattr(args, "trace_memory", False)
+    try:
+        if timings is None and profile is None and not trace_memory:
+            handler(args)
+        else:
+            PhaseTimer.run(
+                handler.__name__, lambda: handler(args), timings, profile, trace_memory
+            )
+    finally:
+        # 失敗した取得も監視できるよう、例外で終わった場合も書き出す
+        if getattr(args, "metrics_textfile", None) is not None:
+            try:
+                Ghrepo.write_metrics_textfile(args)
+            except Exception as exc:  # 書き出しの失敗で元の例外を隠さない
+                Loggerx.error(f"failed to write metrics textfile: {exc!r}", __name__)
 
 
 def get_user() -> None:
     """現在の GitHub ユーザー名を正規化してログ出力する。"""
-    command = CommandGhUser()
-    user = command.run()
+    from yklibpy.command.command_gh_user import CommandGhUser
+
+    from ghrepo.gh_user_cache import GhUserCache
+
+    user = GhUserCache().get_user()
     normalized_user = Util.normalize_string(user)
     if Util.is_empty(normalized_user):
         normalized_user = CommandGhUser.DEFAULT_VALUE_USER
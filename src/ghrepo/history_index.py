@@ -0,0 +1,174 @@
+import json
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from ghrepo.atomic_file import write_text_atomically
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_store import SnapshotStore
+
+type Interval = list[Any]  # [開始スナップショットID, 終了スナップショットID, 可視性]
+
+
+class HistoryIndex:
+    """全スナップショットにわたるリポジトリごとの可視性の区間索引 (`snapshots/history.json`)。
+
+    リポジトリごとに「連続するスナップショットで可視性が同じ区間」を `[開始ID, 終了ID, 可視性]` の
+    列として保持し、期間を指定した検索 (期間中に一度でも private だったもの等) を
+    スナップショットを読み直さずに答える。各スナップショットは検索用インデックス (`SearchIndex`) から
+    名前・可視性・オーナーだけを読む。
+
+    スナップショットごとのフィンガープリントを記録し、既存分が変わらずに新しいスナップショットが
+    後ろに増えただけなら、その分だけを追加で反映する。それ以外の変化があれば作り直す。
+    """
+
+    INDEX_FILE_NAME: ClassVar[str] = "history.json"
+    VERSION: ClassVar[int] = 1  # 形式を変えたら上げる。異なる版の索引は作り直す
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        """読み込み済み、または `update` で組み立てた索引内容を保持する。"""
+        self.data: dict[str, Any] = data
+        self.repos: dict[str, dict[str, Any]] = cast(
+            dict[str, dict[str, Any]], data["repos"]
+        )
+
+    @classmethod
+    def empty(cls) -> "HistoryIndex":
+        """スナップショットを 1 つも反映していない索引を返す。"""
+        return cls(
+            {"version": cls.VERSION, "snapshot-ids": [], "sources": {}, "repos": {}}
+        )
+
+    @property
+    def snapshot_ids(self) -> list[int]:
+        """反映済みのスナップショットIDを昇順で返す。"""
+        return cast(list[int], self.data["snapshot-ids"])
+
+    @classmethod
+    def get_index_path(cls, snapshot_store: SnapshotStore) -> Path:
+        """索引ファイルのパスを返す。"""
+        return snapshot_store.snapshots_dir / cls.INDEX_FILE_NAME
+
+    @classmethod
+    def load(cls, snapshot_store: SnapshotStore) -> "HistoryIndex | None":
+        """保存済みの索引を読み込む。無い、壊れている、または版が異なる場合は `None` を返す。"""
+        index_path = cls.get_index_path(snapshot_store)
+        if not index_path.exists():
+            return None
+        try:
+            data = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION:
+            return None
+        return cls(data)
+
+    def save(self, path: Path) -> None:
+        """索引を一時ファイル経由で書き出す。"""
+        write_text_atomically(
+            path, json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+        )
+
+    def add_snapshot(self, snapshot_id: int, index: SearchIndex) -> None:
+        """1 つのスナップショットを反映する。`snapshot_id` は反映済みのどの ID よりも大きいこと。"""
+        previous_id = self.snapshot_ids[-1] if self.snapshot_ids else None
+        visibility_of: dict[int, str] = {}
+        for visibility, positions in cast(
+            dict[str, list[int]], index.data["visibility"]
+        ).items():
+            for position in positions:
+                visibility_of[position] = visibility
+        owners_of: dict[int, list[str]] = {}
+        for owner, positions in cast(
+            dict[str, list[int]], index.data["owners"]
+        ).items():
+            for position in positions:
+                owners_of.setdefault(position, []).append(owner)
+
+        for position, name in enumerate(index.names):
+            visibility = visibility_of.get(position, "")
+            entry = self.repos.setdefault(name, {"owners": [], "intervals": []})
+            entry["owners"] = sorted(
+                set(entry["owners"]) | set(owners_of.get(position, []))
+            )
+            intervals = cast(list[Interval], entry["intervals"])
+            if (
+                intervals
+                and intervals[-1][1] == previous_id
+                and intervals[-1][2] == visibility
+            ):
+                intervals[-1][1] = snapshot_id
+            else:
+                intervals.append([snapshot_id, snapshot_id, visibility])
+        self.snapshot_ids.append(snapshot_id)
+
+    @classmethod
+    def update(cls, snapshot_store: SnapshotStore) -> "HistoryIndex":
+        """全スナップショットを反映した索引を返す。変化があった場合だけ保存し直す。
+
+        Raises:
+            FileNotFoundError: スナップショットが 1 件も無い場合。
+        """
+        snapshot_ids = [
+            snapshot_id
+            for snapshot_id in snapshot_store.collect_all_snapshot_ids()
+            if snapshot_store.exists(snapshot_id)
+        ]
+        if not snapshot_ids:
+            raise FileNotFoundError(
+                f"スナップショットトップディレクトリ配下にスナップショットが存在しません: {snapshot_store.snapshots_dir}"
+            )
+        sources = {
+            str(snapshot_id): snapshot_store.get_fingerprint(snapshot_id)
+            for snapshot_id in snapshot_ids
+        }
+
+        history = cls.load(snapshot_store)
+        if history is not None:
+            known = history.snapshot_ids
+            stored_sources = cast(dict[str, Any], history.data["sources"])
+            if known != snapshot_ids[: len(known)] or any(
+                stored_sources.get(str(snapshot_id)) != sources[str(snapshot_id)]
+                for snapshot_id in known
+            ):
+                history = None
+        if history is None:
+            history = cls.empty()
+        elif len(history.snapshot_ids) == len(snapshot_ids):
+            return history
+
+        for snapshot_id in snapshot_ids[len(history.snapshot_ids) :]:
+            history.add_snapshot(
+                snapshot_id, SearchIndex.load_or_rebuild(snapshot_store, snapshot_id)
+            )
+        history.data["sources"] = sources
+        history.save(cls.get_index_path(snapshot_store))
+        return history
+
+    def select(
+        self,
+        visibilities: list[str],
+        start_id: int,
+        end_id: int,
+        name_pattern: str | None = None,
+        github_user: str | None = None,
+    ) -> dict[str, list[Interval]]:
+        """`start_id` から `end_id` までのいずれかのスナップショットで `visibilities` のどれかだった
+        リポジトリについて、期間に重なる区間を名前順に返す。
+        """
+        wanted = {visibility.lower() for visibility in visibilities}
+        owner = github_user.lower().strip() if github_user else None
+        selected: dict[str, list[Interval]] = {}
+        for name in sorted(self.repos):
+            if name_pattern and name_pattern not in name:
+                continue
+            entry = self.repos[name]
+            if owner is not None and owner not in entry["owners"]:
+                continue
+            intervals = [
+                interval
+                for interval in cast(list[Interval], entry["intervals"])
+                if interval[0] <= end_id and interval[1] >= start_id
+            ]
+            if any(interval[2] in wanted for interval in intervals):
+                selected[name] = intervals
+        return selected
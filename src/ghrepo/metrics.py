@@ -0,0 +1,184 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+import yaml
+
+from ghrepo.atomic_file import write_text_atomically
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_registry import SnapshotRegistry
+
+
+class RunMetrics:
+    """直近の取得 (`list`) と補正 (`fix`) の結果を記録するファイル (`metrics.json`)。
+
+    `{"fetch": {...}, "fix": {...}}` の形で、種類ごとに前回の値へ今回の値を上書きする。
+    取得に失敗したときは成否と所要時間だけを書き、件数は最後に成功したときの値を残す。
+    """
+
+    FILE_NAME: ClassVar[str] = "metrics.json"
+    VERSION: ClassVar[int] = 1
+
+    def __init__(self, user_dir: Path) -> None:
+        """対象ユーザーの保存ルートディレクトリを保持する。"""
+        self.path: Path = user_dir / self.FILE_NAME
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        """記録を読み込む。無い、壊れている、または版が異なれば空辞書を返す。"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        return {
+            str(kind): cast(dict[str, Any], values)
+            for kind, values in data.items()
+            if isinstance(values, dict)
+        }
+
+    def record(self, kind: str, values: dict[str, Any]) -> None:
+        """`kind` の記録に `values` と現在時刻 (`timestamp`) を上書きする。
+
+        呼び出し側はユーザー単位のロックを保持していること。
+        """
+        data: dict[str, Any] = dict(self.load())
+        data[kind] = {**data.get(kind, {}), **values, "timestamp": round(time.time(), 3)}
+        data["version"] = self.VERSION
+        write_text_atomically(self.path, json.dumps(data, ensure_ascii=False, sort_keys=True))
+
+
+class MetricsExporter:
+    """全ユーザーのスナップショットの状態と直近の取得・補正の結果を Prometheus のテキスト形式で出力する。
+
+    保存ルート (各ユーザーディレクトリの親) の下で `snapshots.yaml` のあるディレクトリをユーザーとし、
+    台帳 (`registry.json`)、`snapshots.yaml`、`metrics.json` を読むだけで値を求める。
+    スナップショット本体は読まないため、cron からの textfile collector 向け出力
+    (`--metrics-textfile`) と `ghrepo serve` の `/metrics` のどちらでも軽く動く。
+    値はすべて `user` ラベル付きの gauge で、値の分からないものは出力しない。
+    """
+
+    CONTENT_TYPE: ClassVar[str] = "text/plain; version=0.0.4; charset=utf-8"
+    # メトリクス名 -> HELP 文字列 (出力順)
+    METRICS: ClassVar[dict[str, str]] = {
+        "ghrepo_fetch_success": "Whether the last fetch succeeded (1) or failed (0).",
+        "ghrepo_fetch_duration_seconds": "Wall time of the last fetch including saving the snapshot.",
+        "ghrepo_fetch_timestamp_seconds": "Unix time of the last fetch attempt.",
+        "ghrepo_fetch_last_success_timestamp_seconds": "Unix time of the last successful fetch.",
+        "ghrepo_fetch_repos": "Repositories returned by the last successful fetch.",
+        "ghrepo_merge_changed_records": "Records added or updated in the latest list by the last successful fetch.",
+        "ghrepo_snapshots": "Committed snapshots, including archived ones.",
+        "ghrepo_latest_snapshot_id": "ID of the latest committed snapshot.",
+        "ghrepo_latest_snapshot_records": "Repositories in the latest committed snapshot.",
+        "ghrepo_latest_snapshot_bytes": "Size of the latest committed snapshot body in bytes.",
+        "ghrepo_latest_snapshot_age_seconds": "Seconds since the latest committed snapshot was taken.",
+        "ghrepo_fix_repairs": "Repairs made by the last fix run.",
+        "ghrepo_fix_invalid_snapshots": "Unreadable snapshots found by the last fix --validate run.",
+        "ghrepo_fix_timestamp_seconds": "Unix time of the last fix run.",
+        "ghrepo_fix_validate_timestamp_seconds": "Unix time of the last fix --validate run.",
+    }
+
+    def __init__(self, root_dir: Path, snapshots_file_name: str) -> None:
+        """保存ルートディレクトリと、ユーザーの判定に使う `snapshots.yaml` のファイル名を保持する。"""
+        self.root_dir: Path = root_dir
+        self.snapshots_file_name: str = snapshots_file_name
+
+    def collect_user_dirs(self) -> list[Path]:
+        """ユーザーディレクトリを名前順で返す。"""
+        if not self.root_dir.is_dir():
+            return []
+        return sorted(
+            path
+            for path in self.root_dir.iterdir()
+            if path.is_dir() and (path / self.snapshots_file_name).exists()
+        )
+
+    def _get_latest_timestamp(self, user_dir: Path, snapshot_id: int | None) -> float | None:
+        """`snapshots.yaml` から最新スナップショット (`snapshot_id`) の作成日時を Unix 時刻で返す。"""
+        try:
+            with (user_dir / self.snapshots_file_name).open(encoding="utf-8") as snapshots_file:
+                loaded_value = yaml.safe_load(snapshots_file)
+        except (OSError, yaml.YAMLError):
+            return None
+        if not isinstance(loaded_value, dict) or not loaded_value:
+            return None
+        snapshot_ids = [int(key) for key in loaded_value if str(key).isdigit()]
+        if snapshot_id is None or snapshot_id not in snapshot_ids:
+            snapshot_id = max(snapshot_ids, default=None)
+        if snapshot_id is None:
+            return None
+        value = loaded_value.get(snapshot_id, loaded_value.get(str(snapshot_id)))
+        parsed = SearchIndex.parse_timestamp(value)
+        return None if parsed is None else parsed.timestamp()
+
+    def collect(self, user_dir: Path, now: float) -> dict[str, float]:
+        """1 ユーザー分のメトリクスの値を返す。"""
+        values: dict[str, float] = {}
+        run_metrics = RunMetrics(user_dir).load()
+        fetch = run_metrics.get("fetch", {})
+        fix = run_metrics.get("fix", {})
+        for name, source, key in (
+            ("ghrepo_fetch_success", fetch, "success"),
+            ("ghrepo_fetch_duration_seconds", fetch, "duration_seconds"),
+            ("ghrepo_fetch_timestamp_seconds", fetch, "timestamp"),
+            ("ghrepo_fetch_last_success_timestamp_seconds", fetch, "success_timestamp"),
+            ("ghrepo_fetch_repos", fetch, "repos"),
+            ("ghrepo_merge_changed_records", fetch, "changed_records"),
+            ("ghrepo_fix_repairs", fix, "repairs"),
+            ("ghrepo_fix_invalid_snapshots", fix, "invalid_snapshots"),
+            ("ghrepo_fix_timestamp_seconds", fix, "timestamp"),
+            ("ghrepo_fix_validate_timestamp_seconds", fix, "validate_timestamp"),
+        ):
+            value = source.get(key)
+            if isinstance(value, (int, float)):
+                values[name] = float(value)
+
+        registry = SnapshotRegistry(user_dir)
+        snapshot_ids = registry.collect_snapshot_ids()
+        latest_id = registry.get_latest_id()
+        if snapshot_ids is not None:
+            values["ghrepo_snapshots"] = float(len(snapshot_ids))
+        if latest_id is not None:
+            values["ghrepo_latest_snapshot_id"] = float(latest_id)
+            entry = registry.get_entry(latest_id) or {}
+            for name, key in (
+                ("ghrepo_latest_snapshot_records", "records"),
+                ("ghrepo_latest_snapshot_bytes", "bytes"),
+            ):
+                if isinstance(entry.get(key), int):
+                    values[name] = float(entry[key])
+        latest_timestamp = self._get_latest_timestamp(user_dir, latest_id)
+        if latest_timestamp is not None:
+            values["ghrepo_latest_snapshot_age_seconds"] = max(0.0, now - latest_timestamp)
+        return values
+
+    @staticmethod
+    def _escape_label(value: str) -> str:
+        """ラベル値の `\\`、`"`、改行をエスケープする。"""
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        """サンプル値を文字列にする。整数値は小数点を付けない。"""
+        return str(int(value)) if value.is_integer() else repr(round(value, 3))
+
+    def render(self, now: float | None = None) -> str:
+        """全ユーザーのメトリクスを Prometheus のテキスト形式 (0.0.4) で返す。"""
+        if now is None:
+            now = time.time()
+        collected = {
+            user_dir.name: self.collect(user_dir, now) for user_dir in self.collect_user_dirs()
+        }
+        lines: list[str] = []
+        for name, help_text in self.METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for user, values in collected.items():
+                if name in values:
+                    lines.append(f'{name}{{user="{self._escape_label(user)}"}} {self._format_value(values[name])}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path) -> None:
+        """node_exporter の textfile collector 向けに、一時ファイル経由でメトリクスを書き出す。"""
+        write_text_atomically(path, self.render())
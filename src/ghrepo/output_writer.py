@@ -0,0 +1,183 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from typing import Any, ClassVar, TextIO
+
+from ghrepo.appconfigx import AppConfigx
+
+type RepoItem = dict[str, Any]
+
+
+class RecordWriter(ABC):
+    """`list` / `search` の結果を 1 レコードずつ出力先へ書き出す基底クラス。
+
+    全件を 1 つの文字列に組み立てないため、出力のピークメモリがレコード 1 件分で済み、
+    最初のレコードからすぐに下流へ流れる。`fields` を指定するとそのフィールドだけを書き出す
+    (`owner.login` のようなドット区切りで入れ子の値も取り出せる)。
+    """
+
+    output_format: ClassVar[str] = ""
+
+    def __init__(
+        self, output: TextIO, fields: list[str] | None = None, keyed: bool = False
+    ) -> None:
+        """出力先と出力フィールドを保持する。
+
+        Args:
+            output: 書き込み先のテキストストリーム。閉じるのは呼び出し側。
+            fields: 出力するフィールド名の一覧。`None` なら全フィールド。
+            keyed: JSON 形式でリポジトリ名をキーとするオブジェクトにするか (`list` の出力)。
+        """
+        self.output: TextIO = output
+        self.fields: list[str] | None = fields
+        self.keyed: bool = keyed
+        self.count: int = 0
+
+    @staticmethod
+    def get_value(item: RepoItem, field: str) -> Any:
+        """ドット区切りのフィールド名で値を取り出す。無ければ `None` を返す。"""
+        value: Any = item
+        for key in field.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def project(self, item: RepoItem) -> RepoItem:
+        """`fields` 指定時はそのフィールドだけの辞書を返す。"""
+        if self.fields is None:
+            return item
+        return {field: self.get_value(item, field) for field in self.fields}
+
+    def write(self, name: str, item: RepoItem) -> None:
+        """1 件を書き出す。"""
+        self.write_record(name, self.project(item))
+        self.count += 1
+
+    @abstractmethod
+    def write_record(self, name: str, item: RepoItem) -> None:
+        """射影済みの 1 件を書き出す。"""
+
+    def close(self) -> None:
+        """末尾 (JSON の閉じ括弧等) を書き出す。出力先は閉じない。"""
+
+
+class JsonWriter(RecordWriter):
+    """`json.dumps(..., indent=2)` と同じ内容の字下げ付き JSON をレコード単位で書き出す。"""
+
+    output_format: ClassVar[str] = AppConfigx.OUTPUT_FORMAT_JSON
+    INDENT: ClassVar[int | None] = 2
+
+    def _dumps(self, value: object) -> str:
+        if self.INDENT is None:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        return json.dumps(value, ensure_ascii=False, indent=self.INDENT)
+
+    def write_record(self, name: str, item: RepoItem) -> None:
+        opening = "{" if self.keyed else "["
+        if self.INDENT is None:
+            self.output.write(opening if self.count == 0 else ",")
+            prefix = f"{self._dumps(name)}:" if self.keyed else ""
+            self.output.write(prefix + self._dumps(item))
+            return
+
+        margin = " " * self.INDENT
+        self.output.write(f"{opening}\n" if self.count == 0 else ",\n")
+        prefix = f"{margin}{self._dumps(name)}: " if self.keyed else margin
+        self.output.write(prefix + self._dumps(item).replace("\n", f"\n{margin}"))
+
+    def close(self) -> None:
+        closing = "}" if self.keyed else "]"
+        if self.count == 0:
+            self.output.write(("{" if self.keyed else "[") + closing)
+        elif self.INDENT is None:
+            self.output.write(closing)
+        else:
+            self.output.write(f"\n{closing}")
+
+
+class CompactJsonWriter(JsonWriter):
+    """字下げ・区切りの空白を入れない JSON。"""
+
+    output_format: ClassVar[str] = AppConfigx.OUTPUT_FORMAT_COMPACT
+    INDENT: ClassVar[int | None] = None
+
+
+class JsonLinesWriter(RecordWriter):
+    """1 行 1 レコードの JSON Lines。リポジトリ名はレコードの `name` で表す。"""
+
+    output_format: ClassVar[str] = AppConfigx.OUTPUT_FORMAT_JSONL
+
+    def write_record(self, name: str, item: RepoItem) -> None:
+        self.output.write(json.dumps(item, ensure_ascii=False))
+        self.output.write("\n")
+
+
+class CsvWriter(RecordWriter):
+    """ヘッダ付き CSV。列は `fields`、未指定なら最初のレコードのフィールド順。
+
+    列に無いフィールドは書き出さない。辞書・配列の値は JSON 文字列、`None` は空欄にする。
+    """
+
+    output_format: ClassVar[str] = AppConfigx.OUTPUT_FORMAT_CSV
+    DELIMITER: ClassVar[str] = ","
+
+    def __init__(
+        self, output: TextIO, fields: list[str] | None = None, keyed: bool = False
+    ) -> None:
+        super().__init__(output, fields, keyed)
+        self._writer: Any = csv.writer(
+            output, delimiter=self.DELIMITER, lineterminator="\n"
+        )
+        self._columns: list[str] | None = fields
+
+    @staticmethod
+    def _format_cell(value: object) -> object:
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def write_record(self, name: str, item: RepoItem) -> None:
+        if self._columns is None:
+            self._columns = list(item)
+        if self.count == 0:
+            self._writer.writerow(self._columns)
+        self._writer.writerow(
+            [self._format_cell(item.get(column)) for column in self._columns]
+        )
+
+    def close(self) -> None:
+        if self.count == 0 and self._columns is not None:
+            self._writer.writerow(self._columns)
+
+
+class TsvWriter(CsvWriter):
+    """タブ区切り。"""
+
+    output_format: ClassVar[str] = AppConfigx.OUTPUT_FORMAT_TSV
+    DELIMITER: ClassVar[str] = "\t"
+
+
+RECORD_WRITERS: dict[str, type[RecordWriter]] = {
+    writer.output_format: writer
+    for writer in (JsonWriter, CompactJsonWriter, JsonLinesWriter, CsvWriter, TsvWriter)
+}
+
+
+def get_record_writer(
+    output_format: str,
+    output: TextIO,
+    fields: list[str] | None = None,
+    keyed: bool = False,
+) -> RecordWriter:
+    """出力形式に対応する `RecordWriter` を返す。
+
+    Raises:
+        ValueError: 未知の出力形式の場合。
+    """
+    writer = RECORD_WRITERS.get(output_format)
+    if writer is None:
+        raise ValueError(f"unsupported output format: {output_format}")
+    return writer(output, fields, keyed)
@@ -0,0 +1,190 @@
+import json
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ClassVar
+
+
+class Phase:
+    """1 つのフェーズの累計 (呼び出し回数、経過時間、CPU 時間、件数、読み書きバイト数)。"""
+
+    def __init__(self, name: str) -> None:
+        """フェーズ名を保持し、累計を 0 にする。"""
+        self.name: str = name
+        self.calls: int = 0
+        self.wall: float = 0.0
+        self.cpu: float = 0.0
+        self.records: int = 0
+        self.bytes_read: int = 0
+        self.bytes_written: int = 0
+
+    def add(self, records: int = 0, bytes_read: int = 0, bytes_written: int = 0) -> None:
+        """処理したレコード数と読み書きしたバイト数を加える。"""
+        self.records += records
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON 出力用の辞書を返す。時間はミリ秒で丸める。"""
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "records": self.records,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+class PhaseTimer:
+    """`--timings` 用に、処理のフェーズごとの経過時間・CPU 時間・件数・バイト数を集計する。
+
+    計測箇所は `with PhaseTimer.phase("gh") as phase: ... phase.add(records=...)` と書く。
+    計測中のタイマー (`start` で開始) が無ければ何も記録せず、ほぼコストはかからない。
+    同じ名前のフェーズは回数を重ねて合算する。フェーズは入れ子にでき、外側の時間は内側を含む。
+    CPU 時間はスレッド単位 (`time.thread_time`) で測るため、並行取得 (`--users`) でも
+    各スレッドの分だけを数える。
+
+    `--profile` は `cProfile` の統計を、`--trace-memory` は `tracemalloc` のピークと
+    割り当ての多い箇所を添える。どちらも必要になるまで import しない。
+    """
+
+    TOP_ALLOCATIONS: ClassVar[int] = 10  # `--trace-memory` で出力する割り当て箇所の数
+    _active: ClassVar["PhaseTimer | None"] = None
+
+    def __init__(self, command: str) -> None:
+        """計測対象のサブコマンド名を保持する。"""
+        self.command: str = command
+        self.phases: dict[str, Phase] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._started: float = 0.0
+        self._cpu_started: float = 0.0
+
+    @classmethod
+    def start(cls, command: str) -> "PhaseTimer":
+        """タイマーを作って計測中にする。"""
+        timer = cls(command)
+        timer._started = time.perf_counter()
+        timer._cpu_started = time.process_time()
+        cls._active = timer
+        return timer
+
+    @classmethod
+    def stop(cls) -> None:
+        """計測を終える。以後の `phase` は何も記録しない。"""
+        cls._active = None
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str) -> Iterator[Phase]:
+        """フェーズの経過時間と CPU 時間を計測する。計測中でなければ記録しない `Phase` を返す。"""
+        timer = cls._active
+        if timer is None:
+            yield Phase(name)
+            return
+
+        with timer._lock:
+            phase = timer.phases.get(name)
+            if phase is None:
+                phase = timer.phases[name] = Phase(name)
+        local = Phase(name)
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield local
+        finally:
+            wall = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+            with timer._lock:
+                phase.calls += 1
+                phase.wall += wall
+                phase.cpu += cpu
+                phase.add(local.records, local.bytes_read, local.bytes_written)
+
+    def to_dict(self) -> dict[str, Any]:
+        """全体とフェーズごとの集計を JSON 出力用の辞書で返す。"""
+        return {
+            "command": self.command,
+            "wall_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "cpu_ms": round((time.process_time() - self._cpu_started) * 1000, 3),
+            "phases": [phase.to_dict() for phase in self.phases.values()],
+        }
+
+    @classmethod
+    def run(
+        cls,
+        command: str,
+        handler: Callable[[], None],
+        timings: str | None = None,
+        profile: str | None = None,
+        trace_memory: bool = False,
+    ) -> None:
+        """`handler` を計測しながら実行し、終了後 (例外時も) に結果を書き出す。
+
+        Args:
+            command: サブコマンド名。
+            handler: 実行する処理。
+            timings: 集計の出力先。`-` なら標準エラー出力。`None` なら `trace_memory` のときだけ標準エラー出力に書く。
+            profile: `cProfile` の統計 (`pstats` 形式) の出力先。
+            trace_memory: `tracemalloc` でメモリ割り当てを追跡し、集計に含める。
+        """
+        profiler = None
+        if profile is not None:
+            import cProfile
+
+            profiler = cProfile.Profile()
+        if trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+        timer = cls.start(command)
+        try:
+            if profiler is not None:
+                profiler.runcall(handler)
+            else:
+                handler()
+        finally:
+            cls.stop()
+            report = timer.to_dict()
+            if profiler is not None and profile is not None:
+                profiler.dump_stats(profile)
+                report["profile"] = profile
+            if trace_memory:
+                report["memory"] = cls._collect_memory()
+            if timings is not None or trace_memory:
+                cls._write_report(report, timings)
+
+    @classmethod
+    def _collect_memory(cls) -> dict[str, Any]:
+        """`tracemalloc` のピークと、割り当ての多い箇所を返して追跡を終える。"""
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        tracemalloc.stop()
+        return {
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in statistics[: cls.TOP_ALLOCATIONS]
+            ],
+        }
+
+    @staticmethod
+    def _write_report(report: dict[str, Any], timings: str | None) -> None:
+        """集計を JSON で書き出す。出力先が無指定か `-` なら標準エラー出力に書く。"""
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if timings is None or timings == "-":
+            print(text, file=sys.stderr)
+            return
+        Path(timings).write_text(text + "\n", encoding="utf-8")
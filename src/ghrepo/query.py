@@ -0,0 +1,427 @@
+import fnmatch
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from datetime import UTC
+from typing import Any, ClassVar
+
+from ghrepo.search_index import SearchIndex
+
+type RepoItem = dict[str, Any]
+type Predicate = Callable[[RepoItem], bool]
+type SortKey = tuple[str, bool]  # (フィールド名, 降順かどうか)
+
+
+class _Literal:
+    """比較式の右辺。種類 (`number` / `string` / `null` / `bool`) と比較用の値を持つ。
+
+    数値と日時はどちらも `number` とし、日時はエポック秒にしておく。
+    """
+
+    DATE_PATTERN: ClassVar[re.Pattern[str]] = re.compile(
+        r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+(Z|[+-]\d{2}:?\d{2})?)?$"
+    )
+    NUMBER_PATTERN: ClassVar[re.Pattern[str]] = re.compile(
+        r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+    )
+
+    def __init__(self, kind: str, value: Any) -> None:
+        self.kind: str = kind
+        self.value: Any = value
+
+    @classmethod
+    def parse(cls, text: str, quoted: bool) -> "_Literal":
+        """字句を値に変換する。引用符で囲まれた字句は常に文字列とする。"""
+        if quoted:
+            return cls("string", text)
+        lowered = text.lower()
+        if lowered == "null":
+            return cls("null", None)
+        if lowered in ("true", "false"):
+            return cls("bool", lowered == "true")
+        if cls.NUMBER_PATTERN.match(text):
+            return cls("number", float(text))
+        if cls.DATE_PATTERN.match(text):
+            parsed = SearchIndex.parse_timestamp(text.replace(" ", "T"))
+            if parsed is not None:
+                # タイムゾーンの無い日時は GitHub の値と同じく UTC とみなす
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=UTC)
+                return cls("number", parsed.timestamp())
+        return cls("string", text)
+
+
+class _Node(ABC):
+    """式の構文木の節。`compile` で 1 度だけ述語関数へ変換する。"""
+
+    @abstractmethod
+    def fields(self) -> set[str]:
+        """参照するフィールド名を返す。"""
+
+    @abstractmethod
+    def is_index_safe(self, index_fields: set[str]) -> bool:
+        """検索用インデックスの行 (`SearchIndex.get_rows`) だけで評価しても結果が変わらないか判定する。"""
+
+    @abstractmethod
+    def compile(self) -> Predicate:
+        """レコードを受け取って真偽を返す関数に変換する。"""
+
+
+class _Compare(_Node):
+    """`フィールド 演算子 値` の比較。"""
+
+    ORDER_OPS: ClassVar[dict[str, Callable[[Any, Any], bool]]] = {
+        "==": lambda left, right: left == right,
+        "!=": lambda left, right: left != right,
+        ">": lambda left, right: left > right,
+        ">=": lambda left, right: left >= right,
+        "<": lambda left, right: left < right,
+        "<=": lambda left, right: left <= right,
+    }
+
+    def __init__(self, field: str, op: str, literal: _Literal) -> None:
+        self.field: str = field
+        self.op: str = op
+        self.literal: _Literal = literal
+
+    def fields(self) -> set[str]:
+        return {self.field}
+
+    def is_index_safe(self, index_fields: set[str]) -> bool:
+        if self.field not in index_fields:
+            return False
+        if self.field in ("name", "visibility"):
+            # インデックスの可視性は小文字。正規表現・glob は名前だけをそのまま比べられる
+            return self.field == "name" or self.op not in ("~", "!~", "like")
+        # 並べ替え用フィールドはインデックスでは数値 (日時はエポック秒) なので、数値との比較だけ。
+        # 日時として解釈できない値もインデックスでは null になるため、null との比較はレコードで行う
+        return self.literal.kind == "number" and self.op in self.ORDER_OPS
+
+    @staticmethod
+    def get_value(item: RepoItem, path: list[str]) -> Any:
+        """`owner.login` のようなドット区切りのパスで値を取り出す。無ければ `None` を返す。"""
+        value: Any = item
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def compile(self) -> Predicate:
+        path = self.field.split(".")
+        get_value = self.get_value
+        op = self.op
+        kind = self.literal.kind
+        expected = self.literal.value
+
+        if op in ("~", "!~"):
+            pattern = re.compile(str(expected))
+            negate = op == "!~"
+            return lambda item: (
+                (
+                    isinstance(value := get_value(item, path), str)
+                    and pattern.search(value) is not None
+                )
+                != negate
+            )
+        if op == "like":
+            glob = re.compile(fnmatch.translate(str(expected).casefold()))
+            return lambda item: (
+                isinstance(value := get_value(item, path), str)
+                and glob.match(value.casefold()) is not None
+            )
+
+        compare = self.ORDER_OPS[op]
+        if kind == "null":
+            if op not in ("==", "!="):
+                raise ValueError(
+                    f"invalid query: null only supports == and !=: {self.field}{op}null"
+                )
+            return lambda item: (get_value(item, path) is None) == (op == "==")
+        if kind == "bool":
+            return lambda item: (
+                isinstance(value := get_value(item, path), bool)
+                and compare(value, expected)
+            )
+        if kind == "number":
+            get_sort_key = SearchIndex.get_sort_key
+            return lambda item: (
+                (value := get_sort_key(get_value(item, path))) is not None
+                and compare(value, expected)
+            )
+        expected_text = str(expected).casefold()
+        return lambda item: (
+            isinstance(value := get_value(item, path), str)
+            and compare(value.casefold(), expected_text)
+        )
+
+
+class _Not(_Node):
+    def __init__(self, operand: _Node) -> None:
+        self.operand: _Node = operand
+
+    def fields(self) -> set[str]:
+        return self.operand.fields()
+
+    def is_index_safe(self, index_fields: set[str]) -> bool:
+        return self.operand.is_index_safe(index_fields)
+
+    def compile(self) -> Predicate:
+        operand = self.operand.compile()
+        return lambda item: not operand(item)
+
+
+class _Bool(_Node):
+    """`and` / `or` で結んだ複数の式。短絡評価する。"""
+
+    def __init__(self, op: str, operands: list[_Node]) -> None:
+        self.op: str = op
+        self.operands: list[_Node] = operands
+
+    def fields(self) -> set[str]:
+        return set().union(*(operand.fields() for operand in self.operands))
+
+    def is_index_safe(self, index_fields: set[str]) -> bool:
+        return all(operand.is_index_safe(index_fields) for operand in self.operands)
+
+    def compile(self) -> Predicate:
+        predicates = [operand.compile() for operand in self.operands]
+        if self.op == "and":
+            return lambda item: all(predicate(item) for predicate in predicates)
+        return lambda item: any(predicate(item) for predicate in predicates)
+
+
+class Query:
+    """`search --where` の式を構文解析し、1 回の走査で評価できる述語関数にする。
+
+    式は `フィールド 演算子 値` の比較を `and` / `or` / `not` (`&&` / `||` / `!`) と括弧で組み合わせる。
+    演算子は `==` (`=`) / `!=` / `>` / `>=` / `<` / `<=`、正規表現の `~` / `!~`、glob の `like`。
+    値は数値 (`1e5` 等)、日時 (`2024-01-01` 等。タイムゾーンが無ければ UTC)、`null`、`true` / `false`、
+    文字列 (引用符で囲むと常に文字列) で、文字列の比較は大文字小文字を区別しない。
+
+    最上位の `and` で結ばれた項のうち検索用インデックスの行だけで評価できるものは `split` で切り出し、
+    スナップショット本体を読む前に候補を絞るのに使う。
+    """
+
+    TOKEN_PATTERN: ClassVar[re.Pattern[str]] = re.compile(
+        r"""\s*(?:
+            (?P<paren>[()])
+            |(?P<op>==|!=|>=|<=|!~|&&|\|\||[=<>~!])
+            |'(?P<single>(?:[^'\\]|\\.)*)'
+            |"(?P<double>(?:[^"\\]|\\.)*)"
+            |(?P<word>[^\s()=<>~!&|'"]+)
+        )""",
+        re.VERBOSE,
+    )
+    KEYWORDS: ClassVar[dict[str, str]] = {
+        "and": "and",
+        "&&": "and",
+        "or": "or",
+        "||": "or",
+        "not": "not",
+        "!": "not",
+    }
+
+    def __init__(self, text: str, node: _Node) -> None:
+        """元の式と構文木を保持し、述語関数を 1 度だけ作る。"""
+        self.text: str = text
+        self.node: _Node = node
+        self.predicate: Predicate = node.compile()
+
+    @classmethod
+    def _tokenize(cls, text: str) -> list[tuple[str, str]]:
+        """式を `(種類, 字句)` の列に分ける。種類は `paren` / `op` / `string` / `word`。"""
+        tokens: list[tuple[str, str]] = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = cls.TOKEN_PATTERN.match(text, position)
+            if match is None or match.end() == position:
+                raise ValueError(
+                    f"invalid query: unexpected character at {position}: {text!r}"
+                )
+            position = match.end()
+            kind = match.lastgroup or ""
+            value = match.group(kind)
+            if kind in ("single", "double"):
+                tokens.append(("string", re.sub(r"\\(.)", r"\1", value)))
+            else:
+                tokens.append((kind, value))
+        return tokens
+
+    @classmethod
+    def parse(cls, text: str) -> "Query":
+        """式を解析する。
+
+        Raises:
+            ValueError: 式の構文が不正な場合。
+        """
+        tokens = cls._tokenize(text)
+        position = 0
+
+        def peek() -> tuple[str, str] | None:
+            return tokens[position] if position < len(tokens) else None
+
+        def take() -> tuple[str, str]:
+            nonlocal position
+            token = peek()
+            if token is None:
+                raise ValueError(f"invalid query: unexpected end: {text!r}")
+            position += 1
+            return token
+
+        def keyword(token: tuple[str, str] | None) -> str | None:
+            if token is None or token[0] not in ("op", "word"):
+                return None
+            return cls.KEYWORDS.get(
+                token[1].lower() if token[0] == "word" else token[1]
+            )
+
+        def parse_bool(op: str, parse_operand: Callable[[], _Node]) -> _Node:
+            operands = [parse_operand()]
+            while keyword(peek()) == op:
+                take()
+                operands.append(parse_operand())
+            return operands[0] if len(operands) == 1 else _Bool(op, operands)
+
+        def parse_or() -> _Node:
+            return parse_bool("or", parse_and)
+
+        def parse_and() -> _Node:
+            return parse_bool("and", parse_not)
+
+        def parse_not() -> _Node:
+            if keyword(peek()) == "not":
+                take()
+                return _Not(parse_not())
+            return parse_primary()
+
+        def parse_primary() -> _Node:
+            token = take()
+            if token == ("paren", "("):
+                node = parse_or()
+                if take() != ("paren", ")"):
+                    raise ValueError(f"invalid query: ')' expected: {text!r}")
+                return node
+            if token[0] != "word":
+                raise ValueError(
+                    f"invalid query: field name expected, got {token[1]!r}: {text!r}"
+                )
+            field = token[1]
+            op_token = take()
+            if op_token[0] == "op" and op_token[1] in _Compare.ORDER_OPS.keys() | {
+                "=",
+                "~",
+                "!~",
+            }:
+                op = "==" if op_token[1] == "=" else op_token[1]
+            elif op_token[0] == "word" and op_token[1].lower() == "like":
+                op = "like"
+            else:
+                raise ValueError(
+                    f"invalid query: operator expected after {field!r}: {text!r}"
+                )
+            value_token = take()
+            if value_token[0] not in ("word", "string"):
+                raise ValueError(
+                    f"invalid query: value expected after {field}{op}: {text!r}"
+                )
+            if op not in ("~", "!~", "like"):
+                return _Compare(
+                    field,
+                    op,
+                    _Literal.parse(value_token[1], value_token[0] == "string"),
+                )
+            if op != "like":
+                try:
+                    re.compile(value_token[1])
+                except re.error as exc:
+                    raise ValueError(
+                        f"invalid query: bad regular expression {value_token[1]!r}: {exc}"
+                    ) from exc
+            return _Compare(field, op, _Literal("string", value_token[1]))
+
+        node = parse_or()
+        if position != len(tokens):
+            raise ValueError(
+                f"invalid query: unexpected {tokens[position][1]!r}: {text!r}"
+            )
+        return cls(text, node)
+
+    def fields(self) -> set[str]:
+        """式が参照するフィールド名を返す。"""
+        return self.node.fields()
+
+    def split(
+        self, index_fields: set[str]
+    ) -> tuple[Predicate | None, Predicate | None]:
+        """最上位の `and` の項を、インデックスの行で評価できるものと、レコード本体が必要なものに分ける。
+
+        Returns:
+            インデックス側の述語と残りの述語。該当する項が無い側は `None`。
+        """
+        operands = (
+            self.node.operands
+            if isinstance(self.node, _Bool) and self.node.op == "and"
+            else [self.node]
+        )
+        index_operands = [
+            operand for operand in operands if operand.is_index_safe(index_fields)
+        ]
+        rest_operands = [
+            operand for operand in operands if not operand.is_index_safe(index_fields)
+        ]
+
+        def combine(nodes: list[_Node]) -> Predicate | None:
+            if not nodes:
+                return None
+            return (nodes[0] if len(nodes) == 1 else _Bool("and", nodes)).compile()
+
+        return combine(index_operands), combine(rest_operands)
+
+    @staticmethod
+    def parse_sort(text: str) -> list[SortKey]:
+        """`--sort` の値 (カンマ区切り、先頭 `-` で降順) を解析する。
+
+        Raises:
+            ValueError: フィールド名が空の場合。
+        """
+        keys: list[SortKey] = []
+        for part in text.split(","):
+            part = part.strip()
+            descending = part.startswith("-")
+            field = part.lstrip("+-").strip()
+            if field == "":
+                raise ValueError(f"invalid sort: {text!r}")
+            keys.append((field, descending))
+        return keys
+
+    @staticmethod
+    def get_sort_value(value: Any) -> tuple[int, Any] | None:
+        """並べ替え用の値を返す。数値と日時は数値どうし、その他の文字列は大文字小文字を区別せずに比べる。"""
+        number = SearchIndex.get_sort_key(value)
+        if number is not None:
+            return (0, number)
+        if isinstance(value, str):
+            return (1, value.casefold())
+        if isinstance(value, bool):
+            return (0, float(value))
+        return None
+
+    @classmethod
+    def sort_items(cls, items: list[RepoItem], keys: list[SortKey]) -> list[RepoItem]:
+        """レコードを `keys` の順に並べる。値の無いものは末尾、同値は元の順序を保つ。"""
+        for field, descending in reversed(keys):
+            path = field.split(".")
+            values = [
+                cls.get_sort_value(_Compare.get_value(item, path)) for item in items
+            ]
+            present = [
+                (index, value) for index, value in enumerate(values) if value is not None
+            ]
+            present.sort(key=lambda pair: pair[1], reverse=descending)
+            missing = [index for index, value in enumerate(values) if value is None]
+            items = [items[index] for index, _ in present] + [
+                items[index] for index in missing
+            ]
+        return items
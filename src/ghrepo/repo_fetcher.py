@@ -0,0 +1,346 @@
+import json
+import os
+import subprocess
+from collections.abc import Callable, Iterator
+from typing import Any, ClassVar, cast
+
+from ghrepo.phase_timer import PhaseTimer
+
+type RepoItem = dict[str, Any]
+type CommandRunner = Callable[[list[str]], str]
+
+
+class RepoFetcher:
+    """GitHub GraphQL API をカーソルでページ送りしながらリポジトリ一覧を取得する。
+
+    `gh api graphql` を 1 ページごとに実行し、検証と `visibility` 正規化 (と管理用フィールドの付与) を
+    1 回の走査で済ませたページを到着順に呼び出し側へ渡す。不正なレコードはページから除いて
+    取得を続け、最後にすべてをまとめて `ValueError` で報告する。
+    `gh` の実体は環境変数 `GHREPO_GH` で差し替えられる。
+    """
+
+    GH_COMMAND_ENV: ClassVar[str] = "GHREPO_GH"  # `gh` 実行ファイルを差し替える環境変数名
+    DEFAULT_PAGE_SIZE: ClassVar[int] = 100  # GraphQL `first` の上限値
+    DEFAULT_NAME_BATCH_SIZE: ClassVar[int] = 50  # 名前指定取得で 1 クエリにまとめる件数
+    ALLOWED_VISIBILITY: ClassVar[frozenset[str]] = frozenset(
+        {"public", "internal", "private"}
+    )
+
+    # `gh repo list --json` と同じ形の値を得るための GraphQL 選択式。
+    # ここにも `UNSUPPORTED_FIELDS` にも無いフィールドはスカラー値としてそのまま要求する。
+    FIELD_SELECTIONS: ClassVar[dict[str, str]] = {
+        "owner": "owner { id login }",
+        "parent": "parent { id name owner { id login } }",
+        # `gh` と同じく未解決 (OPEN) のものだけを数える
+        "pullRequests": "pullRequests(states: OPEN) { totalCount }",
+        "issues": "issues(states: OPEN) { totalCount }",
+        "stargazers": "stargazers { totalCount }",
+        "watchers": "watchers { totalCount }",
+        "primaryLanguage": "primaryLanguage { name }",
+        "licenseInfo": "licenseInfo { key name nickname }",
+        "defaultBranchRef": "defaultBranchRef { name }",
+        "codeOfConduct": "codeOfConduct { key name url }",
+        "latestRelease": "latestRelease { name tagName url publishedAt }",
+        "templateRepository": "templateRepository { id name owner { id login } }",
+    }
+    # `gh` が一覧を独自に平坦化するオブジェクト型のフィールド。GraphQL で同じ形に取れないため受け付けない
+    UNSUPPORTED_FIELDS: ClassVar[frozenset[str]] = frozenset(
+        {
+            "assignableUsers",
+            "contactLinks",
+            "fundingLinks",
+            "issueTemplates",
+            "labels",
+            "languages",
+            "mentionableUsers",
+            "milestones",
+            "projects",
+            "projectsV2",
+            "pullRequestTemplates",
+            "repositoryTopics",
+        }
+    )
+
+    def __init__(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        runner: CommandRunner | None = None,
+    ) -> None:
+        """ページサイズと `gh` 実行関数を保持する。
+
+        Args:
+            page_size: 1 回の GraphQL 呼び出しで要求する件数。1 から 100 に丸める。
+            runner: 引数リストを受け取り標準出力を返す関数。省略時は `gh` を直接起動する。
+        """
+        self.page_size: int = max(1, min(page_size, self.DEFAULT_PAGE_SIZE))
+        self.runner: CommandRunner = runner if runner is not None else self._run_gh
+
+    @classmethod
+    def get_gh_command(cls) -> str:
+        """実行する `gh` コマンドのパスを返す。"""
+        return os.environ.get(cls.GH_COMMAND_ENV) or "gh"
+
+    @staticmethod
+    def _run_gh(command_args: list[str]) -> str:
+        """`gh` を起動し、標準出力を返す。終了コードが 0 以外なら `RuntimeError` を送出する。"""
+        completed = subprocess.run(
+            command_args, capture_output=True, text=True, encoding="utf-8", check=False
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(
+                f"gh api graphql failed ({completed.returncode}): {completed.stderr.strip()}"
+            )
+        return completed.stdout
+
+    @classmethod
+    def build_selections(cls, fields: list[str]) -> str:
+        """取得フィールド名を GraphQL の選択式へ展開する。
+
+        Raises:
+            ValueError: `UNSUPPORTED_FIELDS` のフィールドを含む場合。
+        """
+        unsupported = [field for field in fields if field in cls.UNSUPPORTED_FIELDS]
+        if unsupported:
+            raise ValueError(
+                f"fields not supported by the GraphQL fetch: {', '.join(unsupported)}"
+            )
+        return " ".join(cls.FIELD_SELECTIONS.get(field, field) for field in fields)
+
+    @classmethod
+    def build_query(cls, fields: list[str], owner: str, order_by: str = "PUSHED_AT") -> str:
+        """取得フィールドと対象オーナーから GraphQL クエリ文字列を組み立てる。
+
+        `owner` が空文字の場合は認証ユーザー (`viewer`) のリポジトリを対象にする。
+        `order_by` には `RepositoryOrderField` の値 (`PUSHED_AT` / `UPDATED_AT` 等) を指定する。
+        """
+        selections = cls.build_selections(fields)
+        connection = (
+            "repositories(first: $first, after: $after, ownerAffiliations: OWNER, "
+            f"orderBy: {{field: {order_by}, direction: DESC}}) "
+            f"{{ nodes {{ {selections} }} pageInfo {{ hasNextPage endCursor }} }}"
+        )
+        if owner == "":
+            return (
+                "query($first: Int!, $after: String) "
+                f"{{ viewer {{ {connection} }} }}"
+            )
+        return (
+            "query($owner: String!, $first: Int!, $after: String) "
+            f"{{ repositoryOwner(login: $owner) {{ {connection} }} }}"
+        )
+
+    def build_command(
+        self, query: str, owner: str, first: int, after: str | None
+    ) -> list[str]:
+        """1 ページ分の `gh api graphql` 引数リストを返す。"""
+        command_args = [self.get_gh_command(), "api", "graphql", "-f", f"query={query}"]
+        # `-F` は数字だけの値を Int として送るため、文字列の変数は `-f` で渡す
+        if owner != "":
+            command_args += ["-f", f"owner={owner}"]
+        command_args += ["-F", f"first={first}"]
+        if after is not None:
+            command_args += ["-f", f"after={after}"]
+        return command_args
+
+    @staticmethod
+    def _extract_connection(payload: object, owner: str) -> dict[str, Any]:
+        """GraphQL 応答から `repositories` コネクション部分を取り出す。"""
+        if not isinstance(payload, dict):
+            raise ValueError("gh api graphql must return a JSON object")
+        errors = payload.get("errors")
+        if errors:
+            raise ValueError(f"gh api graphql returned errors: {errors!r}")
+
+        data = payload.get("data")
+        root_key = "viewer" if owner == "" else "repositoryOwner"
+        root = data.get(root_key) if isinstance(data, dict) else None
+        if not isinstance(root, dict):
+            raise ValueError(f"GitHub owner not found: {owner!r}")
+        connection = root.get("repositories")
+        if not isinstance(connection, dict) or not isinstance(
+            connection.get("nodes"), list
+        ):
+            raise ValueError("gh api graphql output must include repositories.nodes")
+        return cast(dict[str, Any], connection)
+
+    @classmethod
+    def normalize_item(cls, item: object) -> RepoItem:
+        """1 件のリポジトリを検証し、`visibility` を小文字へ正規化して返す。
+
+        Raises:
+            ValueError: `name` / `visibility` が欠けている、または `visibility` が不正な場合。
+        """
+        errors: list[str] = []
+        page = cls.normalize_page([item], errors)
+        if errors:
+            raise ValueError(f"gh repo list output {errors[0]}")
+        return page[0]
+
+    @classmethod
+    def normalize_page(
+        cls,
+        nodes: list[object],
+        errors: list[str],
+        offset: int = 0,
+    ) -> list[RepoItem]:
+        """1 ページ分のリポジトリを 1 回の走査で検証・正規化して返す。
+
+        Args:
+            nodes: GraphQL 応答のリポジトリ。
+            errors: 不正なレコードの説明を追加するリスト。不正なレコードは戻り値に含めない。
+            offset: エラー表示に使う、このページの先頭レコードの通し番号。
+        """
+        allowed = cls.ALLOWED_VISIBILITY
+        page: list[RepoItem] = []
+        append = page.append
+        for index, item in enumerate(nodes, offset):
+            if not isinstance(item, dict) or "name" not in item or "visibility" not in item:
+                errors.append(f"#{index}: must include repository names and visibility")
+                continue
+            visibility_value = item["visibility"]
+            normalized = (
+                visibility_value.lower() if isinstance(visibility_value, str) else None
+            )
+            if normalized not in allowed:
+                errors.append(
+                    f"#{index} ({item['name']!r}): has invalid visibility value: "
+                    f"{visibility_value!r}"
+                )
+                continue
+            # GitHub は PUBLIC 等の大文字で返す。保存は public/internal/private に統一する。
+            item["visibility"] = normalized
+            append(cast(RepoItem, item))
+        return page
+
+    @staticmethod
+    def raise_if_invalid(errors: list[str]) -> None:
+        """不正なレコードがあれば、すべてをまとめた `ValueError` を送出する。"""
+        if errors:
+            raise ValueError(
+                f"gh repo list output has {len(errors)} invalid repositories:\n"
+                + "\n".join(errors)
+            )
+
+    def _run_query(self, command_args: list[str]) -> object:
+        """`gh api graphql` を実行し、応答 JSON を返す。"""
+        with PhaseTimer.phase("gh") as phase:
+            output = self.runner(command_args)
+            phase.add(bytes_read=len(output))
+        with PhaseTimer.phase("json_parse"):
+            try:
+                return json.loads(output)
+            except json.JSONDecodeError as exc:
+                raise ValueError("gh api graphql returned invalid JSON output") from exc
+
+    def iter_pages(
+        self,
+        owner: str,
+        fields: list[str],
+        limit: int | None = None,
+        order_by: str = "PUSHED_AT",
+    ) -> Iterator[list[RepoItem]]:
+        """検証済みのリポジトリをページ単位で順に返す。
+
+        Args:
+            owner: 対象ユーザーまたは組織。空文字なら認証ユーザー。
+            fields: 取得するフィールド名。`gh repo list --json` と同じ名前を使う。
+            limit: 取得件数の上限。`None` なら全件をたどる。
+            order_by: 並び順に使う `RepositoryOrderField` の値 (降順)。
+
+        Raises:
+            ValueError: 応答が JSON でない、想定した構造でない、または不正なレコードがある場合
+                (不正なレコードは全ページを返し終えてからまとめて報告する)。
+        """
+        errors: list[str] = []
+        yield from self._iter_pages(owner, fields, limit, order_by, errors)
+        self.raise_if_invalid(errors)
+
+    def _iter_pages(
+        self,
+        owner: str,
+        fields: list[str],
+        limit: int | None,
+        order_by: str,
+        errors: list[str],
+    ) -> Iterator[list[RepoItem]]:
+        """`iter_pages` の本体。不正なレコードは `errors` に追加する。"""
+        query = self.build_query(fields, owner, order_by)
+        offset = 0
+        remaining = limit
+        after: str | None = None
+        while remaining is None or remaining > 0:
+            first = self.page_size if remaining is None else min(self.page_size, remaining)
+            payload = self._run_query(self.build_command(query, owner, first, after))
+            connection = self._extract_connection(payload, owner)
+            nodes = cast(list[object], connection["nodes"])
+            if remaining is not None:
+                nodes = nodes[:remaining]
+                remaining -= len(nodes)
+            with PhaseTimer.phase("validate") as phase:
+                page = self.normalize_page(nodes, errors, offset)
+                phase.add(records=len(nodes))
+            offset += len(nodes)
+            if page:
+                yield page
+
+            page_info = connection.get("pageInfo")
+            if not isinstance(page_info, dict) or not page_info.get("hasNextPage"):
+                return
+            end_cursor = page_info.get("endCursor")
+            if not isinstance(end_cursor, str) or end_cursor == after:
+                return
+            after = end_cursor
+
+    def iter_repositories_by_name(
+        self,
+        names_with_owner: list[str],
+        fields: list[str],
+    ) -> Iterator[list[RepoItem]]:
+        """`owner/name` 形式で指定したリポジトリだけを、別名付きクエリでまとめて取得する。
+
+        存在しなくなったリポジトリは結果に含めない。
+
+        Raises:
+            ValueError: 応答が JSON でない、GraphQL エラーを含む、または項目が不正な場合
+                (不正な項目は全件を返し終えてからまとめて報告する)。
+        """
+        errors: list[str] = []
+        selections = self.build_selections(fields)
+        batch_size = self.DEFAULT_NAME_BATCH_SIZE
+        for start in range(0, len(names_with_owner), batch_size):
+            aliases: list[str] = []
+            for index, name_with_owner in enumerate(
+                names_with_owner[start : start + batch_size]
+            ):
+                owner, _, name = name_with_owner.partition("/")
+                # GraphQL の文字列リテラルは JSON と同じエスケープ規則で書ける
+                aliases.append(
+                    f"r{index}: repository(owner: {json.dumps(owner)}, "
+                    f"name: {json.dumps(name)}) {{ {selections} }}"
+                )
+            query = "query { " + " ".join(aliases) + " }"
+            payload = self._run_query(
+                [self.get_gh_command(), "api", "graphql", "-f", f"query={query}"]
+            )
+            if not isinstance(payload, dict) or not isinstance(payload.get("data"), dict):
+                raise ValueError("gh api graphql must return a JSON object with data")
+            # 存在しないリポジトリは NOT_FOUND エラーと null で返るため、それ以外のみ失敗とする
+            graphql_errors = [
+                error
+                for error in cast(list[Any], payload.get("errors") or [])
+                if not isinstance(error, dict) or error.get("type") != "NOT_FOUND"
+            ]
+            if graphql_errors:
+                raise ValueError(f"gh api graphql returned errors: {graphql_errors!r}")
+            data = cast(dict[str, Any], payload["data"])
+            nodes = [
+                node
+                for node in (data.get(f"r{index}") for index in range(len(aliases)))
+                if node is not None
+            ]
+            with PhaseTimer.phase("validate") as phase:
+                page = self.normalize_page(nodes, errors, start)
+                phase.add(records=len(nodes))
+            if page:
+                yield page
+        self.raise_if_invalid(errors)
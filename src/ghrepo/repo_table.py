@@ -0,0 +1,94 @@
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import islice
+from typing import Any, ClassVar, cast
+
+type RepoItem = dict[str, Any]
+
+
+class RepoTable(Mapping[str, RepoItem]):
+    """リポジトリ名 -> レコードの読み取り専用の対応を、辞書より少ないメモリで保持する。
+
+    常駐プロセスのキャッシュのように、全件を長く保持する場所で `RepoAssoc` の代わりに使う。
+    レコードは `(キーのタプル, 値1, 値2, ...)` のタプルとして持つ。キーのタプル (レイアウト) は
+    同じ形のレコードで共有し、入れ子の辞書 (`owner` / `parent` など) とリストも同じ形に凍結して、
+    同じ内容のものを 1 つにまとめる。`INTERNED_FIELDS` の文字列値も表の中で 1 つにまとめる。
+    読み込んだデータにタプルは現れないため、凍結した値と区別できる (リストは先頭を `None` にする)。
+
+    `table[name]` や `items()` は呼ぶたびに新しい辞書を組み立てて返すため、辞書を受け取る
+    既存の処理はそのまま使え、返した辞書を変更しても表には影響しない。
+    """
+
+    INTERNED_FIELDS: ClassVar[frozenset[str]] = frozenset(
+        {"visibility", "owner", "snapshot-id"}
+    )  # 同じ値が繰り返し現れる最上位のフィールド (文字列・整数の値だけを共有する)
+
+    def __init__(self, items: Iterable[tuple[str, RepoItem]] = ()) -> None:
+        """`(リポジトリ名, レコード)` を順に取り込む。"""
+        self._rows: dict[str, tuple[Any, ...]] = {}
+        self._shared: dict[Any, Any] = {}
+        for name, item in items:
+            self.add(name, item)
+
+    def _share(self, value: Any) -> Any:
+        """同じ値が既にあればそれを返し、無ければ登録して返す。"""
+        return self._shared.setdefault(value, value)
+
+    def _is_shareable(self, value: Any) -> bool:
+        """共有してよい要素か判定する。`True == 1 == 1.0` で型が入れ替わらないよう、`bool` / `float` を含むものは共有しない。"""
+        kind = type(value)
+        if kind is tuple:
+            return self._shared.get(value) is value
+        return kind is str or kind is int or value is None
+
+    def _freeze(self, value: Any) -> Any:
+        """入れ子の辞書・リストをタプルへ凍結し、同じ内容のものを共有する。"""
+        if isinstance(value, dict):
+            frozen: tuple[Any, ...] = (
+                self._share(tuple(value)),
+                *map(self._freeze, value.values()),
+            )
+        elif isinstance(value, list):
+            frozen = (None, *map(self._freeze, value))
+        else:
+            return value
+        if all(map(self._is_shareable, islice(frozen, 1, None))):
+            return self._share(frozen)
+        return frozen
+
+    @classmethod
+    def _thaw(cls, value: Any) -> Any:
+        """凍結した値を辞書・リストへ戻す。"""
+        if type(value) is not tuple:
+            return value
+        layout = value[0]
+        if layout is None:
+            return [cls._thaw(element) for element in islice(value, 1, None)]
+        return {key: cls._thaw(element) for key, element in zip(layout, islice(value, 1, None))}
+
+    def add(self, name: str, item: RepoItem) -> None:
+        """レコードを取り込む。同じ名前があれば置き換える。`item` は変更しない。"""
+        interned = self.INTERNED_FIELDS
+        values = [
+            self._share(value)
+            if key in interned and (type(value) is str or type(value) is int)
+            else self._freeze(value)
+            for key, value in item.items()
+        ]
+        self._rows[name] = (self._share(tuple(item)), *values)
+
+    def __getitem__(self, name: str) -> RepoItem:
+        return cast(RepoItem, self._thaw(self._rows[name]))
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def to_dict(self) -> dict[str, RepoItem]:
+        """全レコードを辞書に戻して返す (JSON への書き出し用)。"""
+        thaw = self._thaw
+        return {name: thaw(row) for name, row in self._rows.items()}
@@ -0,0 +1,166 @@
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping
+from contextlib import closing
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+import yaml
+from yklibpy.db.storex import Storex
+
+from ghrepo.atomic_file import replace_atomically
+from ghrepo.repo_table import RepoTable
+from ghrepo.snapshot_store import SnapshotStore
+
+type RepoItem = dict[str, Any]
+type RepoAssoc = dict[str, RepoItem]
+
+
+class ReposStore(ABC):
+    """最新のリポジトリ一覧 (リポジトリ名 -> レコード) を保存する場所を表す基底クラス。
+
+    `merge` は内容 (`snapshot-id` を除く) が変わったレコードだけを書き込み、変更が無ければ
+    ファイルに触れない。内容が変わらなかったレコードは前回の `snapshot-id` をそのまま保持する。
+    """
+
+    @abstractmethod
+    def get_path(self) -> Path:
+        """保存先ファイルのパスを返す。"""
+
+    def exists(self) -> bool:
+        """保存先ファイルが存在するか判定する。"""
+        return self.get_path().exists()
+
+    @abstractmethod
+    def load_all(self) -> RepoAssoc:
+        """全レコードをリポジトリ名をキーとする辞書として返す。"""
+
+    def iter_items(self) -> Iterator[tuple[str, RepoItem]]:
+        """全レコードを `(リポジトリ名, レコード)` で順に返す。"""
+        yield from self.load_all().items()
+
+    def get(self, name: str) -> RepoItem | None:
+        """1 件のレコードを返す。存在しなければ `None` を返す。"""
+        return self.load_all().get(name)
+
+    def load_table(self) -> RepoTable:
+        """全レコードを `RepoTable` に取り込んで返す。全件を長く保持する場所向け。"""
+        return RepoTable(self.iter_items())
+
+    @abstractmethod
+    def merge(self, new_assoc: Mapping[str, RepoItem]) -> int:
+        """新しいレコードをマージし、追加・更新した件数を返す。"""
+
+
+class YamlReposStore(ReposStore):
+    """`repos.yaml` に全レコードを書き出す既定の保存先。"""
+
+    def __init__(self, storex: Storex) -> None:
+        """`repos.yaml` に対応する `Storex` を保持する。"""
+        self.storex: Storex = storex
+
+    def get_path(self) -> Path:
+        return self.storex.get_path()
+
+    def load_all(self) -> RepoAssoc:
+        loaded_value = self.storex.load()
+        if not isinstance(loaded_value, dict):
+            return {}
+        return cast(RepoAssoc, loaded_value)
+
+    def merge(self, new_assoc: Mapping[str, RepoItem]) -> int:
+        """変更があった場合だけ `repos.yaml` 全体を一時ファイル経由で書き直す。"""
+        repos_assoc = self.load_all()
+        changed_count = 0
+        for name, item in new_assoc.items():
+            current = repos_assoc.get(name)
+            if current is None or SnapshotStore.hash_record(
+                current
+            ) != SnapshotStore.hash_record(item):
+                repos_assoc[name] = item
+                changed_count += 1
+
+        if changed_count > 0:
+            replace_atomically(
+                self.get_path(),
+                lambda temp_path: temp_path.write_text(
+                    yaml.safe_dump(repos_assoc, allow_unicode=True), encoding="utf-8"
+                ),
+            )
+        return changed_count
+
+
+class SqliteReposStore(ReposStore):
+    """SQLite (`repos.sqlite3`) にリポジトリ名をキーとして 1 行 1 レコードで保存する。
+
+    各行にレコードの内容ハッシュを持たせ、マージ時は名前とハッシュだけを読んで差分を求める。
+    1 件の参照は主キー検索で済むため、全件を読み込まない。
+    """
+
+    FILE_NAME: ClassVar[str] = "repos.sqlite3"
+
+    def __init__(self, path: Path) -> None:
+        """データベースファイルのパスを保持する。"""
+        self.path: Path = path
+
+    def get_path(self) -> Path:
+        return self.path
+
+    def _connect(self) -> sqlite3.Connection:
+        """テーブルを用意した接続を返す。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS repos ("
+            "name TEXT PRIMARY KEY, hash TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        return connection
+
+    def load_all(self) -> RepoAssoc:
+        if not self.exists():
+            return {}
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT name, data FROM repos ORDER BY name")
+            return {
+                str(name): cast(RepoItem, json.loads(data)) for name, data in rows
+            }
+
+    def iter_items(self) -> Iterator[tuple[str, RepoItem]]:
+        """カーソルから 1 行ずつ読み出し、全件を保持しない。"""
+        if not self.exists():
+            return
+        with closing(self._connect()) as connection:
+            for name, data in connection.execute(
+                "SELECT name, data FROM repos ORDER BY name"
+            ):
+                yield str(name), cast(RepoItem, json.loads(data))
+
+    def get(self, name: str) -> RepoItem | None:
+        if not self.exists():
+            return None
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT data FROM repos WHERE name = ?", (name,)
+            ).fetchone()
+        return cast(RepoItem, json.loads(row[0])) if row is not None else None
+
+    def merge(self, new_assoc: Mapping[str, RepoItem]) -> int:
+        """変更のあった行だけを書き込む。変更が無ければトランザクションを開始しない。"""
+        with closing(self._connect()) as connection:
+            current_hashes = dict(connection.execute("SELECT name, hash FROM repos"))
+            changed_rows: list[tuple[str, str, str]] = []
+            for name, item in new_assoc.items():
+                record_hash = SnapshotStore.hash_record(item)
+                if current_hashes.get(name) != record_hash:
+                    changed_rows.append(
+                        (name, record_hash, json.dumps(item, ensure_ascii=False))
+                    )
+            if changed_rows:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO repos (name, hash, data) VALUES (?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET hash = excluded.hash, data = excluded.data",
+                        changed_rows,
+                    )
+        return len(changed_rows)
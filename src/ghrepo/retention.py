@@ -0,0 +1,128 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any, ClassVar
+
+
+class RetentionPolicy:
+    """どのスナップショットを `snapshots/` に残すかを決める保持ポリシー。
+
+    次のいずれかに該当するスナップショットを残し、それ以外を `prune` のアーカイブ対象にする。
+    期間は現在時刻ではなく最新スナップショットの作成日時から数えるため、取得が止まっていても
+    直近の履歴が一度に消えることはない。
+
+    - `keep_last`: 新しい方から N 件。
+    - `keep_daily`: 直近 N 日の各日で最も新しいもの。
+    - `keep_weekly`: 直近 N 週 (ISO 週) の各週で最も新しいもの。`-1` で無期限。
+
+    最新のスナップショットと、作成日時の分からないスナップショットは常に残す。
+    """
+
+    FOREVER: ClassVar[int] = -1  # 期間の上限を設けない
+
+    def __init__(self, keep_last: int, keep_daily: int, keep_weekly: int) -> None:
+        """各ポリシーの件数・期間を保持する。`0` はそのポリシーを使わない。
+
+        Raises:
+            ValueError: 負の値 (`keep_daily` / `keep_weekly` の `-1` を除く) が指定された場合。
+        """
+        if keep_last < 0:
+            raise ValueError(f"keep-last must be 0 or more: {keep_last}")
+        for name, value in (("keep-daily", keep_daily), ("keep-weekly", keep_weekly)):
+            if value < self.FOREVER:
+                raise ValueError(f"{name} must be -1 (forever) or more: {value}")
+        self.keep_last: int = keep_last
+        self.keep_daily: int = keep_daily
+        self.keep_weekly: int = keep_weekly
+
+    @staticmethod
+    def _coerce(value: Any, default: int) -> int:
+        """設定値を整数へそろえる。未設定なら `default` を返す。
+
+        Raises:
+            ValueError: 整数に解釈できない場合。
+        """
+        if value is None or value == "":
+            return default
+        if isinstance(value, bool):
+            raise ValueError(f"retention value must be an integer: {value}")
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"retention value must be an integer: {value}") from None
+
+    @classmethod
+    def from_values(
+        cls,
+        keep_last: Any,
+        keep_daily: Any,
+        keep_weekly: Any,
+        defaults: tuple[int, int, int],
+    ) -> "RetentionPolicy":
+        """設定ファイルや CLI の値からポリシーを作る。未設定の項目は `defaults` を使う。"""
+        return cls(
+            cls._coerce(keep_last, defaults[0]),
+            cls._coerce(keep_daily, defaults[1]),
+            cls._coerce(keep_weekly, defaults[2]),
+        )
+
+    def _keep_newest_per_period(
+        self,
+        timestamps: dict[int, datetime],
+        count: int,
+        get_period: Callable[[datetime], object],
+        period_length: timedelta,
+        latest: datetime,
+    ) -> set[int]:
+        """`latest` から `count` 期間内の各期間で最も新しいスナップショットIDを返す。"""
+        if count == 0:
+            return set()
+        newest: dict[object, int] = {}
+        for snapshot_id, timestamp in timestamps.items():
+            if count != self.FOREVER and latest - timestamp >= period_length * count:
+                continue
+            period = get_period(timestamp)
+            current = newest.get(period)
+            if current is None or timestamps[current] <= timestamp:
+                newest[period] = snapshot_id
+        return set(newest.values())
+
+    def select(
+        self, snapshot_ids: list[int], timestamps: dict[int, datetime]
+    ) -> tuple[list[int], list[int]]:
+        """スナップショットIDを残すものとアーカイブするものに分け、それぞれ昇順で返す。
+
+        Args:
+            snapshot_ids: 対象のスナップショットID。
+            timestamps: スナップショットIDごとの作成日時 (`snapshots.yaml`)。
+        """
+        ordered = sorted(snapshot_ids)
+        if not ordered:
+            return [], []
+        kept = {ordered[-1]}
+        kept.update(ordered[-self.keep_last :] if self.keep_last > 0 else [])
+        dated = {
+            snapshot_id: timestamps[snapshot_id]
+            for snapshot_id in ordered
+            if snapshot_id in timestamps
+        }
+        kept.update(snapshot_id for snapshot_id in ordered if snapshot_id not in dated)
+        if dated:
+            latest = max(dated.values())
+            kept |= self._keep_newest_per_period(
+                dated,
+                self.keep_daily,
+                lambda timestamp: timestamp.date(),
+                timedelta(days=1),
+                latest,
+            )
+            kept |= self._keep_newest_per_period(
+                dated,
+                self.keep_weekly,
+                lambda timestamp: timestamp.isocalendar()[:2],
+                timedelta(weeks=1),
+                latest,
+            )
+        return (
+            [snapshot_id for snapshot_id in ordered if snapshot_id in kept],
+            [snapshot_id for snapshot_id in ordered if snapshot_id not in kept],
+        )
@@ -0,0 +1,294 @@
+import heapq
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.atomic_file import write_text_atomically
+from ghrepo.snapshot_store import SnapshotStore
+
+type RepoItem = dict[str, Any]
+
+
+class SearchIndex:
+    """スナップショットごとの検索用サイドカーインデックス (`snapshots/<id>/index.json`)。
+
+    リポジトリ名を昇順に並べた位置番号を単位に、可視性ごとのバケット、オーナー名の対応、
+    名前のトライグラム転置索引、並べ替え用の数値キー列 (日時は 1 度だけ解析したエポック秒)、
+    `createdAt` の昇順・降順の並びを保持する。`search` はこれだけで対象リポジトリ名を
+    決められるため、スナップショット本体を読まずに済む。
+
+    インデックスには元ファイルのフィンガープリントを記録し、一致しない場合は作り直す。
+    """
+
+    INDEX_FILE_NAME: ClassVar[str] = "index.json"
+    VERSION: ClassVar[int] = 2  # 形式を変えたら上げる。異なる版のインデックスは作り直す
+    TRIGRAM_SIZE: ClassVar[int] = 3
+    SORT_FIELDS: ClassVar[list[str]] = AppConfigx.search_sort_fields
+    PRESORTED_FIELDS: ClassVar[list[str]] = ["createdAt"]  # 並びを事前に保存しておくフィールド
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        """読み込み済み、または `build` で組み立てたインデックス内容を保持する。"""
+        self.data: dict[str, Any] = data
+        self.names: list[str] = cast(list[str], data["names"])
+
+    @staticmethod
+    def parse_timestamp(value: object) -> datetime | None:
+        """ISO 8601 形式の日時文字列を `datetime` に変換する。変換できなければ `None` を返す。"""
+        if not isinstance(value, str) or value == "":
+            return None
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def get_owner_keys(item: RepoItem) -> set[str]:
+        """`owner` / `owner.login` / `nameWithOwner` の接頭辞から、オーナー名の候補を小文字で返す。"""
+        keys: set[str] = set()
+        owner = item.get("owner")
+        if isinstance(owner, str):
+            keys.add(owner.lower())
+        if isinstance(owner, dict):
+            login = owner.get("login")
+            if isinstance(login, str):
+                keys.add(login.lower())
+        nwo = item.get("nameWithOwner")
+        if isinstance(nwo, str) and "/" in nwo:
+            keys.add(nwo.split("/", 1)[0].lower())
+        return keys
+
+    @classmethod
+    def get_sort_key(cls, value: object) -> float | None:
+        """並べ替え用の数値キーを返す。数値はそのまま、日時文字列はエポック秒にする。"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        parsed = cls.parse_timestamp(value)
+        return parsed.timestamp() if parsed is not None else None
+
+    @staticmethod
+    def _sort_order(keys: list[float | None], descending: bool) -> list[int]:
+        """キー列を並べた位置番号を返す。キーの無いものは末尾、同値は名前順 (位置番号順)。"""
+        sign = -1.0 if descending else 1.0
+        return sorted(
+            range(len(keys)),
+            key=lambda position: (
+                keys[position] is None,
+                sign * cast(float, keys[position]) if keys[position] is not None else 0.0,
+                position,
+            ),
+        )
+
+    @classmethod
+    def get_trigrams(cls, text: str) -> set[str]:
+        """文字列に含まれるトライグラムを返す。"""
+        size = cls.TRIGRAM_SIZE
+        return {text[index : index + size] for index in range(len(text) - size + 1)}
+
+    @classmethod
+    def build(
+        cls,
+        assoc: Mapping[str, RepoItem],
+        snapshot_id: int,
+        fingerprint: dict[str, Any] | None,
+    ) -> "SearchIndex":
+        """スナップショットの内容からインデックスを組み立てる。"""
+        names = sorted(assoc)
+        visibility: dict[str, list[int]] = {}
+        owners: dict[str, list[int]] = {}
+        trigrams: dict[str, list[int]] = {}
+        sort_keys: dict[str, list[float | None]] = {
+            field: [None] * len(names) for field in cls.SORT_FIELDS
+        }
+        for position, name in enumerate(names):
+            item = assoc[name]
+            visibility_value = item.get("visibility")
+            if isinstance(visibility_value, str):
+                visibility.setdefault(visibility_value.lower(), []).append(position)
+            for owner_key in cls.get_owner_keys(item):
+                owners.setdefault(owner_key, []).append(position)
+            for trigram in cls.get_trigrams(name):
+                trigrams.setdefault(trigram, []).append(position)
+            for field, column in sort_keys.items():
+                column[position] = cls.get_sort_key(item.get(field))
+
+        order: dict[str, list[int]] = {}
+        for field in cls.PRESORTED_FIELDS:
+            order[f"{field}:desc"] = cls._sort_order(sort_keys[field], True)
+            order[f"{field}:asc"] = cls._sort_order(sort_keys[field], False)
+        return cls(
+            {
+                "version": cls.VERSION,
+                "snapshot-id": snapshot_id,
+                "source": fingerprint,
+                "names": names,
+                "visibility": visibility,
+                "owners": owners,
+                "trigrams": trigrams,
+                "keys": sort_keys,
+                "order": order,
+            }
+        )
+
+    @classmethod
+    def get_index_path(cls, snapshot_store: SnapshotStore, snapshot_id: int) -> Path:
+        """インデックスファイルのパスを返す。"""
+        return snapshot_store.get_snapshot_dir(snapshot_id) / cls.INDEX_FILE_NAME
+
+    def save(self, path: Path) -> None:
+        """インデックスを一時ファイル経由で書き出す。"""
+        write_text_atomically(
+            path, json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+        )
+
+    @classmethod
+    def load(cls, snapshot_store: SnapshotStore, snapshot_id: int) -> "SearchIndex | None":
+        """保存済みインデックスを読み込む。無い、壊れている、または元データと一致しない場合は `None` を返す。"""
+        index_path = cls.get_index_path(snapshot_store, snapshot_id)
+        if not index_path.exists():
+            return None
+        try:
+            data = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != cls.VERSION
+            or data.get("source") != snapshot_store.get_fingerprint(snapshot_id)
+        ):
+            return None
+        return cls(data)
+
+    @classmethod
+    def rebuild(cls, snapshot_store: SnapshotStore, snapshot_id: int) -> "SearchIndex":
+        """スナップショット本体からインデックスを作り直して保存する。
+
+        Raises:
+            FileNotFoundError: スナップショットが存在しない場合。
+            ValueError: スナップショットの形式が不正な場合。
+        """
+        fingerprint = snapshot_store.get_fingerprint(snapshot_id)
+        index = cls.build(snapshot_store.read(snapshot_id), snapshot_id, fingerprint)
+        index.save(cls.get_index_path(snapshot_store, snapshot_id))
+        return index
+
+    @classmethod
+    def load_or_rebuild(
+        cls, snapshot_store: SnapshotStore, snapshot_id: int
+    ) -> "SearchIndex":
+        """最新のインデックスを返す。古い、または無い場合は作り直す。"""
+        index = cls.load(snapshot_store, snapshot_id)
+        if index is not None:
+            return index
+        return cls.rebuild(snapshot_store, snapshot_id)
+
+    def select_visibility(self, visibilities: list[str]) -> list[int]:
+        """いずれかの可視性に一致する位置番号を昇順で返す。"""
+        buckets = cast(dict[str, list[int]], self.data["visibility"])
+        selected: set[int] = set()
+        for visibility in visibilities:
+            selected.update(buckets.get(visibility.lower(), []))
+        return sorted(selected)
+
+    def filter_name_substring(self, positions: list[int], pattern: str) -> list[int]:
+        """名前に `pattern` を含む位置番号だけを残す。3 文字以上ならトライグラムで候補を絞る。"""
+        if len(pattern) >= self.TRIGRAM_SIZE:
+            postings = cast(dict[str, list[int]], self.data["trigrams"])
+            candidates: set[int] | None = None
+            for trigram in sorted(
+                self.get_trigrams(pattern), key=lambda key: len(postings.get(key, []))
+            ):
+                posting = set(postings.get(trigram, []))
+                candidates = posting if candidates is None else candidates & posting
+                if not candidates:
+                    return []
+            positions = [
+                position for position in positions if position in cast(set[int], candidates)
+            ]
+        return [position for position in positions if pattern in self.names[position]]
+
+    def filter_owner(self, positions: list[int], github_user: str) -> list[int]:
+        """オーナーが `github_user` と一致する位置番号だけを残す。"""
+        owners = cast(dict[str, list[int]], self.data["owners"])
+        matched = set(owners.get(github_user.lower().strip(), []))
+        return [position for position in positions if position in matched]
+
+    def take_top(
+        self,
+        field: str,
+        n: int,
+        descending: bool = True,
+        positions: list[int] | None = None,
+    ) -> list[int]:
+        """`field` の値で並べた先頭 `n` 件の位置番号を返す。値の無いものは末尾、同値は名前順。
+
+        事前に並べた順序があればその先頭から拾い、無ければ保存済みのキー列に対する
+        ヒープ選択 (O(M log n)) で求める。`positions` を渡すとその中から選ぶ。
+
+        Raises:
+            ValueError: `field` が `SORT_FIELDS` に含まれない場合。
+        """
+        if field not in self.SORT_FIELDS:
+            raise ValueError(f"unsupported sort field: {field}")
+        if n <= 0:
+            return []
+
+        allowed = None if positions is None else set(positions)
+        order = cast(dict[str, list[int]], self.data["order"]).get(
+            f"{field}:{'desc' if descending else 'asc'}"
+        )
+        if order is not None:
+            if allowed is None:
+                return order[:n]
+            selected: list[int] = []
+            for position in order:
+                if position in allowed:
+                    selected.append(position)
+                    if len(selected) == n:
+                        break
+            return selected
+
+        keys = cast(dict[str, list[float | None]], self.data["keys"])[field]
+        sign = -1.0 if descending else 1.0
+        candidates = range(len(keys)) if positions is None else positions
+        return heapq.nsmallest(
+            n,
+            candidates,
+            key=lambda position: (
+                keys[position] is None,
+                sign * cast(float, keys[position]) if keys[position] is not None else 0.0,
+                position,
+            ),
+        )
+
+    @classmethod
+    def get_row_fields(cls) -> set[str]:
+        """`get_rows` の行に含まれるフィールド名を返す。"""
+        return {"name", "visibility", *cls.SORT_FIELDS}
+
+    def get_rows(self, positions: list[int]) -> list[RepoItem]:
+        """位置番号ごとに、名前・可視性 (小文字)・並べ替え用の数値キーだけを持つ行を返す。
+
+        スナップショット本体を読まずに `Query` の条件の一部を評価するために使う。
+        """
+        visibility_of: dict[int, str] = {}
+        for visibility, bucket in cast(dict[str, list[int]], self.data["visibility"]).items():
+            for position in bucket:
+                visibility_of[position] = visibility
+        keys = cast(dict[str, list[float | None]], self.data["keys"])
+        return [
+            {
+                "name": self.names[position],
+                "visibility": visibility_of.get(position),
+                **{field: column[position] for field, column in keys.items()},
+            }
+            for position in positions
+        ]
+
+    def get_names(self, positions: list[int]) -> list[str]:
+        """位置番号をリポジトリ名へ変換する。"""
+        return [self.names[position] for position in positions]
@@ -0,0 +1,301 @@
+import json
+import os
+import socketserver
+import stat
+import threading
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from yklibpy.common.loggerx import Loggerx
+from yklibpy.common.util import Util
+from yklibpy.db.appstore import AppStore
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList, RepoAssoc
+from ghrepo.command_search import CommandSearch, SearchOptions
+from ghrepo.daemon_client import DaemonClient
+from ghrepo.repo_table import RepoTable
+
+type AppStoreFactory = Callable[[str | None], AppStore]
+
+
+class _UserState:
+    """1 ユーザー分の常駐状態 (`AppStore`、検索キャッシュ、`repos.yaml` の読み込み結果)。
+
+    読み込み結果は問い合わせの間も保持し続けるため、メモリの少ない `RepoTable` で持つ。
+    """
+
+    def __init__(self, appstore: AppStore, user: str | None) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.appstore: AppStore = appstore
+        self.search: CommandSearch = CommandSearch(appstore, user, cache=True)
+        json_fields = cast(list[str], appstore.get_from_config("config", AppConfigx.key))
+        self.list: CommandList = CommandList(appstore, json_fields, user)
+        self.latest_key: tuple[int, int] | None = None
+        self.latest_assoc: RepoTable | None = None
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix ドメインソケットで待ち受ける HTTP サーバー。閉じるときにソケットファイルを消す。"""
+
+    daemon_threads = True
+
+    def server_close(self) -> None:
+        super().server_close()
+        Path(cast(str, self.server_address)).unlink(missing_ok=True)
+
+
+class GhrepoServer:
+    """`search` / `list` の問い合わせにローカル HTTP で応答する常駐プロセス。
+
+    ユーザーごとに `AppStore` と `CommandSearch` (キャッシュ有効) を保持し、起動時の import、
+    `gh` によるユーザー名解決、スナップショットの再解析を問い合わせごとに行わない。
+    スナップショットと `repos.yaml` は問い合わせのたびにフィンガープリント (更新時刻とサイズ) を確認し、
+    変わっていれば読み直す。`GET /metrics` には全ユーザーのメトリクスを Prometheus のテキスト形式で返す。
+
+    既定では起動した OS ユーザーだけが接続できる Unix ドメインソケット (権限 0600) で待ち受ける。
+    `port` を指定した場合だけ TCP で待ち受ける (認証は無い)。問い合わせは、クライアント側で
+    解決済みの保存先ユーザー名 (`store_user`) を必ず含む。
+    """
+
+    SEARCH_PATH: ClassVar[str] = DaemonClient.SEARCH_PATH
+    LIST_PATH: ClassVar[str] = DaemonClient.LIST_PATH
+    HEALTH_PATH: ClassVar[str] = DaemonClient.HEALTH_PATH
+    METRICS_PATH: ClassVar[str] = DaemonClient.METRICS_PATH
+
+    def __init__(
+        self,
+        appstore_factory: AppStoreFactory,
+        host: str = DaemonClient.DEFAULT_HOST,
+        port: int | None = None,
+        socket_path: Path | None = None,
+    ) -> None:
+        """`AppStore` の生成関数と待ち受けアドレスを保持する。
+
+        Args:
+            appstore_factory: 正規化済みユーザー名から `AppStore` を準備する関数。
+            host: TCP で待ち受けるアドレス。`port` 指定時のみ使う。
+            port: TCP で待ち受けるポート。`None` なら Unix ドメインソケットで待ち受ける。
+            socket_path: ソケットのパス。省略時は `DaemonClient.get_default_socket_path()`。
+        """
+        self.appstore_factory: AppStoreFactory = appstore_factory
+        self.host: str = host
+        self.port: int | None = port
+        self.socket_path: Path | None = (
+            socket_path if socket_path is not None else DaemonClient.get_default_socket_path()
+        )
+        self._states: dict[str | None, _UserState] = {}
+        self._states_lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def get_store_user(payload: dict[str, Any]) -> str:
+        """問い合わせの保存先ユーザー名 (`store_user`) を返す。
+
+        Raises:
+            ValueError: `store_user` が無い場合 (常駐プロセス側の `gh` のユーザーで補完しないため)。
+        """
+        store_user = payload.get("store_user")
+        if not isinstance(store_user, str) or store_user == "":
+            raise ValueError("store_user is required")
+        return store_user
+
+    def _get_state(self, user: str | None) -> _UserState:
+        """ユーザーの常駐状態を返す。初回のみ `AppStore` を準備する。"""
+        normalized_user = Util.normalize_string(user)
+        with self._states_lock:
+            state = self._states.get(normalized_user)
+            if state is None:
+                appstore = self.appstore_factory(normalized_user)
+                appstore.load_file_all()
+                state = _UserState(appstore, user)
+                self._states[normalized_user] = state
+            return state
+
+    def search(self, payload: dict[str, Any]) -> object:
+        """`ghrepo search` と同じ条件で検索し、結果を返す。"""
+        user = cast(str | None, payload.get("user"))
+        state = self._get_state(self.get_store_user(payload))
+        between = cast(list[str] | None, payload.get("between"))
+        if between:
+            with state.lock:
+                intervals = state.search.search_between(
+                    str(payload["search_name"]),
+                    str(between[0]),
+                    str(between[1]),
+                    cast(str | None, payload.get("name")),
+                    user,
+                )
+            return intervals if payload.get("all") else list(intervals)
+
+        options = SearchOptions.from_payload(payload)
+        with state.lock:
+            if payload.get("all"):
+                return state.search.search_repos(options)
+            return state.search.search_names(options)
+
+    def list_latest(self, payload: dict[str, Any]) -> RepoAssoc | None:
+        """`repos.yaml` の内容を返す。ファイルが変わっていなければ前回の読み込み結果を使う。
+
+        読み込み結果は `RepoTable` で保持し、応答のたびに辞書へ戻す。
+
+        スナップショットが未作成で GitHub からの取得が必要な場合は `None` を返し、クライアント側で処理させる。
+
+        Raises:
+            FileNotFoundError: `repos.yaml` が存在しない場合。
+        """
+        state = self._get_state(self.get_store_user(payload))
+        with state.lock:
+            if not state.list.get_snapshots_path().exists():
+                return None
+            repos_file_path = state.list.get_repos_store().get_path()
+            if not repos_file_path.exists():
+                raise FileNotFoundError(f"リポジトリ一覧ファイルが存在しません: {repos_file_path}")
+            stat_result = repos_file_path.stat()
+            latest_key = (stat_result.st_mtime_ns, stat_result.st_size)
+            if state.latest_key != latest_key or state.latest_assoc is None:
+                state.latest_assoc = state.list.get_repos_store().load_table()
+                state.latest_key = latest_key
+            return state.latest_assoc.to_dict()
+
+    def render_metrics(self) -> str:
+        """全ユーザーのメトリクスを Prometheus のテキスト形式で返す。保存ルートは既定ユーザーから求める。"""
+        from ghrepo.metrics import MetricsExporter
+
+        state = self._get_state(None)
+        return MetricsExporter(
+            state.list.get_user_dir().parent, state.list.get_snapshots_path().name
+        ).render()
+
+    def dispatch(self, path: str, payload: dict[str, Any]) -> object:
+        """パスに応じた処理を実行する。
+
+        Raises:
+            ValueError: 未知のパスの場合。
+        """
+        if path == self.SEARCH_PATH:
+            return self.search(payload)
+        if path == self.LIST_PATH:
+            return self.list_latest(payload)
+        if path == self.HEALTH_PATH:
+            return {"status": "ok", "users": len(self._states)}
+        raise ValueError(f"unsupported path: {path}")
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        """この常駐プロセスへ処理を委ねるリクエストハンドラクラスを返す。"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            server_version = DaemonClient.SERVER_SOFTWARE
+            sys_version = ""
+
+            def _respond(
+                self,
+                status: int,
+                data: dict[str, Any] | str,
+                content_type: str = "application/json; charset=utf-8",
+            ) -> None:
+                text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+                body = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, payload: dict[str, Any]) -> None:
+                try:
+                    result = server.dispatch(self.path, payload)
+                except (FileNotFoundError, ValueError) as exc:
+                    self._respond(400, {"error": str(exc), "type": type(exc).__name__})
+                    return
+                except Exception as exc:  # 常駐プロセスは 1 件の失敗で止めない
+                    Loggerx.warning(f"{self.path}: {exc!r}", __name__)
+                    self._respond(500, {"error": str(exc), "type": type(exc).__name__})
+                    return
+                self._respond(200, {"result": result})
+
+            def do_GET(self) -> None:
+                if self.path != server.METRICS_PATH:
+                    self._handle({})
+                    return
+                from ghrepo.metrics import MetricsExporter
+
+                try:
+                    text = server.render_metrics()
+                except Exception as exc:  # 常駐プロセスは 1 件の失敗で止めない
+                    Loggerx.warning(f"{self.path}: {exc!r}", __name__)
+                    self._respond(500, {"error": str(exc), "type": type(exc).__name__})
+                    return
+                self._respond(200, text, MetricsExporter.CONTENT_TYPE)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", "0"))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    payload = None
+                if not isinstance(payload, dict):
+                    self._respond(
+                        400, {"error": "request body must be a JSON object", "type": "ValueError"}
+                    )
+                    return
+                self._handle(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                Loggerx.debug(format % args, __name__)
+
+        return Handler
+
+    def _bind_socket(self, socket_path: Path) -> _UnixHTTPServer:
+        """Unix ドメインソケットを自分だけが接続できる権限 (0600) で作って待ち受ける。
+
+        Raises:
+            RuntimeError: 親ディレクトリを他のユーザーが書き換えられる場合 (クライアントが接続しない)、
+                または同じソケットで別の常駐プロセスが応答している場合。
+        """
+        socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        dir_stat = socket_path.parent.stat()
+        if dir_stat.st_uid != os.getuid() or dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise RuntimeError(
+                f"socket directory must be owned by you and not writable by others: {socket_path.parent}"
+            )
+        if socket_path.exists() or socket_path.is_symlink():
+            if DaemonClient(socket_path).request(self.HEALTH_PATH, {}) is not None:
+                raise RuntimeError(f"ghrepo serve is already running: {socket_path}")
+            socket_path.unlink()  # 前回の常駐プロセスが残したソケット
+        # 作成から chmod までの間も他のユーザーが接続できないよう、umask で権限を絞って作る
+        previous_umask = os.umask(0o177)
+        try:
+            return _UnixHTTPServer(str(socket_path), self._make_handler())
+        finally:
+            os.umask(previous_umask)
+
+    def create_server(self) -> socketserver.BaseServer:
+        """待ち受けソケットを作る。
+
+        Raises:
+            ValueError: `port` が無く、Unix ドメインソケットも使えない場合。
+        """
+        if self.port is not None:
+            return ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        if self.socket_path is None:
+            raise ValueError("--port is required where Unix domain sockets are unavailable")
+        return self._bind_socket(self.socket_path)
+
+    def serve_forever(self) -> None:
+        """待ち受けを開始し、割り込まれるまで応答し続ける。"""
+        httpd = self.create_server()
+        address = (
+            f"http://{self.host}:{self.port}"
+            if self.port is not None
+            else f"unix:{self.socket_path}"
+        )
+        Loggerx.info(f"ghrepo serve: {address}", __name__)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
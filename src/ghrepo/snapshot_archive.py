@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.atomic_file import replace_atomically, write_text_atomically
+
+
+class SnapshotArchive:
+    """`prune` で `snapshots/` から外したスナップショットを収める圧縮アーカイブ (`archive/`)。
+
+    アーカイブは `archive/pack-<最初のID>-<最後のID>.zip` で、1 つに複数のスナップショットを
+    `<snapshot-id>/<ファイル名>` として収める。どのスナップショットがどのアーカイブにあるかと、
+    アーカイブ前のフィンガープリントは `archive/catalog.json` に記録する。フィンガープリントを
+    引き継ぐため、検索用インデックスや履歴索引は作り直さずにそのまま使える。
+
+    読み込み時は対象のスナップショットだけを `archive/.cache/<snapshot-id>/` へ展開する
+    (`extract`)。展開済みのものは `CACHE_LIMIT` 件まで残し、古いものから消す。
+    """
+
+    CATALOG_FILE_NAME: ClassVar[str] = "catalog.json"
+    CACHE_DIR_NAME: ClassVar[str] = ".cache"
+    CACHE_LIMIT: ClassVar[int] = 8  # 展開したまま残すスナップショット数
+    VERSION: ClassVar[int] = 1
+
+    def __init__(self, user_dir: Path) -> None:
+        """対象ユーザーの保存ルートディレクトリを保持する。カタログは必要になるまで読まない。"""
+        self.archive_dir: Path = user_dir / AppConfigx.ARCHIVE_DIR_NAME
+        self.cache_dir: Path = self.archive_dir / self.CACHE_DIR_NAME
+        self._catalog: dict[str, Any] | None = None
+
+    def get_catalog_path(self) -> Path:
+        """カタログファイルのパスを返す。"""
+        return self.archive_dir / self.CATALOG_FILE_NAME
+
+    def _load_catalog(self) -> dict[str, Any]:
+        """カタログ (`snapshot-id -> {pack, fingerprint}`) を返す。無い、または壊れていれば空にする。"""
+        if self._catalog is not None:
+            return self._catalog
+        catalog: dict[str, Any] = {}
+        catalog_path = self.get_catalog_path()
+        if catalog_path.exists():
+            try:
+                data = json.loads(catalog_path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                data = None
+            if isinstance(data, dict) and data.get("version") == self.VERSION:
+                catalog = cast(dict[str, Any], data.get("snapshots", {}))
+        self._catalog = catalog
+        return catalog
+
+    def _save_catalog(self, catalog: dict[str, Any]) -> None:
+        """カタログを一時ファイル経由で書き出す。"""
+        write_text_atomically(
+            self.get_catalog_path(),
+            json.dumps(
+                {"version": self.VERSION, "snapshots": catalog},
+                ensure_ascii=False,
+                sort_keys=True,
+            ),
+        )
+        self._catalog = catalog
+
+    def collect_snapshot_ids(self) -> list[int]:
+        """アーカイブ済みのスナップショットIDを昇順で返す。"""
+        return sorted(int(snapshot_id) for snapshot_id in self._load_catalog())
+
+    def contains(self, snapshot_id: int) -> bool:
+        """スナップショットがアーカイブ済みか判定する。"""
+        return str(snapshot_id) in self._load_catalog()
+
+    def get_fingerprint(self, snapshot_id: int) -> dict[str, Any] | None:
+        """アーカイブ前のフィンガープリントを返す。"""
+        entry = self._load_catalog().get(str(snapshot_id))
+        if not isinstance(entry, dict):
+            return None
+        return cast(dict[str, Any] | None, entry.get("fingerprint"))
+
+    def _get_pack_path(self, first_id: int, last_id: int) -> Path:
+        """まだ使われていないアーカイブファイル名を返す。"""
+        pack_path = self.archive_dir / f"pack-{first_id}-{last_id}.zip"
+        suffix = 2
+        while pack_path.exists():
+            pack_path = self.archive_dir / f"pack-{first_id}-{last_id}-{suffix}.zip"
+            suffix += 1
+        return pack_path
+
+    def add(self, snapshots: dict[int, tuple[Path, dict[str, Any] | None]]) -> str:
+        """スナップショットのディレクトリをまとめて 1 つのアーカイブへ収め、カタログに記録する。
+
+        元のディレクトリは消さない。アーカイブを書き終えてからカタログを置き換えるため、
+        途中で止まっても元のスナップショットはそのまま読める。
+
+        Args:
+            snapshots: スナップショットIDごとの `(収めるファイルのあるディレクトリ, フィンガープリント)`。
+
+        Returns:
+            作成したアーカイブのファイル名。
+        """
+        pack_path = self._get_pack_path(min(snapshots), max(snapshots))
+
+        def dump(temp_path: Path) -> None:
+            with zipfile.ZipFile(
+                temp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
+            ) as pack:
+                for snapshot_id in sorted(snapshots):
+                    source_dir = snapshots[snapshot_id][0]
+                    for file_path in sorted(source_dir.iterdir()):
+                        if file_path.is_file():
+                            pack.write(file_path, f"{snapshot_id}/{file_path.name}")
+
+        replace_atomically(pack_path, dump)
+        catalog = dict(self._load_catalog())
+        for snapshot_id, (_, fingerprint) in snapshots.items():
+            catalog[str(snapshot_id)] = {"pack": pack_path.name, "fingerprint": fingerprint}
+        self._save_catalog(catalog)
+        return pack_path.name
+
+    def extract(self, snapshot_id: int) -> Path:
+        """アーカイブ済みのスナップショットを展開し、そのディレクトリを返す。展開済みなら再利用する。
+
+        複数のプロセスが同時に展開しても、一時ディレクトリから rename するため壊れない。
+
+        Raises:
+            FileNotFoundError: アーカイブ済みでない、またはアーカイブファイルが無い場合。
+        """
+        target_dir = self.cache_dir / str(snapshot_id)
+        if target_dir.is_dir():
+            os.utime(target_dir)
+            return target_dir
+
+        entry = self._load_catalog().get(str(snapshot_id))
+        if not isinstance(entry, dict):
+            raise FileNotFoundError(f"アーカイブにスナップショットがありません: {snapshot_id}")
+        pack_path = self.archive_dir / str(entry["pack"])
+        if not pack_path.exists():
+            raise FileNotFoundError(f"アーカイブファイルが存在しません: {pack_path}")
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(prefix=f"{snapshot_id}.", dir=self.cache_dir))
+        prefix = f"{snapshot_id}/"
+        with zipfile.ZipFile(pack_path) as pack:
+            for info in pack.infolist():
+                if not info.filename.startswith(prefix) or info.is_dir():
+                    continue
+                name = Path(info.filename).name
+                with pack.open(info) as source, (temp_dir / name).open("wb") as target:
+                    shutil.copyfileobj(source, target)
+        try:
+            os.rename(temp_dir, target_dir)
+        except OSError:  # 他のプロセスが先に展開した
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self._evict(keep=target_dir)
+        return target_dir
+
+    def _evict(self, keep: Path) -> None:
+        """展開済みのスナップショットが `CACHE_LIMIT` を超えたら、使われていない順に消す。"""
+        cached = [
+            path
+            for path in self.cache_dir.iterdir()
+            if path.is_dir() and path.name.isdigit() and path != keep
+        ]
+        excess = len(cached) + 1 - self.CACHE_LIMIT
+        if excess <= 0:
+            return
+        cached.sort(key=lambda path: path.stat().st_mtime)
+        for path in cached[:excess]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def clear_cache(self) -> None:
+        """展開済みのスナップショットをすべて消す。"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,208 @@
+import importlib
+import json
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+import yaml
+
+from ghrepo.appconfigx import AppConfigx
+
+# libyaml が使える環境では C 実装のローダ/ダンパを使う
+_YamlLoader: Any = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YamlDumper: Any = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+class SnapshotCodec(ABC):
+    """スナップショット (キー文字列 -> 値 の辞書) のファイル形式を表す基底クラス。
+
+    サブクラスは `file_type` と `dump` / `load` を実装する。拡張子は
+    `AppConfigx.file_type_dict` から引く。
+    """
+
+    file_type: ClassVar[str] = ""
+
+    def get_ext(self) -> str:
+        """この形式の拡張子 (`.yaml` 等) を返す。"""
+        return AppConfigx.file_type_dict[self.file_type]
+
+    @abstractmethod
+    def dump(self, data: Mapping[str, Any], path: Path) -> None:
+        """辞書をキー順にファイルへ書き出す。"""
+
+    @abstractmethod
+    def load(self, path: Path) -> dict[str, Any]:
+        """ファイルを辞書として読み込む。
+
+        Raises:
+            ValueError: ファイルの形式が不正な場合。
+        """
+
+    def iter_items(self, path: Path) -> Iterator[tuple[str, Any]]:
+        """ファイル内の (キー, 値) をキー順に返す。逐次読み込みできない形式は全体を読んでから返す。"""
+        loaded = self.load(path)
+        for key in sorted(loaded):
+            yield key, loaded[key]
+
+
+class YamlCodec(SnapshotCodec):
+    """人が読める既定の YAML 形式。"""
+
+    file_type: ClassVar[str] = AppConfigx.FILE_TYPE_YAML
+
+    def dump(self, data: Mapping[str, Any], path: Path) -> None:
+        with path.open("w", encoding="utf-8") as output_file:
+            # ダンパは辞書しか表現できないため、`AnnotatedRepos` 等は辞書に組み立ててから渡す
+            yaml.dump(
+                data if isinstance(data, dict) else dict(data),
+                output_file,
+                Dumper=_YamlDumper,
+                allow_unicode=True,
+                sort_keys=True,
+            )
+
+    def load(self, path: Path) -> dict[str, Any]:
+        with path.open(encoding="utf-8") as input_file:
+            loaded_value = yaml.load(input_file, Loader=_YamlLoader)
+        if not isinstance(loaded_value, dict):
+            raise ValueError(f"スナップショットファイルの形式が不正です: {path}")
+        return cast(dict[str, Any], loaded_value)
+
+
+class JsonLinesCodec(SnapshotCodec):
+    """1 行 1 エントリの JSON Lines 形式。各行は `[キー, 値]` の 2 要素配列。
+
+    キー順に書き出すため、`iter_items` はファイル全体を読まずに逐次返せる。
+    """
+
+    file_type: ClassVar[str] = AppConfigx.FILE_TYPE_JSONL
+
+    def dump(self, data: Mapping[str, Any], path: Path) -> None:
+        with path.open("w", encoding="utf-8") as output_file:
+            for key in sorted(data):
+                output_file.write(json.dumps([key, data[key]], ensure_ascii=False))
+                output_file.write("\n")
+
+    def iter_items(self, path: Path) -> Iterator[tuple[str, Any]]:
+        with path.open(encoding="utf-8") as input_file:
+            for line_number, line in enumerate(input_file, start=1):
+                if line.strip() == "":
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise ValueError(
+                        f"スナップショットファイルの形式が不正です: {path}:{line_number}"
+                    ) from exc
+                if not isinstance(entry, list) or len(entry) != 2:
+                    raise ValueError(
+                        f"スナップショットファイルの形式が不正です: {path}:{line_number}"
+                    )
+                yield str(entry[0]), entry[1]
+
+    def load(self, path: Path) -> dict[str, Any]:
+        return dict(self.iter_items(path))
+
+
+class MsgpackCodec(SnapshotCodec):
+    """MessagePack 形式。`msgpack` パッケージが必要。"""
+
+    file_type: ClassVar[str] = AppConfigx.FILE_TYPE_MSGPACK
+
+    @staticmethod
+    def _import_msgpack() -> Any:
+        try:
+            return importlib.import_module("msgpack")
+        except ImportError as exc:
+            raise ValueError(
+                "msgpack snapshot format requires the 'msgpack' package"
+            ) from exc
+
+    def dump(self, data: Mapping[str, Any], path: Path) -> None:
+        msgpack = self._import_msgpack()
+        path.write_bytes(msgpack.packb(dict(sorted(data.items())), use_bin_type=True))
+
+    def load(self, path: Path) -> dict[str, Any]:
+        msgpack = self._import_msgpack()
+        try:
+            loaded_value = msgpack.unpackb(path.read_bytes(), raw=False)
+        except ValueError as exc:
+            raise ValueError(f"スナップショットファイルの形式が不正です: {path}") from exc
+        if not isinstance(loaded_value, dict):
+            raise ValueError(f"スナップショットファイルの形式が不正です: {path}")
+        return cast(dict[str, Any], loaded_value)
+
+
+class ParquetCodec(SnapshotCodec):
+    """Apache Parquet の列指向形式。`pyarrow` パッケージが必要。
+
+    値が辞書ならそのフィールドを列に、それ以外なら `__value__` 列に格納し、キーは `__key__` 列に置く。
+    列指向のため、あるレコードに無いフィールドの列は `None` で埋まる。辞書のレコードは元のフィールド名を
+    `__fields__` 列に残し、読み込み時にそれ以外の列を落とすため、元と同じ辞書に戻る。
+    (`__fields__` 列の無い古いファイルでは `None` で埋まった列も残る)
+    """
+
+    file_type: ClassVar[str] = AppConfigx.FILE_TYPE_PARQUET
+    KEY_COLUMN: ClassVar[str] = "__key__"
+    VALUE_COLUMN: ClassVar[str] = "__value__"
+    FIELDS_COLUMN: ClassVar[str] = "__fields__"  # 辞書のレコードが持っていたフィールド名の列
+
+    @staticmethod
+    def _import_pyarrow() -> tuple[Any, Any]:
+        try:
+            return (
+                importlib.import_module("pyarrow"),
+                importlib.import_module("pyarrow.parquet"),
+            )
+        except ImportError as exc:
+            raise ValueError(
+                "parquet snapshot format requires the 'pyarrow' package"
+            ) from exc
+
+    def dump(self, data: Mapping[str, Any], path: Path) -> None:
+        pyarrow, parquet = self._import_pyarrow()
+        rows = [
+            {self.KEY_COLUMN: key, self.FIELDS_COLUMN: list(value), **value}
+            if isinstance(value, dict)
+            else {self.KEY_COLUMN: key, self.VALUE_COLUMN: value}
+            for key, value in sorted(data.items())
+        ]
+        parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+
+    def load(self, path: Path) -> dict[str, Any]:
+        _pyarrow, parquet = self._import_pyarrow()
+        try:
+            rows = parquet.read_table(path).to_pylist()
+        except Exception as exc:  # pyarrow は形式不正を独自例外で通知する
+            raise ValueError(f"スナップショットファイルの形式が不正です: {path}") from exc
+
+        loaded: dict[str, Any] = {}
+        for row in rows:
+            key = str(row.pop(self.KEY_COLUMN))
+            fields = row.pop(self.FIELDS_COLUMN, None)
+            if fields is not None:
+                loaded[key] = {field: row[field] for field in fields}
+            elif self.VALUE_COLUMN in row:
+                loaded[key] = row[self.VALUE_COLUMN]
+            else:
+                loaded[key] = row
+        return loaded
+
+
+SNAPSHOT_CODECS: dict[str, SnapshotCodec] = {
+    codec.file_type: codec
+    for codec in (YamlCodec(), JsonLinesCodec(), MsgpackCodec(), ParquetCodec())
+}
+
+
+def get_snapshot_codec(file_type: str) -> SnapshotCodec:
+    """ファイル種別に対応するコーデックを返す。種別名の大文字小文字は区別しない (`yaml` も `YAML` も可)。
+
+    Raises:
+        ValueError: 未知のファイル種別の場合。
+    """
+    codec = SNAPSHOT_CODECS.get(file_type.upper())
+    if codec is None:
+        raise ValueError(f"unsupported snapshot format: {file_type}")
+    return codec
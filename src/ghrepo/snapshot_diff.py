@@ -0,0 +1,157 @@
+from collections.abc import Iterator
+from typing import Any, ClassVar
+
+from ghrepo.snapshot_store import SnapshotEntry, SnapshotStore
+
+type RepoItem = dict[str, Any]
+type ChangeRecord = dict[str, Any]
+
+
+class SnapshotDiff:
+    """2 つのスナップショットの差分を変更レコードとして順に返す。
+
+    両側を名前順に読み進めて突き合わせるため、両方を丸ごと保持しない。`dedup` 形式どうしでは
+    マニフェストのハッシュが一致するレコードを本体を読まずに読み飛ばす。改名を判定するため、
+    片側にしか無いレコードだけを最後まで保持し、同じリポジトリとみなせる組を `renamed` にまとめる。
+    """
+
+    # 個別の変更レコードで報告し、`modified` の `fields` には含めないフィールド
+    REPORTED_FIELDS: ClassVar[frozenset[str]] = frozenset({"visibility", "diskUsage"})
+    IGNORED_FIELDS: ClassVar[frozenset[str]] = frozenset({SnapshotStore.SNAPSHOT_ID_FIELD})
+    RENAME_FIELDS: ClassVar[frozenset[str]] = frozenset({"name", "nameWithOwner", "url"})
+
+    def __init__(self, snapshot_store: SnapshotStore) -> None:
+        """比較対象のスナップショットを読む `SnapshotStore` を保持する。"""
+        self.snapshot_store: SnapshotStore = snapshot_store
+
+    @staticmethod
+    def get_identity(item: RepoItem) -> tuple[str, ...] | None:
+        """改名の前後で変わらない識別キーを返す。決められなければ `None` を返す。
+
+        GraphQL のノード ID (`id`) があればそれを、無ければオーナーと `createdAt` の組を使う。
+        """
+        node_id = item.get("id")
+        if isinstance(node_id, str) and node_id != "":
+            return ("id", node_id)
+        created_at = item.get("createdAt")
+        owner = item.get("owner")
+        login = owner.get("login") if isinstance(owner, dict) else owner
+        name_with_owner = item.get("nameWithOwner")
+        if not isinstance(login, str) and isinstance(name_with_owner, str):
+            login = name_with_owner.split("/", 1)[0]
+        if not isinstance(created_at, str) or created_at == "" or not isinstance(login, str):
+            return None
+        return ("createdAt", login.lower(), created_at)
+
+    @classmethod
+    def compare_items(
+        cls,
+        name: str,
+        old: RepoItem,
+        new: RepoItem,
+        ignored: frozenset[str] = frozenset(),
+    ) -> list[ChangeRecord]:
+        """同じリポジトリの 2 つのレコードを比べ、変更レコードを返す。`ignored` のフィールドは比べない。"""
+        changes: list[ChangeRecord] = []
+        old_visibility = old.get("visibility")
+        new_visibility = new.get("visibility")
+        if old_visibility != new_visibility:
+            changes.append(
+                {"change": "visibility", "name": name, "old": old_visibility, "new": new_visibility}
+            )
+        old_disk_usage = old.get("diskUsage")
+        new_disk_usage = new.get("diskUsage")
+        if old_disk_usage != new_disk_usage:
+            change: ChangeRecord = {
+                "change": "disk_usage",
+                "name": name,
+                "old": old_disk_usage,
+                "new": new_disk_usage,
+            }
+            if isinstance(old_disk_usage, int) and isinstance(new_disk_usage, int):
+                change["delta"] = new_disk_usage - old_disk_usage
+            changes.append(change)
+
+        skipped = cls.REPORTED_FIELDS | cls.IGNORED_FIELDS | ignored
+        fields = sorted(
+            key
+            for key in old.keys() | new.keys()
+            if key not in skipped and old.get(key) != new.get(key)
+        )
+        if fields:
+            changes.append({"change": "modified", "name": name, "fields": fields})
+        return changes
+
+    @staticmethod
+    def _is_unchanged(old_entry: SnapshotEntry, new_entry: SnapshotEntry) -> bool:
+        """両側のハッシュが分かっていて一致すれば `True` を返す。"""
+        return old_entry[1] is not None and old_entry[1] == new_entry[1]
+
+    def _compare_entries(
+        self, old_entry: SnapshotEntry, new_entry: SnapshotEntry
+    ) -> list[ChangeRecord]:
+        """同名エントリを比べる。ハッシュで判定できない場合だけ本体を読む。"""
+        if self._is_unchanged(old_entry, new_entry):
+            return []
+        return self.compare_items(new_entry[0], old_entry[2](), new_entry[2]())
+
+    def iter_changes(self, old_id: int, new_id: int) -> Iterator[ChangeRecord]:
+        """`old_id` から `new_id` への変更レコードを返す。
+
+        同名リポジトリの変更 (`visibility` / `disk_usage` / `modified`) は名前順に逐次返し、
+        最後に `renamed`、`deleted`、`created` をそれぞれ名前順に返す。
+
+        Raises:
+            FileNotFoundError: いずれかのスナップショットが存在しない場合。
+        """
+        old_iter = self.snapshot_store.iter_entries(old_id)
+        new_iter = self.snapshot_store.iter_entries(new_id)
+        deleted: dict[str, RepoItem] = {}
+        created: dict[str, RepoItem] = {}
+
+        old_entry = next(old_iter, None)
+        new_entry = next(new_iter, None)
+        while old_entry is not None or new_entry is not None:
+            if new_entry is None or (old_entry is not None and old_entry[0] < new_entry[0]):
+                assert old_entry is not None
+                deleted[old_entry[0]] = old_entry[2]()
+                old_entry = next(old_iter, None)
+            elif old_entry is None or new_entry[0] < old_entry[0]:
+                created[new_entry[0]] = new_entry[2]()
+                new_entry = next(new_iter, None)
+            else:
+                yield from self._compare_entries(old_entry, new_entry)
+                old_entry = next(old_iter, None)
+                new_entry = next(new_iter, None)
+
+        yield from self._iter_renamed(deleted, created)
+        for name in sorted(deleted):
+            yield {"change": "deleted", "name": name}
+        for name in sorted(created):
+            yield {
+                "change": "created",
+                "name": name,
+                "visibility": created[name].get("visibility"),
+            }
+
+    def _iter_renamed(
+        self, deleted: dict[str, RepoItem], created: dict[str, RepoItem]
+    ) -> Iterator[ChangeRecord]:
+        """削除と新規の組のうち識別キーが一致するものを改名として返し、両方の辞書から取り除く。"""
+        created_by_identity: dict[tuple[str, ...], str] = {}
+        for name, item in created.items():
+            identity = self.get_identity(item)
+            if identity is not None:
+                created_by_identity.setdefault(identity, name)
+
+        for old_name in sorted(deleted):
+            identity = self.get_identity(deleted[old_name])
+            new_name = created_by_identity.pop(identity, None) if identity else None
+            if new_name is None:
+                continue
+            old_item = deleted.pop(old_name)
+            new_item = created.pop(new_name)
+            yield {"change": "renamed", "name": new_name, "old_name": old_name}
+            yield from self.compare_items(
+                new_name, old_item, new_item, self.RENAME_FIELDS
+            )
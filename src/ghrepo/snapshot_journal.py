@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+from typing import ClassVar
+
+from ghrepo.atomic_file import fsync_path, write_text_atomically
+
+
+class SnapshotJournal:
+    """書き込み途中のスナップショットを記録するジャーナル (`journal.json`)。
+
+    `save_snapshot` は書き込みを始める前にスナップショットIDと作成日時を記録し、
+    `snapshots.yaml` と最新リポジトリ一覧の更新まで終えてから消す。起動時にジャーナルが残っていれば
+    前回の書き込みが途中で止まったことが分かるため、ディレクトリを走査せずに後始末できる。
+    """
+
+    FILE_NAME: ClassVar[str] = "journal.json"
+
+    def __init__(self, user_dir: Path) -> None:
+        """対象ユーザーの保存ルートディレクトリを保持する。"""
+        self.path: Path = user_dir / self.FILE_NAME
+
+    def begin(self, snapshot_id: int, timestamp: str) -> None:
+        """書き込みを始めるスナップショットを記録する。"""
+        write_text_atomically(
+            self.path, json.dumps({"snapshot-id": snapshot_id, "timestamp": timestamp})
+        )
+
+    def read(self, clear_invalid: bool = True) -> tuple[int, str] | None:
+        """書き込み途中のスナップショットIDと作成日時を返す。無ければ `None` を返す。
+
+        壊れたジャーナルは `begin` の書き込み途中 (まだ何も書いていない) とみなして `None` を返す。
+        `clear_invalid` が真ならそのジャーナルを消す。
+        """
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError):
+            data = None
+        snapshot_id = data.get("snapshot-id") if isinstance(data, dict) else None
+        timestamp = data.get("timestamp") if isinstance(data, dict) else None
+        if not isinstance(snapshot_id, int) or not isinstance(timestamp, str):
+            if clear_invalid:
+                self.clear()
+            return None
+        return snapshot_id, timestamp
+
+    def clear(self) -> None:
+        """ジャーナルを消し、書き込みの完了を確定させる。"""
+        self.path.unlink(missing_ok=True)
+        fsync_path(self.path.parent)
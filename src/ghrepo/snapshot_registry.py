@@ -0,0 +1,175 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar, cast
+
+from ghrepo.atomic_file import write_text_atomically
+
+if TYPE_CHECKING:
+    # `SnapshotStore` が公開済みスナップショットIDを台帳から読むため、実行時には import しない
+    from ghrepo.snapshot_store import SnapshotStore
+
+type RegistryEntry = dict[str, Any]
+
+
+class SnapshotRegistry:
+    """コミット済みスナップショットの台帳 (`registry.json`)。
+
+    最新のスナップショットIDと、スナップショットごとのレコード数・本体ファイルのバイト数・
+    SHA-256 ハッシュを持つ。最新IDや次回IDはこのファイルを 1 回読むだけで分かるため、
+    `snapshots/` の走査は台帳が無いときと `fix` での修復時だけで済む。
+
+    `save_snapshot` (`_record_snapshot`) と `convert` がロック下で更新する。`prune` でアーカイブした
+    スナップショットも台帳に残す (値はアーカイブ前の本体のもの)。
+    """
+
+    FILE_NAME: ClassVar[str] = "registry.json"
+    VERSION: ClassVar[int] = 1
+    HASH_CHUNK_SIZE: ClassVar[int] = 1 << 20  # ハッシュ計算で一度に読むバイト数
+
+    def __init__(self, user_dir: Path) -> None:
+        """対象ユーザーの保存ルートディレクトリを保持する。台帳は必要になるまで読まない。"""
+        self.path: Path = user_dir / self.FILE_NAME
+        self._entries: dict[int, RegistryEntry] | None = None
+        self._latest_id: int | None = None
+
+    def exists(self) -> bool:
+        """台帳ファイルがあり、読み込めるか判定する。"""
+        return self._load() is not None
+
+    def _load(self) -> dict[int, RegistryEntry] | None:
+        """台帳を読み込む。無い、壊れている、または版が異なれば `None` を返す。"""
+        if self._entries is not None:
+            return self._entries
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return None
+        snapshots = data.get("snapshots")
+        if not isinstance(snapshots, dict):
+            return None
+        entries: dict[int, RegistryEntry] = {}
+        for key, value in snapshots.items():
+            try:
+                snapshot_id = int(key)
+            except ValueError:
+                continue
+            if snapshot_id > 0 and isinstance(value, dict):
+                entries[snapshot_id] = cast(RegistryEntry, value)
+        latest_id = data.get("latest")
+        self._entries = dict(sorted(entries.items()))
+        self._latest_id = latest_id if isinstance(latest_id, int) else max(entries, default=None)
+        return self._entries
+
+    def _save(self, entries: dict[int, RegistryEntry]) -> None:
+        """台帳を一時ファイル経由で書き出す。"""
+        entries = dict(sorted(entries.items()))
+        latest_id = max(entries, default=None)
+        write_text_atomically(
+            self.path,
+            json.dumps(
+                {
+                    "version": self.VERSION,
+                    "latest": latest_id,
+                    "snapshots": {str(key): value for key, value in entries.items()},
+                },
+                ensure_ascii=False,
+            ),
+        )
+        self._entries = entries
+        self._latest_id = latest_id
+
+    def get_latest_id(self) -> int | None:
+        """最新のスナップショットIDを返す。台帳が無い、または空なら `None` を返す。"""
+        if self._load() is None:
+            return None
+        return self._latest_id
+
+    def collect_snapshot_ids(self) -> list[int] | None:
+        """台帳にあるスナップショットIDを昇順で返す。台帳が無ければ `None` を返す。"""
+        entries = self._load()
+        return None if entries is None else list(entries)
+
+    def get_entry(self, snapshot_id: int) -> RegistryEntry | None:
+        """スナップショットのレコード数・バイト数・ハッシュを返す。"""
+        entries = self._load()
+        return None if entries is None else entries.get(snapshot_id)
+
+    @classmethod
+    def hash_file(cls, path: Path) -> str:
+        """ファイル内容の SHA-256 ハッシュを返す。"""
+        digest = hashlib.sha256()
+        with path.open("rb") as file:
+            while chunk := file.read(cls.HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @classmethod
+    def describe(
+        cls,
+        snapshot_store: SnapshotStore,
+        snapshot_id: int,
+        record_count: int | None = None,
+    ) -> RegistryEntry:
+        """スナップショット本体 (またはマニフェスト) から台帳の値を求める。
+
+        `record_count` を省略するとスナップショットを読み込んで数える。
+
+        Raises:
+            FileNotFoundError: スナップショットが存在しない場合。
+        """
+        found = snapshot_store.find_file(
+            snapshot_id, snapshot_store.MANIFEST_BASE_NAME
+        ) or snapshot_store.find_file(snapshot_id, snapshot_store.SNAPSHOT_BASE_NAME)
+        if found is None:
+            raise FileNotFoundError(f"スナップショットが存在しません: {snapshot_id}")
+        body_path = found[0]
+        if record_count is None:
+            manifest = snapshot_store.read_manifest(snapshot_id)
+            record_count = len(
+                manifest if manifest is not None else snapshot_store.read(snapshot_id)
+            )
+        return {
+            "records": record_count,
+            "bytes": body_path.stat().st_size,
+            "hash": cls.hash_file(body_path),
+        }
+
+    def record(self, snapshot_id: int, entry: RegistryEntry) -> None:
+        """スナップショットの値を記録する。呼び出し側はユーザー単位のロックを保持していること。"""
+        entries = dict(self._load() or {})
+        if entries.get(snapshot_id) == entry and self.path.exists():
+            return
+        entries[snapshot_id] = entry
+        self._save(entries)
+
+    def rebuild(
+        self, snapshot_store: SnapshotStore, snapshot_ids: list[int], dry_run: bool = False
+    ) -> bool:
+        """台帳を `snapshot_ids` に合わせて作り直し、内容が変わったかを返す。
+
+        既存の値はそのまま使い、足りない値だけをスナップショットを読んで求める。本体が台帳と
+        食い違っていても書き換えない (`fix --validate` で報告する)。`fix` から呼ぶ。
+        `dry_run` では書き出さない。呼び出し側はユーザー単位のロックを保持していること。
+        """
+        previous = self._load()
+        current = previous or {}
+        entries: dict[int, RegistryEntry] = {}
+        for snapshot_id in snapshot_ids:
+            entry = current.get(snapshot_id)
+            if entry is not None:
+                entries[snapshot_id] = entry
+                continue
+            if dry_run:
+                entries[snapshot_id] = {}
+                continue
+            try:
+                entries[snapshot_id] = self.describe(snapshot_store, snapshot_id)
+            except (FileNotFoundError, ValueError):
+                continue
+        changed = previous is None or entries != previous
+        if changed and not dry_run:
+            self._save(entries)
+        return changed
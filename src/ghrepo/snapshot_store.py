@@ -0,0 +1,567 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Callable, Iterator, Mapping
+from functools import partial
+from pathlib import Path
+from typing import Any, ClassVar, cast
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.atomic_file import fsync_path, replace_atomically
+from ghrepo.file_lock import FileLock
+from ghrepo.phase_timer import PhaseTimer
+from ghrepo.repo_table import RepoTable
+from ghrepo.snapshot_archive import SnapshotArchive
+from ghrepo.snapshot_codec import SNAPSHOT_CODECS, SnapshotCodec, get_snapshot_codec
+from ghrepo.snapshot_registry import SnapshotRegistry
+
+type RepoItem = dict[str, Any]
+type RepoAssoc = dict[str, RepoItem]
+type SnapshotEntry = tuple[str, str | None, Callable[[], RepoItem]]
+
+
+class SnapshotStore:
+    """`snapshots/<snapshot-id>/` 配下のスナップショットを読み書きする。
+
+    保存形式は 2 種類ある。`plain` は全レコードを `snapshot.<ext>` に書き出す。`dedup` は
+    レコードごとの内容ハッシュをキーにユーザーディレクトリ直下の `objects/` へ 1 度だけ保存し、
+    スナップショットには `name -> ハッシュ` の対応だけを `manifest.<ext>` として書き出す。
+    ファイル種別 (`<ext>`) は `SnapshotCodec` で選ぶ。読み込み側は形式と種別を意識せずに `read` を使う。
+
+    新しいスナップショットは `staging=True` のインスタンスで `snapshots/.staging/<snapshot-id>/` に書き、
+    `publish` でディレクトリごと rename して公開する。読み手が書きかけのスナップショットを見ることはない。
+    取得中のスナップショットIDは `snapshots/.staging/<snapshot-id>.lock` のロックで予約する (`reserve`)。
+
+    `archive` で `snapshots/` から外したスナップショットは `SnapshotArchive` に収まり、読み込み時に
+    必要なものだけを展開する。読み込み側はアーカイブ済みかどうかを意識しなくてよい。
+    """
+
+    SNAPSHOT_BASE_NAME: ClassVar[str] = "snapshot"
+    MANIFEST_BASE_NAME: ClassVar[str] = "manifest"
+    SNAPSHOT_ID_FIELD: ClassVar[str] = "snapshot-id"  # ハッシュ計算から除外する管理用フィールド
+    STAGING_DIR_NAME: ClassVar[str] = ".staging"  # 公開前のスナップショットを書くディレクトリ名
+    RESERVATION_SUFFIX: ClassVar[str] = ".lock"  # スナップショットIDの予約ファイルの拡張子
+
+    def __init__(self, user_dir: Path, staging: bool = False) -> None:
+        """対象ユーザーの保存ルートディレクトリを保持する。
+
+        `staging` を指定すると、スナップショットの読み書き先を公開前の `snapshots/.staging/` にする。
+        """
+        self.user_dir: Path = user_dir
+        self.staging: bool = staging
+        self.published_dir: Path = user_dir / AppConfigx.SNAPSHOT_TOP_DIR_NAME
+        self.snapshots_dir: Path = (
+            self.published_dir / self.STAGING_DIR_NAME if staging else self.published_dir
+        )
+        self.objects_dir: Path = user_dir / AppConfigx.OBJECTS_DIR_NAME
+        self.archive: SnapshotArchive = SnapshotArchive(user_dir)
+
+    @staticmethod
+    def collect_snapshot_ids(snapshots_dir: str | Path) -> list[int]:
+        """スナップショットトップディレクトリ配下の数値ディレクトリ名を昇順で収集する。
+
+        数値に解釈できないディレクトリ名は対象に含めない。
+        """
+        snapshot_top_path = Path(snapshots_dir)
+        if not snapshot_top_path.exists() or not snapshot_top_path.is_dir():
+            return []
+
+        ids: list[int] = []
+        for child_path in snapshot_top_path.iterdir():
+            if not child_path.is_dir():
+                continue
+            try:
+                snapshot_id = int(child_path.name)
+            except ValueError:
+                continue
+            if snapshot_id > 0:
+                ids.append(snapshot_id)
+
+        ids.sort()
+        return ids
+
+    def get_snapshot_dir(self, snapshot_id: int) -> Path:
+        """`snapshots/<snapshot-id>/` のパスを返す。アーカイブ済みなら展開したディレクトリを返す。"""
+        if self.is_archived(snapshot_id):
+            return self.archive.extract(snapshot_id)
+        return self.snapshots_dir / str(snapshot_id)
+
+    def is_archived(self, snapshot_id: int) -> bool:
+        """スナップショットが `snapshots/` に無く、アーカイブにだけあるか判定する。"""
+        return (
+            not self.staging
+            and not (self.snapshots_dir / str(snapshot_id)).is_dir()
+            and self.archive.contains(snapshot_id)
+        )
+
+    def _collect_registered_ids(self) -> list[int]:
+        """台帳 (`registry.json`) にあるスナップショットIDを昇順で返す。
+
+        台帳が無い場合 (台帳導入前のユーザーディレクトリ) だけ `snapshots/` を走査する。
+        """
+        snapshot_ids = SnapshotRegistry(self.user_dir).collect_snapshot_ids()
+        if snapshot_ids is None:
+            return self.collect_snapshot_ids(self.published_dir)
+        return snapshot_ids
+
+    def collect_published_ids(self) -> list[int]:
+        """`snapshots/` にある (アーカイブ済みでない) スナップショットIDを昇順で返す。"""
+        archived_ids = set(self.archive.collect_snapshot_ids())
+        return [
+            snapshot_id
+            for snapshot_id in self._collect_registered_ids()
+            if snapshot_id not in archived_ids
+        ]
+
+    def collect_all_snapshot_ids(self) -> list[int]:
+        """`snapshots/` とアーカイブにあるスナップショットIDを合わせて昇順で返す。"""
+        return sorted(
+            set(self._collect_registered_ids()) | set(self.archive.collect_snapshot_ids())
+        )
+
+    def get_staging_store(self) -> "SnapshotStore":
+        """公開前のスナップショットを読み書きする `SnapshotStore` を返す。"""
+        return SnapshotStore(self.user_dir, staging=True)
+
+    def publish(self, snapshot_id: int) -> None:
+        """`snapshots/.staging/<snapshot-id>/` の内容をディスクへ書き出してから、ディレクトリごと公開する。
+
+        Raises:
+            FileNotFoundError: 公開前のスナップショットが存在しない場合。
+            OSError: 同じ ID のスナップショットが公開済みの場合。
+        """
+        staged_dir = self.get_staging_store().get_snapshot_dir(snapshot_id)
+        if not staged_dir.is_dir():
+            raise FileNotFoundError(f"公開前のスナップショットが存在しません: {staged_dir}")
+        for path in staged_dir.iterdir():
+            fsync_path(path)
+        fsync_path(staged_dir)
+        os.rename(staged_dir, self.published_dir / str(snapshot_id))
+        fsync_path(self.published_dir)
+        try:
+            staged_dir.parent.rmdir()
+        except OSError:  # 他の書きかけが残っている
+            pass
+
+    def discard_staged(self, snapshot_id: int) -> None:
+        """公開前のスナップショットを削除する。無ければ何もしない。"""
+        shutil.rmtree(
+            self.get_staging_store().get_snapshot_dir(snapshot_id), ignore_errors=True
+        )
+
+    def get_reservation_path(self, snapshot_id: int) -> Path:
+        """スナップショットIDの予約ファイル `snapshots/.staging/<snapshot-id>.lock` のパスを返す。"""
+        return (
+            self.published_dir
+            / self.STAGING_DIR_NAME
+            / f"{snapshot_id}{self.RESERVATION_SUFFIX}"
+        )
+
+    def reserve(self, snapshot_id: int) -> FileLock:
+        """スナップショットIDを予約し、予約を表すロックを返す。
+
+        ロックを保持している間、`collect_reserved_ids` はこの ID を返し、`remove_stale_reservations`
+        は消さない。プロセスが異常終了すると OS がロックを解放するため、予約は古いものとして扱われる。
+        呼び出し側はユーザー単位のロックを保持していること。
+        """
+        reservation = FileLock(self.get_reservation_path(snapshot_id))
+        reservation.acquire()
+        return reservation
+
+    def release_reservation(self, snapshot_id: int, reservation: FileLock) -> None:
+        """予約ファイルを消してから予約のロックを解放する。"""
+        self.get_reservation_path(snapshot_id).unlink(missing_ok=True)
+        reservation.release()
+
+    def collect_reserved_ids(self) -> list[int]:
+        """予約ファイルのあるスナップショットIDを昇順で返す。"""
+        staging_dir = self.published_dir / self.STAGING_DIR_NAME
+        if not staging_dir.is_dir():
+            return []
+        reserved_ids: list[int] = []
+        for child_path in staging_dir.glob(f"*{self.RESERVATION_SUFFIX}"):
+            try:
+                reserved_ids.append(int(child_path.stem))
+            except ValueError:
+                continue
+        return sorted(reserved_ids)
+
+    def remove_stale_reservations(self, dry_run: bool = False) -> list[int]:
+        """保持しているプロセスが居なくなった予約と、その書きかけのディレクトリを消す。
+
+        呼び出し側はユーザー単位のロックを保持していること。`dry_run` では消さずに ID だけを返す。
+
+        Returns:
+            消した (`dry_run` では消す対象の) 予約のスナップショットID。
+        """
+        removed_ids: list[int] = []
+        for snapshot_id in self.collect_reserved_ids():
+            reservation = FileLock(self.get_reservation_path(snapshot_id))
+            if not reservation.acquire(blocking=False):
+                continue
+            if dry_run:
+                reservation.release()
+            else:
+                self.discard_staged(snapshot_id)
+                self.release_reservation(snapshot_id, reservation)
+            removed_ids.append(snapshot_id)
+        return removed_ids
+
+    def find_file(
+        self, snapshot_id: int, base_name: str
+    ) -> tuple[Path, SnapshotCodec] | None:
+        """`snapshots/<snapshot-id>/<base_name>.<ext>` を既知のファイル種別から探す。"""
+        snapshot_dir = self.get_snapshot_dir(snapshot_id)
+        for codec in SNAPSHOT_CODECS.values():
+            path = snapshot_dir / f"{base_name}{codec.get_ext()}"
+            if path.exists():
+                return path, codec
+        return None
+
+    def exists(self, snapshot_id: int) -> bool:
+        """指定 ID のスナップショットがいずれかの形式で保存済みか判定する。アーカイブ済みなら展開せずに判定する。"""
+        return (
+            self.is_archived(snapshot_id)
+            or self.find_file(snapshot_id, self.SNAPSHOT_BASE_NAME) is not None
+            or self.find_file(snapshot_id, self.MANIFEST_BASE_NAME) is not None
+        )
+
+    @classmethod
+    def hash_record(cls, item: RepoItem) -> str:
+        """`snapshot-id` を除いたレコード内容から SHA-256 ハッシュを求める。
+
+        スナップショットごとに変わる `snapshot-id` を除くことで、内容が同じレコードは同じハッシュになる。
+        """
+        payload = {
+            key: value for key, value in item.items() if key != cls.SNAPSHOT_ID_FIELD
+        }
+        encoded = json.dumps(
+            payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+        ).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get_object_path(self, record_hash: str) -> Path:
+        """ハッシュに対応するオブジェクトファイルのパスを返す。"""
+        return self.objects_dir / record_hash[:2] / f"{record_hash}.json"
+
+    def _write_object(self, record_hash: str, item: RepoItem) -> None:
+        """レコードをオブジェクトとして書き出す。一時ファイル経由で置き換え、途中状態を残さない。"""
+        object_path = self.get_object_path(record_hash)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            key: value for key, value in item.items() if key != self.SNAPSHOT_ID_FIELD
+        }
+        replace_atomically(
+            object_path,
+            lambda temp_path: temp_path.write_text(
+                json.dumps(payload, ensure_ascii=False, sort_keys=True), encoding="utf-8"
+            ),
+        )
+
+    def _read_object(self, record_hash: str) -> RepoItem:
+        """ハッシュに対応するレコードを読み込む。"""
+        object_path = self.get_object_path(record_hash)
+        if not object_path.exists():
+            raise FileNotFoundError(f"スナップショットのオブジェクトが存在しません: {object_path}")
+        return cast(RepoItem, json.loads(object_path.read_text(encoding="utf-8")))
+
+    def read_manifest(self, snapshot_id: int) -> dict[str, str] | None:
+        """`dedup` 形式のマニフェスト (`name -> ハッシュ`) を返す。`plain` 形式なら `None` を返す。"""
+        found = self.find_file(snapshot_id, self.MANIFEST_BASE_NAME)
+        if found is None:
+            return None
+        manifest_path, codec = found
+        return {
+            str(name): str(record_hash)
+            for name, record_hash in codec.load(manifest_path).items()
+        }
+
+    def read(self, snapshot_id: int) -> RepoAssoc:
+        """スナップショットを読み込み、リポジトリ名をキーとする辞書として返す。
+
+        Raises:
+            FileNotFoundError: スナップショットまたは参照先オブジェクトが存在しない場合。
+            ValueError: ファイルの形式が不正な場合。
+        """
+        with PhaseTimer.phase("snapshot_read") as phase:
+            manifest = self.read_manifest(snapshot_id)
+            if manifest is not None:
+                assoc: RepoAssoc = {}
+                for name, record_hash in manifest.items():
+                    item = self._read_object(record_hash)
+                    item[self.SNAPSHOT_ID_FIELD] = snapshot_id
+                    assoc[name] = item
+                phase.add(records=len(assoc))
+                return assoc
+
+            found = self.find_file(snapshot_id, self.SNAPSHOT_BASE_NAME)
+            if found is None:
+                snapshot_path = self.get_snapshot_dir(snapshot_id) / f"{self.SNAPSHOT_BASE_NAME}.yaml"
+                raise FileNotFoundError(f"リポジトリ一覧スナップショットファイルが存在しません: {snapshot_path}")
+            snapshot_path, codec = found
+            assoc = {
+                key: cast(RepoItem, value)
+                for key, value in codec.load(snapshot_path).items()
+                if isinstance(key, str) and isinstance(value, dict)
+            }
+            phase.add(records=len(assoc), bytes_read=snapshot_path.stat().st_size)
+            return assoc
+
+    def read_subset(self, snapshot_id: int, names: list[str]) -> RepoAssoc:
+        """スナップショットから指定名のレコードだけを `names` の順に返す。
+
+        `dedup` 形式では該当オブジェクトだけを読むため、全件を読み込まない。`plain` 形式でも
+        `iter_entries` で 1 件ずつ読み、該当しないレコードは保持しない。
+        """
+        manifest = self.read_manifest(snapshot_id)
+        if manifest is None:
+            wanted = set(names)
+            with PhaseTimer.phase("snapshot_read") as phase:
+                found = {
+                    name: load()
+                    for name, _, load in self.iter_entries(snapshot_id)
+                    if name in wanted
+                }
+                phase.add(records=len(found))
+            return {name: found[name] for name in names if name in found}
+
+        subset: RepoAssoc = {}
+        for name in names:
+            record_hash = manifest.get(name)
+            if record_hash is None:
+                continue
+            item = self._read_object(record_hash)
+            item[self.SNAPSHOT_ID_FIELD] = snapshot_id
+            subset[name] = item
+        return subset
+
+    def read_table(self, snapshot_id: int) -> RepoTable:
+        """スナップショットを 1 件ずつ読みながら `RepoTable` に取り込んで返す。
+
+        全件を長く保持する場所 (常駐プロセスのキャッシュ) 向け。内容は `read` と同じ。
+
+        Raises:
+            FileNotFoundError: スナップショットまたは参照先オブジェクトが存在しない場合。
+            ValueError: ファイルの形式が不正な場合。
+        """
+        table = RepoTable()
+        with PhaseTimer.phase("snapshot_read") as phase:
+            for name, record_hash, load in self.iter_entries(snapshot_id):
+                item = load()
+                if record_hash is not None:
+                    item[self.SNAPSHOT_ID_FIELD] = snapshot_id
+                table.add(name, item)
+            phase.add(records=len(table))
+        return table
+
+    def iter_entries(self, snapshot_id: int) -> Iterator[SnapshotEntry]:
+        """スナップショットのレコードを名前順に `(名前, ハッシュ, 読み込み関数)` で返す。
+
+        `dedup` 形式ではマニフェストのハッシュを返し、レコード本体は読み込み関数を呼んだときだけ読む。
+        `plain` 形式ではハッシュは `None` で、ファイル種別が対応していれば逐次読み込む。
+
+        Raises:
+            FileNotFoundError: スナップショットが存在しない場合。
+        """
+        manifest = self.read_manifest(snapshot_id)
+        if manifest is not None:
+            for name in sorted(manifest):
+                record_hash = manifest[name]
+                yield name, record_hash, partial(self._read_object, record_hash)
+            return
+
+        found = self.find_file(snapshot_id, self.SNAPSHOT_BASE_NAME)
+        if found is None:
+            snapshot_path = self.get_snapshot_dir(snapshot_id) / f"{self.SNAPSHOT_BASE_NAME}.yaml"
+            raise FileNotFoundError(f"リポジトリ一覧スナップショットファイルが存在しません: {snapshot_path}")
+        snapshot_path, codec = found
+        for name, value in codec.iter_items(snapshot_path):
+            if isinstance(value, dict):
+                yield name, None, partial(dict, cast(RepoItem, value))
+
+    def get_fingerprint(self, snapshot_id: int) -> dict[str, Any] | None:
+        """スナップショット本体 (またはマニフェスト) のファイル名・更新時刻・サイズを返す。
+
+        派生ファイル (検索インデックス等) が元データと一致しているかの判定に使う。
+        アーカイブ済みならアーカイブ前の値を返すため、派生ファイルを作り直さずに済む。
+        """
+        if self.is_archived(snapshot_id):
+            return self.archive.get_fingerprint(snapshot_id)
+        found = self.find_file(snapshot_id, self.MANIFEST_BASE_NAME) or self.find_file(
+            snapshot_id, self.SNAPSHOT_BASE_NAME
+        )
+        if found is None:
+            return None
+        stat_result = found[0].stat()
+        return {
+            "file": found[0].name,
+            "mtime_ns": stat_result.st_mtime_ns,
+            "size": stat_result.st_size,
+        }
+
+    def _remove_files(self, snapshot_dir: Path, keep: Path) -> None:
+        """`keep` 以外の種別で書かれた同じスナップショットのファイルを削除する。"""
+        for base_name in (self.SNAPSHOT_BASE_NAME, self.MANIFEST_BASE_NAME):
+            for codec in SNAPSHOT_CODECS.values():
+                path = snapshot_dir / f"{base_name}{codec.get_ext()}"
+                if path != keep and path.exists():
+                    path.unlink()
+
+    def _write_dedup(
+        self, snapshot_dir: Path, assoc: Mapping[str, RepoItem], codec: SnapshotCodec
+    ) -> int:
+        """未保存のレコードだけをオブジェクトとして書き出し、マニフェストを出力する。
+
+        台帳で直前のスナップショットを探し、そのマニフェストにあるハッシュは保存済みとみなして存在確認も省く。
+
+        Returns:
+            新たに書き出したオブジェクト数。
+        """
+        known_hashes: set[str] = set()
+        previous_ids = [
+            snapshot_id
+            for snapshot_id in self.collect_published_ids()
+            if snapshot_dir.name != str(snapshot_id)
+        ]
+        if previous_ids:
+            previous_manifest = SnapshotStore(self.user_dir).read_manifest(max(previous_ids))
+            if previous_manifest is not None:
+                known_hashes.update(previous_manifest.values())
+
+        manifest: dict[str, str] = {}
+        written_count = 0
+        for name, item in assoc.items():
+            record_hash = self.hash_record(item)
+            manifest[name] = record_hash
+            if record_hash in known_hashes:
+                continue
+            known_hashes.add(record_hash)
+            if not self.get_object_path(record_hash).exists():
+                self._write_object(record_hash, item)
+                written_count += 1
+
+        manifest_path = snapshot_dir / f"{self.MANIFEST_BASE_NAME}{codec.get_ext()}"
+        replace_atomically(
+            manifest_path,
+            lambda temp_path: codec.dump(manifest, temp_path),
+        )
+        self._remove_files(snapshot_dir, manifest_path)
+        return written_count
+
+    def write(
+        self,
+        snapshot_id: int,
+        assoc: Mapping[str, RepoItem],
+        storage: str,
+        file_type: str = AppConfigx.default_snapshot_format,
+    ) -> None:
+        """スナップショットを指定形式・ファイル種別で書き出す。
+
+        各ファイルは一時ファイルに書いてから置き換えるため、読み手が書きかけのファイルを見ることはない。
+        同じスナップショットが別の種別で保存済みなら、書き出し後にそのファイルを削除する。
+
+        Args:
+            snapshot_id: 書き出し先のスナップショットID。
+            assoc: リポジトリ名をキーとする取得結果。
+            storage: `AppConfigx.SNAPSHOT_STORAGE_PLAIN` または `AppConfigx.SNAPSHOT_STORAGE_DEDUP`。
+            file_type: `AppConfigx.snapshot_formats` のいずれか。
+
+        Raises:
+            ValueError: `storage` または `file_type` が未知の値の場合。
+        """
+        codec = get_snapshot_codec(file_type)
+        snapshot_dir = self.snapshots_dir / str(snapshot_id)
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        if storage == AppConfigx.SNAPSHOT_STORAGE_PLAIN:
+            snapshot_path = snapshot_dir / f"{self.SNAPSHOT_BASE_NAME}{codec.get_ext()}"
+            replace_atomically(
+                snapshot_path,
+                lambda temp_path: codec.dump(assoc, temp_path),
+            )
+            self._remove_files(snapshot_dir, snapshot_path)
+        elif storage == AppConfigx.SNAPSHOT_STORAGE_DEDUP:
+            self._write_dedup(snapshot_dir, assoc, codec)
+        else:
+            raise ValueError(f"unsupported snapshot storage: {storage}")
+
+    def archive_snapshots(self, snapshot_ids: list[int]) -> str:
+        """スナップショットを 1 つのアーカイブへ収め、`snapshots/` から消す。
+
+        `dedup` 形式のスナップショットは全レコードを `snapshot.<ext>` に書き出してから収めるため、
+        アーカイブは `objects/` を参照しない (`remove_unreferenced_objects` で消せるようになる)。
+        アーカイブとカタログを書き終えてからディレクトリを消すので、途中で止まっても読めなくならない。
+        呼び出し側はユーザー単位のロックを保持していること。
+
+        Returns:
+            作成したアーカイブのファイル名。
+
+        Raises:
+            FileNotFoundError: 対象のスナップショットが `snapshots/` に存在しない場合。
+        """
+        self.archive.archive_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.archive.archive_dir) as work_dir:
+            sources: dict[int, tuple[Path, dict[str, Any] | None]] = {}
+            for snapshot_id in snapshot_ids:
+                snapshot_dir = self.published_dir / str(snapshot_id)
+                if not snapshot_dir.is_dir() or not self.exists(snapshot_id):
+                    raise FileNotFoundError(f"スナップショットが存在しません: {snapshot_dir}")
+                fingerprint = self.get_fingerprint(snapshot_id)
+                found = self.find_file(snapshot_id, self.MANIFEST_BASE_NAME)
+                if found is None:
+                    sources[snapshot_id] = (snapshot_dir, fingerprint)
+                    continue
+
+                source_dir = Path(work_dir) / str(snapshot_id)
+                source_dir.mkdir()
+                codec = found[1]
+                codec.dump(
+                    self.read(snapshot_id),
+                    source_dir / f"{self.SNAPSHOT_BASE_NAME}{codec.get_ext()}",
+                )
+                for file_path in snapshot_dir.iterdir():
+                    if file_path.is_file() and file_path != found[0]:
+                        shutil.copy2(file_path, source_dir / file_path.name)
+                sources[snapshot_id] = (source_dir, fingerprint)
+            pack_name = self.archive.add(sources)
+
+        for snapshot_id in snapshot_ids:
+            shutil.rmtree(self.published_dir / str(snapshot_id))
+        fsync_path(self.published_dir)
+        return pack_name
+
+    def remove_unreferenced_objects(self, dry_run: bool = False) -> int:
+        """`snapshots/` のどのマニフェストからも参照されないオブジェクトを消し、その件数を返す。
+
+        アーカイブ済みのスナップショットはオブジェクトを参照しないため、`snapshots/` だけを見ればよい。
+        対象のスナップショットは台帳から決めるので、呼び出し側はユーザー単位のロックを保持し、
+        中断された `save_snapshot` を後始末してから呼ぶこと。空になった `objects/<先頭2文字>/` も消す。
+        `dry_run` では消さずに数える。
+        """
+        if not self.objects_dir.is_dir():
+            return 0
+        referenced: set[str] = set()
+        for snapshot_id in self.collect_published_ids():
+            manifest = self.read_manifest(snapshot_id)
+            if manifest is not None:
+                referenced.update(manifest.values())
+
+        removed_count = 0
+        with os.scandir(self.objects_dir) as fan_out_entries:
+            for fan_out_entry in fan_out_entries:
+                if not fan_out_entry.is_dir(follow_symlinks=False):
+                    continue
+                remaining = 0
+                with os.scandir(fan_out_entry.path) as object_entries:
+                    for object_entry in object_entries:
+                        record_hash = object_entry.name.split(".", 1)[0]
+                        if record_hash in referenced:
+                            remaining += 1
+                            continue
+                        if not dry_run:
+                            os.unlink(object_entry.path)
+                        removed_count += 1
+                if remaining == 0 and not dry_run:
+                    os.rmdir(fan_out_entry.path)
+        return removed_count
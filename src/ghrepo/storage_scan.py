@@ -0,0 +1,197 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import ClassVar
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_codec import SNAPSHOT_CODECS
+from ghrepo.snapshot_registry import SnapshotRegistry
+from ghrepo.snapshot_store import SnapshotStore
+
+
+class StorageScan:
+    """ユーザーディレクトリを `os.scandir` で 1 回だけ走査し、`fix` に必要な情報をまとめたもの。
+
+    `snapshots/<snapshot-id>/` はファイル名だけを読み (スナップショット単位で並列化できる)、
+    `objects/<先頭2文字>/` は空かどうかだけを最初の 1 件で判定するため、オブジェクト数に比例しない。
+    それ以外のディレクトリは再帰的に走査する。
+
+    本体の無いスナップショットに残った検索用インデックスは削除対象として扱い、それを消すと空になる
+    ディレクトリも空ディレクトリに数える。
+    """
+
+    BODY_FILE_NAMES: ClassVar[frozenset[str]] = frozenset(
+        f"{base_name}{codec.get_ext()}"
+        for base_name in (SnapshotStore.SNAPSHOT_BASE_NAME, SnapshotStore.MANIFEST_BASE_NAME)
+        for codec in SNAPSHOT_CODECS.values()
+    )
+
+    def __init__(self, user_dir: Path) -> None:
+        """走査対象のユーザーディレクトリを保持する。結果は `scan` で埋める。"""
+        self.user_dir: Path = user_dir
+        self.snapshots_dir: Path = user_dir / AppConfigx.SNAPSHOT_TOP_DIR_NAME
+        self.objects_dir: Path = user_dir / AppConfigx.OBJECTS_DIR_NAME
+        self.snapshot_files: dict[int, frozenset[str]] = {}
+        self.orphan_indexes: list[Path] = []
+        self.empty_dirs: list[Path] = []  # 末端から順に並ぶ
+
+    @classmethod
+    def scan(cls, user_dir: Path, max_workers: int = 1) -> "StorageScan":
+        """ユーザーディレクトリを走査した結果を返す。
+
+        Args:
+            user_dir: 対象ユーザーの保存ルートディレクトリ。
+            max_workers: スナップショットディレクトリを並行して読むスレッド数。
+        """
+        storage_scan = cls(user_dir)
+        if user_dir.is_dir():
+            storage_scan._scan_dir(user_dir, max_workers)
+        return storage_scan
+
+    @property
+    def snapshot_ids(self) -> list[int]:
+        """`snapshots/` 配下の数値ディレクトリ名を昇順で返す。"""
+        return sorted(self.snapshot_files)
+
+    def has_body(self, snapshot_id: int) -> bool:
+        """スナップショット本体 (`snapshot.<ext>` または `manifest.<ext>`) があるか。"""
+        return not self.BODY_FILE_NAMES.isdisjoint(self.snapshot_files.get(snapshot_id, ()))
+
+    def get_live_snapshot_ids(self) -> list[int]:
+        """孤立したインデックスを消した後も残るスナップショットディレクトリの ID を昇順で返す。"""
+        empty = set(self.empty_dirs)
+        return [
+            snapshot_id
+            for snapshot_id in self.snapshot_ids
+            if self.snapshots_dir / str(snapshot_id) not in empty
+        ]
+
+    @staticmethod
+    def _list_dir(path: Path) -> list[os.DirEntry[str]]:
+        """ディレクトリの直下を返す。読めなければ空リストを返す。"""
+        try:
+            with os.scandir(path) as entries:
+                return list(entries)
+        except OSError:
+            return []
+
+    @staticmethod
+    def _is_empty(path: Path) -> bool:
+        """最初の 1 件だけを読んで空ディレクトリか判定する。"""
+        try:
+            with os.scandir(path) as entries:
+                return next(entries, None) is None
+        except OSError:
+            return False
+
+    def _scan_dir(self, path: Path, max_workers: int) -> bool:
+        """ディレクトリを走査し、削除後に空になるなら `True` を返す (自身も `empty_dirs` に加える)。"""
+        if path == self.objects_dir:
+            return self._scan_objects_dir(path)
+        if path == self.snapshots_dir:
+            return self._scan_snapshots_dir(path, max_workers)
+
+        remaining = 0
+        for entry in self._list_dir(path):
+            if entry.is_dir(follow_symlinks=False):
+                if self._scan_dir(Path(entry.path), max_workers):
+                    continue
+            remaining += 1
+        return self._mark_if_empty(path, remaining)
+
+    def _mark_if_empty(self, path: Path, remaining: int) -> bool:
+        """残るエントリが無ければ `empty_dirs` に加える。ユーザーディレクトリ自身は対象外。"""
+        if remaining > 0 or path == self.user_dir:
+            return False
+        self.empty_dirs.append(path)
+        return True
+
+    def _scan_objects_dir(self, path: Path) -> bool:
+        """`objects/<先頭2文字>/` は空かどうかだけを判定する。"""
+        remaining = 0
+        for entry in self._list_dir(path):
+            if entry.is_dir(follow_symlinks=False) and self._is_empty(Path(entry.path)):
+                self.empty_dirs.append(Path(entry.path))
+                continue
+            remaining += 1
+        return self._mark_if_empty(path, remaining)
+
+    def _scan_snapshots_dir(self, path: Path, max_workers: int) -> bool:
+        """`snapshots/<snapshot-id>/` のファイル名を (必要なら並行して) 読み、それ以外は再帰的に走査する。"""
+        snapshot_entries: dict[int, Path] = {}
+        remaining = 0
+        for entry in self._list_dir(path):
+            if not entry.is_dir(follow_symlinks=False):
+                remaining += 1
+                continue
+            try:
+                snapshot_entries[int(entry.name)] = Path(entry.path)
+            except ValueError:
+                if not self._scan_dir(Path(entry.path), max_workers):
+                    remaining += 1
+
+        snapshot_ids = sorted(snapshot_entries)
+        paths = [snapshot_entries[snapshot_id] for snapshot_id in snapshot_ids]
+        if max_workers > 1 and len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                listings = list(executor.map(self._list_dir, paths))
+        else:
+            listings = [self._list_dir(snapshot_path) for snapshot_path in paths]
+
+        for snapshot_id, snapshot_path, entries in zip(snapshot_ids, paths, listings):
+            names = frozenset(entry.name for entry in entries)
+            self.snapshot_files[snapshot_id] = names
+            left = len(names)
+            if SearchIndex.INDEX_FILE_NAME in names and not self.has_body(snapshot_id):
+                self.orphan_indexes.append(snapshot_path / SearchIndex.INDEX_FILE_NAME)
+                left -= 1
+            subdirs = [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+            for entry in subdirs:
+                if self._scan_dir(Path(entry.path), max_workers):
+                    left -= 1
+            if not self._mark_if_empty(snapshot_path, left):
+                remaining += 1
+        return self._mark_if_empty(path, remaining)
+
+    def remove_orphan_indexes(self) -> int:
+        """本体の無いスナップショットに残った検索用インデックスを削除し、削除件数を返す。"""
+        removed_count = 0
+        for index_path in self.orphan_indexes:
+            try:
+                index_path.unlink()
+                removed_count += 1
+            except FileNotFoundError:
+                continue
+        return removed_count
+
+    def remove_empty_dirs(self) -> int:
+        """空ディレクトリを末端から削除し、削除件数を返す。走査後に中身が増えたものは残す。"""
+        removed_count = 0
+        for directory_path in self.empty_dirs:
+            try:
+                directory_path.rmdir()
+                removed_count += 1
+            except OSError:
+                continue
+        return removed_count
+
+
+def validate_snapshot(
+    user_dir: str, snapshot_id: int, expected_hash: str | None = None
+) -> str | None:
+    """スナップショットを最後まで読み込めるか確かめ、読めなければ理由を返す。
+
+    `expected_hash` を与えると、本体 (またはマニフェスト) のハッシュが台帳と一致するかも確かめる。
+    `fix --validate` がプロセスプールから呼ぶため、モジュールの最上位に置く。
+    """
+    snapshot_store = SnapshotStore(Path(user_dir))
+    try:
+        snapshot_store.read(snapshot_id)
+        if expected_hash is not None:
+            actual_hash = SnapshotRegistry.describe(snapshot_store, snapshot_id, 0)["hash"]
+            if actual_hash != expected_hash:
+                return f"台帳のハッシュと一致しません: {actual_hash}"
+    except Exception as exc:  # 形式ごとに送出する例外の型が異なる
+        return f"{type(exc).__name__}: {exc}"
+    return None
@@ -0,0 +1,42 @@
+"""テスト共通のフィクスチャ。"""
+
+from pathlib import Path
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.command_setup import CommandSetup
+from ghrepo.ghrepo import Ghrepo
+
+
+@pytest.fixture
+def command_list(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> CommandList:
+    """`tmp_path` をホームディレクトリとして `setup` 済みの `alice` の `CommandList` を返す。"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("XDG_CONFIG_HOME", "XDG_DATA_HOME", "XDG_CACHE_HOME"):
+        monkeypatch.delenv(name, raising=False)
+    appstore = Ghrepo.init_appstore("alice")
+    CommandSetup(appstore).run(AppConfigx.key, AppConfigx.default_json_fields)
+    appstore.load_file_all()
+    command = CommandList(appstore, ["name", "visibility"], "alice")
+    assert tmp_path in command.get_user_dir().parents
+    return command
+
+
+@pytest.fixture
+def old_config_command_list(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> CommandList:
+    """`JSON_FIELDS` と `USER` だけの (保存形式等の設定項目が入る前の `setup` で作った) 設定ファイルを持つ `alice` の `CommandList` を返す。"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("XDG_CONFIG_HOME", "XDG_DATA_HOME", "XDG_CACHE_HOME"):
+        monkeypatch.delenv(name, raising=False)
+    appstore = Ghrepo.init_appstore("alice")
+    appstore.output_config(
+        "config", {AppConfigx.key: AppConfigx.default_json_fields, "USER": "alice"}
+    )
+    appstore.output_db(AppConfigx.BASE_NAME_REPOS, {})
+    appstore.output_db(AppConfigx.BASE_NAME_SNAPSHOTS, {})
+    appstore.load_file_all()
+    return CommandList(appstore, ["name", "visibility"], "alice")
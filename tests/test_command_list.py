@@ -0,0 +1,203 @@
+"""`CommandList` の取得結果の組み立て (管理用フィールドの付与)・差分取得と保存のテスト。
+
+`gh` は起動せず、`RepoFetcher(runner=...)` に渡した偽の `gh` が GraphQL 応答と同じ形の JSON を返す。
+"""
+
+import argparse
+import json
+import re
+from typing import Any
+
+from ghrepo.annotated_repos import AnnotatedRepos
+from ghrepo.command_list import CommandList
+from ghrepo.repo_fetcher import RepoFetcher
+
+TIMESTAMP = "2024-03-15T12:00:00+00:00"
+
+
+def make_args(**overrides: Any) -> argparse.Namespace:
+    """`list` サブコマンドの引数を返す。"""
+    values: dict[str, Any] = {"user": "alice", "json": None, "limit": None}
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def make_fetcher(nodes: list[dict[str, Any]]) -> RepoFetcher:
+    """`nodes` を 1 ページで返す偽の `gh` を使う `RepoFetcher` を返す。"""
+    connection = {"nodes": nodes, "pageInfo": {"hasNextPage": False, "endCursor": None}}
+    output = json.dumps({"data": {"repositoryOwner": {"repositories": connection}}})
+    return RepoFetcher(runner=lambda command_args: output)
+
+
+class FakeGitHub:
+    """`repos` をそのまま返す偽の `gh`。一覧はページ送りせず 1 ページで返し、名前指定の取得を記録する。"""
+
+    ALIAS_PATTERN = re.compile(
+        r'(r\d+): repository\(owner: "([^"]*)", name: "([^"]*)"\)'
+    )
+
+    def __init__(self, repos: dict[str, dict[str, Any]]) -> None:
+        self.repos = repos
+        self.list_count = 0
+        self.fetched_names: list[str] = []
+
+    def __call__(self, command_args: list[str]) -> str:
+        query = next(arg for arg in command_args if arg.startswith("query="))
+        aliases = self.ALIAS_PATTERN.findall(query)
+        if not aliases:
+            self.list_count += 1
+            connection = {
+                "nodes": [dict(node) for node in self.repos.values()],
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+            }
+            return json.dumps(
+                {"data": {"repositoryOwner": {"repositories": connection}}}
+            )
+        data: dict[str, Any] = {}
+        for alias, _owner, name in aliases:
+            self.fetched_names.append(name)
+            node = self.repos.get(name)
+            data[alias] = dict(node) if node is not None else None
+        return json.dumps({"data": data})
+
+
+def make_repo(
+    name: str, updated_at: str, visibility: str = "PUBLIC", description: str = ""
+) -> dict[str, Any]:
+    """GraphQL 応答のリポジトリ 1 件を返す。"""
+    return {
+        "name": name,
+        "nameWithOwner": f"alice/{name}",
+        "visibility": visibility,
+        "updatedAt": updated_at,
+        "pushedAt": None,
+        "description": description,
+    }
+
+
+def fetch_incremental(
+    command: CommandList, github: FakeGitHub
+) -> tuple[int, AnnotatedRepos, str]:
+    """`list --incremental` と同じ手順で差分取得・保存・水位の記録を行う。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        repos, watermark = command.get_incremental_repos(
+            make_args(), command.appstore, snapshot_id, RepoFetcher(runner=github)
+        )
+        command.save_snapshot(snapshot_id, TIMESTAMP, repos)
+        command.save_watermark("alice", watermark, snapshot_id)
+    return snapshot_id, repos, watermark
+
+
+def test_incremental_without_watermark_fetches_everything(
+    command_list: CommandList,
+) -> None:
+    github = FakeGitHub(
+        {
+            "a": make_repo("a", "2024-01-03T00:00:00Z"),
+            "b": make_repo("b", "2024-01-01T00:00:00Z"),
+        }
+    )
+
+    snapshot_id, repos, watermark = fetch_incremental(command_list, github)
+
+    assert sorted(repos) == ["a", "b"]
+    assert repos["a"]["snapshot-id"] == snapshot_id
+    assert watermark == "2024-01-03T00:00:00Z"
+    assert github.list_count == 1
+    assert github.fetched_names == []
+    assert command_list.load_watermark("alice") == (watermark, snapshot_id)
+
+
+def test_incremental_refetches_changed_and_drops_deleted(
+    command_list: CommandList,
+) -> None:
+    github = FakeGitHub(
+        {
+            "a": make_repo("a", "2024-01-03T00:00:00Z"),
+            "b": make_repo("b", "2024-01-02T00:00:00Z"),
+            "c": make_repo("c", "2024-01-01T00:00:00Z"),
+            "e": make_repo("e", "2024-01-01T00:00:00Z"),
+            "f": make_repo("f", "2024-01-01T00:00:00Z", description="old"),
+        }
+    )
+    first_id, _repos, _watermark = fetch_incremental(command_list, github)
+
+    # b は更新、c は削除、d は新規 (水位より古い)、e は可視性だけ変更、
+    # f は一覧に現れない項目だけ変わったが更新日時は古いまま
+    del github.repos["c"]
+    github.repos["b"] = make_repo("b", "2024-02-01T00:00:00Z", description="new")
+    github.repos["d"] = make_repo("d", "2023-06-01T00:00:00Z")
+    github.repos["e"] = make_repo("e", "2024-01-01T00:00:00Z", "PRIVATE")
+    github.repos["f"] = make_repo("f", "2024-01-01T00:00:00Z", description="changed")
+    github.list_count = 0
+
+    snapshot_id, repos, watermark = fetch_incremental(command_list, github)
+
+    assert github.list_count == 1
+    # 水位と同じ更新日時の a も、同じ秒の更新を取りこぼさないよう取り直す
+    assert sorted(github.fetched_names) == ["a", "b", "d", "e"]
+    assert sorted(repos) == ["a", "b", "d", "e", "f"]
+    assert repos["b"]["description"] == "new"
+    assert repos["e"]["visibility"] == "private"
+    # 取り直さなかった f は前回のレコードを引き継ぎ、管理用フィールドは今回のものになる
+    assert repos["f"]["description"] == "old"
+    assert repos["f"]["snapshot-id"] == snapshot_id != first_id
+    assert watermark == "2024-02-01T00:00:00Z"
+    saved = command_list.get_snapshot_store().read(snapshot_id)
+    assert saved == dict(repos.items())
+    assert command_list.load_watermark("alice") == (watermark, snapshot_id)
+
+
+def test_incremental_falls_back_when_previous_snapshot_is_missing(
+    command_list: CommandList,
+) -> None:
+    github = FakeGitHub({"a": make_repo("a", "2024-01-01T00:00:00Z")})
+    command_list.save_watermark("alice", "2024-01-01T00:00:00Z", 99)
+
+    _snapshot_id, repos, _watermark = fetch_incremental(command_list, github)
+
+    assert sorted(repos) == ["a"]
+    assert github.fetched_names == []
+
+
+def test_annotated_repos_merges_annotations_on_read() -> None:
+    records = {"a": {"name": "a", "snapshot-id": 1, "valid": False}}
+    annotations = CommandList.get_annotations(2)
+    repos = AnnotatedRepos(records, annotations)
+
+    assert repos["a"] == {"name": "a", **annotations}
+    assert dict(repos.items()) == {"a": {"name": "a", **annotations}}
+    assert list(repos) == ["a"] and len(repos) == 1 and "a" in repos
+    # 読み出しても元のレコードは変わらない
+    assert records == {"a": {"name": "a", "snapshot-id": 1, "valid": False}}
+    repos["a"]["name"] = "changed"
+    assert repos["a"]["name"] == "a"
+
+
+def test_get_all_repos_shares_annotations_per_fetch(command_list: CommandList) -> None:
+    fetcher = make_fetcher(
+        [{"name": "a", "visibility": "PUBLIC"}, {"name": "b", "visibility": "PRIVATE"}]
+    )
+
+    repos = command_list.get_all_repos(make_args(), command_list.appstore, 3, fetcher)
+
+    assert repos.annotations == CommandList.get_annotations(3)
+    assert repos.records == {
+        "a": {"name": "a", "visibility": "public"},
+        "b": {"name": "b", "visibility": "private"},
+    }
+    assert repos["b"] == {"name": "b", "visibility": "private", **repos.annotations}
+
+
+def test_save_snapshot_writes_annotated_records(command_list: CommandList) -> None:
+    fetcher = make_fetcher([{"name": "a", "visibility": "PUBLIC"}])
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        repos = command_list.get_all_repos(
+            make_args(), command_list.appstore, snapshot_id, fetcher
+        )
+        command_list.save_snapshot(snapshot_id, TIMESTAMP, repos)
+
+    expected = {"name": "a", "visibility": "public", **repos.annotations}
+    assert command_list.get_snapshot_store().read(snapshot_id) == {"a": expected}
+    assert command_list.load_latest_assoc() == {"a": expected}
+    assert "snapshot-id" not in repos.records["a"]
@@ -0,0 +1,155 @@
+"""`SearchOptions` の既定の並べ替え・件数と、問い合わせ内容からの変換、`latest` / `oldest` の上位 N 件選択のテスト。"""
+
+import random
+from typing import Any
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.command_search import CommandSearch, SearchOptions
+from ghrepo.search_index import SearchIndex
+
+
+@pytest.mark.parametrize(
+    ("options", "sort_keys", "limit"),
+    [
+        (SearchOptions("public"), [], None),
+        (SearchOptions("latest10"), [("createdAt", True)], 10),
+        (SearchOptions("latest", count=3), [("createdAt", True)], 3),
+        (SearchOptions("oldest", sort_by="diskUsage"), [("diskUsage", False)], 10),
+        (
+            SearchOptions("oldest", sort="-name", limit=2),
+            [("name", True)],
+            2,
+        ),
+        (SearchOptions("both", limit=0), [], 0),
+    ],
+)
+def test_defaults(
+    options: SearchOptions, sort_keys: list[tuple[str, bool]], limit: int | None
+) -> None:
+    assert options.get_sort_keys() == sort_keys
+    assert options.get_limit() == limit
+
+
+def test_rejects_unknown_search_name() -> None:
+    with pytest.raises(ValueError, match="unsupported search_name"):
+        SearchOptions("everything")
+
+
+def test_from_payload() -> None:
+    options = SearchOptions.from_payload(
+        {
+            "search_name": "latest",
+            "name": "tool",
+            "user": "alice",
+            "count": 0,
+            "at": "3",
+            "where": "diskUsage > 1",
+            "all": True,
+        }
+    )
+
+    assert (options.search_name, options.name_pattern, options.user) == (
+        "latest",
+        "tool",
+        "alice",
+    )
+    assert (options.count, options.sort_by, options.at) == (0, "createdAt", "3")
+    assert (options.where, options.sort, options.limit) == ("diskUsage > 1", None, None)
+    assert options.get_limit() == 0
+
+
+def make_assoc() -> dict[str, dict[str, Any]]:
+    """並べ替え用フィールドに同値・欠損・数値を含むリポジトリ一覧を返す。"""
+    rng = random.Random(7)
+    assoc: dict[str, dict[str, Any]] = {}
+    for number in range(60):
+        name = f"repo{number:02d}"
+        item: dict[str, Any] = {"name": name, "visibility": "public"}
+        if number % 7 != 0:
+            day = rng.randint(1, 20)
+            item["createdAt"] = f"2024-01-{day:02d}T00:00:00Z"
+            item["pushedAt"] = f"2024-02-{day:02d}T09:00:00+09:00"
+            item["diskUsage"] = rng.randint(0, 5)
+        assoc[name] = item
+    return assoc
+
+
+def full_sort(
+    assoc: dict[str, dict[str, Any]], field: str, descending: bool
+) -> list[str]:
+    """全件を並べ替えた名前順を返す。値の無いものは末尾、同値は名前順。"""
+
+    def key(name: str) -> tuple[bool, float]:
+        value = SearchIndex.get_sort_key(assoc[name].get(field))
+        if value is None:
+            return (True, 0.0)
+        return (False, -value if descending else value)
+
+    return sorted(sorted(assoc), key=key)
+
+
+@pytest.mark.parametrize("field", ["createdAt", "pushedAt", "diskUsage"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_take_top_matches_full_sort(field: str, descending: bool) -> None:
+    assoc = make_assoc()
+    index = SearchIndex.build(assoc, 1, None)
+    # 事前に並べた順序 (`createdAt`) とヒープ選択 (それ以外) のどちらも全件の並べ替えと一致する
+    expected = full_sort(assoc, field, descending)
+
+    for n in (1, 10, 60, 100):
+        assert index.get_names(index.take_top(field, n, descending)) == expected[:n]
+
+    subset = [position for position in range(len(index.names)) if position % 3 == 0]
+    subset_names = set(index.get_names(subset))
+    expected_subset = [name for name in expected if name in subset_names]
+    assert (
+        index.get_names(index.take_top(field, 5, descending, subset))
+        == (expected_subset[:5])
+    )
+
+
+def test_take_top_rejects_unknown_field() -> None:
+    index = SearchIndex.build(make_assoc(), 1, None)
+
+    with pytest.raises(ValueError, match="unsupported sort field"):
+        index.take_top("name", 3)
+    assert index.take_top("createdAt", 0) == []
+
+
+def test_latest_and_oldest_search_use_index_keys(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    assoc = make_assoc()
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", assoc)
+    command = CommandSearch(command_list.appstore, "alice")
+    latest = full_sort(assoc, "createdAt", True)
+    oldest_pushed = full_sort(assoc, "pushedAt", False)
+    largest = full_sort(assoc, "diskUsage", True)
+
+    # 日時はインデックス作成時に 1 度だけ解析し、検索では解析し直さない
+    calls: list[object] = []
+    parse_timestamp = SearchIndex.parse_timestamp
+    monkeypatch.setattr(
+        SearchIndex,
+        "parse_timestamp",
+        staticmethod(lambda value: calls.append(value) or parse_timestamp(value)),
+    )
+
+    assert command.search_names(SearchOptions("latest", count=3)) == latest[:3]
+    assert (
+        command.search_names(SearchOptions("oldest", count=4, sort_by="pushedAt"))
+        == oldest_pushed[:4]
+    )
+    # `latest10` は名前の条件を無視する
+    assert (
+        command.search_names(SearchOptions("latest10", name_pattern="zzz"))
+        == latest[:10]
+    )
+    records = command.search_repos(
+        SearchOptions("latest", count=2, sort_by="diskUsage")
+    )
+    assert [record["name"] for record in records] == largest[:2]
+    assert calls == []
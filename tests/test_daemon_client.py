@@ -0,0 +1,167 @@
+"""`DaemonClient` の接続先の決定と、`ghrepo serve` 以外の応答を受けたときのフォールバックのテスト。"""
+
+import json
+import socket
+import sys
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from ghrepo.daemon_client import DaemonClient
+
+needs_unix_socket = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX") or sys.platform == "win32",
+    reason="Unix domain sockets are unavailable",
+)
+
+
+def make_response(
+    status: int, data: object, server: str = DaemonClient.SERVER_SOFTWARE
+) -> bytes:
+    """`ghrepo serve` と同じ形の HTTP 応答を返す。"""
+    body = json.dumps(data).encode("utf-8")
+    return (
+        f"HTTP/1.0 {status} OK\r\nServer: {server} \r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii") + body
+
+
+def serve_once(response: bytes) -> tuple[str, int]:
+    """1 回だけ `response` を返す TCP サーバーを起動し、そのアドレスを返す。"""
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def run() -> None:
+        with listener:
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(65536)
+                connection.sendall(response)
+
+    threading.Thread(target=run, daemon=True).start()
+    return listener.getsockname()[:2]
+
+
+@pytest.fixture
+def server_env(monkeypatch: pytest.MonkeyPatch) -> Iterator[pytest.MonkeyPatch]:
+    monkeypatch.delenv(DaemonClient.SERVER_ENV, raising=False)
+    yield monkeypatch
+
+
+def test_from_env_off(server_env: pytest.MonkeyPatch) -> None:
+    server_env.setenv(DaemonClient.SERVER_ENV, "off")
+
+    assert DaemonClient.from_env() is None
+
+
+def test_from_env_tcp_only_when_given(server_env: pytest.MonkeyPatch) -> None:
+    server_env.setenv(DaemonClient.SERVER_ENV, "127.0.0.1:9000")
+
+    client = DaemonClient.from_env()
+    assert client is not None
+    assert client.address == ("127.0.0.1", 9000)
+
+
+@needs_unix_socket
+def test_from_env_defaults_to_per_user_socket(
+    server_env: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    server_env.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    client = DaemonClient.from_env()
+    assert client is not None
+    assert client.address == tmp_path / "ghrepo" / DaemonClient.SOCKET_FILE_NAME
+
+
+def test_parse_response_accepts_ghrepo_server() -> None:
+    assert DaemonClient.parse_response(make_response(200, {"result": [1]})) == (
+        200,
+        {"result": [1]},
+    )
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        b"",
+        b"SSH-2.0-OpenSSH_9.6\r\n",
+        b"garbage\r\n\r\n{}",
+        make_response(200, {"result": []}, server="nginx/1.25"),
+        make_response(200, ["not", "an", "object"]),
+        b"HTTP/1.0 200 OK\r\nServer: "
+        + DaemonClient.SERVER_SOFTWARE.encode()
+        + b"\r\n\r\n<html>",
+    ],
+)
+def test_parse_response_rejects_other_responses(response: bytes) -> None:
+    assert DaemonClient.parse_response(response) is None
+
+
+def test_request_falls_back_on_foreign_service() -> None:
+    client = DaemonClient(serve_once(b"SSH-2.0-OpenSSH_9.6\r\n"))
+
+    assert client.request(DaemonClient.SEARCH_PATH, {}) is None
+
+
+def test_request_returns_result() -> None:
+    client = DaemonClient(serve_once(make_response(200, {"result": ["a"]})))
+
+    assert client.request(DaemonClient.SEARCH_PATH, {}) == ["a"]
+
+
+def test_request_raises_server_errors() -> None:
+    client = DaemonClient(
+        serve_once(make_response(400, {"error": "bad", "type": "ValueError"}))
+    )
+
+    with pytest.raises(ValueError, match="bad"):
+        client.request(DaemonClient.SEARCH_PATH, {})
+
+
+def test_request_returns_none_without_server(tmp_path: Path) -> None:
+    assert (
+        DaemonClient(tmp_path / "missing.sock").request(DaemonClient.HEALTH_PATH, {})
+        is None
+    )
+
+
+@needs_unix_socket
+def test_socket_in_shared_directory_is_not_trusted(tmp_path: Path) -> None:
+    socket_path = tmp_path / "serve.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    try:
+        tmp_path.chmod(0o700)
+        assert DaemonClient.is_private_socket(socket_path)
+        tmp_path.chmod(0o777)
+        assert not DaemonClient.is_private_socket(socket_path)
+    finally:
+        tmp_path.chmod(0o700)
+        listener.close()
+
+
+@needs_unix_socket
+def test_server_answers_on_private_socket(tmp_path: Path) -> None:
+    from ghrepo.server import GhrepoServer
+
+    socket_dir = tmp_path / "run"
+    socket_path = socket_dir / DaemonClient.SOCKET_FILE_NAME
+    server = GhrepoServer(
+        lambda user: pytest.fail("no user state needed"), socket_path=socket_path
+    )
+    httpd = server.create_server()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert socket_path.stat().st_mode & 0o077 == 0
+        assert DaemonClient(socket_path).request(DaemonClient.HEALTH_PATH, {}) == {
+            "status": "ok",
+            "users": 0,
+        }
+        with pytest.raises(ValueError, match="store_user"):
+            DaemonClient(socket_path).request(DaemonClient.LIST_PATH, {"user": None})
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert not socket_path.exists()
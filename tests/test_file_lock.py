@@ -0,0 +1,90 @@
+"""`FileLock` の排他と、スナップショットIDの予約 (`reserve_snapshot_id`) が重ならないことのテスト。"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.file_lock import FileLock
+
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+
+def test_lock_excludes_other_instances(tmp_path: Path) -> None:
+    path = tmp_path / "sub" / ".lock"
+    first, second = FileLock(path), FileLock(path)
+
+    with first:
+        assert first.locked
+        assert not second.acquire(blocking=False)
+        assert not second.locked
+        with pytest.raises(RuntimeError):
+            first.acquire()
+
+    assert not first.locked
+    assert second.acquire(blocking=False)
+    second.release()
+    second.release()  # 保持していなければ何もしない
+
+
+def test_lock_excludes_other_processes(tmp_path: Path) -> None:
+    path = tmp_path / ".lock"
+    script = (
+        "import sys; from pathlib import Path; from ghrepo.file_lock import FileLock\n"
+        "lock = FileLock(Path(sys.argv[1])); lock.acquire()\n"
+        "print('locked', flush=True); sys.stdin.read()\n"
+    )
+    with subprocess.Popen(
+        [sys.executable, "-c", script, str(path)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    ) as child:
+        assert child.stdout is not None and child.stdin is not None
+        assert child.stdout.readline().strip() == "locked"
+        assert not FileLock(path).acquire(blocking=False)
+        child.stdin.close()
+        child.wait()
+
+    # 終了したプロセスのロックは OS が解放する
+    lock = FileLock(path)
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_overlapping_reservations_get_distinct_ids(command_list: CommandList) -> None:
+    store = command_list.get_snapshot_store()
+
+    with command_list.reserve_snapshot_id() as first_id:
+        with command_list.reserve_snapshot_id() as second_id:
+            assert (first_id, second_id) == (1, 2)
+            assert store.collect_reserved_ids() == [1, 2]
+            command_list.save_snapshot(second_id, TIMESTAMP, {"a": {"name": "a"}})
+        command_list.save_snapshot(first_id, TIMESTAMP, {"b": {"name": "b"}})
+
+    assert store.collect_reserved_ids() == []
+    assert store.read(1) == {"b": {"name": "b"}}
+    assert store.read(2) == {"a": {"name": "a"}}
+    with command_list.reserve_snapshot_id() as third_id:
+        assert third_id == 3
+
+
+def test_remove_stale_reservations_keeps_held_ones(command_list: CommandList) -> None:
+    store = command_list.get_snapshot_store()
+    # 異常終了したプロセスの予約 (ロックの保持者が居ない予約ファイルと書きかけのディレクトリ)
+    stale_path = store.get_reservation_path(5)
+    stale_path.parent.mkdir(parents=True)
+    stale_path.touch()
+    store.get_staging_store().get_snapshot_dir(5).mkdir()
+
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        assert snapshot_id == 6
+        assert store.remove_stale_reservations(dry_run=True) == [5]
+        assert stale_path.exists()
+        assert store.remove_stale_reservations() == [5]
+        assert store.collect_reserved_ids() == [snapshot_id]
+
+    assert not stale_path.exists()
+    assert not store.get_staging_store().get_snapshot_dir(5).exists()
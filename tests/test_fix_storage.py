@@ -0,0 +1,145 @@
+"""`StorageScan` の 1 回走査と、`fix_storage` の補正・`--dry-run`・`--validate` のテスト。"""
+
+from pathlib import Path
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.search_index import SearchIndex
+from ghrepo.storage_scan import StorageScan
+
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+
+def save(command: CommandList, *names: str) -> int:
+    """`names` のリポジトリを持つスナップショットを保存し、その ID を返す。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(
+            snapshot_id,
+            TIMESTAMP,
+            {name: {"name": name, "visibility": "public"} for name in names},
+        )
+    return snapshot_id
+
+
+def make_leftovers(user_dir: Path) -> None:
+    """本体の無いスナップショット 5 (インデックスだけが残る)・空のスナップショット 6・空ディレクトリを作る。"""
+    orphan_dir = user_dir / "snapshots" / "5"
+    orphan_dir.mkdir(parents=True)
+    (orphan_dir / SearchIndex.INDEX_FILE_NAME).write_text("{}", encoding="utf-8")
+    (user_dir / "snapshots" / "6").mkdir()
+    (user_dir / "objects" / "ab").mkdir(parents=True)
+    (user_dir / "objects" / "cd").mkdir()
+    (user_dir / "objects" / "cd" / "cd01.json").write_text("{}", encoding="utf-8")
+    (user_dir / "tmp" / "nested").mkdir(parents=True)
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_scan_finds_orphans_and_empty_directories(
+    command_list: CommandList, max_workers: int
+) -> None:
+    save(command_list, "a")
+    user_dir = command_list.get_user_dir()
+    make_leftovers(user_dir)
+
+    storage_scan = StorageScan.scan(user_dir, max_workers)
+
+    assert storage_scan.snapshot_ids == [1, 5, 6]
+    assert storage_scan.has_body(1)
+    assert not storage_scan.has_body(5)
+    assert storage_scan.orphan_indexes == [
+        user_dir / "snapshots" / "5" / SearchIndex.INDEX_FILE_NAME
+    ]
+    assert set(storage_scan.empty_dirs) >= {
+        user_dir / "snapshots" / "5",
+        user_dir / "snapshots" / "6",
+        user_dir / "objects" / "ab",
+        user_dir / "tmp" / "nested",
+        user_dir / "tmp",
+    }
+    assert user_dir / "objects" / "cd" not in storage_scan.empty_dirs
+    # 子は親より先に並ぶ
+    empty_dirs = storage_scan.empty_dirs
+    assert empty_dirs.index(user_dir / "tmp" / "nested") < empty_dirs.index(
+        user_dir / "tmp"
+    )
+    assert storage_scan.get_live_snapshot_ids() == [1]
+
+
+def test_dry_run_reports_without_changing(command_list: CommandList) -> None:
+    save(command_list, "a")
+    user_dir = command_list.get_user_dir()
+    make_leftovers(user_dir)
+
+    result = command_list.fix_storage(dry_run=True)
+
+    assert result["dry_run"] is True
+    assert result["removed_search_indexes"] == 1
+    # make_leftovers の 5 つと、予約を解放して空になった snapshots/.staging
+    assert result["removed_empty_directories"] == 6
+    assert (user_dir / "snapshots" / "5" / SearchIndex.INDEX_FILE_NAME).exists()
+    assert (user_dir / "tmp" / "nested").is_dir()
+
+
+def test_fix_removes_leftovers_and_repairs_records(command_list: CommandList) -> None:
+    save(command_list, "a")
+    latest_id = save(command_list, "a", "b")
+    user_dir = command_list.get_user_dir()
+    make_leftovers(user_dir)
+    store = command_list.get_snapshot_store()
+    SearchIndex.get_index_path(store, latest_id).unlink()
+    command_list.get_snapshot_registry().path.unlink()
+
+    result = command_list.fix_storage()
+
+    assert result["removed_search_indexes"] == 1
+    assert result["removed_empty_directories"] == 6
+    assert result["max_snapshot_id"] == latest_id
+    assert result["search_index_rebuilt"] is True
+    assert result["registry_updated"] is True
+    assert result["warnings"] == []
+    assert not (user_dir / "snapshots" / "5").exists()
+    assert not (user_dir / "tmp").exists()
+    assert (user_dir / "objects" / "cd" / "cd01.json").exists()
+    assert SearchIndex.load(store, latest_id) is not None
+    assert command_list.get_snapshot_registry().collect_snapshot_ids() == [1, latest_id]
+
+    # 2 回目は補正するものが無い
+    again = command_list.fix_storage()
+    assert again["removed_search_indexes"] == 0
+    assert again["removed_empty_directories"] == 0
+    assert again["snapshots_updated"] is False
+    assert again["registry_updated"] is False
+    assert again["search_index_rebuilt"] is False
+
+
+def test_fix_trims_records_past_latest_snapshot(command_list: CommandList) -> None:
+    save(command_list, "a")
+    command_list._output_snapshots_assoc({1: TIMESTAMP, 9: TIMESTAMP})
+
+    result = command_list.fix_storage()
+
+    assert result["snapshots_updated"] is True
+    assert command_list._load_snapshots_assoc() == {1: TIMESTAMP}
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_validate_reports_unreadable_and_modified_snapshots(
+    command_list: CommandList, max_workers: int
+) -> None:
+    for name in ("a", "b", "c"):
+        save(command_list, name)
+    store = command_list.get_snapshot_store()
+    broken = store.find_file(2, store.SNAPSHOT_BASE_NAME)
+    modified = store.find_file(3, store.SNAPSHOT_BASE_NAME)
+    assert broken is not None and modified is not None
+    broken[0].write_text("- not a mapping\n", encoding="utf-8")
+    modified[0].write_text("c:\n  name: c\n  visibility: private\n", encoding="utf-8")
+
+    result = command_list.fix_storage(validate=True, max_workers=max_workers)
+
+    invalid = result["invalid_snapshots"]
+    assert sorted(invalid) == [2, 3]
+    assert "ValueError" in invalid[2]
+    assert "台帳のハッシュと一致しません" in invalid[3]
+    assert len(result["warnings"]) == 2
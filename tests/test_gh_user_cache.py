@@ -0,0 +1,51 @@
+"""`GhUserCache` のキャッシュ判定のテスト。`gh` は起動せず `CommandGhUser.run` を差し替える。"""
+
+from pathlib import Path
+
+import pytest
+from yklibpy.command.command_gh_user import CommandGhUser
+
+from ghrepo.gh_user_cache import GhUserCache
+
+
+@pytest.fixture
+def gh_results(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> list[str | None]:
+    """`CommandGhUser.run` が先頭から順に返す値。`gh` の設定は `tmp_path` に固定する。"""
+    results: list[str | None] = []
+    monkeypatch.setenv("GH_CONFIG_DIR", str(tmp_path / "gh"))
+    monkeypatch.setattr(CommandGhUser, "run", lambda self: results.pop(0))
+    return results
+
+
+def test_get_user_caches_resolved_user(
+    gh_results: list[str | None], tmp_path: Path
+) -> None:
+    cache = GhUserCache(tmp_path / "gh_user.json", ttl=60)
+    gh_results.append("alice")
+
+    assert cache.get_user() == "alice"
+    assert cache.get_user() == "alice"
+    assert gh_results == []
+
+
+@pytest.mark.parametrize("failed", [None, ""])
+def test_get_user_does_not_cache_failures(
+    gh_results: list[str | None], tmp_path: Path, failed: str | None
+) -> None:
+    cache = GhUserCache(tmp_path / "gh_user.json", ttl=60)
+    gh_results.extend([failed, "alice"])
+
+    assert cache.get_user() == failed
+    assert not cache.cache_path.exists()
+    assert cache.get_user() == "alice"
+
+
+def test_load_ignores_cached_empty_user(
+    gh_results: list[str | None], tmp_path: Path
+) -> None:
+    cache = GhUserCache(tmp_path / "gh_user.json", ttl=60)
+    cache.save(cache.get_auth_key(), "")
+    gh_results.append("alice")
+
+    assert cache.get_user() == "alice"
+    assert cache.load(cache.get_auth_key()) == "alice"
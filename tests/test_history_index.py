@@ -0,0 +1,139 @@
+"""過去のスナップショットを対象にした検索 (`search --at` / `--between`) と、可視性の区間索引 (`HistoryIndex`) のテスト。"""
+
+from typing import Any
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.command_search import CommandSearch, SearchOptions
+from ghrepo.history_index import HistoryIndex
+from ghrepo.search_index import SearchIndex
+
+# スナップショットID -> (作成日時, リポジトリ名 -> 可視性)
+HISTORY: dict[int, tuple[str, dict[str, str]]] = {
+    1: ("2024-01-01T00:00:00+00:00", {"app": "public", "lib": "private"}),
+    2: ("2024-02-01T00:00:00+00:00", {"app": "private", "lib": "private"}),
+    3: (
+        "2024-03-01T00:00:00+00:00",
+        {"app": "public", "lib": "public", "new": "private"},
+    ),
+    4: ("2024-04-01T00:00:00+00:00", {"app": "public", "new": "private"}),
+}
+
+
+def make_assoc(visibilities: dict[str, str]) -> dict[str, dict[str, Any]]:
+    """リポジトリ名 -> 可視性からスナップショットの内容を返す。"""
+    return {
+        name: {"name": name, "visibility": visibility, "nameWithOwner": f"alice/{name}"}
+        for name, visibility in visibilities.items()
+    }
+
+
+def save_history(command: CommandList, snapshot_ids: list[int]) -> None:
+    """`HISTORY` のうち `snapshot_ids` の分を順にスナップショットとして保存する。"""
+    for expected_id in snapshot_ids:
+        timestamp, visibilities = HISTORY[expected_id]
+        with command.reserve_snapshot_id() as snapshot_id:
+            assert snapshot_id == expected_id
+            command.save_snapshot(snapshot_id, timestamp, make_assoc(visibilities))
+
+
+def test_search_at_snapshot_id_or_timestamp(command_list: CommandList) -> None:
+    save_history(command_list, [1, 2, 3, 4])
+    command = CommandSearch(command_list.appstore, "alice")
+
+    assert command.search_names(SearchOptions("private")) == ["new"]
+    assert command.search_names(SearchOptions("private", at="2")) == ["app", "lib"]
+    # 日時はその日時以前に作成された最後のスナップショットを選ぶ
+    assert command.search_names(
+        SearchOptions("public", at="2024-03-15T00:00:00+00:00")
+    ) == ["app", "lib"]
+    assert command.search_names(
+        SearchOptions("both", at="2024-01-01T00:00:00+00:00")
+    ) == ["app", "lib"]
+    records = command.search_repos(SearchOptions("private", at="2"))
+    assert records == list(make_assoc(HISTORY[2][1]).values())
+
+    with pytest.raises(FileNotFoundError):
+        command.search_names(SearchOptions("public", at="2023-12-31T00:00:00+00:00"))
+    with pytest.raises(FileNotFoundError):
+        command.search_names(SearchOptions("public", at="9"))
+    with pytest.raises(ValueError, match="snapshot id or timestamp expected"):
+        command.search_names(SearchOptions("public", at="yesterday"))
+
+
+def test_search_between_returns_overlapping_intervals(
+    command_list: CommandList,
+) -> None:
+    save_history(command_list, [1, 2, 3, 4])
+    command = CommandSearch(command_list.appstore, "alice")
+
+    assert command.search_between("private", "1", "4") == {
+        "app": [[1, 1, "public"], [2, 2, "private"], [3, 4, "public"]],
+        "lib": [[1, 2, "private"], [3, 3, "public"]],
+        "new": [[3, 4, "private"]],
+    }
+    # 期間に重ならない区間は返さず、期間中に一度も該当しないリポジトリは含めない
+    assert command.search_between("private", "3", "2024-04-30T00:00:00+00:00") == {
+        "new": [[3, 4, "private"]]
+    }
+    # 開始側は最初のスナップショットより前の日時でもよい
+    assert command.search_between(
+        "public", "2023-01-01T00:00:00+00:00", "1", name_pattern="ap", user="ALICE"
+    ) == {"app": [[1, 1, "public"]]}
+    assert command.search_between("public", "1", "4", user="bob") == {}
+
+    with pytest.raises(ValueError, match="unsupported search_name"):
+        command.search_between("latest", "1", "4")
+    with pytest.raises(ValueError, match="range start is after its end"):
+        command.search_between("public", "3", "2")
+
+
+def test_update_adds_only_new_snapshots(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    save_history(command_list, [1, 2])
+    store = command_list.get_snapshot_store()
+    loaded: list[int] = []
+    load_or_rebuild = SearchIndex.load_or_rebuild
+
+    def counting_load(snapshot_store: Any, snapshot_id: int) -> SearchIndex:
+        loaded.append(snapshot_id)
+        return load_or_rebuild(snapshot_store, snapshot_id)
+
+    monkeypatch.setattr(SearchIndex, "load_or_rebuild", counting_load)
+
+    assert HistoryIndex.update(store).snapshot_ids == [1, 2]
+    assert HistoryIndex.get_index_path(store).exists()
+    assert loaded == [1, 2]
+
+    # 変化が無ければ保存済みの索引をそのまま使い、増えた分だけを追加で反映する
+    loaded.clear()
+    assert HistoryIndex.update(store).snapshot_ids == [1, 2]
+    assert loaded == []
+    save_history(command_list, [3])
+    history = HistoryIndex.update(store)
+    assert loaded == [3]
+    assert history.repos["app"]["intervals"] == [
+        [1, 1, "public"],
+        [2, 2, "private"],
+        [3, 3, "public"],
+    ]
+
+    # 反映済みのスナップショットが変わったら作り直す
+    loaded.clear()
+    store.write(1, make_assoc({"app": "private"}), command_list.get_snapshot_storage())
+    history = HistoryIndex.update(store)
+    assert loaded == [1, 2, 3]
+    assert history.repos["app"]["intervals"] == [[1, 2, "private"], [3, 3, "public"]]
+    assert history.repos["lib"]["intervals"] == [[2, 2, "private"], [3, 3, "public"]]
+
+
+def test_load_ignores_broken_index(command_list: CommandList) -> None:
+    save_history(command_list, [1])
+    store = command_list.get_snapshot_store()
+    HistoryIndex.get_index_path(store).write_text("[", encoding="utf-8")
+
+    assert HistoryIndex.load(store) is None
+    assert HistoryIndex.update(store).snapshot_ids == [1]
+    assert HistoryIndex.load(store) is not None
@@ -0,0 +1,157 @@
+"""`list --users` / `--users-file` による複数オーナーの並行取得のテスト。
+
+`gh` は起動せず、`RepoFetcher._run_gh` を差し替えた偽の `gh` がオーナーごとの GraphQL 応答を返す。
+"""
+
+import argparse
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.command_setup import CommandSetup
+from ghrepo.ghrepo import Ghrepo, main
+from ghrepo.repo_fetcher import RepoFetcher
+
+# オーナー -> リポジトリ名の一覧。含まれないオーナーは GitHub に存在しない扱いにする
+OWNER_REPOS: dict[str, list[str]] = {"alice": ["a1", "a2"], "bob": ["b1"]}
+# `setup` 済みにするオーナー (`ghost` は GitHub に存在しない)
+SETUP_OWNERS: list[str] = ["alice", "bob", "ghost"]
+
+
+@pytest.fixture
+def home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """`tmp_path` をホームディレクトリにして `SETUP_OWNERS` を `setup` し、`OWNER_REPOS` を返す偽の `gh` を使わせる。"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("XDG_CONFIG_HOME", "XDG_DATA_HOME", "XDG_CACHE_HOME"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(RepoFetcher, "_run_gh", staticmethod(fake_gh))
+    for owner in SETUP_OWNERS:
+        CommandSetup(Ghrepo.init_appstore(owner)).run(
+            AppConfigx.key, ["name", "visibility"]
+        )
+    return tmp_path
+
+
+def fake_gh(command_args: list[str]) -> str:
+    """`-f owner=...` のオーナーのリポジトリを 1 ページで返す。"""
+    owner = next(
+        arg.split("=", 1)[1] for arg in command_args if arg.startswith("owner=")
+    )
+    if owner not in OWNER_REPOS:
+        return json.dumps({"data": {"repositoryOwner": None}})
+    connection = {
+        "nodes": [
+            {"name": name, "visibility": "PUBLIC"} for name in OWNER_REPOS[owner]
+        ],
+        "pageInfo": {"hasNextPage": False, "endCursor": None},
+    }
+    return json.dumps({"data": {"repositoryOwner": {"repositories": connection}}})
+
+
+def run_list(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str], *options: str
+) -> tuple[list[dict[str, Any]], int]:
+    """`ghrepo list` を実行し、標準出力の結果レポートと終了コードを返す。"""
+    monkeypatch.setattr(sys, "argv", ["ghrepo", "list", *options])
+    exit_code = 0
+    try:
+        main()
+    except SystemExit as exc:
+        exit_code = int(exc.code or 0)
+    return json.loads(capsys.readouterr().out), exit_code
+
+
+def load_latest(owner: str) -> dict[str, Any]:
+    """`owner` の最新 DB を返す。"""
+    appstore = Ghrepo.init_appstore(owner)
+    appstore.load_file_all()
+    return CommandList(appstore, ["name", "visibility"], owner).load_latest_assoc()
+
+
+def test_collect_owners_merges_users_and_users_file(tmp_path: Path) -> None:
+    users_file = tmp_path / "users.txt"
+    users_file.write_text("bob\n\n# comment\ncarol  # org\nalice\n", encoding="utf-8")
+    args = argparse.Namespace(users="alice, bob,,", users_file=str(users_file))
+
+    assert Ghrepo._collect_owners(args) == ["alice", "bob", "carol"]
+
+
+def test_list_users_fetches_each_owner_and_reports_failures(
+    home: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    threads: set[str] = set()
+
+    def recording_gh(command_args: list[str]) -> str:
+        threads.add(threading.current_thread().name)
+        return fake_gh(command_args)
+
+    monkeypatch.setattr(RepoFetcher, "_run_gh", staticmethod(recording_gh))
+
+    reports, exit_code = run_list(
+        monkeypatch,
+        capsys,
+        "--users",
+        "bob,ghost,carol,alice",
+        "--jobs",
+        "2",
+        "--force",
+    )
+
+    # 失敗したオーナーがあっても他のオーナーは保存し、最後に終了コード 1 で終わる。
+    # ghost は取得で、`setup` していない carol は設定の読み込みで失敗する
+    assert exit_code == 1
+    assert [report["user"] for report in reports] == ["bob", "ghost", "carol", "alice"]
+    assert [report["status"] for report in reports] == ["ok", "error", "error", "ok"]
+    assert reports[0]["repos"] == 1 and reports[3]["repos"] == 2
+    assert "GitHub owner not found" in reports[1]["error"]
+    assert reports[2]["error"].startswith("KeyError")
+    assert all(report["elapsed"] >= 0 for report in reports)
+    assert threading.current_thread().name not in threads
+    assert sorted(load_latest("alice")) == ["a1", "a2"]
+    assert sorted(load_latest("bob")) == ["b1"]
+
+
+def test_list_users_skips_owners_with_snapshots_unless_forced(
+    home: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    users_file = home / "users.txt"
+    users_file.write_text("alice\nbob\n", encoding="utf-8")
+
+    # `setup` 済み (スナップショット作成記録あり) のオーナーは取得しない
+    reports, exit_code = run_list(monkeypatch, capsys, "--users-file", str(users_file))
+    assert exit_code == 0
+    assert [(report["user"], report["status"]) for report in reports] == [
+        ("alice", "skipped"),
+        ("bob", "skipped"),
+    ]
+    assert load_latest("alice") == {}
+
+    reports, exit_code = run_list(
+        monkeypatch, capsys, "--users-file", str(users_file), "--force"
+    )
+    assert exit_code == 0
+    assert [report["status"] for report in reports] == ["ok", "ok"]
+    assert sorted(load_latest("bob")) == ["b1"]
+
+
+@pytest.mark.parametrize(
+    "option", [["--user", "alice"], ["--output", "-"], ["--format", "csv"]]
+)
+def test_list_users_rejects_single_owner_options(
+    home: Path, monkeypatch: pytest.MonkeyPatch, option: list[str]
+) -> None:
+    monkeypatch.setattr(sys, "argv", ["ghrepo", "list", "--users", "alice", *option])
+
+    with pytest.raises(ValueError, match="cannot be combined with --users"):
+        main()
+    assert load_latest("alice") == {}
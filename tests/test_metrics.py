@@ -0,0 +1,73 @@
+"""`fix` の結果の記録 (`metrics.json`) と、`--metrics-textfile` の書き出し失敗の扱いのテスト。"""
+
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.ghrepo import Ghrepo, main
+from ghrepo.metrics import MetricsExporter
+
+
+def make_fix_result(**extra: Any) -> dict[str, Any]:
+    """補正の無かった `fix_storage` の結果を返す。"""
+    return {
+        "removed_empty_directories": 0,
+        "removed_search_indexes": 0,
+        "snapshots_updated": False,
+        "registry_updated": False,
+        "search_index_rebuilt": False,
+        "recovered_snapshot_id": None,
+        "released_snapshot_ids": [],
+        **extra,
+    }
+
+
+def test_fix_without_validate_keeps_validate_time(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("ghrepo.command_list.time.time", lambda: 100.0)
+    command_list.record_fix_metrics(make_fix_result(invalid_snapshots={3: "broken"}))
+    monkeypatch.setattr("ghrepo.command_list.time.time", lambda: 200.0)
+    command_list.record_fix_metrics(make_fix_result())
+
+    fix = command_list.get_run_metrics().load()["fix"]
+    assert fix["invalid_snapshots"] == 1
+    assert fix["validate_timestamp"] == 100.0
+    assert fix["timestamp"] == 200.0
+
+    values = MetricsExporter(
+        command_list.get_user_dir().parent, "snapshots.yaml"
+    ).collect(command_list.get_user_dir(), 200.0)
+    assert values["ghrepo_fix_invalid_snapshots"] == 1
+    assert values["ghrepo_fix_validate_timestamp_seconds"] == 100.0
+    assert values["ghrepo_fix_timestamp_seconds"] == 200.0
+
+
+def test_main_keeps_error_when_metrics_textfile_fails(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    def fail_fix(args: Any) -> None:
+        raise RuntimeError("fix failed")
+
+    def fail_write(args: Any) -> None:
+        raise OSError("disk full")
+
+    errors: list[str] = []
+    monkeypatch.setattr(Ghrepo, "fix_repos", fail_fix)
+    monkeypatch.setattr(Ghrepo, "write_metrics_textfile", fail_write)
+    monkeypatch.setattr(
+        "ghrepo.ghrepo.Loggerx.error", lambda message, name: errors.append(message)
+    )
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["ghrepo", "fix", "--metrics-textfile", str(tmp_path / "ghrepo.prom")],
+    )
+
+    with pytest.raises(RuntimeError, match="fix failed"):
+        main()
+    assert len(errors) == 1
+    assert "disk full" in errors[0]
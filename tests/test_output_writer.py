@@ -0,0 +1,154 @@
+"""`list` / `search` の出力形式ごとの `RecordWriter` と、`--format` / `--fields` のテスト。"""
+
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.ghrepo import main
+from ghrepo.output_writer import CsvWriter, get_record_writer
+
+RECORDS: dict[str, dict[str, Any]] = {
+    "alpha": {
+        "name": "alpha",
+        "visibility": "public",
+        "owner": {"login": "alice"},
+        "description": '日本語, "quoted"',
+        "topics": ["a", "b"],
+    },
+    "beta": {
+        "name": "beta",
+        "visibility": "private",
+        "owner": None,
+        "description": None,
+    },
+}
+
+
+def render(
+    output_format: str,
+    records: dict[str, dict[str, Any]],
+    fields: list[str] | None = None,
+    keyed: bool = False,
+) -> str:
+    """`records` を指定形式で書き出した文字列を返す。"""
+    output = io.StringIO()
+    writer = get_record_writer(output_format, output, fields, keyed)
+    for name, item in records.items():
+        writer.write(name, item)
+    writer.close()
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("records", [RECORDS, {}])
+@pytest.mark.parametrize("keyed", [True, False])
+def test_json_writers_match_json_dumps(
+    records: dict[str, dict[str, Any]], keyed: bool
+) -> None:
+    value: object = records if keyed else list(records.values())
+
+    assert render(AppConfigx.OUTPUT_FORMAT_JSON, records, keyed=keyed) == json.dumps(
+        value, ensure_ascii=False, indent=2
+    )
+    assert render(AppConfigx.OUTPUT_FORMAT_COMPACT, records, keyed=keyed) == json.dumps(
+        value, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def test_json_lines_writes_one_record_per_line() -> None:
+    lines = render(AppConfigx.OUTPUT_FORMAT_JSONL, RECORDS, keyed=True).splitlines()
+
+    assert [json.loads(line) for line in lines] == list(RECORDS.values())
+
+
+def test_fields_project_nested_values() -> None:
+    fields = ["name", "owner.login", "missing"]
+
+    assert json.loads(
+        render(AppConfigx.OUTPUT_FORMAT_COMPACT, RECORDS, fields, keyed=True)
+    ) == {
+        "alpha": {"name": "alpha", "owner.login": "alice", "missing": None},
+        "beta": {"name": "beta", "owner.login": None, "missing": None},
+    }
+
+
+def test_csv_and_tsv_cells() -> None:
+    assert render(AppConfigx.OUTPUT_FORMAT_CSV, RECORDS) == (
+        "name,visibility,owner,description,topics\n"
+        'alpha,public,"{""login"": ""alice""}","日本語, ""quoted""","[""a"", ""b""]"\n'
+        "beta,private,,,\n"
+    )
+    assert render(AppConfigx.OUTPUT_FORMAT_TSV, RECORDS, ["name", "owner.login"]) == (
+        "name\towner.login\nalpha\talice\nbeta\t\n"
+    )
+
+
+def test_csv_without_records_writes_header_only_for_given_fields() -> None:
+    assert render(AppConfigx.OUTPUT_FORMAT_CSV, {}, ["name", "url"]) == "name,url\n"
+    assert render(AppConfigx.OUTPUT_FORMAT_CSV, {}) == ""
+
+
+def test_unknown_format_is_rejected() -> None:
+    with pytest.raises(ValueError, match="unsupported output format"):
+        get_record_writer("xml", io.StringIO())
+    assert isinstance(get_record_writer("tsv", io.StringIO()), CsvWriter)
+
+
+def test_list_and_search_write_selected_format(
+    command_list: CommandList,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    tmp_path: Path,
+) -> None:
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", RECORDS)
+    output = tmp_path / "repos.csv"
+
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "ghrepo",
+            "list",
+            "--user",
+            "alice",
+            "--no-daemon",
+            "--format",
+            "csv",
+            "--fields",
+            "name, owner.login",
+            "--output",
+            str(output),
+        ],
+    )
+    main()
+    assert output.read_text(encoding="utf-8") == (
+        "name,owner.login\nalpha,alice\nbeta,\n"
+    )
+
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "ghrepo",
+            "search",
+            "public",
+            "--user",
+            "alice",
+            "--no-daemon",
+            "--format",
+            "jsonl",
+            "--fields",
+            "name,visibility",
+        ],
+    )
+    main()
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "alpha", "visibility": "public"}
+    ]
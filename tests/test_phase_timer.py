@@ -0,0 +1,134 @@
+"""フェーズごとの計測 (`PhaseTimer`) と `--timings` / `--profile` / `--trace-memory` のテスト。"""
+
+import json
+import pstats
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.ghrepo import main
+from ghrepo.phase_timer import PhaseTimer
+
+
+def test_phase_records_nothing_without_active_timer() -> None:
+    with PhaseTimer.phase("idle") as phase:
+        phase.add(records=3)
+
+    timer = PhaseTimer.start("test")
+    PhaseTimer.stop()
+    with PhaseTimer.phase("idle") as phase:
+        phase.add(records=3)
+    assert timer.phases == {}
+
+
+def test_phases_accumulate_across_calls_and_threads() -> None:
+    timer = PhaseTimer.start("test")
+    try:
+        with PhaseTimer.phase("outer"):
+            for _ in range(2):
+                with PhaseTimer.phase("inner") as phase:
+                    phase.add(records=2, bytes_read=10)
+
+        def work() -> None:
+            with PhaseTimer.phase("worker") as phase:
+                phase.add(records=1, bytes_written=5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        PhaseTimer.stop()
+
+    report = timer.to_dict()
+    phases = {phase["name"]: phase for phase in report["phases"]}
+    assert report["command"] == "test"
+    assert list(phases) == ["outer", "inner", "worker"]
+    assert (phases["inner"]["calls"], phases["inner"]["records"]) == (2, 4)
+    assert phases["inner"]["bytes_read"] == 20
+    assert (phases["worker"]["calls"], phases["worker"]["records"]) == (4, 4)
+    assert phases["worker"]["bytes_written"] == 20
+    # 外側のフェーズの時間は内側を含む
+    assert phases["outer"]["wall_ms"] >= phases["inner"]["wall_ms"]
+    assert report["wall_ms"] >= phases["outer"]["wall_ms"]
+
+
+def test_run_writes_report_even_when_handler_fails(tmp_path: Path) -> None:
+    timings = tmp_path / "timings.json"
+    profile = tmp_path / "profile.pstats"
+
+    def handler() -> None:
+        with PhaseTimer.phase("work") as phase:
+            phase.add(records=1)
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError, match="failed"):
+        PhaseTimer.run("list_repos", handler, str(timings), str(profile), True)
+
+    report = json.loads(timings.read_text(encoding="utf-8"))
+    assert report["command"] == "list_repos"
+    assert [phase["name"] for phase in report["phases"]] == ["work"]
+    assert report["profile"] == str(profile)
+    assert report["memory"]["peak_bytes"] >= report["memory"]["current_bytes"] >= 0
+    assert len(report["memory"]["top"]) <= PhaseTimer.TOP_ALLOCATIONS
+    assert pstats.Stats(str(profile)).total_calls > 0
+    # 計測を終えた後の `phase` は記録しない
+    assert PhaseTimer._active is None
+
+
+def test_run_without_timings_file_writes_to_stderr_only_for_memory(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    PhaseTimer.run("search_repos", lambda: None)
+    assert capsys.readouterr().err == ""
+
+    PhaseTimer.run("search_repos", lambda: None, trace_memory=True)
+    report = json.loads(capsys.readouterr().err)
+    assert report["command"] == "search_repos"
+    assert "memory" in report
+
+
+def test_search_timings_option_reports_phases(
+    command_list: CommandList,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    assoc = {
+        name: {"name": name, "visibility": "public", "nameWithOwner": f"alice/{name}"}
+        for name in ("a", "b")
+    }
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", assoc)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "ghrepo",
+            "search",
+            "public",
+            "--user",
+            "alice",
+            "--no-daemon",
+            "--format",
+            "jsonl",
+            "--timings",
+        ],
+    )
+
+    main()
+
+    captured = capsys.readouterr()
+    assert [json.loads(line)["name"] for line in captured.out.splitlines()] == [
+        "a",
+        "b",
+    ]
+    report = json.loads(captured.err)
+    phases = {phase["name"]: phase for phase in report["phases"]}
+    assert report["command"] == "search_repos"
+    assert {"index_load", "select", "output"} <= set(phases)
+    assert phases["select"]["records"] == 2
+    assert phases["output"]["records"] == 2
@@ -0,0 +1,215 @@
+"""`Query` の構文解析・評価と、検索用インデックスとの分割評価のテスト。"""
+
+from typing import Any
+
+import pytest
+
+from ghrepo.query import Query
+from ghrepo.search_index import SearchIndex
+
+RECORDS: dict[str, dict[str, Any]] = {
+    "alpha": {
+        "name": "alpha",
+        "visibility": "public",
+        "createdAt": "2023-05-01T00:00:00Z",
+        "diskUsage": 50,
+        "isFork": False,
+        "parent": None,
+        "owner": {"login": "alice"},
+    },
+    "Beta-tool": {
+        "name": "Beta-tool",
+        "visibility": "private",
+        "createdAt": "2024-02-01T00:00:00Z",
+        "diskUsage": 200000,
+        "isFork": True,
+        "parent": {"name": "upstream"},
+        "owner": {"login": "bob"},
+    },
+    "gamma": {
+        "name": "gamma",
+        "visibility": "internal",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "description": "Gamma Tools",
+    },
+    # 欠けた値・日時として解釈できない値
+    "delta": {"name": "delta", "createdAt": "not a date", "diskUsage": None},
+}
+
+EXPRESSIONS = [
+    "visibility == public",
+    "visibility = PUBLIC",
+    "visibility != private",
+    "visibility == null",
+    "name like 'beta-*'",
+    "name ~ '^[ab]'",
+    "name !~ a$",
+    "diskUsage > 1e5",
+    "diskUsage <= 50",
+    "diskUsage == null",
+    "createdAt >= 2024-01-01",
+    "createdAt < '2024-01-01'",
+    "createdAt == null",
+    "createdAt != null",
+    "updatedAt == null",
+    "isFork == true",
+    "parent != null",
+    "owner.login == ALICE",
+    "description like '*tool*'",
+    "not visibility == public",
+    "visibility == public or diskUsage > 1e5",
+    "createdAt >= 2024-01-01 and not isFork == true",
+    "(name ~ a or visibility == private) and diskUsage != null",
+    "createdAt == null and description == null",
+    "visibility != internal && createdAt > 2023-01-01 && parent == null",
+]
+
+
+def match(query: Query, records: list[dict[str, Any]]) -> list[str]:
+    """`query` に一致したレコードの名前を返す。"""
+    return [record["name"] for record in records if query.predicate(record)]
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("a == 1 or b == 1 and c == 1", {"x"}),
+        ("(a == 1 or b == 1) and c == 1", set()),
+        ("not a == 1 or c == 1", set()),
+        ("not (a == 1 and b == 2)", set()),
+        ("not (a == 1 and b == 1)", {"x"}),
+        ("a == 1 || b == 1 && c == 1", {"x"}),
+        ("! a == 2", {"x"}),
+        ("a == 1 AND NOT b == 1", {"x"}),
+    ],
+)
+def test_parse_precedence(expression: str, expected: set[str]) -> None:
+    record = {"name": "x", "a": 1, "b": 2, "c": 3}
+
+    assert set(match(Query.parse(expression), [record])) == expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "record", "expected"),
+    [
+        # 数値と日時は数値として比べる
+        ("n > 9", {"n": 10}, True),
+        ("n == 1e1", {"n": 10}, True),
+        ("n > 9", {"n": "10"}, False),
+        ("at > 2024-01-01", {"at": "2024-01-01T00:00:01Z"}, True),
+        ("at == '2024-01-01'", {"at": "2024-01-01"}, True),
+        ("at > 2024-01-01T09:00:00+09:00", {"at": "2024-01-01T00:00:01Z"}, True),
+        # 引用符で囲んだ値は常に文字列で、大文字小文字を区別しない
+        ("v == '10'", {"v": 10}, False),
+        ("v == 'Null'", {"v": "null"}, True),
+        ("v == ABC", {"v": "abc"}, True),
+        # null は値が無い場合も含む
+        ("v == null", {}, True),
+        ("v == null", {"v": None}, True),
+        ("v != NULL", {"v": 0}, True),
+        # 真偽値は真偽値とだけ一致する
+        ("v == true", {"v": True}, True),
+        ("v == false", {"v": 0}, False),
+        ("v != false", {"v": True}, True),
+        # 正規表現は大文字小文字を区別し、glob は区別しない
+        ("v ~ ^A", {"v": "abc"}, False),
+        ("v like A*", {"v": "abc"}, True),
+        ("v ~ a", {"v": 1}, False),
+        ("v !~ a", {}, True),
+        ("a.b == 1", {"a": {"b": 1}}, True),
+        ("a.b == null", {"a": 1}, True),
+    ],
+)
+def test_literal_semantics(
+    expression: str, record: dict[str, Any], expected: bool
+) -> None:
+    assert Query.parse(expression).predicate(record) is expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "message"),
+    [
+        ("", "unexpected end"),
+        ("a ==", "unexpected end"),
+        ("(a == 1", "unexpected end"),
+        ("(a == 1 b", r"'\)' expected"),
+        ("a == 1)", r"unexpected '\)'"),
+        ("a 1", "operator expected"),
+        ("== 1", "field name expected"),
+        ("a == (", "value expected"),
+        ("a ~ '('", "bad regular expression"),
+        ("a > null", "null only supports"),
+        ("a == 1 b == 2", "unexpected 'b'"),
+        ("a == 'x", "unexpected character"),
+    ],
+)
+def test_parse_errors(expression: str, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        Query.parse(expression)
+
+
+def test_fields() -> None:
+    query = Query.parse("a == 1 or not (b.c == 2 and a ~ x)")
+
+    assert query.fields() == {"a", "b.c"}
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_split_agrees_with_full_evaluation(expression: str) -> None:
+    query = Query.parse(expression)
+    index = SearchIndex.build(RECORDS, 1, None)
+    index_predicate, rest_predicate = query.split(SearchIndex.get_row_fields())
+
+    rows = index.get_rows(list(range(len(index.names))))
+    if index_predicate is not None:
+        rows = [row for row in rows if index_predicate(row)]
+    records = [RECORDS[row["name"]] for row in rows]
+    if rest_predicate is not None:
+        records = [record for record in records if rest_predicate(record)]
+
+    expected = match(query, [RECORDS[name] for name in index.names])
+    assert [record["name"] for record in records] == expected
+
+
+@pytest.mark.parametrize(
+    ("expression", "index_side", "rest_side"),
+    [
+        ("name like 'a*' and diskUsage > 10", True, False),
+        ("visibility ~ pub", False, True),
+        ("createdAt > 'x'", False, True),
+        ("createdAt == null", False, True),
+        ("name == a and parent != null", True, True),
+        ("name == a or parent != null", False, True),
+    ],
+)
+def test_split_sides(expression: str, index_side: bool, rest_side: bool) -> None:
+    index_predicate, rest_predicate = Query.parse(expression).split(
+        SearchIndex.get_row_fields()
+    )
+
+    assert (index_predicate is not None) is index_side
+    assert (rest_predicate is not None) is rest_side
+
+
+def test_parse_sort() -> None:
+    assert Query.parse_sort("-diskUsage, name,+createdAt") == [
+        ("diskUsage", True),
+        ("name", False),
+        ("createdAt", False),
+    ]
+    with pytest.raises(ValueError, match="invalid sort"):
+        Query.parse_sort("name,,-")
+
+
+def test_sort_items_keeps_missing_last_and_is_stable() -> None:
+    items = [
+        {"name": "b", "size": 2},
+        {"name": "none"},
+        {"name": "a", "size": 2},
+        {"name": "c", "size": 10},
+    ]
+
+    by_size = Query.sort_items(items, [("size", True)])
+    assert [item["name"] for item in by_size] == ["c", "b", "a", "none"]
+    by_size_then_name = Query.sort_items(items, [("size", False), ("name", False)])
+    assert [item["name"] for item in by_size_then_name] == ["a", "b", "c", "none"]
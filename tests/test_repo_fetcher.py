@@ -0,0 +1,233 @@
+"""`RepoFetcher` のページ送り・カーソル処理・名前指定取得・GraphQL エラー処理のテスト。
+
+`gh` は起動せず、`runner=` に渡した偽の `gh` が GraphQL 応答と同じ形の JSON を返す。
+"""
+
+import json
+import sys
+from typing import Any
+
+import pytest
+
+from ghrepo.repo_fetcher import RepoFetcher
+
+
+def make_node(name: str, visibility: str = "PUBLIC") -> dict[str, Any]:
+    """GraphQL 応答のリポジトリ 1 件を返す。"""
+    return {"name": name, "visibility": visibility}
+
+
+def make_page(
+    nodes: list[dict[str, Any]], has_next: bool, end_cursor: str | None
+) -> str:
+    """`repositoryOwner.repositories` の 1 ページ分の応答 JSON を返す。"""
+    connection = {
+        "nodes": nodes,
+        "pageInfo": {"hasNextPage": has_next, "endCursor": end_cursor},
+    }
+    return json.dumps({"data": {"repositoryOwner": {"repositories": connection}}})
+
+
+class FakeGh:
+    """`after` カーソルごとに用意した応答を返し、受け取った引数を記録する偽の `gh`。"""
+
+    def __init__(self, pages: dict[str | None, str]) -> None:
+        self.pages = pages
+        self.calls: list[list[str]] = []
+
+    @staticmethod
+    def get_arg(command_args: list[str], key: str) -> str | None:
+        """`-f key=value` / `-F key=value` の値を返す。無ければ `None`。"""
+        for value in command_args:
+            if value.startswith(f"{key}="):
+                return value[len(key) + 1 :]
+        return None
+
+    def __call__(self, command_args: list[str]) -> str:
+        self.calls.append(command_args)
+        return self.pages[self.get_arg(command_args, "after")]
+
+    def get_values(self, key: str) -> list[str | None]:
+        """各呼び出しで渡された `key` の値を順に返す。"""
+        return [self.get_arg(command_args, key) for command_args in self.calls]
+
+
+def collect(pages: Any) -> list[list[str]]:
+    """ページごとのリポジトリ名を返す。"""
+    return [[item["name"] for item in page] for page in pages]
+
+
+def test_iter_pages_follows_cursor_until_last_page() -> None:
+    gh = FakeGh(
+        {
+            None: make_page([make_node("a"), make_node("b")], True, "c1"),
+            "c1": make_page([make_node("c"), make_node("d")], True, "c2"),
+            "c2": make_page([make_node("e")], False, "c3"),
+        }
+    )
+    fetcher = RepoFetcher(page_size=2, runner=gh)
+
+    assert collect(fetcher.iter_pages("alice", ["name", "visibility"])) == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e"],
+    ]
+    assert gh.get_values("after") == [None, "c1", "c2"]
+    assert gh.get_values("first") == ["2", "2", "2"]
+    assert gh.get_values("owner") == ["alice", "alice", "alice"]
+
+
+def test_iter_pages_stops_when_cursor_does_not_advance() -> None:
+    gh = FakeGh(
+        {
+            None: make_page([make_node("a")], True, "c1"),
+            "c1": make_page([make_node("b")], True, "c1"),
+        }
+    )
+    fetcher = RepoFetcher(page_size=1, runner=gh)
+
+    assert collect(fetcher.iter_pages("alice", ["name"])) == [["a"], ["b"]]
+    assert gh.get_values("after") == [None, "c1"]
+
+
+def test_iter_pages_stops_without_end_cursor() -> None:
+    gh = FakeGh({None: make_page([make_node("a")], True, None)})
+
+    assert collect(RepoFetcher(runner=gh).iter_pages("alice", ["name"])) == [["a"]]
+    assert len(gh.calls) == 1
+
+
+def test_iter_pages_limit_shrinks_last_request_and_truncates() -> None:
+    gh = FakeGh(
+        {
+            None: make_page([make_node("a"), make_node("b")], True, "c1"),
+            # 要求より多く返されても上限で打ち切る
+            "c1": make_page([make_node("c"), make_node("d")], True, "c2"),
+        }
+    )
+    fetcher = RepoFetcher(page_size=2, runner=gh)
+
+    assert collect(fetcher.iter_pages("alice", ["name"], limit=3)) == [
+        ["a", "b"],
+        ["c"],
+    ]
+    assert gh.get_values("first") == ["2", "1"]
+
+
+def test_page_size_is_clamped() -> None:
+    assert RepoFetcher(page_size=0).page_size == 1
+    assert RepoFetcher(page_size=1000).page_size == RepoFetcher.DEFAULT_PAGE_SIZE
+
+
+def test_build_command_sends_owner_as_string() -> None:
+    command_args = RepoFetcher().build_command("query", "12345", 10, "c1")
+
+    assert command_args[command_args.index("owner=12345") - 1] == "-f"
+    assert command_args[command_args.index("first=10") - 1] == "-F"
+    assert command_args[command_args.index("after=c1") - 1] == "-f"
+
+
+def test_iter_pages_for_viewer_omits_owner() -> None:
+    connection = {
+        "nodes": [make_node("a")],
+        "pageInfo": {"hasNextPage": False, "endCursor": None},
+    }
+    gh = FakeGh({None: json.dumps({"data": {"viewer": {"repositories": connection}}})})
+
+    assert collect(RepoFetcher(runner=gh).iter_pages("", ["name"])) == [["a"]]
+    assert gh.get_values("owner") == [None]
+    assert "viewer" in (gh.get_arg(gh.calls[0], "query") or "")
+
+
+def test_iter_pages_normalizes_visibility() -> None:
+    gh = FakeGh({None: make_page([make_node("a", "PRIVATE")], False, None)})
+    fetcher = RepoFetcher(runner=gh)
+
+    pages = list(fetcher.iter_pages("alice", ["name"]))
+    assert pages == [[{"name": "a", "visibility": "private"}]]
+
+
+def test_iter_pages_reports_all_invalid_records_after_last_page() -> None:
+    gh = FakeGh(
+        {
+            None: make_page([make_node("a"), make_node("bad1", "BOGUS")], True, "c1"),
+            "c1": make_page([{"name": "bad2"}, make_node("b")], False, None),
+        }
+    )
+    received: list[list[str]] = []
+
+    with pytest.raises(ValueError) as excinfo:
+        for page in RepoFetcher(runner=gh).iter_pages("alice", ["name"]):
+            received.append([item["name"] for item in page])
+
+    assert received == [["a"], ["b"]]
+    message = str(excinfo.value)
+    assert "2 invalid repositories" in message
+    assert "#1 ('bad1')" in message
+    assert "#2:" in message
+
+
+def test_iter_pages_raises_on_graphql_errors() -> None:
+    gh = FakeGh({None: json.dumps({"errors": [{"message": "rate limited"}]})})
+
+    with pytest.raises(ValueError, match="returned errors"):
+        list(RepoFetcher(runner=gh).iter_pages("alice", ["name"]))
+
+
+def test_iter_pages_raises_on_missing_owner() -> None:
+    gh = FakeGh({None: json.dumps({"data": {"repositoryOwner": None}})})
+
+    with pytest.raises(ValueError, match="owner not found"):
+        list(RepoFetcher(runner=gh).iter_pages("ghost", ["name"]))
+
+
+def test_iter_pages_raises_on_invalid_json() -> None:
+    gh = FakeGh({None: "not json"})
+
+    with pytest.raises(ValueError, match="invalid JSON"):
+        list(RepoFetcher(runner=gh).iter_pages("alice", ["name"]))
+
+
+def test_iter_pages_raises_on_missing_nodes() -> None:
+    gh = FakeGh({None: json.dumps({"data": {"repositoryOwner": {"repositories": {}}}})})
+
+    with pytest.raises(ValueError, match="repositories.nodes"):
+        list(RepoFetcher(runner=gh).iter_pages("alice", ["name"]))
+
+
+def test_iter_repositories_by_name_reports_invalid_records_from_every_batch(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def gh(command_args: list[str]) -> str:
+        query = FakeGh.get_arg(command_args, "query") or ""
+        node = make_node("bad", "BOGUS") if '"bad"' in query else make_node("good")
+        return json.dumps({"data": {"r0": node}})
+
+    monkeypatch.setattr(RepoFetcher, "DEFAULT_NAME_BATCH_SIZE", 1)
+    received: list[list[str]] = []
+
+    with pytest.raises(ValueError, match="bad") as excinfo:
+        for page in RepoFetcher(runner=gh).iter_repositories_by_name(
+            ["alice/bad", "alice/good"], ["name"]
+        ):
+            received.append([item["name"] for item in page])
+
+    assert received == [["good"]]
+    assert "1 invalid repositories" in str(excinfo.value)
+
+
+def test_run_gh_raises_on_nonzero_exit() -> None:
+    with pytest.raises(RuntimeError, match=r"failed \(3\)"):
+        RepoFetcher._run_gh([sys.executable, "-c", "import sys; sys.exit(3)"])
+
+
+def test_build_selections_counts_open_items_only() -> None:
+    selections = RepoFetcher.build_selections(["name", "pullRequests", "issues"])
+
+    assert "pullRequests(states: OPEN) { totalCount }" in selections
+    assert "issues(states: OPEN) { totalCount }" in selections
+
+
+def test_build_selections_rejects_unsupported_fields() -> None:
+    with pytest.raises(ValueError, match="labels"):
+        RepoFetcher.build_selections(["name", "labels"])
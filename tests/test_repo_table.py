@@ -0,0 +1,144 @@
+"""メモリの少ないリポジトリ一覧 (`RepoTable`) の往復・共有と、読み込み境界での利用のテスト。"""
+
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.command_search import CommandSearch, SearchOptions
+from ghrepo.repo_table import RepoTable
+from ghrepo.snapshot_store import SnapshotStore
+
+
+def make_item(number: int) -> dict[str, Any]:
+    """GraphQL の取得結果と同じ形のレコードを返す。"""
+    return {
+        "name": f"repo{number}",
+        "nameWithOwner": f"alice/repo{number}",
+        "visibility": "public" if number % 3 else "private",
+        "owner": {"login": "alice", "id": "U_1"},
+        "parent": None,
+        "diskUsage": number,
+        "isFork": False,
+        "stargazerCount": 1,
+        "repositoryTopics": ["tool", "cli"],
+        "primaryLanguage": {"name": "Python"},
+        "description": f"repository {number}",
+        "field_1": "",
+        "snapshot-id": 7,
+    }
+
+
+def test_round_trip_keeps_values_types_and_order() -> None:
+    item = {
+        "name": "a",
+        "flag": True,
+        "one": 1,
+        "ratio": 1.0,
+        "empty_list": [],
+        "empty_dict": {},
+        "nested": {"list": [1, True, {"x": None}], "none": None},
+        "owner": {"login": "alice"},
+    }
+    table = RepoTable([("a", item)])
+
+    thawed = table["a"]
+    assert thawed == item
+    assert list(thawed) == list(item)
+    # `True == 1 == 1.0` でも型は入れ替わらない
+    assert type(thawed["flag"]) is bool and type(thawed["one"]) is int
+    assert type(thawed["ratio"]) is float
+    assert type(thawed["nested"]["list"][1]) is bool
+    assert table.to_dict() == {"a": item}
+
+
+def test_returned_dicts_do_not_change_the_table() -> None:
+    item = make_item(1)
+    table = RepoTable([("repo1", item)])
+
+    thawed = table["repo1"]
+    thawed["owner"]["login"] = "mallory"
+    thawed["repositoryTopics"].append("changed")
+    item["visibility"] = "internal"
+
+    assert table["repo1"] == make_item(1)
+    assert table["repo1"] is not table["repo1"]
+
+
+def test_layouts_nested_values_and_interned_strings_are_shared() -> None:
+    table = RepoTable((f"repo{number}", make_item(number)) for number in range(3))
+    rows = [table._rows[f"repo{number}"] for number in range(3)]
+    keys = list(make_item(0))
+
+    def value(row: tuple[Any, ...], key: str) -> Any:
+        return row[1 + keys.index(key)]
+
+    assert rows[0][0] is rows[1][0] is rows[2][0]
+    assert value(rows[0], "owner") is value(rows[1], "owner")
+    assert value(rows[0], "repositoryTopics") is value(rows[2], "repositoryTopics")
+    # 別々に作られた同じ文字列も 1 つにまとめる
+    assert value(rows[1], "visibility") is value(rows[2], "visibility")
+    visibility = "".join(["pub", "lic"])
+    assert visibility is not value(rows[1], "visibility")
+    table.add("other", {"visibility": visibility})
+    assert table._rows["other"][1] is value(rows[1], "visibility")
+
+
+def test_mapping_interface_and_replacement() -> None:
+    table = RepoTable([("a", {"name": "a"}), ("b", {"name": "b"})])
+    table.add("a", {"name": "a", "visibility": "private"})
+
+    assert list(table) == ["a", "b"]
+    assert len(table) == 2
+    assert "a" in table and "c" not in table
+    assert table.get("c") is None
+    assert dict(table.items()) == {
+        "a": {"name": "a", "visibility": "private"},
+        "b": {"name": "b"},
+    }
+
+
+def test_table_uses_less_memory_than_dicts() -> None:
+    names = [f"repo{number}" for number in range(2000)]
+
+    tracemalloc.start()
+    try:
+        assoc = {name: make_item(number) for number, name in enumerate(names)}
+        dict_size = tracemalloc.get_traced_memory()[0]
+        table = RepoTable(assoc.items())
+        del assoc
+        table_size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert len(table) == len(names)
+    assert table_size * 2 < dict_size
+
+
+def test_read_table_matches_read(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    assoc = {f"repo{number}": make_item(number) for number in range(5)}
+    for snapshot_id, storage in enumerate(
+        (AppConfigx.SNAPSHOT_STORAGE_PLAIN, AppConfigx.SNAPSHOT_STORAGE_DEDUP), 1
+    ):
+        store.write(snapshot_id, assoc, storage)
+
+        table = store.read_table(snapshot_id)
+        assert isinstance(table, RepoTable)
+        assert table.to_dict() == store.read(snapshot_id)
+
+
+def test_cached_search_returns_records_from_table(command_list: CommandList) -> None:
+    assoc = {f"repo{number}": make_item(number) for number in range(6)}
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", assoc)
+    cached = CommandSearch(command_list.appstore, "alice", cache=True)
+    uncached = CommandSearch(command_list.appstore, "alice")
+    options = SearchOptions("private")
+
+    assert cached.search_repos(options) == uncached.search_repos(options)
+    assert isinstance(cached._cached_assoc, RepoTable)
+    # 返したレコードを変更しても、キャッシュ中の表は変わらない
+    cached.search_repos(options)[0]["owner"]["login"] = "mallory"
+    assert cached.search_repos(options) == uncached.search_repos(options)
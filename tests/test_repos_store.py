@@ -0,0 +1,92 @@
+"""最新リポジトリ一覧の保存先 (`repos.yaml` / `repos.sqlite3`) のマージと、`REPOS_STORE` による選択のテスト。"""
+
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.repos_store import ReposStore, SqliteReposStore, YamlReposStore
+
+
+def set_repos_store(command: CommandList, kind: str) -> None:
+    """設定ファイルの `REPOS_STORE` を書き換えて読み直す。"""
+    appstore = command.appstore
+    config = {
+        AppConfigx.key: AppConfigx.default_json_fields,
+        "USER": appstore.user,
+        AppConfigx.REPOS_STORE_KEY: kind,
+    }
+    appstore.output_config("config", config)
+    appstore.load_file_all()
+
+
+def make_item(name: str, visibility: str, snapshot_id: int) -> dict[str, Any]:
+    """リポジトリ 1 件のレコードを返す。"""
+    return {"name": name, "visibility": visibility, "snapshot-id": snapshot_id}
+
+
+@pytest.fixture(params=[AppConfigx.REPOS_STORE_YAML, AppConfigx.REPOS_STORE_SQLITE])
+def repos_store(
+    request: pytest.FixtureRequest, command_list: CommandList
+) -> ReposStore:
+    set_repos_store(command_list, request.param)
+    return command_list.get_repos_store()
+
+
+def test_merge_writes_only_changed_records(repos_store: ReposStore) -> None:
+    assert repos_store.merge({"a": make_item("a", "public", 1)}) == 1
+    assert (
+        repos_store.merge(
+            {"a": make_item("a", "public", 2), "b": make_item("b", "private", 2)}
+        )
+        == 1
+    )
+
+    # 内容が変わらなかった a は前回の snapshot-id を保持する
+    assert repos_store.load_all() == {
+        "a": make_item("a", "public", 1),
+        "b": make_item("b", "private", 2),
+    }
+    assert repos_store.get("b") == make_item("b", "private", 2)
+    assert repos_store.get("missing") is None
+    assert [name for name, _ in repos_store.iter_items()] == ["a", "b"]
+    assert dict(repos_store.load_table().items()) == repos_store.load_all()
+
+
+def test_merge_without_changes_does_not_touch_file(repos_store: ReposStore) -> None:
+    repos_store.merge({"a": make_item("a", "public", 1)})
+    before = repos_store.get_path().stat().st_mtime_ns
+
+    assert repos_store.merge({"a": make_item("a", "public", 2)}) == 0
+
+    assert repos_store.get_path().stat().st_mtime_ns == before
+
+
+def test_default_config_uses_yaml(command_list: CommandList) -> None:
+    assert isinstance(command_list.get_repos_store(), YamlReposStore)
+
+
+def test_old_config_uses_yaml(old_config_command_list: CommandList) -> None:
+    assert isinstance(old_config_command_list.get_repos_store(), YamlReposStore)
+
+
+def test_sqlite_imports_existing_repos_yaml(command_list: CommandList) -> None:
+    command_list.get_repos_store().merge({"a": make_item("a", "public", 1)})
+
+    set_repos_store(command_list, AppConfigx.REPOS_STORE_SQLITE)
+    store = command_list.get_repos_store()
+
+    assert isinstance(store, SqliteReposStore)
+    assert store.exists()
+    assert store.load_all() == {"a": make_item("a", "public", 1)}
+    # 取り込みは repos.sqlite3 が無いときだけ行う
+    store.merge({"a": make_item("a", "private", 2)})
+    assert command_list.load_latest_repo("a") == make_item("a", "private", 2)
+
+
+def test_unknown_repos_store_is_rejected(command_list: CommandList) -> None:
+    set_repos_store(command_list, "lmdb")
+
+    with pytest.raises(ValueError, match="unsupported repos store: lmdb"):
+        command_list.get_repos_store()
@@ -0,0 +1,197 @@
+"""`RetentionPolicy` の選択規則と、`prune_snapshots` のアーカイブ・オブジェクト削除のテスト。"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.retention import RetentionPolicy
+
+LATEST = datetime(2024, 3, 15, 12, 0, tzinfo=timezone.utc)  # 金曜日
+
+
+def make_timestamps(*hours_ago: float) -> dict[int, datetime]:
+    """スナップショットID 1, 2, ... の作成日時を `LATEST` からの経過時間で返す。"""
+    return {
+        snapshot_id: LATEST - timedelta(hours=hours)
+        for snapshot_id, hours in enumerate(hours_ago, start=1)
+    }
+
+
+def select(policy: RetentionPolicy, timestamps: dict[int, datetime]) -> list[int]:
+    """`timestamps` の全スナップショットから残す ID を返す。"""
+    kept, archived = policy.select(list(timestamps), timestamps)
+    assert sorted(kept + archived) == sorted(timestamps)
+    return kept
+
+
+@pytest.mark.parametrize(
+    ("values", "message"),
+    [
+        ((-1, 0, 0), "keep-last"),
+        ((0, -2, 0), "keep-daily"),
+        ((0, 0, -2), "keep-weekly"),
+    ],
+)
+def test_policy_rejects_out_of_range(
+    values: tuple[int, int, int], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        RetentionPolicy(*values)
+
+
+def test_from_values_coerces_and_uses_defaults() -> None:
+    policy = RetentionPolicy.from_values("3", None, "", defaults=(1, 7, -1))
+
+    assert (policy.keep_last, policy.keep_daily, policy.keep_weekly) == (3, 7, -1)
+
+
+@pytest.mark.parametrize("value", [True, "three", 1.5j, [1]])
+def test_from_values_rejects_non_integers(value: Any) -> None:
+    with pytest.raises(ValueError, match="must be an integer"):
+        RetentionPolicy.from_values(value, 0, 0, defaults=(0, 0, 0))
+
+
+def test_select_empty() -> None:
+    assert RetentionPolicy(1, 1, 1).select([], {}) == ([], [])
+
+
+def test_select_always_keeps_latest() -> None:
+    assert select(RetentionPolicy(0, 0, 0), make_timestamps(30, 20, 10, 0)) == [4]
+
+
+def test_select_keep_last() -> None:
+    assert select(RetentionPolicy(2, 0, 0), make_timestamps(30, 20, 10, 0)) == [3, 4]
+
+
+def test_select_keep_daily_keeps_newest_per_day() -> None:
+    # 3 日前・2 日前に 2 件ずつ、当日に 1 件
+    timestamps = make_timestamps(72, 70, 48, 46, 0)
+
+    assert select(RetentionPolicy(0, 2, 0), timestamps) == [4, 5]
+    assert select(RetentionPolicy(0, 4, 0), timestamps) == [2, 4, 5]
+    assert select(RetentionPolicy(0, RetentionPolicy.FOREVER, 0), timestamps) == [
+        2,
+        4,
+        5,
+    ]
+
+
+def test_select_keep_weekly_keeps_newest_per_iso_week() -> None:
+    # 3 週前・2 週前に 2 件ずつ、今週に 1 件
+    week = 24 * 7
+    timestamps = make_timestamps(3 * week, 3 * week - 1, 2 * week, 2 * week - 1, 0)
+
+    assert select(RetentionPolicy(0, 0, 2), timestamps) == [4, 5]
+    assert select(RetentionPolicy(0, 0, RetentionPolicy.FOREVER), timestamps) == [
+        2,
+        4,
+        5,
+    ]
+
+
+def test_select_combines_policies_and_keeps_undated() -> None:
+    timestamps = make_timestamps(200, 100, 50, 1, 0)
+    del timestamps[1]
+
+    kept, archived = RetentionPolicy(1, 2, 0).select([1, 2, 3, 4, 5], timestamps)
+
+    assert kept == [1, 5]
+    assert archived == [2, 3, 4]
+
+
+def test_select_counts_periods_from_latest_snapshot() -> None:
+    # 取得が止まっていても、最新スナップショットから数えるため直近の日は残る
+    timestamps = {1: LATEST - timedelta(days=400), 2: LATEST - timedelta(days=399)}
+
+    assert select(RetentionPolicy(0, 2, 0), timestamps) == [1, 2]
+
+
+def save_dedup(
+    command: CommandList, timestamp: datetime, assoc: dict[str, dict[str, Any]]
+) -> int:
+    """`dedup` 形式でスナップショットを保存し、その ID を返す。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(snapshot_id, timestamp.isoformat(), assoc)
+    return snapshot_id
+
+
+@pytest.fixture
+def dedup_command(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> CommandList:
+    monkeypatch.setattr(
+        command_list, "get_snapshot_storage", lambda: AppConfigx.SNAPSHOT_STORAGE_DEDUP
+    )
+    return command_list
+
+
+def make_assoc(**visibilities: str) -> dict[str, dict[str, Any]]:
+    """リポジトリ名ごとのレコードを返す。"""
+    return {
+        name: {"name": name, "visibility": visibility}
+        for name, visibility in visibilities.items()
+    }
+
+
+def count_objects(command: CommandList) -> int:
+    """`objects/` にあるオブジェクト数を返す。"""
+    objects_dir = command.get_snapshot_store().objects_dir
+    return sum(1 for path in objects_dir.rglob("*") if path.is_file())
+
+
+def test_prune_archives_and_removes_unreferenced_objects(
+    dedup_command: CommandList,
+) -> None:
+    assocs = [
+        make_assoc(a="public", b="public"),
+        make_assoc(a="private", b="public"),
+        make_assoc(a="private", b="internal"),
+    ]
+    for days_ago, assoc in zip((10, 5, 0), assocs, strict=True):
+        save_dedup(dedup_command, LATEST - timedelta(days=days_ago), assoc)
+    store = dedup_command.get_snapshot_store()
+    assert count_objects(dedup_command) == 4
+
+    result = dedup_command.prune_snapshots(RetentionPolicy(1, 0, 0))
+
+    assert result["kept"] == [3]
+    assert result["archived"] == [1, 2]
+    assert result["pack"] is not None
+    # 最新スナップショットの 2 件だけが参照され続ける
+    assert result["removed_objects"] == 2
+    assert count_objects(dedup_command) == 2
+    assert store.collect_snapshot_ids(store.published_dir) == [3]
+    assert store.collect_all_snapshot_ids() == [1, 2, 3]
+    # アーカイブしたスナップショットも同じ内容で読める
+    for snapshot_id, assoc in enumerate(assocs, start=1):
+        assert {
+            name: item["visibility"] for name, item in store.read(snapshot_id).items()
+        } == {name: item["visibility"] for name, item in assoc.items()}
+
+
+def test_prune_dry_run_changes_nothing(dedup_command: CommandList) -> None:
+    save_dedup(dedup_command, LATEST - timedelta(days=1), make_assoc(a="public"))
+    save_dedup(dedup_command, LATEST, make_assoc(a="private"))
+    store = dedup_command.get_snapshot_store()
+
+    result = dedup_command.prune_snapshots(RetentionPolicy(1, 0, 0), dry_run=True)
+
+    assert result["archived"] == [1]
+    assert result["pack"] is None
+    assert result["removed_objects"] == 0
+    assert count_objects(dedup_command) == 2
+    assert store.collect_snapshot_ids(store.published_dir) == [1, 2]
+
+
+def test_prune_keeps_objects_still_referenced(dedup_command: CommandList) -> None:
+    save_dedup(dedup_command, LATEST - timedelta(days=1), make_assoc(a="public"))
+    save_dedup(dedup_command, LATEST, make_assoc(a="public", b="public"))
+
+    result = dedup_command.prune_snapshots(RetentionPolicy(1, 0, 0))
+
+    assert result["archived"] == [1]
+    assert result["removed_objects"] == 0
+    assert count_objects(dedup_command) == 2
@@ -0,0 +1,161 @@
+"""検索用サイドカーインデックス (`SearchIndex`) の組み立て・保存時の作成・作り直しと、インデックスだけでの検索のテスト。"""
+
+from typing import Any
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.command_search import CommandSearch, SearchOptions
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_store import SnapshotStore
+
+TIMESTAMP = "2024-03-15T12:00:00+00:00"
+
+ASSOC: dict[str, dict[str, Any]] = {
+    "toolbox": {
+        "name": "toolbox",
+        "visibility": "PUBLIC",
+        "nameWithOwner": "alice/toolbox",
+        "createdAt": "2024-01-02T00:00:00Z",
+    },
+    "tools-cli": {
+        "name": "tools-cli",
+        "visibility": "private",
+        "owner": {"login": "Alice"},
+        "createdAt": "2024-03-01T00:00:00Z",
+    },
+    "notes": {
+        "name": "notes",
+        "visibility": "public",
+        "owner": "bob",
+        "createdAt": "2023-12-31T23:00:00+09:00",
+    },
+    "sandbox": {"name": "sandbox", "visibility": "internal"},
+}
+
+
+def save(command: CommandList, assoc: dict[str, dict[str, Any]]) -> int:
+    """`assoc` を新しいスナップショットとして保存し、そのIDを返す。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(snapshot_id, TIMESTAMP, assoc)
+    return snapshot_id
+
+
+def test_build_indexes_visibility_owner_name_and_created_at() -> None:
+    index = SearchIndex.build(ASSOC, 1, None)
+
+    assert index.names == ["notes", "sandbox", "toolbox", "tools-cli"]
+    assert index.get_names(index.select_visibility(["public"])) == ["notes", "toolbox"]
+    assert index.get_names(index.select_visibility(["PRIVATE", "internal"])) == [
+        "sandbox",
+        "tools-cli",
+    ]
+    everything = list(range(len(index.names)))
+    # 3 文字以上はトライグラムで、未満は名前の走査で絞る
+    assert index.get_names(index.filter_name_substring(everything, "tool")) == [
+        "toolbox",
+        "tools-cli",
+    ]
+    assert index.get_names(index.filter_name_substring(everything, "box")) == [
+        "sandbox",
+        "toolbox",
+    ]
+    assert index.get_names(index.filter_name_substring(everything, "ls")) == [
+        "tools-cli"
+    ]
+    assert index.filter_name_substring(everything, "xyz") == []
+    # `nameWithOwner` / `owner.login` / `owner` のいずれでも、大文字小文字を区別せず一致する
+    assert index.get_names(index.filter_owner(everything, " ALICE ")) == [
+        "toolbox",
+        "tools-cli",
+    ]
+    assert index.get_names(index.filter_owner(everything, "bob")) == ["notes"]
+    # `createdAt` の並びはエポック秒で比べ、値の無いものは末尾に置く
+    assert index.get_names(index.take_top("createdAt", 4)) == [
+        "tools-cli",
+        "toolbox",
+        "notes",
+        "sandbox",
+    ]
+    assert index.get_names(index.take_top("createdAt", 2, descending=False)) == [
+        "notes",
+        "toolbox",
+    ]
+    assert index.get_rows([0])[0]["visibility"] == "public"
+
+
+def test_save_snapshot_writes_index_and_load_detects_changes(
+    command_list: CommandList,
+) -> None:
+    snapshot_id = save(command_list, ASSOC)
+    store = command_list.get_snapshot_store()
+
+    assert SearchIndex.get_index_path(store, snapshot_id).exists()
+    loaded = SearchIndex.load(store, snapshot_id)
+    assert loaded is not None
+    assert loaded.names == ["notes", "sandbox", "toolbox", "tools-cli"]
+
+    # インデックスを通さずに本体を書き換えると、フィンガープリントが合わず作り直す
+    changed = {**ASSOC, "zeta": {"name": "zeta", "visibility": "public"}}
+    store.write(snapshot_id, changed, command_list.get_snapshot_storage())
+    assert SearchIndex.load(store, snapshot_id) is None
+    rebuilt = SearchIndex.load_or_rebuild(store, snapshot_id)
+    assert "zeta" in rebuilt.names
+    assert SearchIndex.load(store, snapshot_id) is not None
+
+
+def test_load_rejects_broken_or_old_index(command_list: CommandList) -> None:
+    snapshot_id = save(command_list, ASSOC)
+    store = command_list.get_snapshot_store()
+    index_path = SearchIndex.get_index_path(store, snapshot_id)
+
+    index_path.write_text("{broken", encoding="utf-8")
+    assert SearchIndex.load(store, snapshot_id) is None
+
+    old = SearchIndex.build(ASSOC, snapshot_id, store.get_fingerprint(snapshot_id))
+    old.data["version"] = SearchIndex.VERSION - 1
+    old.save(index_path)
+    assert SearchIndex.load(store, snapshot_id) is None
+
+
+def test_search_names_answers_from_index_without_reading_snapshot(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    save(command_list, ASSOC)
+
+    def fail(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("snapshot body must not be read")
+
+    monkeypatch.setattr(SnapshotStore, "read", fail)
+    monkeypatch.setattr(SnapshotStore, "read_subset", fail)
+    monkeypatch.setattr(SnapshotStore, "read_table", fail)
+    command = CommandSearch(command_list.appstore, "alice")
+
+    assert command.search_names(SearchOptions("public")) == ["notes", "toolbox"]
+    assert command.search_names(SearchOptions("both", name_pattern="tool")) == [
+        "toolbox",
+        "tools-cli",
+    ]
+    assert command.search_names(SearchOptions("both", user="alice")) == [
+        "toolbox",
+        "tools-cli",
+    ]
+    assert command.search_names(SearchOptions("latest", count=1)) == ["tools-cli"]
+
+
+def test_search_uses_rebuilt_index_after_snapshot_changes(
+    command_list: CommandList,
+) -> None:
+    snapshot_id = save(command_list, ASSOC)
+    command = CommandSearch(command_list.appstore, "alice", cache=True)
+    assert command.search_names(SearchOptions("private")) == ["tools-cli"]
+
+    changed = {**ASSOC, "secret": {"name": "secret", "visibility": "private"}}
+    command_list.get_snapshot_store().write(
+        snapshot_id, changed, command_list.get_snapshot_storage()
+    )
+
+    assert command.search_names(SearchOptions("private")) == ["secret", "tools-cli"]
+    assert [
+        record["name"] for record in command.search_repos(SearchOptions("private"))
+    ] == ["secret", "tools-cli"]
@@ -0,0 +1,171 @@
+"""`SnapshotCodec` の各形式で、書き出したスナップショットが元と同じ辞書に戻ることと、
+設定した形式での保存・`convert` による形式の書き換えのテスト。
+"""
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.annotated_repos import AnnotatedRepos
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.search_index import SearchIndex
+from ghrepo.snapshot_codec import (
+    SNAPSHOT_CODECS,
+    JsonLinesCodec,
+    ParquetCodec,
+    SnapshotCodec,
+    get_snapshot_codec,
+)
+from ghrepo.snapshot_store import SnapshotStore
+
+# フィールドの揃っていないレコードと、値が `None` のフィールドを含む
+SNAPSHOT: dict[str, Any] = {
+    "beta": {
+        "name": "beta",
+        "visibility": "private",
+        "parent": None,
+        "pullRequests": {"totalCount": 2},
+    },
+    "alpha": {"name": "alpha", "visibility": "public", "parent": None},
+}
+
+OPTIONAL_PACKAGES = {
+    AppConfigx.FILE_TYPE_MSGPACK: "msgpack",
+    AppConfigx.FILE_TYPE_PARQUET: "pyarrow",
+}
+
+
+@pytest.mark.parametrize("file_type", sorted(SNAPSHOT_CODECS))
+def test_round_trip_is_lossless(file_type: str, tmp_path: Path) -> None:
+    if file_type in OPTIONAL_PACKAGES:
+        pytest.importorskip(OPTIONAL_PACKAGES[file_type])
+    codec = SNAPSHOT_CODECS[file_type]
+    path = tmp_path / f"snapshot{codec.get_ext()}"
+
+    codec.dump(SNAPSHOT, path)
+
+    assert codec.load(path) == SNAPSHOT
+    assert [key for key, _ in codec.iter_items(path)] == ["alpha", "beta"]
+
+
+@pytest.mark.parametrize("file_type", sorted(SNAPSHOT_CODECS))
+def test_dump_accepts_read_only_mapping(file_type: str, tmp_path: Path) -> None:
+    if file_type in OPTIONAL_PACKAGES:
+        pytest.importorskip(OPTIONAL_PACKAGES[file_type])
+    codec = SNAPSHOT_CODECS[file_type]
+    path = tmp_path / f"snapshot{codec.get_ext()}"
+    records = {name: dict(item) for name, item in SNAPSHOT.items()}
+
+    codec.dump(AnnotatedRepos(records, {"snapshot-id": 3}), path)
+
+    assert codec.load(path) == {
+        name: {**item, "snapshot-id": 3} for name, item in SNAPSHOT.items()
+    }
+
+
+@pytest.mark.parametrize("line", ["not json", '{"name": "a"}', '["a"]'])
+def test_jsonl_reports_broken_line(line: str, tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.jsonl"
+    path.write_text('["alpha", {"name": "alpha"}]\n\n' + line + "\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match=r"snapshot.jsonl:3"):
+        JsonLinesCodec().load(path)
+
+
+def test_parquet_reads_files_without_fields_column(tmp_path: Path) -> None:
+    pyarrow = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "snapshot.parquet"
+    rows = [
+        {ParquetCodec.KEY_COLUMN: "alpha", "name": "alpha", "url": None},
+        {ParquetCodec.KEY_COLUMN: "beta", "name": "beta", "url": "https://x"},
+    ]
+    parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+
+    assert ParquetCodec().load(path) == {
+        "alpha": {"name": "alpha", "url": None},
+        "beta": {"name": "beta", "url": "https://x"},
+    }
+
+
+@pytest.mark.parametrize("file_type", ["yaml", "YAML", "Jsonl", "msgpack", "PARQUET"])
+def test_get_snapshot_codec_ignores_case(file_type: str) -> None:
+    assert get_snapshot_codec(file_type).file_type == file_type.upper()
+
+
+def test_snapshot_formats_have_codecs_and_extensions() -> None:
+    for file_type in AppConfigx.snapshot_formats:
+        assert (
+            SNAPSHOT_CODECS[file_type].get_ext() == AppConfigx.file_type_dict[file_type]
+        )
+    with pytest.raises(ValueError, match="unsupported snapshot format"):
+        get_snapshot_codec("toml")
+
+
+def test_codec_base_class_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        SnapshotCodec()  # type: ignore[abstract]
+
+
+def set_snapshot_format(command: CommandList, file_type: str) -> None:
+    """設定ファイルの `SNAPSHOT_FORMAT` を書き換えて読み直す。"""
+    appstore = command.appstore
+    config = {
+        AppConfigx.key: AppConfigx.default_json_fields,
+        "USER": appstore.user,
+        AppConfigx.SNAPSHOT_FORMAT_KEY: file_type,
+    }
+    appstore.output_config("config", config)
+    appstore.load_file_all()
+
+
+def save(command: CommandList, assoc: dict[str, Any]) -> int:
+    """スナップショットを保存し、その ID を返す。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(snapshot_id, "2024-01-01T00:00:00+00:00", assoc)
+    return snapshot_id
+
+
+def test_old_config_defaults_to_yaml(old_config_command_list: CommandList) -> None:
+    assert old_config_command_list.get_snapshot_format() == AppConfigx.FILE_TYPE_YAML
+
+
+def test_save_snapshot_uses_configured_format(command_list: CommandList) -> None:
+    set_snapshot_format(command_list, "jsonl")
+    assert command_list.get_snapshot_format() == AppConfigx.FILE_TYPE_JSONL
+
+    snapshot_id = save(command_list, SNAPSHOT)
+
+    store = command_list.get_snapshot_store()
+    found = store.find_file(snapshot_id, SnapshotStore.SNAPSHOT_BASE_NAME)
+    assert found is not None and found[0].name == "snapshot.jsonl"
+    assert store.read(snapshot_id) == SNAPSHOT
+
+
+def test_convert_keeps_storage_and_rebuilds_indexes(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    plain_id = save(command_list, SNAPSHOT)
+    monkeypatch.setattr(
+        command_list, "get_snapshot_storage", lambda: AppConfigx.SNAPSHOT_STORAGE_DEDUP
+    )
+    dedup_id = save(command_list, SNAPSHOT)
+    store = command_list.get_snapshot_store()
+    before = {
+        snapshot_id: store.read(snapshot_id) for snapshot_id in (plain_id, dedup_id)
+    }
+
+    result = command_list.convert_snapshots(AppConfigx.FILE_TYPE_JSONL)
+
+    assert result == {"converted": [plain_id, dedup_id], "format": "JSONL"}
+    plain = store.find_file(plain_id, SnapshotStore.SNAPSHOT_BASE_NAME)
+    assert plain is not None and plain[0].suffix == ".jsonl"
+    assert not (store.get_snapshot_dir(plain_id) / "snapshot.yaml").exists()
+    manifest = store.find_file(dedup_id, SnapshotStore.MANIFEST_BASE_NAME)
+    assert manifest is not None and manifest[0].suffix == ".jsonl"
+    for snapshot_id, assoc in before.items():
+        assert store.read(snapshot_id) == assoc
+        # 検索用インデックスは書き換えたファイルに合わせて作り直されている
+        assert SearchIndex.load(store, snapshot_id) is not None
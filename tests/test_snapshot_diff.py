@@ -0,0 +1,161 @@
+"""スナップショット間の差分 (`SnapshotDiff`) と `ghrepo diff` のテスト。"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.ghrepo import main
+from ghrepo.snapshot_diff import SnapshotDiff
+from ghrepo.snapshot_store import SnapshotStore
+
+DEDUP = AppConfigx.SNAPSHOT_STORAGE_DEDUP
+PLAIN = AppConfigx.SNAPSHOT_STORAGE_PLAIN
+
+OLD: dict[str, dict[str, Any]] = {
+    "same": {"name": "same", "visibility": "public", "diskUsage": 1},
+    "flip": {"name": "flip", "visibility": "public", "diskUsage": 1},
+    "grow": {"name": "grow", "visibility": "private", "diskUsage": 10},
+    "edit": {"name": "edit", "visibility": "public", "description": "old"},
+    "gone": {"name": "gone", "visibility": "public"},
+    "before": {
+        "name": "before",
+        "visibility": "public",
+        "id": "R_1",
+        "nameWithOwner": "alice/before",
+    },
+    "dated": {
+        "name": "dated",
+        "visibility": "private",
+        "owner": {"login": "alice"},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "diskUsage": 5,
+    },
+}
+
+NEW: dict[str, dict[str, Any]] = {
+    "same": {"name": "same", "visibility": "public", "diskUsage": 1},
+    "flip": {"name": "flip", "visibility": "private", "diskUsage": 1},
+    "grow": {"name": "grow", "visibility": "private", "diskUsage": 25},
+    "edit": {"name": "edit", "visibility": "public", "description": "new"},
+    "added": {"name": "added", "visibility": "internal"},
+    "after": {
+        "name": "after",
+        "visibility": "public",
+        "id": "R_1",
+        "nameWithOwner": "alice/after",
+    },
+    "redated": {
+        "name": "redated",
+        "visibility": "private",
+        "owner": {"login": "alice"},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "diskUsage": 6,
+    },
+}
+
+EXPECTED: list[dict[str, Any]] = [
+    {"change": "modified", "name": "edit", "fields": ["description"]},
+    {"change": "visibility", "name": "flip", "old": "public", "new": "private"},
+    {"change": "disk_usage", "name": "grow", "old": 10, "new": 25, "delta": 15},
+    # 改名は GraphQL のノード ID、無ければオーナーと `createdAt` の組で判定する
+    {"change": "renamed", "name": "after", "old_name": "before"},
+    {"change": "renamed", "name": "redated", "old_name": "dated"},
+    {"change": "disk_usage", "name": "redated", "old": 5, "new": 6, "delta": 1},
+    {"change": "deleted", "name": "gone"},
+    {"change": "created", "name": "added", "visibility": "internal"},
+]
+
+
+def with_snapshot_id(
+    assoc: dict[str, dict[str, Any]], snapshot_id: int
+) -> dict[str, dict[str, Any]]:
+    """全レコードに `snapshot-id` を付けた一覧を返す。"""
+    return {name: {**item, "snapshot-id": snapshot_id} for name, item in assoc.items()}
+
+
+@pytest.mark.parametrize("storage", [PLAIN, DEDUP])
+def test_iter_changes_reports_every_kind_of_change(
+    tmp_path: Path, storage: str
+) -> None:
+    store = SnapshotStore(tmp_path)
+    store.write(1, with_snapshot_id(OLD, 1), storage)
+    store.write(2, with_snapshot_id(NEW, 2), storage)
+
+    assert list(SnapshotDiff(store).iter_changes(1, 2)) == EXPECTED
+    assert list(SnapshotDiff(store).iter_changes(2, 2)) == []
+
+
+def test_dedup_diff_reads_only_changed_records(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = SnapshotStore(tmp_path)
+    store.write(1, with_snapshot_id(OLD, 1), DEDUP)
+    store.write(2, with_snapshot_id(NEW, 2), DEDUP)
+    read_hashes: list[str] = []
+    read_object = SnapshotStore._read_object
+
+    def counting_read(self: SnapshotStore, record_hash: str) -> dict[str, Any]:
+        read_hashes.append(record_hash)
+        return read_object(self, record_hash)
+
+    monkeypatch.setattr(SnapshotStore, "_read_object", counting_read)
+
+    assert list(SnapshotDiff(store).iter_changes(1, 2)) == EXPECTED
+    # ハッシュが一致する `same` は両側とも本体を読まない。読むのは変更のあった 3 件の両側と、
+    # 片側にしか無い 3 件ずつ
+    assert SnapshotStore.hash_record(OLD["same"]) not in read_hashes
+    assert len(read_hashes) == 2 * 3 + 3 + 3
+
+
+def test_compare_items_ignores_snapshot_id_and_given_fields() -> None:
+    old = {"name": "a", "url": "u1", "snapshot-id": 1, "diskUsage": "?"}
+    new = {"name": "a", "url": "u2", "snapshot-id": 2, "diskUsage": 3}
+
+    assert SnapshotDiff.compare_items("a", old, new) == [
+        {"change": "disk_usage", "name": "a", "old": "?", "new": 3},
+        {"change": "modified", "name": "a", "fields": ["url"]},
+    ]
+    assert SnapshotDiff.compare_items("a", old, new, frozenset({"url"})) == [
+        {"change": "disk_usage", "name": "a", "old": "?", "new": 3}
+    ]
+
+
+def test_iter_snapshot_changes_defaults_to_latest_two(
+    command_list: CommandList,
+) -> None:
+    with pytest.raises(FileNotFoundError):
+        list(command_list.iter_snapshot_changes())
+
+    for assoc in (OLD, {}, NEW):
+        with command_list.reserve_snapshot_id() as snapshot_id:
+            command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", assoc)
+
+    assert [
+        change["name"] for change in command_list.iter_snapshot_changes()
+    ] == sorted(NEW)
+    assert list(command_list.iter_snapshot_changes(1, 3)) == EXPECTED
+    assert [
+        change["change"] for change in command_list.iter_snapshot_changes(new_id=2)
+    ] == ["deleted"] * len(OLD)
+
+
+def test_diff_command_writes_json_lines(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    for assoc in (OLD, NEW):
+        with command_list.reserve_snapshot_id() as snapshot_id:
+            command_list.save_snapshot(snapshot_id, "2024-03-15T12:00:00+00:00", assoc)
+    output = tmp_path / "diff.jsonl"
+    monkeypatch.setattr(
+        sys, "argv", ["ghrepo", "diff", "--user", "alice", "--output", str(output)]
+    )
+
+    main()
+
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == EXPECTED
@@ -0,0 +1,167 @@
+"""`SnapshotJournal` と、`save_snapshot` が途中で止まった場合の `recover_pending_snapshot` のテスト。"""
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.snapshot_journal import SnapshotJournal
+from ghrepo.snapshot_store import SnapshotStore
+
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+
+def make_assoc(*names: str) -> dict[str, dict[str, Any]]:
+    """リポジトリ名ごとのレコードを返す。"""
+    return {name: {"name": name, "visibility": "public"} for name in names}
+
+
+def save(command: CommandList, assoc: dict[str, dict[str, Any]]) -> int:
+    """予約した ID でスナップショットを保存し、その ID を返す。"""
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(snapshot_id, TIMESTAMP, assoc)
+    return snapshot_id
+
+
+def crash(*args: object, **kwargs: object) -> None:
+    """書き込みの途中でプロセスが止まったことを表す。"""
+    raise KeyboardInterrupt("crash")
+
+
+def test_journal_round_trip(tmp_path: Path) -> None:
+    journal = SnapshotJournal(tmp_path)
+    assert journal.read() is None
+
+    journal.begin(3, TIMESTAMP)
+    assert journal.read() == (3, TIMESTAMP)
+
+    journal.clear()
+    assert journal.read() is None
+    assert not journal.path.exists()
+
+
+@pytest.mark.parametrize("content", ["", '{"snapshot-id": 3', '{"snapshot-id": "3"}'])
+def test_journal_treats_broken_file_as_not_started(
+    tmp_path: Path, content: str
+) -> None:
+    journal = SnapshotJournal(tmp_path)
+    journal.path.write_text(content, encoding="utf-8")
+
+    assert journal.read(clear_invalid=False) is None
+    assert journal.path.exists()
+    assert journal.read() is None
+    assert not journal.path.exists()
+
+
+def test_publish_moves_staged_directory(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    staging_store = store.get_staging_store()
+    staging_store.write(
+        1, make_assoc("a"), AppConfigx.SNAPSHOT_STORAGE_PLAIN, AppConfigx.FILE_TYPE_YAML
+    )
+    staged_dir = staging_store.snapshots_dir / "1"
+
+    store.publish(1)
+
+    assert not staged_dir.exists()
+    assert not staging_store.snapshots_dir.exists()
+    assert store.read(1) == make_assoc("a")
+    with pytest.raises(FileNotFoundError):
+        store.publish(1)
+
+
+def test_publish_never_exposes_partial_snapshot(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = SnapshotStore(tmp_path)
+    store.get_staging_store().write(
+        1, make_assoc("a"), AppConfigx.SNAPSHOT_STORAGE_PLAIN, AppConfigx.FILE_TYPE_YAML
+    )
+    monkeypatch.setattr("ghrepo.snapshot_store.os.rename", crash)
+
+    with pytest.raises(KeyboardInterrupt):
+        store.publish(1)
+
+    assert not store.exists(1)
+    assert store.get_staging_store().read(1) == make_assoc("a")
+
+
+def test_save_snapshot_commits_and_clears_journal(command_list: CommandList) -> None:
+    snapshot_id = save(command_list, make_assoc("a", "b"))
+
+    assert command_list.recover_pending_snapshot() is None
+    assert command_list.get_snapshot_store().read(snapshot_id) == make_assoc("a", "b")
+    assert command_list._load_snapshots_assoc() == {snapshot_id: TIMESTAMP}
+    assert command_list.get_snapshot_registry().get_latest_id() == snapshot_id
+
+
+def test_crash_before_publish_is_discarded(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first_id = save(command_list, make_assoc("a"))
+    with monkeypatch.context() as patch:
+        patch.setattr(SnapshotStore, "publish", crash)
+        with pytest.raises(KeyboardInterrupt):
+            save(command_list, make_assoc("a", "b"))
+
+    snapshot_store = command_list.get_snapshot_store()
+    journal = SnapshotJournal(command_list.get_user_dir())
+    pending = journal.read(clear_invalid=False)
+    assert pending is not None
+    pending_id = pending[0]
+    assert snapshot_store.get_staging_store().exists(pending_id)
+    assert not snapshot_store.exists(pending_id)
+
+    assert command_list.recover_pending_snapshot() == pending_id
+
+    assert not journal.path.exists()
+    assert not snapshot_store.get_staging_store().exists(pending_id)
+    assert command_list._load_snapshots_assoc() == {first_id: TIMESTAMP}
+    assert command_list.get_snapshot_registry().get_latest_id() == first_id
+    assert command_list.load_latest_assoc() == make_assoc("a")
+
+
+def test_crash_after_publish_is_rolled_forward(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first_id = save(command_list, make_assoc("a"))
+    with monkeypatch.context() as patch:
+        patch.setattr(CommandList, "_record_snapshot", crash)
+        with pytest.raises(KeyboardInterrupt):
+            save(command_list, make_assoc("a", "b"))
+
+    snapshot_store = command_list.get_snapshot_store()
+    pending = SnapshotJournal(command_list.get_user_dir()).read(clear_invalid=False)
+    assert pending is not None
+    pending_id = pending[0]
+    assert snapshot_store.exists(pending_id)
+    assert command_list._load_snapshots_assoc() == {first_id: TIMESTAMP}
+
+    assert command_list.recover_pending_snapshot() == pending_id
+
+    assert command_list.recover_pending_snapshot() is None
+    assert command_list._load_snapshots_assoc() == {
+        first_id: TIMESTAMP,
+        pending_id: TIMESTAMP,
+    }
+    assert command_list.get_snapshot_registry().get_latest_id() == pending_id
+    assert command_list.load_latest_assoc() == make_assoc("a", "b")
+
+
+def test_next_save_recovers_interrupted_write_first(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    with monkeypatch.context() as patch:
+        patch.setattr(CommandList, "_record_snapshot", crash)
+        with pytest.raises(KeyboardInterrupt):
+            save(command_list, make_assoc("a"))
+
+    second_id = save(command_list, make_assoc("a", "b"))
+
+    assert sorted(command_list._load_snapshots_assoc()) == [second_id - 1, second_id]
+    assert command_list.get_snapshot_registry().collect_snapshot_ids() == [
+        second_id - 1,
+        second_id,
+    ]
@@ -0,0 +1,130 @@
+"""スナップショット台帳 (`SnapshotRegistry`) の記録・作り直しと、台帳による最新ID・次回IDの参照のテスト。"""
+
+import hashlib
+import json
+from typing import Any
+
+import pytest
+
+from ghrepo.command_list import CommandList
+from ghrepo.command_search import CommandSearch
+from ghrepo.snapshot_registry import SnapshotRegistry
+from ghrepo.snapshot_store import SnapshotStore
+
+TIMESTAMP = "2024-03-15T12:00:00+00:00"
+
+
+def save(command: CommandList, count: int) -> int:
+    """`count` 件のリポジトリを新しいスナップショットとして保存し、そのIDを返す。"""
+    assoc = {
+        f"repo{number}": {"name": f"repo{number}", "visibility": "public"}
+        for number in range(count)
+    }
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(snapshot_id, TIMESTAMP, assoc)
+    return snapshot_id
+
+
+def forbid_directory_scan(monkeypatch: pytest.MonkeyPatch) -> None:
+    """`snapshots/` の走査を失敗させる。"""
+
+    def fail(*args: Any) -> Any:
+        raise AssertionError("snapshots/ must not be scanned")
+
+    monkeypatch.setattr(SnapshotStore, "collect_snapshot_ids", staticmethod(fail))
+
+
+def test_save_snapshot_records_count_size_and_hash(command_list: CommandList) -> None:
+    first_id = save(command_list, 3)
+    second_id = save(command_list, 1)
+    registry = SnapshotRegistry(command_list.get_user_dir())
+    store = command_list.get_snapshot_store()
+
+    assert registry.get_latest_id() == second_id
+    assert registry.collect_snapshot_ids() == [first_id, second_id]
+    found = store.find_file(first_id, store.SNAPSHOT_BASE_NAME)
+    assert found is not None
+    body = found[0].read_bytes()
+    assert registry.get_entry(first_id) == {
+        "records": 3,
+        "bytes": len(body),
+        "hash": hashlib.sha256(body).hexdigest(),
+    }
+    assert SnapshotRegistry.describe(store, first_id) == registry.get_entry(first_id)
+    data = json.loads(registry.path.read_text(encoding="utf-8"))
+    assert data["latest"] == second_id
+
+
+def test_latest_and_next_id_read_registry_without_scanning(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    save(command_list, 2)
+    latest_id = save(command_list, 2)
+    forbid_directory_scan(monkeypatch)
+
+    assert command_list.get_next_snapshot_count() == latest_id + 1
+    command = CommandSearch(command_list.appstore, "alice")
+    assert command._get_latest_snapshot_id() == latest_id
+    assert save(command_list, 1) == latest_id + 1
+
+
+def test_missing_or_broken_registry_is_rebuilt_from_directories(
+    command_list: CommandList,
+) -> None:
+    first_id = save(command_list, 2)
+    second_id = save(command_list, 4)
+    registry_path = command_list.get_snapshot_registry().path
+    entries = json.loads(registry_path.read_text(encoding="utf-8"))["snapshots"]
+
+    # 台帳導入前のユーザーディレクトリと同じく、台帳が無ければ `snapshots/` を走査する
+    registry_path.unlink()
+    assert not command_list.get_snapshot_registry().exists()
+    assert command_list.get_next_snapshot_count() == second_id + 1
+    assert command_list.ensure_snapshot_registry() is True
+    assert command_list.ensure_snapshot_registry() is False
+    rebuilt = command_list.get_snapshot_registry()
+    assert rebuilt.collect_snapshot_ids() == [first_id, second_id]
+    assert rebuilt.get_entry(second_id) == entries[str(second_id)]
+
+    registry_path.write_text("{", encoding="utf-8")
+    assert not SnapshotRegistry(command_list.get_user_dir()).exists()
+    assert save(command_list, 1) == second_id + 1
+    assert SnapshotRegistry(command_list.get_user_dir()).collect_snapshot_ids() == [
+        first_id,
+        second_id,
+        second_id + 1,
+    ]
+
+
+def test_rebuild_keeps_known_entries_and_drops_missing_ids(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first_id = save(command_list, 2)
+    second_id = save(command_list, 3)
+    store = command_list.get_snapshot_store()
+    registry = SnapshotRegistry(command_list.get_user_dir())
+    before = registry.path.read_text(encoding="utf-8")
+    known = registry.get_entry(second_id)
+
+    assert registry.rebuild(store, [first_id, second_id]) is False
+    # `dry_run` では変わるかだけを返し、書き出さない
+    assert registry.rebuild(store, [second_id], dry_run=True) is True
+    assert registry.path.read_text(encoding="utf-8") == before
+
+    described: list[int] = []
+    describe = SnapshotRegistry.describe
+
+    def counting_describe(
+        snapshot_store: SnapshotStore, snapshot_id: int, record_count: int | None = None
+    ) -> dict[str, Any]:
+        described.append(snapshot_id)
+        return describe(snapshot_store, snapshot_id, record_count)
+
+    monkeypatch.setattr(SnapshotRegistry, "describe", staticmethod(counting_describe))
+    registry = SnapshotRegistry(command_list.get_user_dir())
+    assert registry.rebuild(store, [second_id, 99]) is True
+    # 既知の値はスナップショットを読まずに使い、本体の無い ID は載せない
+    assert described == [99]
+    assert registry.collect_snapshot_ids() == [second_id]
+    assert registry.get_latest_id() == second_id
+    assert registry.get_entry(second_id) == known
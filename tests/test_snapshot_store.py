@@ -0,0 +1,139 @@
+"""`SnapshotStore` の `plain` / `dedup` 形式の読み書きと、オブジェクトの共有のテスト。"""
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghrepo.appconfigx import AppConfigx
+from ghrepo.command_list import CommandList
+from ghrepo.snapshot_store import SnapshotStore
+
+DEDUP = AppConfigx.SNAPSHOT_STORAGE_DEDUP
+PLAIN = AppConfigx.SNAPSHOT_STORAGE_PLAIN
+
+
+def make_assoc(snapshot_id: int, **visibilities: str) -> dict[str, dict[str, Any]]:
+    """`snapshot-id` 付きのリポジトリ名ごとのレコードを返す。"""
+    return {
+        name: {"name": name, "visibility": visibility, "snapshot-id": snapshot_id}
+        for name, visibility in visibilities.items()
+    }
+
+
+def count_objects(store: SnapshotStore) -> int:
+    """`objects/` にあるオブジェクト数を返す。"""
+    return sum(1 for path in store.objects_dir.rglob("*") if path.is_file())
+
+
+def test_hash_record_ignores_snapshot_id() -> None:
+    assert SnapshotStore.hash_record(
+        {"name": "a", "snapshot-id": 1}
+    ) == SnapshotStore.hash_record({"snapshot-id": 2, "name": "a"})
+    assert SnapshotStore.hash_record({"name": "a"}) != SnapshotStore.hash_record(
+        {"name": "b"}
+    )
+
+
+def test_dedup_round_trip(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    assoc = make_assoc(1, a="public", b="private")
+
+    store.write(1, assoc, DEDUP)
+
+    manifest = store.read_manifest(1)
+    assert manifest is not None
+    assert manifest == {
+        name: SnapshotStore.hash_record(item) for name, item in assoc.items()
+    }
+    assert store.find_file(1, SnapshotStore.SNAPSHOT_BASE_NAME) is None
+    assert store.exists(1)
+    assert store.read(1) == assoc
+    assert store.read_subset(1, ["b", "missing", "a"]) == {
+        "b": assoc["b"],
+        "a": assoc["a"],
+    }
+    assert dict(store.read_table(1).items()) == assoc
+    assert [(name, record_hash) for name, record_hash, _ in store.iter_entries(1)] == [
+        ("a", manifest["a"]),
+        ("b", manifest["b"]),
+    ]
+
+
+def test_dedup_stores_unchanged_records_once(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    store.write(1, make_assoc(1, a="public", b="public"), DEDUP)
+    assert count_objects(store) == 2
+
+    # 内容が同じレコードは snapshot-id が違っても同じオブジェクトを参照する
+    store.write(2, make_assoc(2, a="public", b="private"), DEDUP)
+
+    assert count_objects(store) == 3
+    first, second = store.read_manifest(1), store.read_manifest(2)
+    assert first is not None and second is not None
+    assert first["a"] == second["a"]
+    assert first["b"] != second["b"]
+    # 読み込み時の snapshot-id はオブジェクトではなく読んだスナップショットのもの
+    assert store.read(1)["a"]["snapshot-id"] == 1
+    assert store.read(2)["a"]["snapshot-id"] == 2
+
+
+def test_rewrite_in_other_storage_removes_old_files(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    assoc = make_assoc(1, a="public")
+    store.write(1, assoc, PLAIN)
+    assert store.read_manifest(1) is None
+
+    store.write(1, assoc, DEDUP, AppConfigx.FILE_TYPE_JSONL)
+
+    assert store.find_file(1, SnapshotStore.SNAPSHOT_BASE_NAME) is None
+    found = store.find_file(1, SnapshotStore.MANIFEST_BASE_NAME)
+    assert found is not None and found[0].suffix == ".jsonl"
+    assert store.read(1) == assoc
+
+
+def test_read_reports_missing_object(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    store.write(1, make_assoc(1, a="public"), DEDUP)
+    for path in store.objects_dir.rglob("*.json"):
+        path.unlink()
+
+    with pytest.raises(FileNotFoundError):
+        store.read(1)
+
+
+def test_write_rejects_unknown_storage(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="unsupported snapshot storage"):
+        SnapshotStore(tmp_path).write(1, make_assoc(1, a="public"), "packed")
+
+
+def test_save_snapshot_uses_configured_dedup_storage(
+    command_list: CommandList, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(command_list, "get_snapshot_storage", lambda: DEDUP)
+    with command_list.reserve_snapshot_id() as snapshot_id:
+        command_list.save_snapshot(
+            snapshot_id, "2024-01-01T00:00:00+00:00", make_assoc(0, a="public")
+        )
+
+    store = command_list.get_snapshot_store()
+    assert store.read_manifest(snapshot_id) is not None
+    assert store.read(snapshot_id) == make_assoc(snapshot_id, a="public")
+
+
+def test_old_config_defaults_to_plain_storage(
+    old_config_command_list: CommandList,
+) -> None:
+    command = old_config_command_list
+    with pytest.raises(KeyError):
+        command.appstore.get_from_config("config", AppConfigx.SNAPSHOT_STORAGE_KEY)
+    assert command.get_snapshot_storage() == PLAIN
+
+    with command.reserve_snapshot_id() as snapshot_id:
+        command.save_snapshot(
+            snapshot_id, "2024-01-01T00:00:00+00:00", make_assoc(0, a="public")
+        )
+
+    store = command.get_snapshot_store()
+    assert store.read_manifest(snapshot_id) is None
+    assert store.read(snapshot_id) == make_assoc(0, a="public")